@@ -0,0 +1,50 @@
+"""Solve many small independent systems one by one and as a batch.
+
+Each system is a KKT matrix [H J'; J 0], where H is the 5-point
+finite-difference Laplacian on a grid x grid mesh shifted by a random
+diagonal, and J holds grid constraints that each couple two neighbouring
+variables. The systems are first solved with one solver object each, then
+with `solve_batch()` on 1 and nthreads threads.
+
+Example usage: python bench_batch.py [grid] [nsystems] [nthreads]
+"""
+
+import sys
+import timeit
+import numpy as np
+from hsl.solvers.batch import solve_batch
+from hsl.solvers.src._cyma57_numpy_INT32_FLOAT64 import NumpyMA57Solver_INT32_FLOAT64
+from bench_matrices import kkt_2d
+
+
+grid = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+nsystems = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+nthreads = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+rng = np.random.RandomState(0)
+systems = [kkt_2d(grid, rng.rand(grid * grid)) for k in range(nsystems)]
+rhs = [np.ones(n) for (n, arow, acol, aval) in systems]
+matrices = [(arow, acol, aval) for (n, arow, acol, aval) in systems]
+
+t = timeit.default_timer()
+xs = []
+for ((n, arow, acol, aval), b) in zip(systems, rhs):
+    context = NumpyMA57Solver_INT32_FLOAT64(n, n, aval.size)
+    context.get_matrix_data(arow, acol, aval)
+    context.analyze(use_cache=False)
+    context.factorize()
+    xs.append(context.solve(b, False))
+t_loop = timeit.default_timer() - t
+
+print 'n = %d, nnz = %d, %d systems' % (systems[0][0], systems[0][3].size,
+                                        nsystems)
+print '  one solver per system : %8.4f s' % t_loop
+for nt in (1, nthreads):
+    t = timeit.default_timer()
+    (x, offsets, inertia, status) = solve_batch(matrices, rhs, nthreads=nt)
+    t_batch = timeit.default_timer() - t
+    err = max(np.max(np.abs(x[offsets[k]:offsets[k+1]] - xs[k]))
+              for k in range(nsystems))
+    print '  batch, %2d threads     : %8.4f s (speedup %6.2f, %d failed,' \
+          ' max |dx| = %.2e)' % (nt, t_batch, t_loop / t_batch,
+                                 np.count_nonzero(status), err)
@@ -0,0 +1,42 @@
+"""Compare k calls to `solve` with a single call to `solve_many`.
+
+The matrix is the 5-point finite-difference Laplacian on a grid x grid mesh.
+
+Example usage: python bench_cyma57_solve_many.py [grid] [k]
+"""
+
+import sys
+import timeit
+import numpy as np
+from hsl.solvers.src._cyma57_numpy_INT32_FLOAT64 import NumpyMA57Solver_INT32_FLOAT64
+from bench_matrices import laplacian_2d
+
+
+grid = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+k = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+
+(n, arow, acol, aval) = laplacian_2d(grid)
+nnz = aval.size
+
+context = NumpyMA57Solver_INT32_FLOAT64(n, n, nnz)
+context.get_matrix_data(arow, acol, aval)
+context.analyze()
+context.factorize()
+
+B = np.asfortranarray(np.random.random((n, k)))
+
+t = timeit.default_timer()
+X1 = np.empty((n, k), order='F')
+for j in xrange(k):
+    X1[:, j] = context.solve(B[:, j].copy(), False)
+t_loop = timeit.default_timer() - t
+
+t = timeit.default_timer()
+X2 = context.solve_many(B)
+t_many = timeit.default_timer() - t
+
+print 'n = %d, nnz = %d, k = %d' % (n, nnz, k)
+print '  %d calls to solve : %8.4f s' % (k, t_loop)
+print '  one solve_many    : %8.4f s' % t_many
+print '  speedup           : %8.2f' % (t_loop / t_many)
+print '  max |X1 - X2|     : %8.2e' % np.max(np.abs(X1 - X2))
@@ -0,0 +1,60 @@
+"""Check that building and discarding solvers does not leak native memory.
+
+Many MA27 and MA57 solvers are built, analyzed, factorized and used to
+solve a system, then dropped. Half of them are released explicitly with
+`free()` (through the context manager), the others by garbage collection.
+The resident set size must stay flat once the first solvers have been built.
+The matrix is the 5-point finite-difference Laplacian on a grid x grid mesh.
+
+Example usage: python bench_leak.py [grid] [nsolvers]
+"""
+
+import os
+import sys
+import numpy as np
+from hsl.solvers.src._cyma27_numpy_INT32_FLOAT64 import NumpyMA27Solver_INT32_FLOAT64
+from hsl.solvers.src._cyma57_numpy_INT32_FLOAT64 import NumpyMA57Solver_INT32_FLOAT64
+from bench_matrices import laplacian_2d
+
+
+def rss():
+    """Return the resident set size of this process in kB."""
+    with open('/proc/self/statm') as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') / 1024
+
+
+def build_and_solve(Solver, k):
+    context = Solver(n, n, aval.size)
+    context.get_matrix_data(arow, acol, aval)
+    context.analyze(use_cache=False)
+    context.factorize()
+    if k % 2:
+        with context:
+            context.solve(rhs, False)
+    else:
+        context.solve(rhs, False)
+
+
+grid = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+nsolvers = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+(n, arow, acol, aval) = laplacian_2d(grid)
+rhs = np.ones(n)
+
+print 'n = %d, nnz = %d, %d solvers of each kind' % (n, aval.size, nsolvers)
+status = 0
+for Solver in (NumpyMA27Solver_INT32_FLOAT64, NumpyMA57Solver_INT32_FLOAT64):
+    for k in xrange(nsolvers / 10):  # warm up the allocator
+        build_and_solve(Solver, k)
+    rss0 = rss()
+    for k in xrange(nsolvers):
+        build_and_solve(Solver, k)
+    growth = rss() - rss0
+    print '  %-32s RSS growth: %6d kB' % (Solver.__name__, growth)
+    if growth > 1024:
+        status = 1
+
+if status:
+    print 'Memory is leaking'
+sys.exit(status)
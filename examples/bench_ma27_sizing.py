@@ -0,0 +1,40 @@
+"""Compare the MA27 factorization with different storage headroom.
+
+The real and integer factor storage is allocated as `headroom` times the
+storage predicted by the analysis for a factorization without compresses.
+Too little headroom for delayed pivots makes MA27 compress its data during
+the factorization, or restart it with more storage. For each
+headroom, the number of real and integer compresses, the number of times the
+storage grew and the time of the factorization are reported. A second
+factorization starts from the sizes that sufficed in the first one. The
+matrix is the 5-point finite-difference Laplacian on a grid x grid mesh.
+
+Example usage: python bench_ma27_sizing.py [grid]
+"""
+
+import sys
+import timeit
+from hsl.solvers.src._cyma27_numpy_INT32_FLOAT64 import NumpyMA27Solver_INT32_FLOAT64
+from bench_matrices import laplacian_2d
+
+
+grid = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+(n, arow, acol, aval) = laplacian_2d(grid)
+nnz = aval.size
+
+print 'n = %d, nnz = %d' % (n, nnz)
+print '  %8s %6s %10s %10s %8s %10s' % ('headroom', 'run', 'real cmp',
+                                        'int cmp', 'grew', 'factorize')
+for headroom in (1.0, 1.2, 1.5, 2.0, 3.0):
+    context = NumpyMA27Solver_INT32_FLOAT64(n, n, nnz)
+    context.get_matrix_data(arow, acol, aval)
+    context.headroom = headroom
+    context.analyze(use_cache=False)
+    for run in ('first', 'second'):
+        t_fact = timeit.default_timer()
+        context.factorize()
+        t_fact = timeit.default_timer() - t_fact
+        stats = context.report()['stats']
+        print '  %8.1f %6s %10d %10d %8d %9.4fs' % (
+            headroom, run, stats['real_compresses'], stats['int_compresses'],
+            stats['reallocations'], t_fact)
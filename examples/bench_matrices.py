@@ -0,0 +1,43 @@
+"""Test matrices shared by the benchmark scripts.
+
+Both matrices are built on a grid x grid mesh and returned as the order and
+the lower triangle in coordinate format, with 0-based int32 indices.
+"""
+
+import numpy as np
+
+
+def laplacian_2d(grid):
+    """Return the lower triangle of the 2D Laplacian in coordinate format.
+
+    The matrix is the 5-point finite-difference Laplacian on the mesh.
+    """
+    n = grid * grid
+    idx = np.arange(n, dtype=np.int32)
+    west = idx[idx % grid != 0]
+    south = idx[idx >= grid]
+    arow = np.concatenate((idx, west, south)).astype(np.int32)
+    acol = np.concatenate((idx, west - 1, south - grid)).astype(np.int32)
+    aval = np.concatenate((4.0 * np.ones(n), -np.ones(west.size),
+                           -np.ones(south.size)))
+    return (n, arow, acol, aval)
+
+
+def kkt_2d(grid, shift=0.0):
+    """Return the lower triangle of the KKT matrix in coordinate format.
+
+    The (1,1) block is the 2D Laplacian plus `shift`, a scalar or an array
+    of size grid * grid, on its diagonal. Constraint i couples the variables
+    i * grid and i * grid + 1.
+    """
+    n = grid * grid
+    idx = np.arange(n, dtype=np.int32)
+    west = idx[idx % grid != 0]
+    south = idx[idx >= grid]
+    cons = np.arange(grid, dtype=np.int32)
+    first = cons * grid
+    arow = np.concatenate((idx, west, south, n + cons, n + cons))
+    acol = np.concatenate((idx, west - 1, south - grid, first, first + 1))
+    aval = np.concatenate((4.0 + shift * np.ones(n), -np.ones(west.size),
+                           -np.ones(south.size), np.ones(grid), -np.ones(grid)))
+    return (n + grid, arow.astype(np.int32), acol.astype(np.int32), aval)
@@ -0,0 +1,43 @@
+"""Compare the MA57 ordering strategies chosen by hand and by the autotuner.
+
+Each ordering strategy is used to analyze and factorize the same matrix. The
+real factor storage and operation count predicted by `autotune()`, the
+actual size of the real factors and the time of the factorization are
+reported, followed by the choice of `autotune()` and the time it took. The
+matrix is the 5-point finite-difference Laplacian on a grid x grid mesh.
+
+Example usage: python bench_ordering.py [grid]
+"""
+
+import sys
+import timeit
+from hsl.solvers.src._cyma57_numpy_INT32_FLOAT64 import NumpyMA57Solver_INT32_FLOAT64
+from bench_matrices import laplacian_2d
+
+names = {0: 'AMD', 2: 'AMD, dense rows', 3: 'MD', 4: 'MeTiS',
+         5: 'MeTiS or AMD, dense rows'}
+
+
+grid = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+(n, arow, acol, aval) = laplacian_2d(grid)
+nnz = aval.size
+
+context = NumpyMA57Solver_INT32_FLOAT64(n, n, nnz)
+context.get_matrix_data(arow, acol, aval)
+t_tune = timeit.default_timer()
+(best, stats) = context.autotune(use_cache=False)
+t_tune = timeit.default_timer() - t_tune
+
+print 'n = %d, nnz = %d' % (n, nnz)
+print '  %-28s %12s %12s %12s %10s' % ('ordering', 'lfact', 'flops',
+                                       'factors', 'factorize')
+for ordering in sorted(stats):
+    context = NumpyMA57Solver_INT32_FLOAT64(n, n, nnz)
+    context.get_matrix_data(arow, acol, aval)
+    context.ordering = ordering
+    context.analyze(use_cache=False)
+    t_fact = min(timeit.repeat(context.factorize, number=1, repeat=3))
+    print '  %d %-26s %12d %12.3e %12d %9.4fs' % (
+        ordering, names[ordering], stats[ordering]['lfact'],
+        stats[ordering]['flops'], context.stats()[1], t_fact)
+print 'autotune chose %d (%s) in %.4fs' % (best, names[best], t_tune)
@@ -0,0 +1,64 @@
+"""Factorize and solve several large KKT matrices in a pool of processes.
+
+Each matrix is the KKT matrix [H J'; J 0] of a 5-point finite-difference
+Laplacian H on a grid x grid mesh, shifted by a random diagonal, and of grid
+constraints J that each couple two neighbouring variables. The matrices are
+first factorized and solved one after the other in this process, then in a
+`FactorizationPool` of nprocs processes, one thread per matrix sending the
+requests. The factorizations stay in the workers, where `nsolves` further
+solves are made against them.
+
+Example usage: python bench_pool.py [grid] [nmatrices] [nprocs] [nsolves]
+"""
+
+import sys
+import timeit
+import numpy as np
+from multiprocessing.pool import ThreadPool
+from hsl.solvers.pool import FactorizationPool
+from hsl.solvers.src._cyma57_numpy_INT32_FLOAT64 import NumpyMA57Solver_INT32_FLOAT64
+from bench_matrices import kkt_2d
+
+
+grid = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+nmatrices = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+nprocs = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+nsolves = int(sys.argv[4]) if len(sys.argv) > 4 else 10
+
+rng = np.random.RandomState(0)
+systems = [kkt_2d(grid, rng.rand(grid * grid)) for k in range(nmatrices)]
+n = systems[0][0]
+rhs = rng.randn(n)
+
+t = timeit.default_timer()
+xs = []
+for (n, arow, acol, aval) in systems:
+    context = NumpyMA57Solver_INT32_FLOAT64(n, n, aval.size)
+    context.get_matrix_data(arow, acol, aval)
+    context.analyze()
+    context.factorize()
+    for k in range(nsolves):
+        x = context.solve(rhs, False)
+    xs.append(x)
+t_serial = timeit.default_timer() - t
+
+with FactorizationPool(nprocs) as pool:
+    def run(system):
+        (n, arow, acol, aval) = system
+        handle = pool.factorize((arow, acol, aval), n=n)
+        for k in range(nsolves):
+            x = pool.solve(handle, rhs)
+        return x
+
+    threads = ThreadPool(nprocs)
+    t = timeit.default_timer()
+    xs_pool = threads.map(run, systems)
+    t_pool = timeit.default_timer() - t
+    threads.close()
+
+err = max(np.max(np.abs(x - x0)) for (x, x0) in zip(xs_pool, xs))
+print 'n = %d, nnz = %d, %d matrices, %d solves each' % (n, systems[0][3].size,
+                                                        nmatrices, nsolves)
+print '  in process          : %8.4f s' % t_serial
+print '  pool, %2d processes  : %8.4f s (speedup %6.2f, max |dx| = %.2e)' % (
+    nprocs, t_pool, t_serial / t_pool, err)
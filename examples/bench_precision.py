@@ -0,0 +1,67 @@
+"""Compare the single and double precision MA27 and MA57 solvers.
+
+For each solver, the same matrix is factorized in single (FLOAT32) and
+double (FLOAT64) precision. The size of the real factor storage, the time of
+the factorization and of a solve, and the relative residual of the solution
+are reported, followed by the solve time, residual and number of refinement
+steps of the mixed precision solver. The matrix is the 5-point
+finite-difference Laplacian on a grid x grid mesh.
+
+Example usage: python bench_precision.py [grid] [repeat]
+"""
+
+import sys
+import timeit
+import numpy as np
+from hsl.solvers.mixed import MixedPrecisionSolver
+from hsl.solvers.src._cyma27_numpy_INT32_FLOAT32 import NumpyMA27Solver_INT32_FLOAT32
+from hsl.solvers.src._cyma27_numpy_INT32_FLOAT64 import NumpyMA27Solver_INT32_FLOAT64
+from hsl.solvers.src._cyma57_numpy_INT32_FLOAT32 import NumpyMA57Solver_INT32_FLOAT32
+from hsl.solvers.src._cyma57_numpy_INT32_FLOAT64 import NumpyMA57Solver_INT32_FLOAT64
+from bench_matrices import laplacian_2d
+
+
+def residual(arow, acol, aval, x, rhs):
+    """Return ||rhs - A x|| / ||rhs|| for A given by its lower triangle."""
+    r = rhs.copy()
+    offdiag = arow != acol
+    np.subtract.at(r, arow, aval * x[acol])
+    np.subtract.at(r, acol[offdiag], aval[offdiag] * x[arow[offdiag]])
+    return np.linalg.norm(r) / np.linalg.norm(rhs)
+
+
+grid = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+(n, arow, acol, aval) = laplacian_2d(grid)
+nnz = aval.size
+rhs = np.ones(n)
+
+print 'n = %d, nnz = %d, best of %d' % (n, nnz, repeat)
+print '  %-32s %12s %10s %10s %10s' % ('solver', 'factors (kB)', 'factorize',
+                                      'solve', 'residual')
+# index of the storage for real data of the factors in stats()
+for (Solvers, ifact) in (((NumpyMA27Solver_INT32_FLOAT64, NumpyMA27Solver_INT32_FLOAT32), 0),
+                         ((NumpyMA57Solver_INT32_FLOAT64, NumpyMA57Solver_INT32_FLOAT32), 1)):
+    for Solver in Solvers:
+        dtype = np.float32 if Solver.__name__.endswith('FLOAT32') else np.float64
+        context = Solver(n, n, nnz)
+        context.get_matrix_data(arow, acol, aval.astype(dtype))
+        context.analyze(use_cache=False)
+        t_fact = min(timeit.repeat(context.factorize, number=1, repeat=repeat))
+        b = rhs.astype(dtype)
+        t_solve = min(timeit.repeat(lambda: context.solve(b, False),
+                                    number=1, repeat=repeat))
+        x = context.solve(b, False).astype(np.float64)
+        kbytes = context.stats()[ifact] * np.dtype(dtype).itemsize / 1024
+        print '  %-32s %12d %9.4fs %9.4fs %10.2e' % (Solver.__name__, kbytes, t_fact,
+                                                    t_solve,
+                                                    residual(arow, acol, aval, x, rhs))
+
+# Single precision factors refined to double precision accuracy
+for solver in ('ma27', 'ma57'):
+    P = MixedPrecisionSolver(n, arow, acol, aval, solver=solver)
+    t_solve = min(timeit.repeat(lambda: P.solve(rhs), number=1, repeat=repeat))
+    print '  %-32s %12s %10s %9.4fs %10.2e  (%d refinement steps, fallback: %s)' % (
+        'MixedPrecisionSolver/' + solver, '', '', t_solve,
+        residual(arow, acol, aval, P.x, rhs), P.nitref, P.fallback)
@@ -0,0 +1,54 @@
+"""Factorize and solve a batch of matrices that share one sparsity pattern.
+
+Each member is the KKT matrix [H J'; J 0] of a 5-point finite-difference
+Laplacian H on a grid x grid mesh, shifted by a random diagonal, and of grid
+constraints J that each couple two neighbouring variables. The pattern is
+analyzed once. The members are first refactorized and solved one after the
+other with `refactorize()` and `solve()`, then with
+`factorize_solve_batch()` on 1 and nthreads threads.
+
+Example usage: python bench_refactor_batch.py [grid] [batch] [nthreads] [ma27|ma57]
+"""
+
+import sys
+import timeit
+import numpy as np
+from hsl.solvers.src._cyma27_numpy_INT32_FLOAT64 import NumpyMA27Solver_INT32_FLOAT64
+from hsl.solvers.src._cyma57_numpy_INT32_FLOAT64 import NumpyMA57Solver_INT32_FLOAT64
+from bench_matrices import kkt_2d
+
+
+grid = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+batch = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+nthreads = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+solver = sys.argv[4] if len(sys.argv) > 4 else 'ma57'
+
+(n, arow, acol, aval) = kkt_2d(grid)
+Solver = {'ma27': NumpyMA27Solver_INT32_FLOAT64,
+          'ma57': NumpyMA57Solver_INT32_FLOAT64}[solver]
+context = Solver(n, n, aval.size)
+context.get_matrix_data(arow, acol, aval)
+context.analyze()
+
+rng = np.random.RandomState(0)
+values = np.tile(aval, (batch, 1))
+values[:, :grid * grid] += rng.rand(batch, grid * grid)  # Shift the diagonal of H
+rhs = rng.randn(batch, n)
+
+t = timeit.default_timer()
+xs = []
+for k in range(batch):
+    context.refactorize(values[k])
+    xs.append(context.solve(rhs[k], False))
+t_loop = timeit.default_timer() - t
+
+print '%s: n = %d, nnz = %d, batch of %d' % (solver, n, aval.size, batch)
+print '  one member at a time  : %8.4f s' % t_loop
+for nt in (1, nthreads):
+    t = timeit.default_timer()
+    (X, inertia, status) = context.factorize_solve_batch(values, rhs, nthreads=nt)
+    t_batch = timeit.default_timer() - t
+    err = np.max(np.abs(X - np.array(xs)))
+    print '  batch, %2d threads     : %8.4f s (speedup %6.2f, %d failed,' \
+          ' max |dx| = %.2e)' % (nt, t_batch, t_loop / t_batch,
+                                 np.count_nonzero(status), err)
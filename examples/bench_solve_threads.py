@@ -0,0 +1,58 @@
+"""Solve with one factorization of a KKT matrix from several threads.
+
+The matrix is factorized once. Each thread then solves `nsolves` systems
+against the shared factors, with its own workspace and without the GIL. The
+total time and the throughput are reported for 1, 2, 4, ... up to nthreads
+threads, as well as the largest difference with the serial solutions. The
+matrix is the KKT matrix [H J'; J 0] of a 5-point finite-difference
+Laplacian H on a grid x grid mesh and of grid constraints J that each couple
+two neighbouring variables.
+
+Example usage: python bench_solve_threads.py [grid] [nsolves] [nthreads] [ma27|ma57]
+"""
+
+import sys
+import timeit
+import numpy as np
+from multiprocessing.pool import ThreadPool
+from hsl.solvers.src._cyma27_numpy_INT32_FLOAT64 import NumpyMA27Solver_INT32_FLOAT64
+from hsl.solvers.src._cyma57_numpy_INT32_FLOAT64 import NumpyMA57Solver_INT32_FLOAT64
+from bench_matrices import kkt_2d
+
+
+grid = int(sys.argv[1]) if len(sys.argv) > 1 else 150
+nsolves = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+nthreads = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+solver = sys.argv[4] if len(sys.argv) > 4 else 'ma57'
+
+(n, arow, acol, aval) = kkt_2d(grid)
+Solver = {'ma27': NumpyMA27Solver_INT32_FLOAT64,
+          'ma57': NumpyMA57Solver_INT32_FLOAT64}[solver]
+context = Solver(n, n, aval.size)
+context.get_matrix_data(arow, acol, aval)
+context.analyze()
+context.factorize()
+
+rhs = [np.random.RandomState(k).randn(n) for k in range(nsolves)]
+xs_serial = [context.solve(b, False) for b in rhs]
+
+print '%s: n = %d, nnz = %d, %d solves per thread' % (solver, n, aval.size,
+                                                      nsolves)
+print '  %8s %10s %12s %10s %12s' % ('threads', 'time', 'solves/s',
+                                     'speedup', 'max |dx|')
+nt = 1
+while nt <= nthreads:
+    def solve_all(thread):
+        return [context.solve(b, False) for b in rhs]
+
+    pool = ThreadPool(nt)
+    t = timeit.default_timer()
+    xs = pool.map(solve_all, range(nt))
+    t = timeit.default_timer() - t
+    pool.close()
+    if nt == 1:
+        t_one = t
+    err = max(np.max(np.abs(x - x0)) for xt in xs for (x, x0) in zip(xt, xs_serial))
+    print '  %8d %9.4fs %12.1f %10.2f %12.2e' % (nt, t, nt * nsolves / t,
+                                                 nt * t_one / t, err)
+    nt *= 2
@@ -0,0 +1,49 @@
+"""Factorize and solve independent systems serially and in a thread pool.
+
+The analyze, factorize and solve phases release the GIL, so independent
+solver objects should scale nearly linearly with the number of threads.
+The matrix is the 5-point finite-difference Laplacian on a grid x grid mesh.
+
+Example usage: python bench_threads.py [grid] [nsystems] [nthreads]
+"""
+
+import sys
+import timeit
+import numpy as np
+from multiprocessing.pool import ThreadPool
+from hsl.solvers.src._cyma57_numpy_INT32_FLOAT64 import NumpyMA57Solver_INT32_FLOAT64
+from bench_matrices import laplacian_2d
+
+
+def factorize_and_solve(k):
+    context = NumpyMA57Solver_INT32_FLOAT64(n, n, aval.size)
+    context.get_matrix_data(arow, acol, (1.0 + k) * aval)
+    context.analyze()
+    context.factorize()
+    return context.solve(rhs, False)
+
+
+grid = int(sys.argv[1]) if len(sys.argv) > 1 else 150
+nsystems = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+nthreads = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+(n, arow, acol, aval) = laplacian_2d(grid)
+rhs = np.ones(n)
+
+t = timeit.default_timer()
+xs_serial = map(factorize_and_solve, range(nsystems))
+t_serial = timeit.default_timer() - t
+
+pool = ThreadPool(nthreads)
+t = timeit.default_timer()
+xs_threads = pool.map(factorize_and_solve, range(nsystems))
+t_threads = timeit.default_timer() - t
+pool.close()
+
+err = max(np.max(np.abs(x1 - x2)) for (x1, x2) in zip(xs_serial, xs_threads))
+
+print 'n = %d, nnz = %d, %d systems' % (n, aval.size, nsystems)
+print '  serial        : %8.4f s' % t_serial
+print '  %2d threads    : %8.4f s' % (nthreads, t_threads)
+print '  speedup       : %8.2f' % (t_serial / t_threads)
+print '  max |x1 - x2| : %8.2e' % err
@@ -0,0 +1,256 @@
+"""Fingerprints, serialization and caching of symbolic analyses.
+
+The analyze phase only depends on the sparsity pattern of a matrix. The
+helpers in this module compute a fingerprint of a pattern and convert the
+state produced by an analysis to and from a compact binary blob, so that it
+can be stored and reused by other solver objects, possibly in other
+processes. Within a process, solvers share completed analyses through
+`analysis_cache`, the orderings chosen by the MA57 autotuner through
+`ordering_cache` and the MA57 factor storage sizes that sufficed through
+`factor_size_cache`.
+"""
+
+import hashlib
+import struct
+import threading
+from collections import OrderedDict
+import numpy as np
+
+__all__ = ['pattern_key', 'pack_ma27_analysis', 'unpack_ma27_analysis',
+           'pack_ma57_analysis', 'unpack_ma57_analysis', 'AnalysisCache',
+           'analysis_cache', 'ordering_cache', 'factor_size_cache']
+
+_MA27_MAGIC = b'HSLMA27A'
+_MA27_HEADER = struct.Struct('<8s40s7i')  # magic, key, n, nz, likeep, liw1,
+                                          # nsteps, la, liw
+_MA27_NINFO = 20
+
+_MA57_MAGIC = b'HSLMA57A'
+_MA57_HEADER = struct.Struct('<8s40s5i')  # magic, key, n, nz, lkeep, lfact, lifact
+_MA57_NINFO = 40
+_MA57_NRINFO = 20
+
+
+def pattern_key(n, irow, jcol):
+    """Return a fingerprint of the sparsity pattern of a matrix.
+
+    :parameters:
+        :n: order of the matrix
+        :irow: 0-based row indices of the nonzeros
+        :jcol: 0-based column indices of the nonzeros
+
+    The fingerprint is the hexadecimal SHA-1 digest of the order and of the
+    index arrays. The order in which the nonzeros are listed matters.
+    """
+    irow = np.ascontiguousarray(irow, dtype=np.int32)
+    jcol = np.ascontiguousarray(jcol, dtype=np.int32)
+    h = hashlib.sha1()
+    h.update(struct.pack('<2i', n, irow.size))
+    h.update(irow)
+    h.update(jcol)
+    return h.hexdigest()
+
+
+def pack_ma27_analysis(key, n, nz, ikeep, iw1, nsteps, info, ops, la, liw):
+    """Serialize the result of an MA27 analysis.
+
+    :parameters:
+        :key: fingerprint of the analyzed pattern (see :func:`pattern_key`)
+        :n: order of the matrix
+        :nz: number of nonzeros given to the analysis
+        :ikeep: the `ikeep` array holding the pivot sequence
+        :iw1: the `iw1` array holding the assembly tree
+        :nsteps: number of elimination steps
+        :info: the `info` array returned by the analysis
+        :ops: the operation count returned by the analysis
+        :la: size of the real factor storage to allocate
+        :liw: size of the integer workspace to allocate
+
+    :returns: a binary blob (bytes).
+    """
+    ikeep = np.asarray(ikeep, dtype='<i4')
+    iw1 = np.asarray(iw1, dtype='<i4')
+    header = _MA27_HEADER.pack(_MA27_MAGIC, key.encode('ascii'), n, nz,
+                               ikeep.size, iw1.size, nsteps, la, liw)
+    return b''.join([header,
+                     np.asarray(info, dtype='<i4').tobytes(),
+                     struct.pack('<d', ops),
+                     ikeep.tobytes(),
+                     iw1.tobytes()])
+
+
+def unpack_ma27_analysis(blob, key, n, nz):
+    """Deserialize the result of an MA27 analysis.
+
+    The blob must have been produced by :func:`pack_ma27_analysis` for a
+    matrix of order `n` with `nz` nonzeros whose fingerprint is `key`.
+
+    :returns: the tuple (ikeep, iw1, nsteps, info, ops, la, liw), where the
+              arrays are contiguous and in native byte order.
+    :raises ValueError: if the blob is malformed or does not match the
+                        given pattern.
+    """
+    hsize = _MA27_HEADER.size
+    if len(blob) < hsize:
+        raise ValueError('Not an MA27 analysis')
+    (magic, blob_key, blob_n, blob_nz,
+     likeep, liw1, nsteps, la, liw) = _MA27_HEADER.unpack(blob[:hsize])
+    if magic != _MA27_MAGIC:
+        raise ValueError('Not an MA27 analysis')
+    if len(blob) != hsize + 4 * _MA27_NINFO + 8 + 4 * (likeep + liw1):
+        raise ValueError('Truncated MA27 analysis')
+    if blob_n != n or blob_nz != nz or blob_key.decode('ascii') != key:
+        raise ValueError('Analysis was performed on a different sparsity pattern')
+
+    offset = hsize
+    info = np.frombuffer(blob, dtype='<i4', count=_MA27_NINFO, offset=offset)
+    offset += 4 * _MA27_NINFO
+    (ops,) = struct.unpack('<d', blob[offset:offset + 8])
+    offset += 8
+    ikeep = np.frombuffer(blob, dtype='<i4', count=likeep, offset=offset)
+    offset += 4 * likeep
+    iw1 = np.frombuffer(blob, dtype='<i4', count=liw1, offset=offset)
+    return (ikeep.astype(np.int32), iw1.astype(np.int32), nsteps,
+            info.astype(np.int32), ops, la, liw)
+
+
+def pack_ma57_analysis(key, n, nz, keep, info, rinfo, lfact, lifact):
+    """Serialize the result of an MA57 analysis.
+
+    :parameters:
+        :key: fingerprint of the analyzed pattern (see :func:`pattern_key`)
+        :n: order of the matrix
+        :nz: number of nonzeros given to the analysis
+        :keep: the `keep` array holding the pivot sequence
+        :info: the `info` array returned by the analysis
+        :rinfo: the `rinfo` array returned by the analysis
+        :lfact: size of the real factor storage to allocate
+        :lifact: size of the integer factor storage to allocate
+
+    :returns: a binary blob (bytes).
+    """
+    keep = np.asarray(keep, dtype='<i4')
+    header = _MA57_HEADER.pack(_MA57_MAGIC, key.encode('ascii'), n, nz,
+                               keep.size, lfact, lifact)
+    return b''.join([header,
+                     np.asarray(info, dtype='<i4').tobytes(),
+                     np.asarray(rinfo, dtype='<f8').tobytes(),
+                     keep.tobytes()])
+
+
+def unpack_ma57_analysis(blob, key, n, nz):
+    """Deserialize the result of an MA57 analysis.
+
+    The blob must have been produced by :func:`pack_ma57_analysis` for a
+    matrix of order `n` with `nz` nonzeros whose fingerprint is `key`.
+
+    :returns: the tuple (keep, info, rinfo, lfact, lifact), where the arrays
+              are contiguous and in native byte order.
+    :raises ValueError: if the blob is malformed or does not match the
+                        given pattern.
+    """
+    hsize = _MA57_HEADER.size
+    if len(blob) < hsize:
+        raise ValueError('Not an MA57 analysis')
+    (magic, blob_key, blob_n, blob_nz,
+     lkeep, lfact, lifact) = _MA57_HEADER.unpack(blob[:hsize])
+    if magic != _MA57_MAGIC:
+        raise ValueError('Not an MA57 analysis')
+    if len(blob) != hsize + 4 * _MA57_NINFO + 8 * _MA57_NRINFO + 4 * lkeep:
+        raise ValueError('Truncated MA57 analysis')
+    if blob_n != n or blob_nz != nz or blob_key.decode('ascii') != key:
+        raise ValueError('Analysis was performed on a different sparsity pattern')
+
+    offset = hsize
+    info = np.frombuffer(blob, dtype='<i4', count=_MA57_NINFO, offset=offset)
+    offset += 4 * _MA57_NINFO
+    rinfo = np.frombuffer(blob, dtype='<f8', count=_MA57_NRINFO, offset=offset)
+    offset += 8 * _MA57_NRINFO
+    keep = np.frombuffer(blob, dtype='<i4', count=lkeep, offset=offset)
+    return (keep.astype(np.int32), info.astype(np.int32),
+            rinfo.astype(np.float64), lfact, lifact)
+
+
+class AnalysisCache(object):
+    """Size-bounded LRU cache of analyses.
+
+    Entries map a key, usually a tuple made of the solver name and the
+    fingerprint of a sparsity pattern, to a value. In `analysis_cache`, the
+    value is a blob produced by one of the `pack_*_analysis` functions. In
+    `ordering_cache` and `factor_size_cache`, it is a tuple (see below).
+    Values are stored as given and must not be None. When the cache is full,
+    the least recently used entry is evicted. Setting `maxsize` to 0
+    disables the cache.
+
+    The cache may be shared between threads.
+    """
+
+    def __init__(self, maxsize=64):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Return the value stored under `key`, or None."""
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries[key] = value  # most recently used goes last
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store `value` under `key`, evicting old entries if necessary."""
+        with self._lock:
+            self._entries.pop(key, None)
+            if self.maxsize <= 0:
+                return
+            self._entries[key] = value
+            self._shrink()
+
+    def resize(self, maxsize):
+        """Change the maximum number of entries."""
+        with self._lock:
+            self.maxsize = maxsize
+            self._shrink()
+
+    def clear(self):
+        """Remove all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Return a dictionary with the cache counters."""
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'size': len(self._entries),
+                'maxsize': self.maxsize}
+
+    def _shrink(self):
+        while len(self._entries) > max(self.maxsize, 0):
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+# Process-wide cache used by all solvers.
+analysis_cache = AnalysisCache()
+
+# Orderings chosen by the MA57 autotuner, by pattern fingerprint. Entries
+# hold the best ordering and the statistics of all the orderings tried.
+ordering_cache = AnalysisCache(maxsize=1024)
+
+# Sizes (lfact, lifact) of the MA57 factor storage that sufficed after the
+# factorization had to restart, by pattern fingerprint and ordering. A new
+# analysis of the same pattern allocates at least these sizes.
+factor_size_cache = AnalysisCache(maxsize=1024)
@@ -0,0 +1,77 @@
+"""Factorize and solve many small independent symmetric systems at once.
+
+Creating one solver object per system and solving from Python is dominated
+by overheads when the systems are small. :func:`solve_batch` instead hands
+the whole batch to MA57 in a single call: a pool of native threads takes the
+systems in turn and analyzes, factorizes and solves each of them without the
+GIL. Each thread reuses its MA57 data and workspaces from one system to the
+next.
+"""
+
+import numpy as np
+from multiprocessing import cpu_count
+
+__all__ = ['solve_batch']
+
+
+def _coo(matrix):
+    """Return the (irow, jcol, val) of one triangle of a symmetric matrix."""
+    if hasattr(matrix, 'tocoo'):  # SciPy sparse matrix: use the lower triangle
+        coo = matrix.tocoo()
+        lower = coo.row >= coo.col
+        return (coo.row[lower], coo.col[lower], coo.data[lower])
+    return matrix
+
+
+def solve_batch(matrices, rhs, nthreads=None, ordering=5):
+    """Solve the independent symmetric systems A_k x_k = b_k with MA57.
+
+    :parameters:
+        :matrices: sequence of matrices A_k, each given either as a tuple
+                   (irow, jcol, val) holding one triangle in coordinate
+                   format with 0-based indices, or as a SciPy sparse matrix
+                   whose lower triangle is used
+        :rhs: sequence of right-hand sides b_k
+        :nthreads: number of threads (default: the number of CPUs)
+        :ordering: pivot selection strategy, `icntl(6)` of MA57
+
+    :returns:
+        the tuple (x, offsets, inertia, status), where `x` holds all the
+        solutions one after the other, x_k being
+        `x[offsets[k]:offsets[k+1]]`, `inertia[k]` holds the numbers of
+        positive and negative eigenvalues of A_k and `status[k]` is 0 or the
+        first error code returned for A_k. x_k is only meaningful when
+        `status[k]` is 0.
+    """
+    from hsl.solvers.src._cyma57_base_INT32_FLOAT64 import solve_batch as _solve_batch
+
+    if len(matrices) != len(rhs):
+        raise ValueError("There must be one right-hand side per matrix")
+    if nthreads is None:
+        nthreads = cpu_count()
+    coos = [_coo(matrix) for matrix in matrices]
+    rhs = [np.asarray(b, dtype=np.float64).ravel() for b in rhs]
+
+    offsets = np.zeros(len(rhs) + 1, dtype=np.int32)
+    nz_offsets = np.zeros(len(rhs) + 1, dtype=np.int32)
+    offsets[1:] = np.cumsum([b.size for b in rhs])
+    nz_offsets[1:] = np.cumsum([len(val) for (irow, jcol, val) in coos])
+    for (b, (irow, jcol, val)) in zip(rhs, coos):
+        if len(irow) != len(val) or len(jcol) != len(val):
+            raise ValueError("irow, jcol and val must have the same size")
+        if len(val) and max(np.max(irow), np.max(jcol)) >= b.size:
+            raise ValueError("Index out of range of the right-hand side")
+
+    def stacked(arrays, dtype):
+        if not arrays:
+            return np.zeros(0, dtype=dtype)
+        return np.concatenate([np.asarray(v, dtype=dtype) for v in arrays])
+
+    # MA57 uses 1-based indices
+    irn = stacked([irow for (irow, jcol, val) in coos], np.int32) + 1
+    jcn = stacked([jcol for (irow, jcol, val) in coos], np.int32) + 1
+    a = stacked([val for (irow, jcol, val) in coos], np.float64)
+    x = stacked(rhs, np.float64)
+    (inertia, status) = _solve_batch(offsets, nz_offsets, irn, jcn, a, x,
+                                     ordering, nthreads)
+    return (x, offsets, inertia, status)
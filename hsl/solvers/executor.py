@@ -0,0 +1,276 @@
+"""Run the phases of the solvers in background threads.
+
+The analyze, factorize, solve and refine phases of the Cython solvers
+release the GIL while the native code runs. A :class:`SolverExecutor` runs
+them in a pool of threads and returns at once a :class:`Job`, so that a
+caller that must stay responsive, such as an event loop, is not blocked
+while a factorization runs. At most `max_workers` jobs run at the same time
+and the others wait in turn.
+
+A job made of several phases, such as the one returned by
+:meth:`SolverExecutor.factorize_and_solve`, can be cancelled between two
+phases. A phase that has started always runs to completion, since the
+native code cannot be interrupted.
+
+Jobs on one solver run in the order in which they were submitted only if
+they are chained in a single job or if each waits for the previous one.
+The phases of jobs submitted with a solver are serialized per solver. If
+its `concurrent_solves` attribute is True, as for the Cython solvers, which
+give each call its own workspace, its solves and refinements may run at the
+same time as each other. Every other phase runs alone, and so do all the
+phases of solvers without that attribute, such as `PyMa27Solver` and
+`PyMa57Solver`, whose solves write state shared by the whole solver.
+"""
+
+import threading
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+
+__all__ = ['JobCancelled', 'Job', 'SolverExecutor']
+
+# Phases that may run at the same time on one solver whose
+# `concurrent_solves` attribute is True
+_SHARED_PHASES = ('solve', 'refine')
+
+
+class _PhaseLock(object):
+    """Lock of one solver, held shared by concurrent solves and alone by
+    other phases.
+
+    A phase that must run alone is not kept waiting by solves that start
+    after it.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._nshared = 0
+        self._alone = False
+        self._nwaiting = 0  # Phases waiting to run alone
+
+    def acquire(self, shared):
+        with self._cond:
+            if shared:
+                while self._alone or self._nwaiting:
+                    self._cond.wait()
+                self._nshared += 1
+            else:
+                self._nwaiting += 1
+                while self._alone or self._nshared:
+                    self._cond.wait()
+                self._nwaiting -= 1
+                self._alone = True
+
+    def release(self, shared):
+        with self._cond:
+            if shared:
+                self._nshared -= 1
+            else:
+                self._alone = False
+            self._cond.notify_all()
+
+
+class JobCancelled(RuntimeError):
+    """Raised by :meth:`Job.result` when a job was cancelled."""
+    pass
+
+
+class Job(object):
+    """The phases of a solver submitted to a :class:`SolverExecutor`.
+
+    `phase` is the name of the phase that runs or ran last, or None if the
+    job has not started.
+    """
+
+    def __init__(self, steps, phase_lock=None, shared_phases=()):
+        self._steps = steps    # list of (name, callable, args, kwargs)
+        self._phase_lock = phase_lock
+        self._shared_phases = shared_phases
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._callbacks = []
+        self._cancelled = False
+        self._value = None
+        self._exception = None
+        self.phase = None
+
+    def _run(self):
+        value = None
+        completed = False
+        for (name, fn, args, kwargs) in self._steps:
+            with self._lock:
+                if self._cancelled:
+                    break
+                self.phase = name
+            shared = name in self._shared_phases
+            if self._phase_lock is not None:
+                self._phase_lock.acquire(shared)
+            try:
+                value = fn(*args, **kwargs)
+            except Exception as e:
+                self._exception = e
+                break
+            finally:
+                if self._phase_lock is not None:
+                    self._phase_lock.release(shared)
+        else:
+            self._value = value
+            completed = True
+        with self._lock:
+            if completed:
+                self._cancelled = False  # Cancelled during the last phase
+            self._done.set()
+            callbacks = self._callbacks
+            self._callbacks = []
+        for callback in callbacks:
+            callback(self)
+
+    def cancel(self):
+        """Skip the phases that have not started.
+
+        Returns False if the job has already finished, True otherwise.
+        """
+        with self._lock:
+            if self._done.is_set():
+                return False
+            self._cancelled = True
+            return True
+
+    def cancelled(self):
+        """Return True if the job finished without running all its phases
+        because it was cancelled."""
+        return self._done.is_set() and self._cancelled
+
+    def done(self):
+        """Return True if the job has finished."""
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """Wait for the job and return the value of its last phase.
+
+        The exception raised by a phase is raised again, and
+        :class:`JobCancelled` if the job was cancelled before its last phase.
+        """
+        self._done.wait(timeout)
+        if not self._done.is_set():
+            raise RuntimeError("The job did not finish in %g s" % timeout)
+        if self._exception is not None:
+            raise self._exception
+        if self._cancelled:
+            raise JobCancelled("The job was cancelled")
+        return self._value
+
+    def add_done_callback(self, callback):
+        """Call `callback(job)` when the job finishes.
+
+        The callback runs in the thread that ran the job, or at once if the
+        job has already finished. An event loop should use it to schedule
+        its own wake-up in a thread-safe way.
+        """
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+
+class SolverExecutor(object):
+    """Pool of threads that run the phases of solvers.
+
+    :parameters:
+        :max_workers: maximum number of jobs that run at the same time
+                      (default: the number of CPUs)
+
+    The executor may be used as a context manager, which closes it on exit.
+    """
+
+    def __init__(self, max_workers=None):
+        if max_workers is None:
+            max_workers = cpu_count()
+        if max_workers < 1:
+            raise ValueError("An executor needs at least one worker")
+        self.max_workers = max_workers
+        self._pool = ThreadPool(max_workers)
+        self._lock = threading.Lock()
+        self._phase_locks = {}  # id(solver) -> [solver, lock, # pending jobs]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def submit(self, steps, solver=None):
+        """Run `steps`, a list of (name, callable, args, kwargs), as one job.
+
+        If `solver` is given, the steps are serialized with the phases of the
+        other jobs submitted with the same solver. Steps named 'solve' or
+        'refine' may run at the same time as each other if
+        `solver.concurrent_solves` is True. Any other step runs alone.
+        The job can be cancelled between two steps. Returns the :class:`Job`.
+        """
+        if self._pool is None:
+            raise RuntimeError("The executor has been closed")
+        phase_lock = None
+        shared_phases = ()
+        if solver is not None:
+            with self._lock:
+                entry = self._phase_locks.get(id(solver))
+                if entry is None:
+                    entry = [solver, _PhaseLock(), 0]
+                    self._phase_locks[id(solver)] = entry
+                entry[2] += 1
+            phase_lock = entry[1]
+            if getattr(solver, 'concurrent_solves', False):
+                shared_phases = _SHARED_PHASES
+        job = Job(list(steps), phase_lock, shared_phases)
+        if solver is not None:
+            job.add_done_callback(lambda job: self._release_solver(solver))
+        self._pool.apply_async(job._run)
+        return job
+
+    def _release_solver(self, solver):
+        # Forget the lock of a solver once it has no pending jobs
+        with self._lock:
+            entry = self._phase_locks[id(solver)]
+            entry[2] -= 1
+            if not entry[2]:
+                del self._phase_locks[id(solver)]
+
+    def analyze(self, solver, *args, **kwargs):
+        """Run `solver.analyze(*args, **kwargs)` in the background."""
+        return self.submit([('analyze', solver.analyze, args, kwargs)], solver)
+
+    def factorize(self, solver, *args, **kwargs):
+        """Run `solver.factorize(*args, **kwargs)` in the background."""
+        return self.submit([('factorize', solver.factorize, args, kwargs)], solver)
+
+    def solve(self, solver, *args, **kwargs):
+        """Run `solver.solve(*args, **kwargs)` in the background."""
+        return self.submit([('solve', solver.solve, args, kwargs)], solver)
+
+    def refine(self, solver, *args, **kwargs):
+        """Run `solver.refine(*args, **kwargs)` in the background."""
+        return self.submit([('refine', solver.refine, args, kwargs)], solver)
+
+    def factorize_and_solve(self, solver, rhs, analyze=False,
+                            get_resid=False):
+        """Factorize and solve with `rhs` in one job, analyzing first if
+        `analyze`.
+
+        The job can be cancelled between the phases, and its result is the
+        one of `solver.solve(rhs, get_resid)`.
+        """
+        steps = [('factorize', solver.factorize, (), {}),
+                 ('solve', solver.solve, (rhs, get_resid), {})]
+        if analyze:
+            steps.insert(0, ('analyze', solver.analyze, (), {}))
+        return self.submit(steps, solver)
+
+    def close(self):
+        """Wait for the submitted jobs and stop the threads."""
+        if self._pool is None:
+            return
+        self._pool.close()
+        self._pool.join()
+        self._pool = None
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""Mixed precision solution of symmetric systems.
+
+The matrix is factorized in single precision with MA27 or MA57 and the
+solution is refined in double precision. When refinement stalls, the matrix
+is factorized again in double precision.
+"""
+
+import numpy as np
+from hsl.solvers.src._cyma27_numpy_INT32_FLOAT32 import NumpyMA27Solver_INT32_FLOAT32
+from hsl.solvers.src._cyma27_numpy_INT32_FLOAT64 import NumpyMA27Solver_INT32_FLOAT64
+from hsl.solvers.src._cyma57_numpy_INT32_FLOAT32 import NumpyMA57Solver_INT32_FLOAT32
+from hsl.solvers.src._cyma57_numpy_INT32_FLOAT64 import NumpyMA57Solver_INT32_FLOAT64
+
+__all__ = ['MixedPrecisionSolver']
+
+_solvers = {'ma27': (NumpyMA27Solver_INT32_FLOAT32, NumpyMA27Solver_INT32_FLOAT64),
+            'ma57': (NumpyMA57Solver_INT32_FLOAT32, NumpyMA57Solver_INT32_FLOAT64)}
+
+
+class MixedPrecisionSolver(object):
+
+    def __init__(self, n, arow, acol, aval, solver='ma57', sqd=False,
+                 maxitref=10, tol=None, stall=0.5):
+        u"""Instantiate a :class:`MixedPrecisionSolver` object.
+
+        Context to solve the square symmetric linear system of equations
+
+            A x = b
+
+        to double precision accuracy with a single precision factorization
+        of A, which needs half the storage of a double precision one and is
+        usually faster to compute.
+
+        The solution x₀ computed with the single precision factors is refined
+        by the iteration
+
+            r = b - A xₖ,  solve A d = r,  xₖ₊₁ = xₖ + d,
+
+        where the residual r is computed in double precision with the
+        original values of A and the correction d is computed with the single
+        precision factors. The iteration stops when
+
+            ‖r‖ ≤ tol (‖A‖ ‖x‖ + ‖b‖)
+
+        in the infinity norm. If the residual norm does not decrease by a
+        factor `stall` in one step, or after `maxitref` steps, A is
+        factorized in double precision and the system is solved again. This
+        fallback persists for subsequent solves.
+
+        :parameters:
+            :n: order of A
+            :arow: 0-based row indices of the nonzeros of A
+            :acol: 0-based column indices of the nonzeros of A
+            :aval: values of the nonzeros of A
+
+        Only one triangle of A should be given.
+
+        :keywords:
+            :solver: 'ma27' or 'ma57' (default: 'ma57')
+            :sqd: Flag indicating symmetric quasi-definite matrix
+                  (default: False)
+            :maxitref: Maximum number of refinement steps (default: 10)
+            :tol: Tolerance on the scaled residual (default: n times the
+                  double precision machine epsilon)
+            :stall: Minimum decrease factor of the residual norm in one
+                    refinement step (default: 0.5)
+        """
+        if solver not in _solvers:
+            raise ValueError("solver must be 'ma27' or 'ma57'")
+        self.n = n
+        self.sqd = sqd
+        self.maxitref = maxitref
+        self.tol = tol if tol is not None else n * np.finfo(np.float64).eps
+        self.stall = stall
+        (self._Solver32, self._Solver64) = _solvers[solver]
+
+        self.arow = np.ascontiguousarray(arow, dtype=np.int32)
+        self.acol = np.ascontiguousarray(acol, dtype=np.int32)
+        self._offdiag = self.arow != self.acol
+
+        self.x = np.zeros(n)
+        self.residual = np.zeros(n)
+        self.nitref = 0          # Refinement steps taken by the last solve
+        self.fallback = False    # A is factorized in double precision
+
+        self.context64 = None    # Double precision context, if needed
+        self.context = self._Solver32(n, n, self.arow.size, sqd)
+        self.context.get_matrix_data(self.arow, self.acol,
+                                     np.zeros(self.arow.size, dtype=np.float32))
+        self.context.analyze()
+        self.refactorize(aval)
+        return
+
+    def refactorize(self, aval):
+        """Factorize A again with new values.
+
+        The sparsity pattern must be the one given at construction and
+        `aval` must list the values in the same order. A new single precision
+        factorization is attempted even after a fallback.
+        """
+        self.aval = np.ascontiguousarray(aval, dtype=np.float64)
+        absval = np.abs(self.aval)
+        self.matNorm = np.max(self._matvec(absval, np.ones(self.n)))
+        self.fallback = False
+        try:
+            self.context.refactorize(self.aval.astype(np.float32))
+        except RuntimeError:
+            self._fall_back()
+        return
+
+    def solve(self, b):
+        """Solve the linear system of equations Ax = b.
+
+        The solution is returned and also found in `self.x`, its residual
+        b - Ax in `self.residual` and the number of refinement steps in
+        `self.nitref`.
+        """
+        b = np.ascontiguousarray(b, dtype=np.float64)
+        self.nitref = 0
+        if self.fallback:
+            return self._solve64(b)
+
+        bnorm = np.max(np.abs(b))
+        x = self.context.solve(b.astype(np.float32), False).astype(np.float64)
+        r = b - self._matvec(self.aval, x)
+        rnorm = np.max(np.abs(r))
+        # Written so that a NaN residual, from single precision factors or
+        # values out of range, does not count as converged
+        while not rnorm <= self.tol * (self.matNorm * np.max(np.abs(x)) + bnorm):
+            if self.nitref == self.maxitref or not np.isfinite(rnorm):
+                self._fall_back()
+                return self._solve64(b)
+            x += self.context.solve(r.astype(np.float32), False)
+            r = b - self._matvec(self.aval, x)
+            self.nitref += 1
+            (rnorm, rnorm_old) = (np.max(np.abs(r)), rnorm)
+            if not rnorm <= self.stall * rnorm_old:
+                self._fall_back()
+                return self._solve64(b)
+
+        self.x[:] = x
+        self.residual[:] = r
+        return self.x
+
+    def _matvec(self, values, x):
+        """Return A x where the nonzeros of A have the given values."""
+        off = self._offdiag
+        y = np.bincount(self.arow, values * x[self.acol], minlength=self.n)
+        y += np.bincount(self.acol[off], values[off] * x[self.arow[off]],
+                         minlength=self.n)
+        return y
+
+    def _fall_back(self):
+        """Factorize A in double precision unless it is already done."""
+        if self.fallback:
+            return
+        if self.context64 is None:
+            self.context64 = self._Solver64(self.n, self.n, self.arow.size,
+                                            self.sqd)
+            self.context64.get_matrix_data(self.arow, self.acol, self.aval)
+            self.context64.analyze()  # found in the analysis cache
+            self.context64.factorize()
+        else:
+            self.context64.refactorize(self.aval)
+        self.fallback = True
+
+    def _solve64(self, b):
+        self.context64.solve(b, False, out=self.x)
+        self.residual[:] = b - self._matvec(self.aval, self.x)
+        return self.x
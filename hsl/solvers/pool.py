@@ -0,0 +1,299 @@
+"""Factorize and solve with MA57 in a pool of worker processes.
+
+A :class:`FactorizationPool` starts worker processes that stay alive between
+requests. Each factorization lives in one worker, where it is kept hot and is
+referred to by the handle returned by :meth:`FactorizationPool.factorize`.
+Requests on handles held by different workers run in parallel when they are
+made from different threads.
+
+Arrays are never pickled. The pattern, the values and the right-hand sides
+are written into buffers that the pool and the workers both map into memory,
+and only the names and shapes of the buffers travel through the pipes. The
+buffers are memory-mapped files in a private directory, placed in
+`/dev/shm` when it exists.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import multiprocessing
+import numpy as np
+from hsl.solvers.batch import _coo
+
+__all__ = ['FactorizationPool']
+
+
+def _create_buffer(dirname, name, shape, dtype):
+    """Create a shared buffer and return its spec and the array that maps it."""
+    spec = (os.path.join(dirname, name), tuple(shape), np.dtype(dtype).str)
+    return (spec, _attach_buffer(spec, 'w+'))
+
+
+def _attach_buffer(spec, mode='r+'):
+    """Return the array that maps the shared buffer described by `spec`."""
+    (path, shape, dtype) = spec
+    # np.memmap cannot map an empty file
+    if not np.prod(shape):
+        return np.zeros(shape, dtype=dtype, order='F')
+    return np.memmap(path, dtype=dtype, mode=mode, shape=shape, order='F')
+
+
+def _worker(conn):
+    """Serve the requests of a pool until it is closed."""
+    from hsl.solvers.src._cyma57_numpy_INT32_FLOAT64 import NumpyMA57Solver_INT32_FLOAT64
+
+    held = {}  # handle -> [solver, values, spec of x, x]
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request[0] == 'close':
+            break
+        try:
+            if request[0] == 'factorize':
+                (op, handle, n, nnz, irow, jcol, val) = request
+                context = NumpyMA57Solver_INT32_FLOAT64(n, n, nnz)
+                values = _attach_buffer(val)
+                context.get_matrix_data(_attach_buffer(irow), _attach_buffer(jcol),
+                                        values)
+                context.analyze()
+                context.factorize()
+                held[handle] = [context, values, None, None]
+                result = None
+            elif request[0] == 'refactorize':
+                (context, values) = held[request[1]][:2]
+                context.refactorize(values)
+                result = None
+            elif request[0] == 'solve':
+                (op, handle, spec, nrhs) = request
+                entry = held[handle]
+                if entry[2] != spec:
+                    entry[2:] = [spec, _attach_buffer(spec)]
+                if nrhs:
+                    entry[0].solve_many(entry[3][:, :nrhs], overwrite_b=True)
+                result = None
+            elif request[0] == 'release':
+                del held[request[1]]
+                result = None
+            else:
+                raise ValueError("Unknown request %r" % (request[0],))
+            conn.send(('ok', result))
+        except Exception as e:
+            conn.send(('error', '%s: %s' % (type(e).__name__, e)))
+    conn.close()
+
+
+class _Handle(object):
+    """State kept by the pool about one factorization."""
+
+    def __init__(self, worker, n, values):
+        self.worker = worker
+        self.n = n
+        self.values = values  # Shared buffer of the values
+        self.x_spec = None    # Shared buffer of the right-hand sides
+        self.x = None
+
+
+class FactorizationPool(object):
+    """Pool of processes that hold MA57 factorizations.
+
+    :parameters:
+        :nprocs: number of worker processes (default: the number of CPUs)
+
+    The pool may be used as a context manager, which closes it on exit.
+    Requests on one pool may be made from several threads. Requests on
+    handles held by one worker are served one at a time.
+    """
+
+    def __init__(self, nprocs=None):
+        if nprocs is None:
+            nprocs = multiprocessing.cpu_count()
+        if nprocs < 1:
+            raise ValueError("A pool needs at least one process")
+        shm = '/dev/shm' if os.path.isdir('/dev/shm') else None
+        self._dirname = tempfile.mkdtemp(prefix='hsl-pool-', dir=shm)
+        self._handles = {}
+        self._next_handle = 0
+        self._lock = threading.Lock()
+        self._conns = []
+        self._locks = []
+        self._procs = []
+        for k in range(nprocs):
+            (conn, child) = multiprocessing.Pipe()
+            proc = multiprocessing.Process(target=_worker, args=(child,))
+            proc.daemon = True
+            proc.start()
+            child.close()
+            self._conns.append(conn)
+            self._locks.append(threading.Lock())
+            self._procs.append(proc)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    @property
+    def nprocs(self):
+        return len(self._procs)
+
+    def _request(self, worker, request):
+        with self._locks[worker]:
+            self._conns[worker].send(request)
+            (status, result) = self._conns[worker].recv()
+        if status == 'error':
+            raise RuntimeError("Worker %d: %s" % (worker, result))
+        return result
+
+    def _get(self, handle):
+        if self._conns is None:
+            raise RuntimeError("The pool has been closed")
+        try:
+            return self._handles[handle]
+        except KeyError:
+            raise ValueError("Unknown handle %r" % (handle,))
+
+    def factorize(self, matrix, n=None):
+        """Analyze and factorize `matrix` in one of the workers.
+
+        :parameters:
+            :matrix: symmetric matrix, given either as a tuple
+                     (irow, jcol, val) holding one triangle in coordinate
+                     format with 0-based indices, or as a SciPy sparse matrix
+                     whose lower triangle is used
+            :n: order of the matrix (default: the shape of a SciPy matrix,
+                or the largest index plus one)
+
+        :returns:
+            the handle of the factorization, to pass to the other methods.
+        """
+        if self._conns is None:
+            raise RuntimeError("The pool has been closed")
+        if n is None and hasattr(matrix, 'shape'):
+            n = matrix.shape[0]
+        (irow, jcol, val) = _coo(matrix)
+        (irow, jcol, val) = (np.asarray(irow), np.asarray(jcol), np.asarray(val))
+        if irow.size != val.size or jcol.size != val.size:
+            raise ValueError("irow, jcol and val must have the same size")
+        if n is None:
+            n = int(max(irow.max(), jcol.max())) + 1 if val.size else 0
+
+        with self._lock:
+            handle = self._next_handle
+            self._next_handle += 1
+            load = [0] * self.nprocs
+            for h in self._handles.values():
+                load[h.worker] += 1
+            worker = load.index(min(load))
+            specs = []
+            for (name, array, dtype) in (('irow', irow, np.int32),
+                                         ('jcol', jcol, np.int32),
+                                         ('val', val, np.float64)):
+                (spec, buf) = _create_buffer(self._dirname, '%d.%s' % (handle, name),
+                                             (val.size,), dtype)
+                buf[:] = array
+                specs.append(spec)
+            self._handles[handle] = _Handle(worker, n, buf)  # buf holds val
+        try:
+            self._request(worker, ('factorize', handle, n, val.size) + tuple(specs))
+        except RuntimeError:
+            self.release(handle)
+            raise
+        finally:
+            for (path, shape, dtype) in specs[:2]:
+                if os.path.exists(path):
+                    os.remove(path)  # The pattern was copied into the solver
+        return handle
+
+    def refactorize(self, handle, val):
+        """Factorize the matrix of `handle` again with the values `val`.
+
+        The sparsity pattern is the one given to :meth:`factorize` and its
+        analysis is reused.
+        """
+        h = self._get(handle)
+        val = np.asarray(val, dtype=np.float64).ravel()
+        if val.size != h.values.size:
+            raise ValueError("Values array has wrong size!\n"
+                             "Expected %d values and got %d" % (h.values.size, val.size))
+        with self._locks[h.worker]:
+            # The values must not change before the worker has read them
+            h.values[:] = val
+            self._conns[h.worker].send(('refactorize', handle))
+            (status, result) = self._conns[h.worker].recv()
+        if status == 'error':
+            raise RuntimeError("Worker %d: %s" % (h.worker, result))
+
+    def solve(self, handle, rhs):
+        """Solve with the factorization of `handle`.
+
+        `rhs` is a vector of size n or a 2-D array of size n x k whose columns
+        are right-hand sides. Returns the solution(s) with the shape of `rhs`.
+        """
+        h = self._get(handle)
+        rhs = np.asarray(rhs, dtype=np.float64)
+        if rhs.shape[0:1] != (h.n,) or rhs.ndim > 2:
+            raise ValueError("Right hand side has wrong shape!\n"
+                             "Expected (%d,) or (%d, k) and got %s"
+                             % (h.n, h.n, str(rhs.shape)))
+        nrhs = rhs.shape[1] if rhs.ndim == 2 else 1
+        with self._locks[h.worker]:
+            # Right-hand sides are sent in a buffer that only grows
+            if h.x is None or h.x.shape[1] < nrhs:
+                self._drop_buffer(h)
+                (h.x_spec, h.x) = _create_buffer(self._dirname,
+                                                 '%d.x%d' % (handle, nrhs),
+                                                 (h.n, nrhs), np.float64)
+            h.x[:, :nrhs] = rhs.reshape(h.n, nrhs)
+            self._conns[h.worker].send(('solve', handle, h.x_spec, nrhs))
+            (status, result) = self._conns[h.worker].recv()
+            x = np.array(h.x[:, :nrhs])
+        if status == 'error':
+            raise RuntimeError("Worker %d: %s" % (h.worker, result))
+        return x.reshape(rhs.shape)
+
+    def release(self, handle):
+        """Free the factorization of `handle` and its buffers."""
+        h = self._get(handle)
+        with self._lock:
+            del self._handles[handle]
+        try:
+            self._request(h.worker, ('release', handle))
+        except RuntimeError:
+            pass  # The factorization failed and was never held
+        self._drop_buffer(h)
+        path = os.path.join(self._dirname, '%d.val' % handle)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _drop_buffer(self, h):
+        if h.x_spec is not None and os.path.exists(h.x_spec[0]):
+            os.remove(h.x_spec[0])
+        h.x_spec = h.x = None
+
+    def close(self):
+        """Stop the workers and remove the shared buffers."""
+        if self._conns is None:
+            return
+        for (conn, lock) in zip(self._conns, self._locks):
+            with lock:
+                try:
+                    conn.send(('close',))
+                except (IOError, OSError):
+                    pass
+                conn.close()
+        for proc in self._procs:
+            proc.join()
+        self._conns = None
+        self._handles.clear()
+        shutil.rmtree(self._dirname, ignore_errors=True)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
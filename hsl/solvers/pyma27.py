@@ -5,8 +5,11 @@ import numpy
 from pysparse.sparse.pysparseMatrix import PysparseMatrix
 from pysparse.sparse import spmatrix
 from hsl.solvers import _pyma27
+from hsl.solvers.analysis import pattern_key, pack_ma27_analysis, unpack_ma27_analysis
+from hsl.solvers.analysis import analysis_cache
+from hsl.solvers.report import ma27_stats
 
-from sils import Sils
+from sils import Sils, default_delta_policy
 
 
 class PyMa27Solver(Sils):
@@ -47,6 +50,13 @@ class PyMa27Solver(Sils):
         :keywords:
             :sqd:  Flag indicating symmetric quasi-definite matrix
                    (default: False)
+            :use_cache: Look up the analysis of the sparsity pattern of A in
+                        `hsl.solvers.analysis.analysis_cache` and store it
+                        there after analyzing (default: True)
+            :perm: Pivot order: variable i is eliminated in position
+                   perm[i] (0-based), as in the permutations returned by
+                   `hsl.ordering.mc60.sloan()`. If given, the analysis
+                   cache is not used (default: None)
 
         Example:
 
@@ -58,6 +68,11 @@ class PyMa27Solver(Sils):
 
         PyMa27 relies on the sparse direct multifrontal code MA27
         from the Harwell Subroutine Library archive.
+
+        Solves and refinements write `self.x`, `self.residual` and the
+        workspace of the solver, so they must not run at the same time on
+        one object. Concurrent solves need one object per thread, or the
+        Cython solvers, which give each solve its own workspace.
         """
 
         if isinstance(A, PysparseMatrix):
@@ -81,7 +96,31 @@ class PyMa27Solver(Sils):
         # self.B = spmatrix.ll_mat_sym(self.n, 0)
 
         # Analyze and factorize matrix
-        self.context = _pyma27.factor(thisA, self.sqd)
+        self.context = _pyma27.factor(thisA, self.sqd, False)
+        perm = kwargs.get('perm')
+        t = self.phase_report.start()
+        if perm is not None:
+            self.context.analyze(numpy.ascontiguousarray(perm, dtype=numpy.int32))
+        elif self.use_cache:
+            key = self.pattern_key()
+            blob = analysis_cache.get(('ma27', key))
+            if blob is None:
+                self.context.analyze()
+                analysis_cache.put(('ma27', key), self._dump_analysis(key))
+            else:
+                self._load_analysis(blob, key)
+        else:
+            self.context.analyze()
+        self.phase_report.stop('analyze', t, self._report_stats)
+        self._factorize()
+
+    def _factorize(self):
+        t = self.phase_report.start()
+        self.context.factorize()
+        self.phase_report.stop('factorize', t, self._report_stats)
+        self._update_stats()
+
+    def _update_stats(self):
         (self.rwords, self.iwords, self.ncomp, self.nrcomp, self.nicomp,
          self.n2x2pivots, self.neig, self.rank) = self.context.stats()
 
@@ -95,13 +134,86 @@ class PyMa27Solver(Sils):
         """
         return (self.rank - self.neig, self.neig, self.n - self.rank)
 
-    def solve(self, b, get_resid=True):
+    def analyze(self, perm=None, warm_start=False):
+        """Analyze A again and factorize.
+
+        Variable i is eliminated in position perm[i] (0-based). If `perm`
+        is not given and `warm_start` is True, the pivot order of the
+        previous analysis is used again, which avoids reordering. Otherwise,
+        the pivot order is chosen automatically.
+        """
+        if perm is not None:
+            perm = numpy.ascontiguousarray(perm, dtype=numpy.int32)
+        t = self.phase_report.start()
+        self.context.analyze(perm, warm_start)
+        self.phase_report.stop('analyze', t, self._report_stats)
+        self._factorize()
+        return
+
+    def refactorize(self, values):
+        """Perform numerical factorization with new values.
+
+        The sparsity pattern must be the one given at the analyze phase.
+        `values` is a contiguous float64 array holding the new values of the
+        nonzeros of A in the order in which they were stored at analysis,
+        i.e., row by row as returned by `A.find()`. The values are copied
+        directly into the solver and no pattern work is performed.
+        """
+        t = self.phase_report.start()
+        self.context.refactorize(values)
+        self.phase_report.stop('factorize', t, self._report_stats)
+        self._update_stats()
+        return
+
+    def factorize_with_inertia(self, target_pos, target_neg,
+                               delta_policy=default_delta_policy):
+        u"""Factorize A + δ diag(I, 0) with a shift δ that corrects the inertia.
+
+        The first `target_pos` diagonal entries of A are shifted by δ ≥ 0
+        until the inertia of the shifted matrix is (target_pos, target_neg,
+        n - target_pos - target_neg). The trial shifts are chosen by
+        `delta_policy` (see :class:`hsl.solvers.sils.DeltaPolicy`). All
+        trials run in a single call against the existing analysis and the
+        values of the last factorization. Those values are left unchanged, so
+        residuals and iterative refinement use the unshifted matrix. Only
+        diagonal entries stored in A are shifted.
+
+        The number of factorizations performed is kept in `self.ntrials`.
+
+        :returns: the tuple (δ, inertia) of the final factorization.
+        :raises RuntimeError: if the shift needed exceeds `delta_policy.max`.
+                             The unshifted matrix is then factorized and
+                             its inertia is reported.
+        """
+        t = self.phase_report.start()
+        (corrected, delta, self.ntrials) = self.context.factorize_inertia(
+            target_pos, target_neg, delta_policy.initial(self.last_delta),
+            delta_policy.max, delta_policy.grow)
+        self._update_stats()
+        if not corrected:
+            raise RuntimeError('Could not correct the inertia with shifts up '
+                               'to %g, the unshifted matrix has inertia %s'
+                               % (delta, self.inertia))
+        self.last_delta = delta
+        self.phase_report.stop('factorize', t, self._report_stats)
+        return (delta, self.inertia)
+
+    def solve(self, b, get_resid=True, overwrite_b=False):
         """Solve the linear system of equations Ax = b.
 
         The solution will be found in self.x and residual in
-        self.residual.
+        self.residual. If `overwrite_b` is True, the solution is written into
+        the contiguous float64 array `b` instead, and no copy of `b` is made.
+        `overwrite_b` cannot be combined with `get_resid`.
         """
-        self.context.ma27(b, self.x, self.residual, get_resid)
+        if overwrite_b and get_resid:
+            raise ValueError('overwrite_b cannot be combined with get_resid')
+        t = self.phase_report.start()
+        if overwrite_b:
+            self.context.ma27(b, b, self.residual, False)
+        else:
+            self.context.ma27(b, self.x, self.residual, get_resid)
+        self.phase_report.stop('solve', t)
         return None
 
     def refine(self, b, nitref=3, tol=1.0e-8, **kwargs):
@@ -117,9 +229,59 @@ class PyMa27Solver(Sils):
 
         By default, tol = 1.0e-8 and nitref = 3.
         """
+        t = self.phase_report.start()
         self.context.refine(self.x, self.residual, b, tol, nitref)
+        self.phase_report.stop('refine', t)
         return None
 
+    def _report_stats(self):
+        (info, ops, reallocations, retries, tol) = self.context.get_info()
+        return ma27_stats(info.tolist(), ops, reallocations, retries, tol)
+
+    def pattern_key(self):
+        """Return the fingerprint of the sparsity pattern of A.
+
+        See :func:`hsl.solvers.analysis.pattern_key`.
+        """
+        (irow, jcol) = self.context.pattern()
+        return pattern_key(self.n, irow, jcol)
+
+    def dump_analysis(self, filename=None):
+        """Serialize the result of the analyze phase.
+
+        The pivot sequence, the assembly tree and the sizes of the
+        workspace are packed into a binary blob together with the
+        fingerprint of the sparsity pattern. If `filename` is given, the blob
+        is also written to that file.
+        """
+        blob = self._dump_analysis(self.pattern_key())
+        if filename is not None:
+            with open(filename, 'wb') as f:
+                f.write(blob)
+        return blob
+
+    def load_analysis(self, blob=None, filename=None):
+        """Restore an analysis produced by `dump_analysis()` and factorize.
+
+        The sparsity pattern of A must be the one that was analyzed.
+        """
+        if blob is None:
+            with open(filename, 'rb') as f:
+                blob = f.read()
+        self._load_analysis(blob, self.pattern_key())
+        self._factorize()
+        return
+
+    def _dump_analysis(self, key):
+        (ikeep, iw1, nsteps, info, ops, la, liw) = self.context.get_analysis()
+        return pack_ma27_analysis(key, self.n, self.context.nnz, ikeep, iw1,
+                                  nsteps, info, ops, la, liw)
+
+    def _load_analysis(self, blob, key):
+        (ikeep, iw1, nsteps, info, ops, la, liw) = \
+            unpack_ma27_analysis(blob, key, self.n, self.context.nnz)
+        self.context.set_analysis(ikeep, iw1, nsteps, info, ops, la, liw)
+
     def fetch_perm(self):
         u"""Return the permutation vector p.
 
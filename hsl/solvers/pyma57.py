@@ -1,14 +1,18 @@
 # -*- coding: utf-8 -*-
 """Ma57: Direct multifrontal solution of symmetric systems."""
 
+import numpy
 from pysparse.sparse.pysparseMatrix import PysparseMatrix
 from hsl.solvers import _pyma57
-from sils import Sils
+from hsl.solvers.analysis import pattern_key, pack_ma57_analysis, unpack_ma57_analysis
+from hsl.solvers.analysis import analysis_cache
+from hsl.solvers.report import ma57_stats
+from sils import Sils, default_delta_policy
 
 
 class PyMa57Solver(Sils):
 
-    def __init__(self, A, factorize=True, **kwargs):
+    def __init__(self, A, factorize=True, analysis=None, **kwargs):
         u"""Instantiate a :class:`PyMa57Solver` object.
 
         Context to solve the square symmetric linear system of equations
@@ -43,6 +47,16 @@ class PyMa57Solver(Sils):
 
         :keywords:
             :sqd:  Flag indicating symmetric quasi-definite matrix (default: False)
+            :analysis: A serialized analysis of the sparsity pattern of A, as
+                       returned by `dump_analysis()`. If given, the analyze
+                       phase is skipped (default: None)
+            :use_cache: Look up the analysis of the sparsity pattern of A in
+                        `hsl.solvers.analysis.analysis_cache` and store it
+                        there after analyzing (default: True)
+            :perm: Pivot order: variable i is eliminated in position
+                   perm[i] (0-based), as in the permutations returned by
+                   `hsl.ordering.mc60.sloan()`. If given, the analysis
+                   cache is not used (default: None)
 
         Example:
 
@@ -63,6 +77,11 @@ class PyMa57Solver(Sils):
         iterative refinement, and the possibility of restarting the
         factorization should it run out of space.'
 
+        Solves and refinements write `self.x`, `self.residual` and the
+        workspace of MA57, so they must not run at the same time on one
+        object. Concurrent solves need one object per thread, or the Cython
+        solvers, which give each solve its own workspace.
+
 
         References
         ----------
@@ -97,7 +116,26 @@ class PyMa57Solver(Sils):
         # self.B = spmatrix.ll_mat_sym(self.n, 0)
 
         # Analyze and factorize matrix
-        self.context = _pyma57.analyze(thisA, self.sqd)
+        self.context = _pyma57.analyze(thisA, self.sqd, False)
+        perm = kwargs.get('perm')
+        if analysis is not None:
+            self.load_analysis(analysis)
+        else:
+            t = self.phase_report.start()
+            if perm is not None:
+                self.context.analyze(numpy.ascontiguousarray(perm, dtype=numpy.int32))
+            elif self.use_cache:
+                key = self.pattern_key()
+                # The context uses the default ordering strategy, 5
+                blob = analysis_cache.get(('ma57', key, 5))
+                if blob is None:
+                    self.context.analyze()
+                    analysis_cache.put(('ma57', key, 5), self._dump_analysis(key))
+                else:
+                    self._load_analysis(blob, key)
+            else:
+                self.context.analyze()
+            self.phase_report.stop('analyze', t, self._report_stats)
         self.factorized = False
         if factorize:
             self.factorize(thisA)
@@ -113,6 +151,23 @@ class PyMa57Solver(Sils):
             raise TypeError("Factorization must be performed first.")
         return (self.rank - self.neig, self.neig, self.n - self.rank)
 
+    def analyze(self, perm=None, warm_start=False):
+        """Analyze A again.
+
+        Variable i is eliminated in position perm[i] (0-based). If `perm`
+        is not given and `warm_start` is True, the pivot order of the
+        previous analysis is used again, which avoids reordering. Otherwise,
+        the pivot order is chosen automatically. The matrix must be
+        factorized again afterwards.
+        """
+        if perm is not None:
+            perm = numpy.ascontiguousarray(perm, dtype=numpy.int32)
+        t = self.phase_report.start()
+        self.context.analyze(perm, warm_start)
+        self.phase_report.stop('analyze', t, self._report_stats)
+        self.factorized = False
+        return
+
     def factorize(self, A):
         """Perform numerical factorization.
 
@@ -129,22 +184,85 @@ class PyMa57Solver(Sils):
         else:
             thisA = A
 
+        t = self.phase_report.start()
         self.context.factorize(thisA)
+        self.phase_report.stop('factorize', t, self._report_stats)
+        self._update_stats()
+        return
+
+    def refactorize(self, values):
+        """Perform numerical factorization with new values.
+
+        The sparsity pattern must be the one given at the analyze phase.
+        `values` is a contiguous float64 array holding the new values of the
+        nonzeros of A in the order in which they were stored at analysis,
+        i.e., row by row as returned by `A.find()`. The values are copied
+        directly into the solver and no pattern work is performed.
+        """
+        t = self.phase_report.start()
+        self.context.refactorize(values)
+        self.phase_report.stop('factorize', t, self._report_stats)
+        self._update_stats()
+        return
+
+    def factorize_with_inertia(self, target_pos, target_neg,
+                               delta_policy=default_delta_policy):
+        u"""Factorize A + δ diag(I, 0) with a shift δ that corrects the inertia.
+
+        The first `target_pos` diagonal entries of A are shifted by δ ≥ 0
+        until the inertia of the shifted matrix is (target_pos, target_neg,
+        n - target_pos - target_neg). The trial shifts are chosen by
+        `delta_policy` (see :class:`hsl.solvers.sils.DeltaPolicy`). All
+        trials run in a single call against the existing analysis and the
+        values of the last factorization. Those values are left unchanged, so
+        residuals and iterative refinement use the unshifted matrix. Only
+        diagonal entries stored in A are shifted.
+
+        The number of factorizations performed is kept in `self.ntrials`.
+
+        :returns: the tuple (δ, inertia) of the final factorization.
+        :raises RuntimeError: if the shift needed exceeds `delta_policy.max`.
+                             The unshifted matrix is then factorized and
+                             its inertia is reported.
+        """
+        self.factorized = False
+        t = self.phase_report.start()
+        (corrected, delta, self.ntrials) = self.context.factorize_inertia(
+            target_pos, target_neg, delta_policy.initial(self.last_delta),
+            delta_policy.max, delta_policy.grow)
+        self._update_stats()
+        if not corrected:
+            raise RuntimeError('Could not correct the inertia with shifts up '
+                               'to %g, the unshifted matrix has inertia %s'
+                               % (delta, self.inertia))
+        self.last_delta = delta
+        self.phase_report.stop('factorize', t, self._report_stats)
+        return (delta, self.inertia)
+
+    def _update_stats(self):
         self.factorized = True
 
         (self.nzFact, self.nRealFact, self.nIntFact, self.front,
          self.n2x2pivots, self.neig, self.rank) = self.context.stats()
 
         self.isFullRank = (self.rank == self.n)
-        return
 
-    def solve(self, b, get_resid=True):
+    def solve(self, b, get_resid=True, overwrite_b=False):
         """Solve the linear system of equations Ax = b.
 
         The solution will be found in self.x and residual in
-        `self.residual`.
+        `self.residual`. If `overwrite_b` is True, the solution is written into
+        the contiguous float64 array `b` instead, and no copy of `b` is made.
+        `overwrite_b` cannot be combined with `get_resid`.
         """
-        self.context.ma57(b, self.x, self.residual, get_resid)
+        if overwrite_b and get_resid:
+            raise ValueError('overwrite_b cannot be combined with get_resid')
+        t = self.phase_report.start()
+        if overwrite_b:
+            self.context.ma57(b, b, self.residual, False)
+        else:
+            self.context.ma57(b, self.x, self.residual, get_resid)
+        self.phase_report.stop('solve', t)
         return None
 
     def refine(self, b, nitref=3, **kwargs):
@@ -160,12 +278,77 @@ class PyMa57Solver(Sils):
 
         By default, nitref = 3.
         """
+        t = self.phase_report.start()
         (self.cond, self.cond2, self.berr,
          self.berr2, self.dirError,
          self.matNorm, self.xNorm,
          self.relRes) = self.context.refine(self.x, self.residual, b, nitref)
+        self.phase_report.stop('refine', t)
         return None
 
+    def workspace_stats(self):
+        """Return statistics on the solve workspace.
+
+        The result is a dictionary with the size of the real workspace
+        `lwork`, the number of workspace `allocations` and the number of
+        `solves` (calls to `solve()` and `refine()`) performed so far. The
+        workspace persists between solves and only grows when needed.
+        """
+        (lwork, allocations, solves) = self.context.workspace()
+        return {'lwork': lwork, 'allocations': allocations, 'solves': solves}
+
+    def _report_stats(self):
+        (info, rinfo, reallocations, allocations,
+         restarts, copies) = self.context.get_info()
+        return ma57_stats(info.tolist(), rinfo.tolist(), reallocations,
+                          allocations, restarts, copies)
+
+    def pattern_key(self):
+        """Return the fingerprint of the sparsity pattern of A.
+
+        See :func:`hsl.solvers.analysis.pattern_key`.
+        """
+        (irow, jcol) = self.context.pattern()
+        return pattern_key(self.n, irow, jcol)
+
+    def dump_analysis(self, filename=None):
+        """Serialize the result of the analyze phase.
+
+        The pivot sequence, the analysis statistics and the sizes of the
+        factor storage are packed into a binary blob together with the
+        fingerprint of the sparsity pattern. If `filename` is given, the blob
+        is also written to that file. The blob may be passed to the
+        constructor of another solver for a matrix with the same pattern.
+        """
+        blob = self._dump_analysis(self.pattern_key())
+        if filename is not None:
+            with open(filename, 'wb') as f:
+                f.write(blob)
+        return blob
+
+    def load_analysis(self, blob=None, filename=None):
+        """Restore an analysis produced by `dump_analysis()`.
+
+        The sparsity pattern of A must be the one that was analyzed. The
+        matrix must be factorized again afterwards.
+        """
+        if blob is None:
+            with open(filename, 'rb') as f:
+                blob = f.read()
+        self._load_analysis(blob, self.pattern_key())
+        self.factorized = False
+        return
+
+    def _dump_analysis(self, key):
+        (keep, info, rinfo, lfact, lifact) = self.context.get_analysis()
+        return pack_ma57_analysis(key, self.n, self.context.nnz, keep, info,
+                                  rinfo, lfact, lifact)
+
+    def _load_analysis(self, blob, key):
+        (keep, info, rinfo, lfact, lifact) = \
+            unpack_ma57_analysis(blob, key, self.n, self.context.nnz)
+        self.context.set_analysis(keep, info, rinfo, lfact, lifact)
+
     def fetch_perm(self):
         u"""Return the permutation vector p.
 
@@ -0,0 +1,176 @@
+"""Per-phase timing and factorization reports of the solvers.
+
+Every solver object records the number of calls and the time spent in its
+analyze, factorize, solve and refine phases in a :class:`SolverReport`. Its
+`report()` method combines these timings with the statistics of the last
+analysis and factorization, and an optional callback receives an event after
+each phase.
+
+The C layer also records its own events (workspace resizes, pivot tolerance
+changes, inertia corrections and error codes) in a fixed-size ring buffer.
+The `event_log()` method of a solver returns the events held in the buffer,
+oldest first, as a structured array of type `EVENT_DTYPE`.
+"""
+
+import threading
+import time
+import numpy as np
+
+__all__ = ['PHASES', 'SolverReport', 'ma27_stats', 'ma57_stats',
+           'EVENTS', 'EVENT_DTYPE', 'event_log_array']
+
+PHASES = ('analyze', 'factorize', 'solve', 'refine')
+
+# Names of the events of the C layer, indexed by the `event` field. The
+# meaning of `code`, `size1`, `size2` and `value` depends on the event:
+#
+# init         size1, size2 = n, nz
+# analyze      size1, size2 = predicted real, integer storage;
+#              value = predicted flops
+# factorize    size1, size2 = real, integer storage; value = pivot tolerance
+# solve        size1 = number of right-hand sides
+# refine       size1 = number of steps; value = residual norm
+# resize_real  size1, size2 = old, new size of the factors
+# resize_int   size1, size2 = old, new size of the integer factor workspace
+# resize_work  size1, size2 = old, new size of the solve workspace (MA57)
+# pivot_tol    code = flag that caused the change (0 when relaxed);
+#              value = new tolerance
+# shift        size1, size2 = number of positive, negative eigenvalues;
+#              value = diagonal shift
+# error        code = error (< 0) or warning (> 0); size1 = info[1]
+EVENTS = ('init', 'analyze', 'factorize', 'solve', 'refine', 'resize_real',
+          'resize_int', 'resize_work', 'pivot_tol', 'shift', 'error')
+
+# Layout of the C struct HSL_Event
+EVENT_DTYPE = np.dtype([('time', np.float64), ('value', np.float64),
+                        ('event', np.int32), ('code', np.int32),
+                        ('size1', np.int32), ('size2', np.int32)])
+
+try:
+    _cpu_time = time.process_time
+except AttributeError:  # Python 2
+    _cpu_time = time.clock
+
+
+class SolverReport(object):
+    """Call counts and times of the phases of a solver.
+
+    For each phase in `PHASES`, `phases[phase]` holds the number of `calls`
+    and the total `wall` clock and `cpu` time in seconds. The CPU time is
+    that of the whole process, so it includes the work of other threads.
+    Failed calls are not recorded. Calls may be recorded from several
+    threads at once.
+
+    If `callback` is not None, it is called after each phase with an event
+    dictionary holding the `solver` name, the `phase` and its `wall` and
+    `cpu` time. After the analyze and factorize phases, the event also holds
+    the `stats` of the solver, as in its `report()`.
+    """
+
+    def __init__(self, solver, callback=None):
+        self.solver = solver
+        self.callback = callback
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Set all counts and times to zero."""
+        with self._lock:
+            self.phases = dict((phase, {'calls': 0, 'wall': 0.0, 'cpu': 0.0})
+                               for phase in PHASES)
+
+    def start(self):
+        """Return the clocks at the start of a phase, to pass to `stop()`."""
+        return (time.time(), _cpu_time())
+
+    def stop(self, phase, start, stats=None):
+        """Record a call of `phase` that began at `start`.
+
+        `stats` is a function returning the statistics of the solver. It is
+        only called when an event is sent to the callback.
+        """
+        wall = time.time() - start[0]
+        cpu = _cpu_time() - start[1]
+        with self._lock:
+            record = self.phases[phase]
+            record['calls'] += 1
+            record['wall'] += wall
+            record['cpu'] += cpu
+        if self.callback is not None:
+            event = {'solver': self.solver, 'phase': phase,
+                     'wall': wall, 'cpu': cpu}
+            if stats is not None:
+                event['stats'] = stats()
+            self.callback(event)
+
+    def as_dict(self, stats):
+        """Return the report of the solver with the given statistics."""
+        with self._lock:
+            phases = dict((phase, dict(record))
+                          for (phase, record) in self.phases.items())
+        return {'solver': self.solver, 'phases': phases, 'stats': stats}
+
+
+def event_log_array(records):
+    """Return the raw records of an event log as an array of `EVENT_DTYPE`."""
+    return np.frombuffer(records, dtype=EVENT_DTYPE).copy()
+
+
+def ma27_stats(info, ops, reallocations, pivot_retries=0, pivot_tol=None):
+    """Return the statistics of an MA27 analysis and factorization.
+
+    :parameters:
+        :info: the `info` array of MA27
+        :ops: the operation count predicted by the analysis
+        :reallocations: number of times the factor storage or the integer
+                        workspace had to grow
+        :pivot_retries: number of times the last factorization raised the
+                        pivot tolerance
+        :pivot_tol: the pivot tolerance for the next factorization
+
+    MA27 does not report delayed pivots.
+    """
+    return {'predicted_flops': ops,
+            'predicted_real_storage': info[4],
+            'predicted_int_storage': info[5],
+            'real_storage': info[8],
+            'int_storage': info[9],
+            'analysis_compresses': info[10],
+            'real_compresses': info[11],
+            'int_compresses': info[12],
+            'n2x2pivots': info[13],
+            'neig': info[14],
+            'reallocations': reallocations,
+            'pivot_retries': pivot_retries,
+            'pivot_tol': pivot_tol}
+
+
+def ma57_stats(info, rinfo, reallocations, workspace_allocations,
+               restarts=0, copies=0):
+    """Return the statistics of an MA57 analysis and factorization.
+
+    :parameters:
+        :info: the `info` array of MA57
+        :rinfo: the `rinfo` array of MA57
+        :reallocations: number of times the factor storage had to grow
+        :workspace_allocations: number of allocations of the solve workspace
+        :restarts: number of restarts from scratch of the last factorization
+        :copies: number of copies of the factors by MA57ED in the last
+                 factorization
+    """
+    return {'predicted_flops': rinfo[0] + rinfo[1],
+            'flops': rinfo[2] + rinfo[3],
+            'predicted_real_storage': info[8],
+            'predicted_int_storage': info[9],
+            'real_storage': info[14],
+            'int_storage': info[15],
+            'largest_front': info[20],
+            'n2x2pivots': info[21],
+            'delayed_pivots': info[22],
+            'neig': info[23],
+            'real_compresses': info[27],
+            'int_compresses': info[28],
+            'reallocations': reallocations,
+            'workspace_allocations': workspace_allocations,
+            'restarts': restarts,
+            'copies': copies}
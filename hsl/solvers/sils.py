@@ -5,12 +5,40 @@ from the Harwell Subroutine Library (http://hsl.rl.ac.uk).
 """
 
 import numpy
+from collections import namedtuple
+from hsl.solvers.report import SolverReport, event_log_array
+
+
+class DeltaPolicy(namedtuple('DeltaPolicy', 'first min max grow shrink')):
+    """Rules for the diagonal shift used to correct the inertia of a matrix.
+
+    The first trial is always unshifted. After that, the shift starts at
+    `first` if the previous correction needed no shift, and otherwise at the
+    previous shift times `shrink`, but not below `min`. It is multiplied by
+    `grow` until the inertia is correct or the shift exceeds `max`.
+    """
+
+    def initial(self, last_delta):
+        """Return the first nonzero shift to try after `last_delta`."""
+        if last_delta == 0:
+            return self.first
+        return max(self.min, self.shrink * last_delta)
+
+
+# Values suggested by Waechter and Biegler for interior-point methods.
+default_delta_policy = DeltaPolicy(first=1.0e-4, min=1.0e-20, max=1.0e40,
+                                   grow=8.0, shrink=1.0 / 3)
 
 
 class Sils(object):
     """Abstract class for the solution of symmetric indefinite linear systems.
 
     The methods of this class must be overridden.
+
+    The analyze, factorize, solve and refine phases release the GIL, so
+    independent solver objects may be used concurrently from several threads.
+    Each object owns its own workspace and should not be shared between
+    threads.
     """
 
     def __init__(self, A, **kwargs):
@@ -21,6 +49,12 @@ class Sils(object):
         :keywords:
             :sqd:  Flag indicating symmetric quasi-definite matrix
                    (default: False)
+            :use_cache: Reuse and store analyses in the process-wide
+                        `hsl.solvers.analysis.analysis_cache`
+                        (default: True)
+            :callback: Function called with an event dictionary after each
+                       phase (see :class:`hsl.solvers.report.SolverReport`)
+                       (default: None)
         """
 
         try:
@@ -32,12 +66,49 @@ class Sils(object):
             raise ValueError('Input matrix must be symmetric')
         self.n = A.shape[0]
         self.sqd = 'sqd' in kwargs and kwargs['sqd']
+        self.use_cache = kwargs.get('use_cache', True)
 
         # Solution and residual vectors
         self.x = numpy.zeros(self.n)
         self.residual = numpy.zeros(self.n)
 
         self.context = None
+        self.last_delta = 0.0   # Shift of the last inertia correction
+        self.phase_report = SolverReport(type(self).__name__,
+                                         kwargs.get('callback'))
+
+    @property
+    def callback(self):
+        """Function called with an event after each phase, or None."""
+        return self.phase_report.callback
+
+    @callback.setter
+    def callback(self, callback):
+        self.phase_report.callback = callback
+
+    def report(self):
+        """Return the timings of the phases and the statistics of the solver.
+
+        The result is a dictionary with the `solver` name, the number of
+        calls and the wall clock and CPU time of each phase (`phases`) and
+        the statistics of the last analysis and factorization (`stats`). See
+        :mod:`hsl.solvers.report`.
+        """
+        return self.phase_report.as_dict(self._report_stats())
+
+    def event_log(self):
+        """Return the last events recorded by the factorization, oldest first.
+
+        The result is a structured array of type
+        :data:`hsl.solvers.report.EVENT_DTYPE`, whose `event` field indexes
+        :data:`hsl.solvers.report.EVENTS`. Only the most recent events are
+        kept.
+        """
+        return event_log_array(self.context.event_log())
+
+    def clear_log(self):
+        """Discard all events recorded so far."""
+        self.context.clear_log()
 
     def solve(self, b, get_resid=True):
         """Must be subclassed."""
@@ -47,6 +118,19 @@ class Sils(object):
         """Must be subclassed."""
         raise NotImplementedError
 
+    def analyze(self, perm=None, warm_start=False):
+        """Must be subclassed."""
+        raise NotImplementedError
+
+    def factorize_with_inertia(self, target_pos, target_neg,
+                               delta_policy=default_delta_policy):
+        """Must be subclassed."""
+        raise NotImplementedError
+
     def fetch_perm(self):
         """Must be subclassed."""
         raise NotImplementedError
+
+    def _report_stats(self):
+        """Must be subclassed."""
+        raise NotImplementedError
@@ -0,0 +1,127 @@
+from libc.stdint cimport int64_t
+from libc.string cimport strncpy, memcpy
+
+import numpy as np
+cimport numpy as cnp
+
+cnp.import_array()
+
+cimport numpy as np
+
+cdef extern from "ma27.h" nogil:
+    enum: HSL_LOG_SIZE
+    enum: HSL_EVENT_SOLVE
+    enum: HSL_EVENT_REFINE
+    enum: HSL_EVENT_ERROR
+
+    ctypedef struct HSL_Event:
+        pass
+
+    ctypedef struct HSL_Log:
+        int       size                # Capacity of the ring buffer
+
+    cdef int  HSL_Log_Copy( const HSL_Log *elog, HSL_Event events[] )
+    cdef void HSL_Log_Clear( HSL_Log *elog )
+    cdef void HSL_Log_Event( HSL_Log *elog, int event, int code, int size1,
+                             int size2, float value )
+
+    ctypedef struct Ma27_Data:
+        int       n, nz               # Order and #nonzeros
+        int       icntl[30]
+        int       info[20]
+        float    cntl[5]
+        int      *irn                 # Sparsity pattern
+        int      *icn
+        int      *iw                  # Integer workspace
+        int       liw
+        int      *ikeep               # Pivot sequence
+        int      *iw1                 # Integer workspace
+        int       nsteps
+        int       iflag               # Pivot selection
+        float    ops                 # Operation count
+    
+        char      rankdef             # Indicate whether matrix is rank-deficient
+        int       rank;               # Matrix rank
+    
+        int       la
+        float   *factors             # Matrix factors
+        int       nrealloc            # Times iw or factors grew
+        float    headroom            # la, liw = headroom * predictions
+        int       la_min, liw_min     # Sizes that sufficed in a factorization
+        int       npivtol             # Pivot tolerance increases in last factorization
+        int       nclean              # Factorizations since the last increase
+        int       relax_after         # Relax after this many clean factorizations
+        float    pivtol_min          # Lowest pivot tolerance when relaxing
+        int       maxfrt
+        float   *w                   # Real workspace
+        int       nworkalloc          # Allocations of solve workspaces
+        int       nsolves             # Calls to Solve and Refine
+    
+        float   *residual            # = b - Ax   
+        char      fetched             # Factors have been fetched
+                                      # Used for de-allocation
+
+        HSL_Log   eventlog            # Ring buffer of events
+
+    cdef Ma27_Data *Ma27_Initialize( int nz, int n, int logsize )
+    cdef int  Ma27_Analyze( Ma27_Data *ma27, int iflag );
+    cdef int  Ma27_Analyze_Perm( Ma27_Data *ma27, const int perm[] );
+    cdef int  Ma27_Allocate_Factors( Ma27_Data *ma27 );
+    cdef int  Ma27_Factorize( Ma27_Data *ma27, float A[] );
+    cdef int  Ma27_Factorize_Inertia( Ma27_Data *ma27, float A[], int npos,
+                                      int nneg, float *delta, float delta_max,
+                                      float grow, int *ntrials )
+    int INERTIA_FAIL
+    cdef int  Ma27_Solve( Ma27_Data *ma27, float x[] );
+    cdef int  Ma27_Solve_Many( Ma27_Data *ma27, float x[], int nrhs, int ldx )
+
+    ctypedef struct Ma27_Work:
+        int       info[20]            # info of the last solve
+        int       nitref              # Steps of the last refinement
+        float     resid_norm          # Residual norm of the last refinement
+        int       nalloc              # Allocations of w, iw1 or d
+
+    cdef Ma27_Work *Ma27_Work_Initialize()
+    cdef int  Ma27_Solve_Work( const Ma27_Data *ma27, Ma27_Work *ws, float x[],
+                               int nrhs, int ldx )
+    cdef void Ma27_Work_Finalize( Ma27_Work *ws )
+
+    cdef void Ma27_Residual( const Ma27_Data *ma27, float A[], float x[], float rhs[],
+                             float resid[], int nrhs, int ldx )
+    cdef int  Ma27_Refine( Ma27_Data *ma27, float x[], float rhs[], float A[],
+                           float tol, int maxitref );
+    cdef int  Ma27_Refine_Work( const Ma27_Data *ma27, Ma27_Work *ws,
+                                float x[], float rhs[], float A[],
+                                float resid[], float tol, int maxitref )
+    cdef void Ma27_Finalize( Ma27_Data *ma27 );
+    cdef int  Ma27_Factorize_Solve_Batch( const Ma27_Data *ma27, int nbatch,
+                                          float values[], int ldv,
+                                          float x[], int ldx, int status[],
+                                          int inertia[], int nthreads )
+    cdef int  Process_Error_Code( Ma27_Data *ma27, int error );
+
+
+cdef class BaseMA27Solver_INT32_FLOAT32:
+    cdef:
+        int n
+        int nnz
+        Ma27_Data* data
+        float* a
+        int factorized
+        object phase_report
+        object work_pool
+        object sizing_key
+        object sizes_seen
+        float last_delta
+        int ntrials
+
+    cdef index_to_fortran(self)
+    cdef void _free(self)
+    cdef _check_alive(self)
+    cdef int _solve_work(self, float *x, int nrhs) except -1
+    cdef int _refine_work(self, float *x, float *rhs, float *resid,
+                          float tol, int nitref) except -1
+    cdef _dump_analysis(self, key)
+    cdef _load_analysis(self, blob, key)
+    cdef _recall_sizes(self, sizing_key)
+    cdef _learn_sizes(self)
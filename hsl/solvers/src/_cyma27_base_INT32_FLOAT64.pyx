@@ -1,11 +1,27 @@
-from libc.stdio cimport FILE
 from cpython.mem cimport PyMem_Malloc, PyMem_Free
 cimport numpy as np
 import numpy as np
+from multiprocessing import cpu_count
+
+from hsl.solvers.analysis import pattern_key, pack_ma27_analysis, unpack_ma27_analysis
+from hsl.solvers.analysis import analysis_cache, factor_size_cache
+from hsl.solvers.sils import default_delta_policy
+from hsl.solvers.report import SolverReport, ma27_stats, EVENT_DTYPE
 
 cnp.import_array()
 
-cdef extern from "ma27.h":
+cdef extern from "ma27.h" nogil:
+    ctypedef struct HSL_Event:
+        pass
+
+    ctypedef struct HSL_Log:
+        int       size                # Capacity of the ring buffer
+
+    cdef int  HSL_Log_Copy( const HSL_Log *elog, HSL_Event events[] )
+    cdef void HSL_Log_Clear( HSL_Log *elog )
+    cdef void HSL_Log_Event( HSL_Log *elog, int event, int code, int size1,
+                             int size2, double value )
+
     ctypedef struct Ma27_Data:
         int       n, nz               # Order and #nonzeros
         int       icntl[30]
@@ -26,22 +42,58 @@ cdef extern from "ma27.h":
 
         int       la
         double   *factors             # Matrix factors
+        int       nrealloc            # Times iw or factors grew
+        double    headroom            # la, liw = headroom * predictions
+        int       la_min, liw_min     # Sizes that sufficed in a factorization
+        int       npivtol             # Pivot tolerance increases in last factorization
+        int       nclean              # Factorizations since the last increase
+        int       relax_after         # Relax after this many clean factorizations
+        double    pivtol_min          # Lowest pivot tolerance when relaxing
         int       maxfrt
         double   *w                   # Real workspace
+        int       nworkalloc          # Allocations of solve workspaces
+        int       nsolves             # Calls to Solve and Refine
 
         double   *residual            # = b - Ax
         char      fetched             # Factors have been fetched
                                       # Used for de-allocation
 
-        FILE     *logfile             # File for log output
+        HSL_Log   eventlog            # Ring buffer of events
 
-    cdef Ma27_Data *Ma27_Initialize( int nz, int n, FILE *logfile )
+    cdef Ma27_Data *Ma27_Initialize( int nz, int n, int logsize )
     cdef int  Ma27_Analyze( Ma27_Data *ma27, int iflag );
+    cdef int  Ma27_Analyze_Perm( Ma27_Data *ma27, const int perm[] );
+    cdef int  Ma27_Allocate_Factors( Ma27_Data *ma27 );
     cdef int  Ma27_Factorize( Ma27_Data *ma27, double A[] );
+    cdef int  Ma27_Factorize_Inertia( Ma27_Data *ma27, double A[], int npos,
+                                      int nneg, double *delta, double delta_max,
+                                      double grow, int *ntrials )
     cdef int  Ma27_Solve( Ma27_Data *ma27, double x[] );
+    cdef int  Ma27_Solve_Many( Ma27_Data *ma27, double x[], int nrhs, int ldx )
+
+    ctypedef struct Ma27_Work:
+        int       info[20]            # info of the last solve
+        int       nitref              # Steps of the last refinement
+        double    resid_norm          # Residual norm of the last refinement
+        int       nalloc              # Allocations of w, iw1 or d
+
+    cdef Ma27_Work *Ma27_Work_Initialize()
+    cdef int  Ma27_Solve_Work( const Ma27_Data *ma27, Ma27_Work *ws, double x[],
+                               int nrhs, int ldx )
+    cdef void Ma27_Work_Finalize( Ma27_Work *ws )
+
+    cdef void Ma27_Residual( const Ma27_Data *ma27, double A[], double x[], double rhs[],
+                             double resid[], int nrhs, int ldx )
     cdef int  Ma27_Refine( Ma27_Data *ma27, double x[], double rhs[], double A[],
                            double tol, int maxitref );
+    cdef int  Ma27_Refine_Work( const Ma27_Data *ma27, Ma27_Work *ws,
+                                double x[], double rhs[], double A[],
+                                double resid[], double tol, int maxitref )
     cdef void Ma27_Finalize( Ma27_Data *ma27 );
+    cdef int  Ma27_Factorize_Solve_Batch( const Ma27_Data *ma27, int nbatch,
+                                          double values[], int ldv,
+                                          double x[], int ldx, int status[],
+                                          int inertia[], int nthreads )
     cdef int  Process_Error_Code( Ma27_Data *ma27, int error );
 
 
@@ -53,28 +105,165 @@ cdef c_to_fortran_index_array(int * a, int a_size):
         a[i] += 1
 
 
+cdef int_array_view(int * a, int a_size):
+    """Return a NumPy array sharing its data with a C int array."""
+    cdef np.npy_intp shape[1]
+    shape[0] = a_size
+    return np.PyArray_SimpleNewFromData(1, shape, np.NPY_INT32, <void *> a)
+
+
+cdef double *vector_data(double[::1] v, int n, name) except NULL:
+    """Return the data of a contiguous float64 vector of size n."""
+    if v.shape[0] != n:
+        raise ValueError("%s has wrong size!\n"
+                         "Expected %d and got %d"%(name, n, v.shape[0]))
+    return &v[0]
+
+
+cdef double *matrix_data(double[::1, :] m, int n, int k, name) except? NULL:
+    """Return the data of a Fortran-contiguous float64 n x k array."""
+    if m.shape[0] != n or m.shape[1] != k:
+        raise ValueError("%s has wrong shape!\n"
+                         "Expected (%d, %d) and got (%d, %d)"%(name, n, k,
+                                                               m.shape[0], m.shape[1]))
+    if k == 0:
+        return NULL
+    return &m[0, 0]
+
+
+cdef copy_vector(np.ndarray src, double *dst, int n, name):
+    """Copy a float64 vector of size n into dst unless they share their data."""
+    if src.size != n:
+        raise ValueError("%s has wrong size!\n"
+                         "Expected %d and got %d"%(name, n, src.size))
+    src = np.ascontiguousarray(src, dtype=np.float64)
+    if <double *> np.PyArray_DATA(src) != dst:
+        memcpy(dst, np.PyArray_DATA(src), n*sizeof(double))
+
+
+cdef class _Workspace:
+    """Workspace of a solve, reused by the later solves of a solver."""
+    cdef Ma27_Work *ws
+
+    def __cinit__(self, int n):
+        self.ws = Ma27_Work_Initialize()
+        if self.ws == NULL:
+            raise MemoryError()
+
+    def __dealloc__(self):
+        if self.ws != NULL:
+            Ma27_Work_Finalize(self.ws)
+
+
 cdef class BaseMA27Solver_INT32_FLOAT64:
+    # Solves and refinements run on per-call workspaces, so that several of
+    # them may run at the same time against one factorization. Checked by
+    # hsl.solvers.executor.
+    concurrent_solves = True
+
     def __cinit__(self, int m, int n, int nnz, bint sqd=False, verbose=False):
         assert m == n
 
         self.n = n
         self.nnz = nnz
 
-        self.data = Ma27_Initialize(self.nnz, self.n, NULL)
+        self.data = Ma27_Initialize(self.nnz, self.n, HSL_LOG_SIZE)
+        self.phase_report = SolverReport(type(self).__name__)
+        self.work_pool = []
 
         self.a = <double *> PyMem_Malloc(self.nnz * sizeof(double))
 
         # Set pivot-for-stability threshold if matrix is SQD
         if sqd:
             self.data.cntl[0]  = 1.0e-15
+            self.data.pivtol_min = 1.0e-15
 
         return
 
 
     def __dealloc__(self):
-        PyMem_Free(self.a)
+        self._free()
         return
 
+    cdef void _free(self):
+        if self.data != NULL:
+            Ma27_Finalize(self.data)
+            self.data = NULL
+        PyMem_Free(self.a)
+        self.a = NULL
+
+    cdef _check_alive(self):
+        if self.data == NULL:
+            raise RuntimeError("Solver memory has been released by free()")
+
+    cdef int _solve_work(self, double *x, int nrhs) except -1:
+        # Solve with a workspace taken from the pool, so that solves from
+        # several threads run at the same time against the same factors.
+        # The pool holds as many workspaces as there were concurrent solves.
+        cdef _Workspace work
+        cdef Ma27_Work *ws
+        cdef int error, nalloc
+        work = self.work_pool.pop() if self.work_pool else _Workspace(self.n)
+        ws = work.ws
+        nalloc = ws.nalloc
+        with nogil:
+            error = Ma27_Solve_Work(self.data, ws, x, nrhs, self.n)
+        self.work_pool.append(work)
+        self.data.nsolves += 1
+        self.data.nworkalloc += ws.nalloc - nalloc
+        if error:
+            HSL_Log_Event(&self.data.eventlog, HSL_EVENT_ERROR, error,
+                          ws.info[1], 0, 0.0)
+        HSL_Log_Event(&self.data.eventlog, HSL_EVENT_SOLVE, error, nrhs, 0, 0.0)
+        if error:
+            raise RuntimeError("Error return code from Solve: %-d\n", error)
+        return 0
+
+    cdef int _refine_work(self, double *x, double *rhs, double *resid,
+                          double tol, int nitref) except -1:
+        # Refine with a workspace taken from the pool, as _solve_work does.
+        # The residual goes to resid and rhs is left untouched.
+        cdef _Workspace work
+        cdef Ma27_Work *ws
+        cdef int error, nalloc
+        work = self.work_pool.pop() if self.work_pool else _Workspace(self.n)
+        ws = work.ws
+        nalloc = ws.nalloc
+        with nogil:
+            error = Ma27_Refine_Work(self.data, ws, x, rhs, self.a, resid,
+                                     tol, nitref)
+        self.work_pool.append(work)
+        self.data.nsolves += 1
+        self.data.nworkalloc += ws.nalloc - nalloc
+        if error:
+            HSL_Log_Event(&self.data.eventlog, HSL_EVENT_ERROR, error,
+                          ws.info[1], 0, 0.0)
+        HSL_Log_Event(&self.data.eventlog, HSL_EVENT_REFINE, error,
+                      ws.nitref, 0, ws.resid_norm)
+        if error:
+            raise RuntimeError("Error return code from Refine: %-d\n", error)
+        return 0
+
+    def free(self):
+        """
+        Release the memory held by the solver.
+
+        This is done automatically when the solver is garbage collected.
+        Calling `free()` releases the memory deterministically; the solver
+        cannot be used afterwards. Calling `free()` more than once is
+        harmless.
+        """
+        self._free()
+        self.work_pool = []
+        self.factorized = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.free()
+        return False
+
     cdef index_to_fortran(self):
         """
         Convert 0-based indices to Fortran indices (1-based).
@@ -90,13 +279,230 @@ cdef class BaseMA27Solver_INT32_FLOAT64:
 
     property factorized:
         def __get__(self): return self.factorized
+    property last_delta:
+        def __get__(self): return self.last_delta
+    property ntrials:
+        def __get__(self): return self.ntrials
+
+    property headroom:
+        """
+        Factor by which the real and integer factor storage exceeds the
+        storage predicted by the analysis for a factorization without data
+        compresses (default 1.2). The headroom leaves room for delayed
+        pivots. The storage also grows by this factor when it turns out to
+        be too small.
+        """
+        def __get__(self):
+            self._check_alive()
+            return self.data.headroom
+        def __set__(self, double value):
+            self._check_alive()
+            if not value >= 1:
+                raise ValueError("headroom must be at least 1")
+            self.data.headroom = value
+
+    property pivot_tol:
+        """
+        Pivot tolerance of the next factorization. A factorization that finds
+        the matrix singular raises the tolerance and keeps it for the next
+        factorizations. Setting the tolerance also sets the lowest value to
+        which `relax_after` brings it back.
+        """
+        def __get__(self):
+            self._check_alive()
+            return self.data.cntl[0]
+        def __set__(self, double value):
+            self._check_alive()
+            self.data.cntl[0] = value
+            self.data.pivtol_min = value
+            self.data.nclean = 0
+
+    property pivot_retries:
+        """Number of times the last factorization raised the pivot tolerance."""
+        def __get__(self):
+            self._check_alive()
+            return self.data.npivtol
+
+    property relax_after:
+        """
+        If positive, the pivot tolerance is divided by 100, down to its
+        initial value, after this many factorizations in a row that did not
+        raise it. The default 0 never relaxes the tolerance.
+        """
+        def __get__(self):
+            self._check_alive()
+            return self.data.relax_after
+        def __set__(self, int value):
+            self._check_alive()
+            if value < 0:
+                raise ValueError("relax_after must be nonnegative")
+            self.data.relax_after = value
+            self.data.nclean = 0
+
+    def analyze(self, *args, perm=None, bint warm_start=False,
+                bint use_cache=True):
+        """
+        Perform the analyze phase.
+
+        If `perm` is given, it is used as the pivot order: variable i is
+        eliminated in position perm[i] (0-based), as in the permutations
+        returned by `hsl.ordering.mc60.sloan()` and `rcmk()`. If
+        `warm_start` is True, the pivot order of the previous analysis is
+        used again, which avoids reordering after small changes of the
+        pattern. The order of another solver is reused with
+        `perm=np.array(other.fetch_perm()) - 1`. The cache is not used in
+        either case.
+
+        If `use_cache` is True, the analysis is first looked up in the
+        process-wide `hsl.solvers.analysis.analysis_cache` using the
+        fingerprint of the sparsity pattern. A new analysis is stored in the
+        cache. The factor storage starts from the sizes that sufficed for the
+        pattern in `hsl.solvers.analysis.factor_size_cache`, and these sizes
+        are updated when a factorization restarts or compresses its data.
+        """
+        cdef int error
+        cdef int *order = NULL
+        cdef np.ndarray[int, ndim=1, mode='c'] perm_array
+        self._check_alive()
+        t = self.phase_report.start()
+
+        if perm is not None or warm_start:
+            if perm is not None:
+                perm_array = np.ascontiguousarray(perm, dtype=np.int32)
+                if perm_array.size != self.n:
+                    raise ValueError("perm must have size %d" % self.n)
+                order = <int *> np.PyArray_DATA(perm_array)
+            self._recall_sizes(None)
+            with nogil:
+                error = Ma27_Analyze_Perm(self.data, order)
+            if error == -9:
+                raise ValueError("Invalid pivot order" if perm is not None
+                                 else "No pivot order to reuse")
+            if error:
+                raise RuntimeError("Error return code from Analyze: %-d\n", error)
+            self.phase_report.stop('analyze', t, self._report_stats)
+            return
+
+        if use_cache:
+            key = self.pattern_key()
+            self._recall_sizes(('ma27', key))
+            blob = analysis_cache.get(('ma27', key))
+            if blob is not None:
+                self._load_analysis(blob, key)
+                self.phase_report.stop('analyze', t, self._report_stats)
+                return
+        else:
+            self._recall_sizes(None)
 
-    def analyze(self, *args):
-        error = Ma27_Analyze(self.data, 0)  # iflag = 0: automatic pivot choice
+        with nogil:
+            error = Ma27_Analyze(self.data, 0)  # iflag = 0: automatic pivot choice
         if error:
             raise RuntimeError("Error return code from Analyze: %-d\n", error)
+
+        if use_cache:
+            analysis_cache.put(('ma27', key), self._dump_analysis(key))
+        self.phase_report.stop('analyze', t, self._report_stats)
+        return
+
+    def pattern_key(self):
+        """
+        Return the fingerprint of the sparsity pattern given to the solver.
+
+        See :func:`hsl.solvers.analysis.pattern_key`.
+        """
+        self._check_alive()
+        return pattern_key(self.n,
+                           int_array_view(self.data.irn, self.nnz) - 1,
+                           int_array_view(self.data.icn, self.nnz) - 1)
+
+    def dump_analysis(self, filename=None):
+        """
+        Serialize the result of the analyze phase.
+
+        The pivot sequence, the assembly tree and the sizes of the workspace
+        are packed into a binary blob together with the fingerprint of the
+        sparsity pattern. If `filename` is given, the blob is also written to
+        that file.
+
+        Returns:
+            blob: the serialized analysis (bytes).
+        """
+        self._check_alive()
+        if self.data.w == NULL:
+            raise RuntimeError("Analysis must be performed first.")
+
+        blob = self._dump_analysis(self.pattern_key())
+        if filename is not None:
+            with open(filename, 'wb') as f:
+                f.write(blob)
+        return blob
+
+    def load_analysis(self, blob=None, filename=None):
+        """
+        Restore an analysis produced by `dump_analysis()`.
+
+        This replaces the analyze phase: `factorize()` may be called right
+        after. The matrix data must have been given with `get_matrix_data()`
+        and its sparsity pattern must be the one that was analyzed.
+
+        Args:
+            blob: a serialized analysis
+            filename: a file holding a serialized analysis, used if
+                      `blob` is not given
+        """
+        self._check_alive()
+        if blob is None:
+            with open(filename, 'rb') as f:
+                blob = f.read()
+
+        self._load_analysis(blob, self.pattern_key())
+        return
+
+    cdef _dump_analysis(self, key):
+        return pack_ma27_analysis(key, self.n, self.nnz,
+                                  int_array_view(self.data.ikeep, 3 * self.n),
+                                  int_array_view(self.data.iw1, 2 * self.n),
+                                  self.data.nsteps,
+                                  int_array_view(&self.data.info[0], 20),
+                                  self.data.ops, self.data.la, self.data.liw)
+
+    cdef _load_analysis(self, blob, key):
+        cdef np.ndarray[int, ndim=1, mode='c'] ikeep, iw1, info
+
+        (ikeep, iw1, nsteps, info, ops, la, liw) = unpack_ma27_analysis(blob, key,
+                                                                        self.n, self.nnz)
+        if ikeep.size != 3 * self.n or iw1.size != 2 * self.n:
+            raise ValueError("Analysis has wrong size!\n"
+                             "Expected ikeep and iw1 of sizes %d and %d"%(3 * self.n, 2 * self.n))
+
+        memcpy(self.data.ikeep, <int *> np.PyArray_DATA(ikeep), 3*self.n*sizeof(int))
+        memcpy(self.data.iw1, <int *> np.PyArray_DATA(iw1), 2*self.n*sizeof(int))
+        memcpy(&self.data.info[0], <int *> np.PyArray_DATA(info), 20*sizeof(int))
+        self.data.nsteps = nsteps
+        self.data.ops = ops
+        self.data.la = max(la, self.data.la_min)
+        self.data.liw = max(liw, self.data.liw_min)
+        if Ma27_Allocate_Factors(self.data):
+            raise MemoryError()
         return
 
+    cdef _recall_sizes(self, sizing_key):
+        # Start the factor storage from the sizes that sufficed for
+        # sizing_key, and remember it to record larger sizes later.
+        self.sizing_key = sizing_key
+        sizes = factor_size_cache.get(sizing_key) if sizing_key is not None else None
+        (self.data.la_min, self.data.liw_min) = sizes or (0, 0)
+        self.sizes_seen = (self.data.la_min, self.data.liw_min)
+
+    cdef _learn_sizes(self):
+        # Record the sizes reached after a restart or a compress.
+        sizes = (self.data.la_min, self.data.liw_min)
+        if sizes == self.sizes_seen:
+            return
+        self.sizes_seen = sizes
+        if self.sizing_key is not None:
+            factor_size_cache.put(self.sizing_key, sizes)
+
     def fetch_perm(self, *args):
         """
         fetch_perm() returns the permutation vector p used
@@ -109,6 +515,7 @@ cdef class BaseMA27Solver_INT32_FLOAT64:
         identity matrix, L is unit upper triangular and
         B is block diagonal with 1x1 and 2x2 blocks.
         """
+        self._check_alive()
         perm = []
         cdef int i
         for i in xrange(self.n):
@@ -124,9 +531,14 @@ cdef class BaseMA27Solver_INT32_FLOAT64:
         the analyze phase but the sparsity pattern must not have changed. Use
         the optional argument newA to specify the updated matrix if applicable.
         """
-        error = Ma27_Factorize(self.data, self.a)
+        cdef int error
+        self._check_alive()
+        t = self.phase_report.start()
+        with nogil:
+            error = Ma27_Factorize(self.data, self.a)
         if error:
             raise RuntimeError("Error return code from Factorize: %-d\n", error)
+        self._learn_sizes()
 
         self.factorized = True
 
@@ -135,44 +547,279 @@ cdef class BaseMA27Solver_INT32_FLOAT64:
         if (self.data.info[0] == 3 or self.data.info[0] == -5):
             self.data.rankdef =  True
             self.data.rank = self.data.info[1]
+        self.phase_report.stop('factorize', t, self._report_stats)
         return
 
-    def solve(self, np.ndarray[double, ndim=1] rhs, bint get_resid):
+    def factorize_with_inertia(self, int target_pos, int target_neg,
+                               delta_policy=default_delta_policy):
+        """
+        Factorize A + delta * diag(I, 0) with a shift delta that corrects the
+        inertia.
+
+        The first `target_pos` diagonal entries of A are shifted by
+        delta >= 0 until the inertia of the shifted matrix is
+        (target_pos, target_neg, n - target_pos - target_neg). The trial
+        shifts are chosen by `delta_policy` (see
+        :class:`hsl.solvers.sils.DeltaPolicy`) and all trials run in C against
+        the existing analysis. The values given with `get_matrix_data()` are
+        left unchanged, so residuals and refinement use the unshifted matrix.
+        Only diagonal entries stored in A are shifted.
+
+        Returns:
+            the tuple (delta, inertia) of the final factorization. The number
+            of factorizations performed is available as `ntrials`.
+
+        Raises:
+            RuntimeError: if the shift needed exceeds `delta_policy.max`. The
+            unshifted matrix is then factorized and its inertia is reported.
+        """
+        cdef int error, ntrials
+        cdef double delta = delta_policy.initial(self.last_delta)
+        cdef double delta_max = delta_policy.max
+        cdef double grow = delta_policy.grow
+        self._check_alive()
+        self.factorized = False
+        t = self.phase_report.start()
+        with nogil:
+            error = Ma27_Factorize_Inertia(self.data, self.a, target_pos,
+                                           target_neg, &delta, delta_max,
+                                           grow, &ntrials)
+        self.ntrials = ntrials
+        if error and error != INERTIA_FAIL:
+            raise RuntimeError("Error return code from Factorize: %-d\n", error)
+        self._learn_sizes()
+
+        self.factorized = True
+        # Find out if matrix was rank deficient
+        self.data.rankdef = self.data.info[0] == 3
+        self.data.rank = self.data.info[1] if self.data.rankdef else self.data.n
+        inertia = (self.data.rank - self.data.info[14], self.data.info[14], self.data.n - self.data.rank)
+        if error == INERTIA_FAIL:
+            raise RuntimeError("Could not correct the inertia with shifts up "
+                               "to %g, the unshifted matrix has inertia %s"
+                               % (delta, inertia))
+        self.last_delta = delta
+        self.phase_report.stop('factorize', t, self._report_stats)
+        return (delta, inertia)
+
+    def refactorize(self, np.ndarray[double, ndim=1, mode='c'] values):
+        """
+        Perform numerical factorization with new values.
+
+        The sparsity pattern must be the one given at the analyze phase.
+        `values` holds the new values of the nonzeros in the same order as
+        the values given to `get_matrix_data()`. They are copied directly
+        into the solver and no index conversion or analysis is performed.
+        """
+        self._check_alive()
+        if values.size != self.nnz:
+            raise ValueError("Values array has wrong size!\n"
+                             "Expected %d values and got %d"%(self.nnz, values.size))
+
+        memcpy(self.a, <double *> np.PyArray_DATA(values), self.nnz*sizeof(double))
+        self.factorize()
+        return
+
+    def factorize_solve_batch(self, values, rhs, nthreads=None):
+        """
+        Factorize and solve a batch of matrices with the analyzed pattern.
+
+        Row k of `values`, a 2-D array of size batch x nnz, holds the values
+        of a matrix A_k in the order given to `get_matrix_data()` and row k
+        of `rhs`, of size batch x n, a right-hand side b_k. All the A_k share
+        the analysis of the solver. They are factorized and solved without
+        the GIL on `nthreads` threads (default: the number of CPUs), each
+        with its own factor storage sized from the analysis. The
+        factorization held by the solver is left unchanged.
+
+        Returns:
+            the tuple (X, inertia, status), where X[k] is the solution of
+            A_k x = b_k, inertia[k] holds the numbers of positive and negative
+            eigenvalues of A_k and status[k] is 0 or the first error code
+            returned for A_k. X[k] is only meaningful when status[k] is 0.
+        """
+        cdef double[:, ::1] v
+        cdef double[:, ::1] x
+        cdef int[:, ::1] inertia_view
+        cdef int[::1] status_view
+        cdef double *v_data
+        cdef double *x_data
+        cdef int *status_data
+        cdef int *inertia_data
+        cdef int nbatch, nt
+        self._check_alive()
+        if self.data.w == NULL:
+            raise RuntimeError("Analysis must be performed first.")
+
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        X = np.array(rhs, dtype=np.float64, order='C', copy=True)
+        if values.ndim != 2 or values.shape[1] != self.nnz:
+            raise ValueError("Values array has wrong shape!\n"
+                             "Expected (batch, %d) and got %s"%(self.nnz, str(values.shape)))
+        if X.shape != (values.shape[0], self.n):
+            raise ValueError("Right hand side has wrong shape!\n"
+                             "Expected (%d, %d) and got %s"%(values.shape[0], self.n, str(X.shape)))
+
+        nbatch = values.shape[0]
+        inertia = np.zeros((nbatch, 2), dtype=np.int32)
+        status = np.zeros(nbatch, dtype=np.int32)
+        if nbatch == 0 or self.n == 0:
+            return (X, inertia, status)
+        nt = cpu_count() if nthreads is None else nthreads
+        v = values
+        x = X
+        inertia_view = inertia
+        status_view = status
+        v_data = &v[0, 0]
+        x_data = &x[0, 0]
+        status_data = &status_view[0]
+        inertia_data = &inertia_view[0, 0]
+        with nogil:
+            Ma27_Factorize_Solve_Batch(self.data, nbatch, v_data, self.nnz,
+                                       x_data, self.n, status_data,
+                                       inertia_data, nt)
+        return (X, inertia, status)
+
+    def solve(self, np.ndarray[double, ndim=1] rhs, bint get_resid,
+              out=None, residual_out=None, bint overwrite_rhs=False):
         """
         solve(b) solves the linear system of equations Ax = b.
-        The solution will be found in self.x and residual in
-        self.residual.
         Warning: only one right-hand side is allowed.
+
+        The solution and residual are written into new arrays, or into the
+        caller-provided buffers `out` and `residual_out`, which must be
+        contiguous float64 arrays (or typed memoryviews) of size n. With
+        `overwrite_rhs`, the solution overwrites `rhs`. When all buffers are
+        provided, the solve performs no allocation.
+
+        Solves from several threads may run at the same time against the
+        same factorization, each with its own workspace, but not at the same
+        time as a factorization.
+
+        Args:
+            rhs: right-hand side
+            get_resid: also compute the residual r = rhs - Ax
+            out: buffer receiving the solution
+            residual_out: buffer receiving the residual; it may be `rhs`
+            overwrite_rhs: write the solution into `rhs`; cannot be
+                           combined with `get_resid`
+
+        Returns:
+            x, or the tuple (x, residual) if get_resid is True, where x and
+            residual are `out` and `residual_out` when given.
         """
-        cdef i,j,k
+        cdef double *x_data
+        cdef double *rhs_data
+        cdef double *r_data
+        self._check_alive()
+        t = self.phase_report.start()
+
         if rhs.size != self.n:
             raise ValueError("Right hand side has wrong size!\n"
                              "Attempting to solve the linear system, where A is of size (%d, %d) "
                              "and rhs is of size (%g)"%(self.n, self.n, rhs.size))
 
-        x = rhs.copy() # x<- rhs ; will be overwritten
-        error = Ma27_Solve(self.data, <double *> np.PyArray_DATA(x))
-        if error:
-            raise RuntimeError("Error return code from Solve: %-d\n", error)
+        if overwrite_rhs:
+            if get_resid:
+                raise ValueError("overwrite_rhs cannot be combined with get_resid")
+            out = rhs
+        elif out is None:
+            out = np.empty(self.n, dtype=np.float64)
+        x_data = vector_data(out, self.n, "out")
+        rhs = np.ascontiguousarray(rhs)
+        rhs_data = <double *> np.PyArray_DATA(rhs)
+        if get_resid:
+            if residual_out is None:
+                residual_out = np.empty(self.n, dtype=np.float64)
+            r_data = vector_data(residual_out, self.n, "residual_out")
+            if x_data == rhs_data or r_data == x_data:
+                raise ValueError("out must not overlap rhs and residual_out")
+
+        if x_data != rhs_data:
+            memcpy(x_data, rhs_data, self.n*sizeof(double)) # x<- rhs ; will be overwritten
+        self._solve_work(x_data, 1)
 
         # When residual is requested, compute r = rhs - Ax
         if get_resid:
-            residual = rhs.copy()
-            self.data.residual = <double *> np.PyArray_DATA(residual)
-            for k in xrange(self.data.nz):
-                i = self.data.irn[k] - 1  # Fortran indexing
-                j = self.data.icn[k] - 1
-                self.data.residual[i] -= self.a[k] * x[j]
-                if i != j:
-                    self.data.residual[j] -= self.a[k] * x[i]
-
-            return (x, residual)
+            with nogil:
+                Ma27_Residual(self.data, self.a, x_data, rhs_data, r_data,
+                              1, self.n)
+
+            self.phase_report.stop('solve', t)
+            return (out, residual_out)
+        else:
+            self.phase_report.stop('solve', t)
+            return out
+
+    def solve_many(self, B, bint get_resid=False, out=None, residual_out=None,
+                   bint overwrite_b=False):
+        """
+        solve_many(B) solves the linear systems of equations AX = B.
+
+        B is a 2-D array of size n x k whose columns are the right-hand
+        sides. All columns are solved in a single loop over MA27CD that
+        runs without the GIL, and may run at the same time as other solves
+        against the same factorization. B is copied once as a whole into a
+        Fortran-ordered float64 array, which is overwritten by the
+        solutions. That array is `out` if given, or `B` itself with
+        `overwrite_b`. The residuals are written into `residual_out` if
+        given. Buffers must be Fortran-contiguous float64 arrays of size
+        n x k.
+
+        Returns:
+            X: Fortran-ordered array of size n x k holding the solutions,
+               or the tuple (X, R) where R = B - AX if get_resid is True.
+        """
+        cdef double *x_data
+        cdef double *b_data
+        cdef double *r_data
+        cdef int nrhs
+        self._check_alive()
+        t = self.phase_report.start()
+
+        if B.ndim != 2 or B.shape[0] != self.n:
+            raise ValueError("Right hand side has wrong shape!\n"
+                             "Attempting to solve the linear system, where A is of size (%d, %d) "
+                             "and B is of shape %s"%(self.n, self.n, str(B.shape)))
+
+        nrhs = B.shape[1]
+        if overwrite_b:
+            if get_resid:
+                raise ValueError("overwrite_b cannot be combined with get_resid")
+            out = B
+        if out is None:
+            X = np.array(B, dtype=np.float64, order='F', copy=True) # X<- B ; will be overwritten
         else:
-            return x
+            X = out
+        x_data = matrix_data(X, self.n, nrhs, "out")
+        if X is not B and out is not None:
+            np.asarray(X)[...] = B
+        if get_resid:
+            Bf = np.asfortranarray(B, dtype=np.float64)
+            b_data = matrix_data(Bf, self.n, nrhs, "B")
+            R = np.empty((self.n, nrhs), order='F') if residual_out is None else residual_out
+            r_data = matrix_data(R, self.n, nrhs, "residual_out")
+            if nrhs > 0 and (x_data == b_data or x_data == r_data):
+                raise ValueError("out must not overlap B and residual_out")
+        if nrhs == 0:
+            self.phase_report.stop('solve', t)
+            return (X, R) if get_resid else X
+
+        self._solve_work(x_data, nrhs)
+
+        if get_resid:
+            with nogil:
+                Ma27_Residual(self.data, self.a, x_data, b_data, r_data,
+                              nrhs, self.n)
+            self.phase_report.stop('solve', t)
+            return (X, R)
+        self.phase_report.stop('solve', t)
+        return X
 
 
     def refine(self, np.ndarray[double, ndim=1] x, np.ndarray[double, ndim=1] rhs,
-               np.ndarray[double, ndim=1] residual, double tol=1e-8, int nitref=3, *args):
+               np.ndarray[double, ndim=1] residual, double tol=1e-8, int nitref=3, *args,
+               out=None, residual_out=None):
         """Perform iterative refinement.
 
         If necessary, it performs iterative refinement until the scaled
@@ -182,38 +829,99 @@ cdef class BaseMA27Solver_INT32_FLOAT64:
         warning: Make sure you have called solve() with the same right-hand
         side b before calling refine().
 
+        Refinements and solves from several threads may run at the same time
+        against the same factorization, but not at the same time as a
+        factorization.
+
+        The improved solution and residual are written into new arrays, or
+        into the caller-provided contiguous float64 buffers `out` and
+        `residual_out` of size n. Passing `out=x` and `residual_out=residual`
+        refines in place without allocating.
+
         Args:
             x: an estimated solution of Ax = b
             rhs: right-hand side
             residual: residual associated with given x entry
             tol: threshold for the scaled residual norm
             nitref: max number of iterative refinement steps
+            out: buffer receiving the improved solution
+            residual_out: buffer receiving the last residual
 
         Returns:
             (tuple):
                 * new_x: improved solution vector
                 * new_res: last residual vector
         """
+        cdef double *x_data
+        cdef double *rhs_data
+        cdef double *r_data
+        self._check_alive()
+        t = self.phase_report.start()
+
+        if out is None:
+            out = np.empty(self.n, dtype=np.float64)
+        if residual_out is None:
+            residual_out = np.empty(self.n, dtype=np.float64)
+        x_data = vector_data(out, self.n, "out")
+        r_data = vector_data(residual_out, self.n, "residual_out")
+        rhs = np.ascontiguousarray(rhs)
+        rhs_data = <double *> np.PyArray_DATA(rhs)
+        if x_data == rhs_data or r_data == x_data or r_data == rhs_data:
+            raise ValueError("rhs, out and residual_out must not overlap")
+        copy_vector(x, x_data, self.n, "x")
+        copy_vector(residual, r_data, self.n, "residual")
+
+        self._refine_work(x_data, rhs_data, r_data, tol, nitref)
+        self.phase_report.stop('refine', t)
+        return (out, residual_out)
+
+    property callback:
+        """
+        Function called with an event dictionary after each phase, or None.
+        See :class:`hsl.solvers.report.SolverReport`.
+        """
+        def __get__(self): return self.phase_report.callback
+        def __set__(self, callback): self.phase_report.callback = callback
 
-        new_x = x.copy()
-        new_res = residual.copy()
+    def report(self):
+        """
+        Return the timings of the phases and the statistics of the solver.
 
-        self.data.residual = <double *> np.PyArray_DATA(new_res)
+        Returns:
+            a dictionary with the `solver` name, the number of calls and the
+            wall clock and CPU time of each phase (`phases`) and the
+            statistics of the last analysis and factorization (`stats`).
+            See :mod:`hsl.solvers.report`.
+        """
+        self._check_alive()
+        return self.phase_report.as_dict(self._report_stats())
 
-        error = Ma27_Refine(self.data,
-                            <double *> np.PyArray_DATA(new_x),
-                            <double *> np.PyArray_DATA(rhs),
-                            self.a,
-                            tol,
-                            nitref)
+    def _report_stats(self):
+        return ma27_stats(self.data.info, self.data.ops, self.data.nrealloc,
+                          self.data.npivtol, self.data.cntl[0])
 
-        if error:
-            raise RuntimeError("Error return code from Refine: %-d\n", error)
+    def event_log(self):
+        """
+        Return the last events recorded by the factorization, oldest first.
 
-        return (new_x, new_res)
+        Returns:
+            a structured array of type :data:`hsl.solvers.report.EVENT_DTYPE`,
+            whose `event` field indexes :data:`hsl.solvers.report.EVENTS`.
+        """
+        self._check_alive()
+        cdef np.ndarray log = np.empty(self.data.eventlog.size, dtype=EVENT_DTYPE)
+        cdef int nevents = HSL_Log_Copy(&self.data.eventlog,
+                                        <HSL_Event *> np.PyArray_DATA(log))
+        return log[:nevents]
+
+    def clear_log(self):
+        """Discard all events recorded so far."""
+        self._check_alive()
+        HSL_Log_Clear(&self.data.eventlog)
 
     def stats(self):
         """Return statistics on the solve."""
+        self._check_alive()
         return (self.data.info[8],  # storage for real data of factors
                 self.data.info[9],  # storage for int  data of factors
                 self.data.info[10], # nb of data compresses performed in analysis
@@ -221,4 +929,23 @@ cdef class BaseMA27Solver_INT32_FLOAT64:
                 self.data.info[12], # nb of int compresses performed in analysis
                 self.data.info[13], # number of 2x2 pivots
                 self.data.info[14], # number of negative eigenvalues
-                self.data.rank)     # matrix rank
\ No newline at end of file
+                self.data.rank)     # matrix rank
+
+    def workspace_stats(self):
+        """
+        Return statistics on the solve workspaces.
+
+        Returns:
+            a dictionary with the list `lw` of the sizes of the real
+            workspaces kept by the solver, one per solve that ran at the same
+            time, the number of workspace `allocations` and the number of
+            `solves` (calls to solve, solve_many and refine) performed so far.
+        """
+        cdef _Workspace work
+        self._check_alive()
+        lw = []
+        for work in self.work_pool:
+            lw.append(work.ws.lw)
+        return {'lw': lw,
+                'allocations': self.data.nworkalloc,
+                'solves': self.data.nsolves}
\ No newline at end of file
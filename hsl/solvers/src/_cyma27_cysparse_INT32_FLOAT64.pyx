@@ -28,6 +28,7 @@ cdef class CySparseMA27Solver_INT32_FLOAT64(BaseMA27Solver_INT32_FLOAT64):
 
         Note: we keep the same name for this method in all derived classes.
         """
+        self._check_alive()
         # Memory allocation of `irn`, `icn` and `a` is done by `BaseMA27Solver`.
 
         A.fill_triplet(self.data.irn, self.data.icn, self.a)
@@ -0,0 +1,334 @@
+from hsl.solvers.src._cyma27_base_INT32_FLOAT32 cimport BaseMA27Solver_INT32_FLOAT32
+
+from libc.stdlib cimport malloc, calloc, free
+from libc.string cimport memcpy
+from libc.math cimport fabs, sqrt
+from libc.float cimport FLT_EPSILON
+cimport cython
+
+cimport numpy as cnp
+import numpy as np
+cnp.import_array()
+
+
+# Mirrored entries of a matrix stored in full may differ by this much,
+# relative to its largest entry, before it is rejected as unsymmetric.
+cdef double SYMMETRY_RTOL = sqrt(FLT_EPSILON)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int mirrored_pattern(const int[::1] indptr, const int[::1] indices,
+                          const float[::1] data, int n, int nlower,
+                          double amax) nogil:
+    """
+    Check whether the strict triangles of a compressed matrix mirror each
+    other in pattern.
+
+    The strict lower triangle, held by its `nlower` entries, is transposed
+    so that both triangles can be compared column by column. When the
+    patterns mirror each other, the values of each pair of mirrored
+    entries are also compared, relative to `amax`.
+
+    Returns:
+        0 if the patterns differ, 1 if the matrix is stored in full, -1 if
+        the patterns mirror each other but the values do not and -2 if
+        memory could not be allocated.
+    """
+    cdef int i, j, k, t, status = 1
+    cdef int *tptr = <int *> calloc(n + 1, sizeof(int))
+    cdef int *tidx = <int *> malloc(max(nlower, 1) * sizeof(int))
+    cdef float *tval = <float *> malloc(max(nlower, 1) * sizeof(float))
+    cdef int *mark = <int *> malloc(n * sizeof(int))
+    cdef int *hit = <int *> malloc(n * sizeof(int))
+    cdef double *wl = <double *> malloc(n * sizeof(double))
+    cdef double *wu = <double *> malloc(n * sizeof(double))
+
+    if (tptr == NULL or tidx == NULL or tval == NULL or mark == NULL or
+            hit == NULL or wl == NULL or wu == NULL):
+        status = -2
+    else:
+        # Bucket the strict lower entries (i, j), i > j, by their index i
+        for j in range(n):
+            for k in range(indptr[j], indptr[j+1]):
+                if indices[k] > j:
+                    tptr[indices[k] + 1] += 1
+        for i in range(n):
+            tptr[i+1] += tptr[i]
+        for j in range(n):
+            for k in range(indptr[j], indptr[j+1]):
+                i = indices[k]
+                if i > j:
+                    tidx[tptr[i]] = j
+                    tval[tptr[i]] = data[k]
+                    tptr[i] += 1
+        for i in range(n, 0, -1):
+            tptr[i] = tptr[i-1]
+        tptr[0] = 0
+
+        for i in range(n):
+            mark[i] = -1
+            hit[i] = -1
+        # Bucket j holds the mirrors of the strict upper entries (i, j)
+        for j in range(n):
+            for t in range(tptr[j], tptr[j+1]):
+                i = tidx[t]
+                if mark[i] != j:
+                    mark[i] = j
+                    wl[i] = 0.0
+                    wu[i] = 0.0
+                wl[i] += tval[t]
+            for k in range(indptr[j], indptr[j+1]):
+                i = indices[k]
+                if i < j:
+                    if mark[i] != j:
+                        status = 0
+                        break
+                    hit[i] = j
+                    wu[i] += data[k]
+            if status == 0:
+                break
+            for t in range(tptr[j], tptr[j+1]):
+                i = tidx[t]
+                if hit[i] != j:
+                    status = 0
+                    break
+                if status == 1 and fabs(wl[i] - wu[i]) > SYMMETRY_RTOL * amax:
+                    status = -1
+            if status == 0:
+                break
+
+    free(tptr)
+    free(tidx)
+    free(tval)
+    free(mark)
+    free(hit)
+    free(wl)
+    free(wu)
+    return status
+
+
+@cython.boundscheck(False)  # indptr and indices are validated below
+@cython.wraparound(False)
+cdef int compressed_shape(const int[::1] indptr, const int[::1] indices,
+                          const float[::1] data, int n,
+                          bint *full) except -1:
+    """
+    Validate a symmetric matrix of order n in compressed format and work
+    out how it is stored.
+
+    The matrix is stored in full if the patterns of its strict triangles
+    mirror each other, in which case only its lower triangle is kept and
+    `full` is set. Otherwise each off-diagonal entry is given once, in
+    either triangle, and all entries are kept. A matrix stored in full
+    whose mirrored values differ by more than roundoff is rejected.
+
+    Returns:
+        the number of kept entries.
+    """
+    cdef int j, k, nlower = 0, nupper = 0, status = 0
+    cdef double amax = 0.0
+    cdef bint bad = False
+
+    if indptr.shape[0] != n + 1:
+        raise ValueError("indptr must have size %d" % (n + 1))
+    if indptr[0] != 0 or indices.shape[0] < indptr[n] or data.shape[0] < indptr[n]:
+        raise ValueError("indptr does not match the size of indices and data")
+
+    with nogil:
+        for j in range(n):
+            if indptr[j+1] < indptr[j]:
+                bad = True
+                break
+            for k in range(indptr[j], indptr[j+1]):
+                if indices[k] < 0 or indices[k] >= n:
+                    bad = True
+                elif indices[k] > j:
+                    nlower += 1
+                elif indices[k] < j:
+                    nupper += 1
+                if fabs(data[k]) > amax:
+                    amax = fabs(data[k])
+        # nlower and nupper are swapped for CSR, which does not matter here
+        if not bad and nlower > 0 and nlower == nupper:
+            status = mirrored_pattern(indptr, indices, data, n, nlower, amax)
+    if bad:
+        raise ValueError("Invalid indptr or indices")
+    if status == -2:
+        raise MemoryError()
+    if status == -1:
+        raise ValueError("Matrix is stored in full but is not symmetric")
+
+    full[0] = status == 1
+    if full[0]:
+        return indptr[n] - nupper
+    return indptr[n]
+
+
+@cython.boundscheck(False)  # validated by compressed_shape()
+@cython.wraparound(False)
+cdef void compressed_to_coord(const int[::1] indptr, const int[::1] indices,
+                              const float[::1] data, int n, bint csr,
+                              bint full, int *irn, int *jcn, float *a) nogil:
+    """
+    Expand a symmetric matrix in compressed format into coordinate format.
+
+    `indptr`, `indices` and `data` describe the columns of the matrix (CSC)
+    or, if `csr` is True, its rows (CSR), and must have been validated by
+    `compressed_shape()`. If `full` is True, only the lower triangle is
+    kept. The 1-based indices and the values of the kept entries are
+    written into `irn`, `jcn` and `a`.
+    """
+    cdef int j, k, row, col, nkept = 0
+
+    for j in range(n):
+        for k in range(indptr[j], indptr[j+1]):
+            if csr:
+                row = j
+                col = indices[k]
+            else:
+                row = indices[k]
+                col = j
+            if full and row < col:
+                continue
+            irn[nkept] = row + 1
+            jcn[nkept] = col + 1
+            a[nkept] = data[k]
+            nkept += 1
+
+
+def compressed_arrays(indptr, indices, data):
+    """Return contiguous int32, int32 and float32 versions of the arrays."""
+    return (np.ascontiguousarray(indptr, dtype=np.int32),
+            np.ascontiguousarray(indices, dtype=np.int32),
+            np.ascontiguousarray(data, dtype=np.float32))
+
+cdef class NumpyMA27Solver_INT32_FLOAT32(BaseMA27Solver_INT32_FLOAT32):
+    """
+    MA27 Context.
+
+    This version deals with matrices supplied through Numpy arrays, in
+    coordinate format (`get_matrix_data()`) or in compressed sparse column
+    or row format (`get_csc_data()`, `get_csr_data()`, `from_csc()`,
+    `from_csr()` and `from_scipy()`).
+
+
+    """
+
+    def __cinit__(self, int m, int n, int nnz, bint sqd=False, verbose=False):
+        pass
+
+    cpdef get_matrix_data(self, cnp.ndarray[cnp.int32_t, ndim=1] arow,
+                                cnp.ndarray[cnp.int32_t, ndim=1] acol,
+                                cnp.ndarray[cnp.float32_t, ndim=1] aval):
+        """
+        Args:
+            a_row: row indices of non zero elements of A
+            a_col: column indices of non zero elements of A
+            a_val: values of non zeros elements of A
+
+        Note: we keep the same name for this method in all derived classes.
+        """
+        self._check_alive()
+        # Memory allocation of `irn`, `icn` and `a` is done by `BaseMA27Solver`.
+        memcpy(self.data.irn, <int *> cnp.PyArray_DATA(arow), self.nnz*sizeof(int))
+        memcpy(self.data.icn, <int *> cnp.PyArray_DATA(acol), self.nnz*sizeof(int))
+        memcpy(self.a, <int *> cnp.PyArray_DATA(aval), self.nnz*sizeof(float))
+
+        # convert irn and jcn indices to Fortran format
+        self.index_to_fortran()
+
+
+    @classmethod
+    def from_csc(cls, int n, indptr, indices, data, bint sqd=False):
+        """
+        Return a solver holding the symmetric matrix of order n given in
+        compressed sparse column format.
+
+        A may be stored in full or with each off-diagonal entry given
+        once. See `get_csc_data()`.
+        """
+        return cls._from_compressed(n, indptr, indices, data, sqd, False)
+
+    @classmethod
+    def from_csr(cls, int n, indptr, indices, data, bint sqd=False):
+        """
+        Return a solver holding the symmetric matrix of order n given in
+        compressed sparse row format.
+
+        A may be stored in full or with each off-diagonal entry given
+        once. See `get_csr_data()`.
+        """
+        return cls._from_compressed(n, indptr, indices, data, sqd, True)
+
+    @classmethod
+    def _from_compressed(cls, int n, indptr, indices, data, bint sqd, bint csr):
+        cdef bint full
+        cdef NumpyMA27Solver_INT32_FLOAT32 solver
+        (indptr, indices, data) = compressed_arrays(indptr, indices, data)
+        nnz = compressed_shape(indptr, indices, data, n, &full)
+        solver = cls(n, n, nnz, sqd)
+        solver._fill_compressed(indptr, indices, data, csr, full)
+        return solver
+
+    @classmethod
+    def from_scipy(cls, A, bint sqd=False):
+        """
+        Return a solver holding the symmetric `scipy.sparse` matrix A.
+
+        Matrices in CSR and CSC format are used directly; other formats are
+        converted to CSC first.
+        """
+        (m, n) = A.shape
+        if m != n:
+            raise ValueError("Matrix must be square")
+        if A.format == 'csr':
+            return cls.from_csr(n, A.indptr, A.indices, A.data, sqd)
+        if A.format != 'csc':
+            A = A.tocsc()
+        return cls.from_csc(n, A.indptr, A.indices, A.data, sqd)
+
+    def get_csc_data(self, indptr, indices, data):
+        """
+        Args:
+            indptr: column pointers of A
+            indices: row indices of non zero elements of A
+            data: values of non zero elements of A
+
+        The row indices are expanded directly into the solver. If A is
+        stored in full, only its lower triangle is used. Otherwise each
+        off-diagonal entry is given once, in either triangle. The number of
+        used entries must be the `nnz` given at construction.
+        """
+        self._check_alive()
+        self._get_compressed_data(indptr, indices, data, False)
+
+    def get_csr_data(self, indptr, indices, data):
+        """
+        Args:
+            indptr: row pointers of A
+            indices: column indices of non zero elements of A
+            data: values of non zero elements of A
+
+        The column indices are expanded directly into the solver. If A is
+        stored in full, only its lower triangle is used. Otherwise each
+        off-diagonal entry is given once, in either triangle. The number of
+        used entries must be the `nnz` given at construction.
+        """
+        self._check_alive()
+        self._get_compressed_data(indptr, indices, data, True)
+
+    def _get_compressed_data(self, indptr, indices, data, bint csr):
+        cdef bint full
+        (indptr, indices, data) = compressed_arrays(indptr, indices, data)
+        nnz = compressed_shape(indptr, indices, data, self.n, &full)
+        if nnz != self.nnz:
+            raise ValueError("Matrix has wrong number of nonzeros!\n"
+                             "Expected %d and got %d" % (self.nnz, nnz))
+        self._fill_compressed(indptr, indices, data, csr, full)
+
+    cdef _fill_compressed(self, const int[::1] indptr, const int[::1] indices,
+                          const float[::1] data, bint csr, bint full):
+        with nogil:
+            compressed_to_coord(indptr, indices, data, self.n, csr, full,
+                                self.data.irn, self.data.icn, self.a)
@@ -5,4 +5,7 @@ cimport numpy as cnp
 cdef class NumpyMA27Solver_INT32_FLOAT64(BaseMA27Solver_INT32_FLOAT64):
     cpdef get_matrix_data(self, cnp.ndarray[cnp.int32_t, ndim=1] arow,
                                 cnp.ndarray[cnp.int32_t, ndim=1] acol,
-                                cnp.ndarray[cnp.float64_t, ndim=1] aval)
\ No newline at end of file
+                                cnp.ndarray[cnp.float64_t, ndim=1] aval)
+
+    cdef _fill_compressed(self, const int[::1] indptr, const int[::1] indices,
+                          const double[::1] data, bint csr, bint full)
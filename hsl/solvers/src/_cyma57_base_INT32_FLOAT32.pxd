@@ -0,0 +1,150 @@
+from libc.stdint cimport int64_t
+from libc.string cimport strncpy, memcpy
+
+import numpy as np
+cimport numpy as cnp
+
+cnp.import_array()
+
+
+
+cimport numpy as np
+
+cdef extern from "ma57.h" nogil:
+    enum: HSL_LOG_SIZE
+    enum: HSL_EVENT_SOLVE
+    enum: HSL_EVENT_REFINE
+    enum: HSL_EVENT_ERROR
+
+    ctypedef struct HSL_Event:
+        pass
+
+    ctypedef struct HSL_Log:
+        int       size                # Capacity of the ring buffer
+
+    cdef int  HSL_Log_Copy( const HSL_Log *elog, HSL_Event events[] )
+    cdef void HSL_Log_Clear( HSL_Log *elog )
+    cdef void HSL_Log_Event( HSL_Log *elog, int event, int code, int size1,
+                             int size2, float value )
+
+    ctypedef struct Ma57_Data:
+        int       n, nz               # Order and #nonzeros
+        int       icntl[20]
+        int       info[40]
+        float    cntl[5]
+        float    rinfo[20]
+        int      *irn                 # Sparsity pattern
+        int      *jcn
+        int       lkeep               # Pivot sequence
+        int      *keep
+        int      *iwork               # Wokspace array
+        int       liwork              # Size of array iwork
+        float   *fact                # Matrix factors
+        int       lfact               # Size of array fact
+        int      *ifact               # Indexing of factors
+        int       lifact              # Size of array ifact
+        int       job
+        int       nrhs                # Number of rhs
+        float   *rhs                 # Right-hand sides
+        int       lrhs                # Leading dim of rhs
+        float   *work                # Real workspace
+        int       lwork               # Size of array work
+        int       nworkalloc          # Allocations of work
+        int       nsolves             # Calls to Solve and Refine
+        int       nrealloc            # Times fact or ifact grew
+        int       nrestarts           # Restarts of MA57BD from scratch and
+        int       ncopies             # calls to MA57ED in last factorization
+        float    fact_grow           # Growth of fact and ifact
+        int       lfact_min           # Sizes of fact and ifact that
+        int       lifact_min          # sufficed in a factorization
+        int       calledcd            # Flag for MA57DD
+        float   *x                   # Solution to Ax=rhs
+        float   *residual            # = A x - rhs
+        char      fetched             # Factors were fetched
+                                      # Used for de-allocation
+        int       rank, rankdef
+        HSL_Log   eventlog            # Ring buffer of events
+
+    cdef Ma57_Data *Ma57_Initialize( int nz, int n, int logsize )
+    cdef int  Ma57_Analyze( Ma57_Data *ma57 );
+    cdef int  Ma57_Analyze_Perm( Ma57_Data *ma57, const int perm[] );
+    cdef void Ma57_Allocate_Factors( Ma57_Data *ma57 );
+    cdef int  Ma57_Factorize( Ma57_Data *ma57, float A[] );
+    cdef int  Ma57_Factorize_Inertia( Ma57_Data *ma57, float A[], int npos,
+                                      int nneg, float *delta, float delta_max,
+                                      float grow, int *ntrials )
+    int INERTIA_FAIL
+    cdef int  Ma57_Solve( Ma57_Data *ma57, float x[] );
+    cdef int  Ma57_Solve_Many( Ma57_Data *ma57, float x[], int nrhs, int lrhs );
+
+    ctypedef struct Ma57_Work:
+        int       lwork               # Size of array work
+        int       info[40]            # info of the last solve
+        float    rinfo[20]           # rinfo of the last refinement
+        int       nalloc              # Allocations of work
+
+    cdef Ma57_Work *Ma57_Work_Initialize( int n )
+    cdef int  Ma57_Solve_Work( const Ma57_Data *ma57, Ma57_Work *ws, float x[],
+                               int nrhs, int lrhs )
+    cdef int  Ma57_Refine_Work( const Ma57_Data *ma57, Ma57_Work *ws,
+                                float x[], float rhs[], float A[],
+                                float resid[], int maxitref, int job )
+    cdef void Ma57_Work_Finalize( Ma57_Work *ws )
+
+    cdef int  Ma57_Refine( Ma57_Data *ma57, float x[], float rhs[], float A[],
+                           int maxitref, int job );
+    cdef void Ma57_Finalize(      Ma57_Data *ma57 );
+
+    ctypedef struct Ma57_System:
+        int       n, nz               # Order and #nonzeros
+        int      *irn                 # Sparsity pattern
+        int      *jcn
+        float   *a                   # Values
+        float   *x                   # rhs on entry, solution on exit
+        int       status              # First nonzero error code
+        int       npos, nneg          # Inertia
+
+    cdef int  Ma57_Solve_Batch( Ma57_System systems[], int nsystems,
+                                int ordering, int nthreads )
+    cdef int  Ma57_Factorize_Solve_Batch( const Ma57_Data *ma57, int nbatch,
+                                          float values[], int ldv,
+                                          float x[], int ldx, int status[],
+                                          int inertia[], int nthreads )
+    cdef int  Process_Error_Code( Ma57_Data *ma57, int nerror );
+
+
+cdef class BaseMA57Solver_INT32_FLOAT32:
+    cdef:
+        int n
+        int nnz
+        Ma57_Data* data
+        float* a
+        float* x
+        float* residual
+        int factorized
+        object phase_report
+        object work_pool
+        bint ordering_set
+        object sizing_key
+        int nrealloc_seen
+        float last_delta
+        int ntrials
+        float cond
+        float cond2
+        float berr
+        float berr2
+        float dirError
+        float matNorm
+        float xNorm
+        float relRes
+
+    cdef index_to_fortran(self)
+    cdef void _free(self)
+    cdef _check_alive(self)
+    cdef int _solve_work(self, float *x, int nrhs) except -1
+    cdef int _refine_work(self, float *x, float *rhs, float *resid,
+                          int nitref, int job) except -1
+    cdef _dump_analysis(self, key)
+    cdef _load_analysis(self, blob, key)
+    cdef _recall_sizes(self, sizing_key)
+    cdef _learn_sizes(self)
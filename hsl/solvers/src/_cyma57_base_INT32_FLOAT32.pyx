@@ -0,0 +1,1113 @@
+from cpython.mem cimport PyMem_Malloc, PyMem_Free
+cimport numpy as np
+import numpy as np
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+
+from hsl.solvers.analysis import pattern_key, pack_ma57_analysis, unpack_ma57_analysis
+from hsl.solvers.analysis import analysis_cache, ordering_cache, factor_size_cache
+from hsl.solvers.sils import default_delta_policy
+from hsl.solvers.report import SolverReport, ma57_stats, EVENT_DTYPE
+
+cnp.import_array()
+
+cdef extern from "ma57.h" nogil:
+    ctypedef struct HSL_Event:
+        pass
+
+    ctypedef struct HSL_Log:
+        int       size                # Capacity of the ring buffer
+
+    cdef int  HSL_Log_Copy( const HSL_Log *elog, HSL_Event events[] )
+    cdef void HSL_Log_Clear( HSL_Log *elog )
+    cdef void HSL_Log_Event( HSL_Log *elog, int event, int code, int size1,
+                             int size2, float value )
+
+    ctypedef struct Ma57_Data:
+        int       n, nz               # Order and #nonzeros
+        int       icntl[20]
+        int       info[40]
+        float    cntl[5]
+        float    rinfo[20]
+        int      *irn                 # Sparsity pattern
+        int      *jcn
+        int       lkeep               # Pivot sequence
+        int      *keep
+        int      *iwork               # Wokspace array
+        int       liwork              # Size of array iwork
+        float   *fact                # Matrix factors
+        int       lfact               # Size of array fact
+        int      *ifact               # Indexing of factors
+        int       lifact              # Size of array ifact
+        int       job
+        int       nrhs                # Number of rhs
+        float   *rhs                 # Right-hand sides
+        int       lrhs                # Leading dim of rhs
+        float   *work                # Real workspace
+        int       lwork               # Size of array work
+        int       nworkalloc          # Allocations of work
+        int       nsolves             # Calls to Solve and Refine
+        int       nrealloc            # Times fact or ifact grew
+        int       nrestarts           # Restarts of MA57BD from scratch and
+        int       ncopies             # calls to MA57ED in last factorization
+        float    fact_grow           # Growth of fact and ifact
+        int       lfact_min           # Sizes of fact and ifact that
+        int       lifact_min          # sufficed in a factorization
+        int       calledcd            # Flag for MA57DD
+        float   *x                   # Solution to Ax=rhs
+        float   *residual            # = A x - rhs
+        char      fetched             # Factors were fetched
+                                      # Used for de-allocation
+        int       rank, rankdef
+        HSL_Log   eventlog            # Ring buffer of events
+
+    cdef Ma57_Data *Ma57_Initialize( int nz, int n, int logsize )
+    cdef int  Ma57_Analyze( Ma57_Data *ma57 );
+    cdef int  Ma57_Analyze_Perm( Ma57_Data *ma57, const int perm[] );
+    cdef void Ma57_Allocate_Factors( Ma57_Data *ma57 );
+    cdef int  Ma57_Factorize( Ma57_Data *ma57, float A[] );
+    cdef int  Ma57_Factorize_Inertia( Ma57_Data *ma57, float A[], int npos,
+                                      int nneg, float *delta, float delta_max,
+                                      float grow, int *ntrials )
+    cdef int  Ma57_Solve( Ma57_Data *ma57, float x[] );
+    cdef int  Ma57_Solve_Many( Ma57_Data *ma57, float x[], int nrhs, int lrhs );
+
+    ctypedef struct Ma57_Work:
+        int       lwork               # Size of array work
+        int       info[40]            # info of the last solve
+        float    rinfo[20]           # rinfo of the last refinement
+        int       nalloc              # Allocations of work
+
+    cdef Ma57_Work *Ma57_Work_Initialize( int n )
+    cdef int  Ma57_Solve_Work( const Ma57_Data *ma57, Ma57_Work *ws, float x[],
+                               int nrhs, int lrhs )
+    cdef int  Ma57_Refine_Work( const Ma57_Data *ma57, Ma57_Work *ws,
+                                float x[], float rhs[], float A[],
+                                float resid[], int maxitref, int job )
+    cdef void Ma57_Work_Finalize( Ma57_Work *ws )
+
+    cdef int  Ma57_Refine( Ma57_Data *ma57, float x[], float rhs[], float A[],
+                           int maxitref, int job );
+    cdef void Ma57_Finalize(      Ma57_Data *ma57 );
+
+    ctypedef struct Ma57_System:
+        int       n, nz               # Order and #nonzeros
+        int      *irn                 # Sparsity pattern
+        int      *jcn
+        float   *a                   # Values
+        float   *x                   # rhs on entry, solution on exit
+        int       status              # First nonzero error code
+        int       npos, nneg          # Inertia
+
+    cdef int  Ma57_Solve_Batch( Ma57_System systems[], int nsystems,
+                                int ordering, int nthreads )
+    cdef int  Ma57_Factorize_Solve_Batch( const Ma57_Data *ma57, int nbatch,
+                                          float values[], int ldv,
+                                          float x[], int ldx, int status[],
+                                          int inertia[], int nthreads )
+    cdef int  Process_Error_Code( Ma57_Data *ma57, int nerror );
+
+
+cdef c_to_fortran_index_array(int * a, int a_size):
+    cdef:
+        int i
+
+    for i from 0 <= i < a_size:
+        a[i] += 1
+
+
+cdef int_array_view(int * a, int a_size):
+    """Return a NumPy array sharing its data with a C int array."""
+    cdef np.npy_intp shape[1]
+    shape[0] = a_size
+    return np.PyArray_SimpleNewFromData(1, shape, np.NPY_INT32, <void *> a)
+
+
+cdef float_array_view(float * a, int a_size):
+    """Return a NumPy array sharing its data with a C float array."""
+    cdef np.npy_intp shape[1]
+    shape[0] = a_size
+    return np.PyArray_SimpleNewFromData(1, shape, np.NPY_FLOAT32, <void *> a)
+
+
+cdef float *vector_data(float[::1] v, int n, name) except NULL:
+    """Return the data of a contiguous float32 vector of size n."""
+    if v.shape[0] != n:
+        raise ValueError("%s has wrong size!\n"
+                         "Expected %d and got %d"%(name, n, v.shape[0]))
+    return &v[0]
+
+
+cdef float *matrix_data(float[::1, :] m, int n, int k, name) except? NULL:
+    """Return the data of a Fortran-contiguous float32 n x k array."""
+    if m.shape[0] != n or m.shape[1] != k:
+        raise ValueError("%s has wrong shape!\n"
+                         "Expected (%d, %d) and got (%d, %d)"%(name, n, k,
+                                                               m.shape[0], m.shape[1]))
+    if k == 0:
+        return NULL
+    return &m[0, 0]
+
+
+cdef copy_vector(np.ndarray src, float *dst, int n, name):
+    """Copy a float32 vector of size n into dst unless they share their data."""
+    if src.size != n:
+        raise ValueError("%s has wrong size!\n"
+                         "Expected %d and got %d"%(name, n, src.size))
+    src = np.ascontiguousarray(src, dtype=np.float32)
+    if <float *> np.PyArray_DATA(src) != dst:
+        memcpy(dst, np.PyArray_DATA(src), n*sizeof(float))
+
+
+# Ordering strategies that compute a pivot sequence (icntl(6) of MA57)
+MA57_ORDERINGS = (0, 2, 3, 4, 5)
+
+
+def solve_batch(int[::1] n_offsets, int[::1] nz_offsets, int[::1] irn,
+                int[::1] jcn, float[::1] a, float[::1] x, int ordering=5,
+                int nthreads=1):
+    """
+    Analyze, factorize and solve independent systems on a pool of threads.
+
+    System k has order n_offsets[k+1] - n_offsets[k]. Its nonzeros are held
+    in irn, jcn (1-based) and a between nz_offsets[k] and nz_offsets[k+1],
+    and its right-hand side in x between n_offsets[k] and n_offsets[k+1].
+    x is overwritten by the solutions. Each thread reuses its MA57 data
+    from one system to the next. See :func:`hsl.solvers.batch.solve_batch`.
+
+    Returns:
+        the tuple (inertia, status) of int32 arrays, where inertia[k] holds
+        the numbers of positive and negative eigenvalues of system k and
+        status[k] the first nonzero error code of its analysis,
+        factorization or solve.
+    """
+    cdef int nsystems = n_offsets.shape[0] - 1, k
+    cdef Ma57_System *systems
+    cdef int *irn_data = &irn[0] if irn.shape[0] else NULL
+    cdef int *jcn_data = &jcn[0] if jcn.shape[0] else NULL
+    cdef float *a_data = &a[0] if a.shape[0] else NULL
+    cdef float *x_data = &x[0] if x.shape[0] else NULL
+
+    if nsystems < 0 or nz_offsets.shape[0] != nsystems + 1:
+        raise ValueError("n_offsets and nz_offsets must have the same size")
+    if (irn.shape[0] != nz_offsets[nsystems] or jcn.shape[0] != irn.shape[0]
+        or a.shape[0] != irn.shape[0] or x.shape[0] != n_offsets[nsystems]):
+        raise ValueError("Arrays do not match the offsets")
+    inertia = np.zeros((max(nsystems, 0), 2), dtype=np.int32)
+    status = np.zeros(max(nsystems, 0), dtype=np.int32)
+    if nsystems <= 0:
+        return (inertia, status)
+
+    systems = <Ma57_System *> PyMem_Malloc(nsystems * sizeof(Ma57_System))
+    if systems == NULL:
+        raise MemoryError()
+    try:
+        for k in range(nsystems):
+            systems[k].n = n_offsets[k+1] - n_offsets[k]
+            systems[k].nz = nz_offsets[k+1] - nz_offsets[k]
+            systems[k].irn = irn_data + nz_offsets[k]
+            systems[k].jcn = jcn_data + nz_offsets[k]
+            systems[k].a = a_data + nz_offsets[k]
+            systems[k].x = x_data + n_offsets[k]
+        with nogil:
+            Ma57_Solve_Batch(systems, nsystems, ordering, nthreads)
+        for k in range(nsystems):
+            inertia[k, 0] = systems[k].npos
+            inertia[k, 1] = systems[k].nneg
+            status[k] = systems[k].status
+    finally:
+        PyMem_Free(systems)
+    return (inertia, status)
+
+
+def _analyze_trial(BaseMA57Solver_INT32_FLOAT32 trial):
+    """Analyze `trial` without the cache; return False if it fails."""
+    try:
+        trial.analyze(use_cache=False)
+    except RuntimeError:
+        return False
+    return True
+
+
+cdef class _Workspace:
+    """Workspace of a solve, reused by the later solves of a solver."""
+    cdef Ma57_Work *ws
+
+    def __cinit__(self, int n):
+        self.ws = Ma57_Work_Initialize(n)
+        if self.ws == NULL:
+            raise MemoryError()
+
+    def __dealloc__(self):
+        if self.ws != NULL:
+            Ma57_Work_Finalize(self.ws)
+
+
+cdef class BaseMA57Solver_INT32_FLOAT32:
+    # Solves and refinements run on per-call workspaces, so that several of
+    # them may run at the same time against one factorization. Checked by
+    # hsl.solvers.executor.
+    concurrent_solves = True
+
+    def __cinit__(self, int m, int n, int nnz, bint sqd=False, verbose=False):
+        cdef int elem, i, k
+
+        assert m == n
+
+        self.n = n
+        self.nnz = nnz
+
+        self.data = Ma57_Initialize(self.nnz, self.n, HSL_LOG_SIZE)
+        self.phase_report = SolverReport(type(self).__name__)
+        self.work_pool = []
+
+        self.a = <float *> PyMem_Malloc(self.nnz * sizeof(float))
+
+        # Set pivot-for-stability threshold if matrix is SQD
+        if sqd:
+            self.data.cntl[0]  = 1.0e-15
+            self.data.cntl[1] = 1.0e-15;
+            self.data.icntl[6] = 1;
+
+        return
+
+
+    def __dealloc__(self):
+        self._free()
+        return
+
+    cdef void _free(self):
+        if self.data != NULL:
+            Ma57_Finalize(self.data)
+            self.data = NULL
+        PyMem_Free(self.a)
+        self.a = NULL
+
+    cdef _check_alive(self):
+        if self.data == NULL:
+            raise RuntimeError("Solver memory has been released by free()")
+
+    cdef int _solve_work(self, float *x, int nrhs) except -1:
+        # Solve with a workspace taken from the pool, so that solves from
+        # several threads run at the same time against the same factors.
+        # The pool holds as many workspaces as there were concurrent solves.
+        cdef _Workspace work
+        cdef Ma57_Work *ws
+        cdef int error, nalloc
+        work = self.work_pool.pop() if self.work_pool else _Workspace(self.n)
+        ws = work.ws
+        nalloc = ws.nalloc
+        with nogil:
+            error = Ma57_Solve_Work(self.data, ws, x, nrhs, self.n)
+        self.work_pool.append(work)
+        self.data.nsolves += 1
+        self.data.nworkalloc += ws.nalloc - nalloc
+        if error:
+            HSL_Log_Event(&self.data.eventlog, HSL_EVENT_ERROR, error,
+                          ws.info[1], 0, 0.0)
+        HSL_Log_Event(&self.data.eventlog, HSL_EVENT_SOLVE, error, nrhs, 0, 0.0)
+        if error:
+            raise RuntimeError("Error return code from Solve: %-d\n", error)
+        return 0
+
+    cdef int _refine_work(self, float *x, float *rhs, float *resid,
+                          int nitref, int job) except -1:
+        # Run MA57DD with a workspace taken from the pool, as _solve_work
+        # does. The residual goes to resid. The estimates of a refinement
+        # (job 2) are kept as attributes.
+        cdef _Workspace work
+        cdef Ma57_Work *ws
+        cdef int error, nalloc
+        work = self.work_pool.pop() if self.work_pool else _Workspace(self.n)
+        ws = work.ws
+        nalloc = ws.nalloc
+        with nogil:
+            error = Ma57_Refine_Work(self.data, ws, x, rhs, self.a, resid,
+                                     nitref, job)
+        self.work_pool.append(work)
+        self.data.nsolves += 1
+        self.data.nworkalloc += ws.nalloc - nalloc
+        if error:
+            HSL_Log_Event(&self.data.eventlog, HSL_EVENT_ERROR, error,
+                          ws.info[1], 0, 0.0)
+        HSL_Log_Event(&self.data.eventlog, HSL_EVENT_REFINE, error,
+                      ws.info[29], 0, ws.rinfo[9])
+        if error:
+            raise RuntimeError("Error return code from %s: %-d\n"
+                               % ("Refine" if job == 2 else "Solve", error))
+        if job == 2:
+            self.cond     = ws.rinfo[10]    # 1st cond number estimate
+            self.cond2    = ws.rinfo[11]    # 2nd cond number estimate
+            self.berr     = ws.rinfo[5]     # 1st backward err estimate
+            self.berr2    = ws.rinfo[6]     # 2nd backward err estimate
+            self.dirError = ws.rinfo[12]    # direct error estimate
+            self.matNorm  = ws.rinfo[7]     # Inf-norm of input matrix
+            self.xNorm    = ws.rinfo[8]     # Inf-norm of solution
+            self.relRes   = ws.rinfo[9]     # Relative residual
+        return 0
+
+    def free(self):
+        """
+        Release the memory held by the solver.
+
+        This is done automatically when the solver is garbage collected.
+        Calling `free()` releases the memory deterministically; the solver
+        cannot be used afterwards. Calling `free()` more than once is
+        harmless.
+        """
+        self._free()
+        self.work_pool = []
+        self.factorized = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.free()
+        return False
+
+    cdef index_to_fortran(self):
+        """
+        Convert 0-based indices to Fortran indices (1-based).
+
+        Note:
+          Only for ``irn`` and ``jcn``.
+        """
+
+        # transform c index arrays to fortran arrays
+        c_to_fortran_index_array(self.data.irn, self.nnz)
+        c_to_fortran_index_array(self.data.jcn, self.nnz)
+
+
+    property factorized:
+        def __get__(self): return self.factorized
+    property last_delta:
+        def __get__(self): return self.last_delta
+    property ntrials:
+        def __get__(self): return self.ntrials
+    property cond:
+        def __get__(self): return self.cond
+
+    property ordering:
+        """
+        Pivot ordering strategy of the analyze phase (icntl(6) of MA57):
+        0 for AMD, 2 for AMD with dense row detection, 3 for minimum degree
+        as in MA27, 4 for MeTiS and 5 (default) for MeTiS with a fallback
+        on 2. Setting it prevents `analyze()` from using the ordering chosen
+        by `autotune()` for the same pattern.
+        """
+        def __get__(self):
+            self._check_alive()
+            return self.data.icntl[5]
+        def __set__(self, int value):
+            self._check_alive()
+            if value not in MA57_ORDERINGS:
+                raise ValueError("Unknown ordering %d" % value)
+            self.data.icntl[5] = value
+            self.ordering_set = True
+
+    property fact_growth:
+        """
+        Factor by which the factor storage grows when the factorization runs
+        out of space (default 2). The storage also grows to at least the size
+        requested by MA57. The factors computed so far are then copied into
+        the new storage by MA57ED and the factorization goes on (see
+        `copies`), or it restarts from scratch (see `restarts`) when MA57
+        cannot continue.
+        """
+        def __get__(self):
+            self._check_alive()
+            return self.data.fact_grow
+        def __set__(self, float value):
+            self._check_alive()
+            if not value > 1:
+                raise ValueError("fact_growth must be greater than 1")
+            self.data.fact_grow = value
+
+    property restarts:
+        """Number of restarts from scratch of the last factorization."""
+        def __get__(self):
+            self._check_alive()
+            return self.data.nrestarts
+
+    property copies:
+        """Number of copies of the factors in the last factorization."""
+        def __get__(self):
+            self._check_alive()
+            return self.data.ncopies
+
+    def analyze(self, *args, perm=None, bint warm_start=False,
+                bint use_cache=True):
+        """
+        Perform the analyze phase.
+
+        If `perm` is given, it is used as the pivot order: variable i is
+        eliminated in position perm[i] (0-based), as in the permutations
+        returned by `hsl.ordering.mc60.sloan()` and `rcmk()`. If
+        `warm_start` is True, the pivot order of the previous analysis is
+        used again, which avoids reordering after small changes of the
+        pattern. The order of another solver is reused with
+        `perm=np.array(other.fetch_perm()) - 1`. The cache is not used in
+        either case.
+
+        If `use_cache` is True, the analysis is first looked up in the
+        process-wide `hsl.solvers.analysis.analysis_cache` using the
+        fingerprint of the sparsity pattern and the ordering strategy. A new
+        analysis is stored in the cache. Unless `ordering` was set, the
+        ordering chosen by `autotune()` for the same pattern is used. The
+        factor storage starts from the sizes that sufficed for the pattern
+        and ordering in `hsl.solvers.analysis.factor_size_cache`, and these
+        sizes are updated when a factorization has to restart.
+        """
+        cdef int error
+        cdef int *order = NULL
+        cdef np.ndarray[int, ndim=1, mode='c'] perm_array
+        self._check_alive()
+        t = self.phase_report.start()
+
+        if perm is not None or warm_start:
+            if perm is not None:
+                perm_array = np.ascontiguousarray(perm, dtype=np.int32)
+                if perm_array.size != self.n:
+                    raise ValueError("perm must have size %d" % self.n)
+                order = <int *> np.PyArray_DATA(perm_array)
+            self._recall_sizes(None)
+            with nogil:
+                error = Ma57_Analyze_Perm(self.data, order)
+            if error == -9:
+                raise ValueError("Invalid pivot order" if perm is not None
+                                 else "No pivot order to reuse")
+            if error:
+                raise RuntimeError("Error return code from Analyze: %-d\n", error)
+            self.phase_report.stop('analyze', t, self._report_stats)
+            return
+
+        if use_cache:
+            key = self.pattern_key()
+            if not self.ordering_set:
+                tuned = ordering_cache.get(('ma57', key))
+                if tuned is not None:
+                    self.data.icntl[5] = tuned[0]
+            self._recall_sizes(('ma57', key, self.data.icntl[5]))
+            blob = analysis_cache.get(('ma57', key, self.data.icntl[5]))
+            if blob is not None:
+                self._load_analysis(blob, key)
+                self.phase_report.stop('analyze', t, self._report_stats)
+                return
+        else:
+            self._recall_sizes(None)
+
+        with nogil:
+            error = Ma57_Analyze(self.data)
+        if error:
+            raise RuntimeError("Error return code from Analyze: %-d\n", error)
+
+        if use_cache:
+            analysis_cache.put(('ma57', key, self.data.icntl[5]),
+                               self._dump_analysis(key))
+        self.phase_report.stop('analyze', t, self._report_stats)
+        return
+
+    def autotune(self, orderings=MA57_ORDERINGS, criterion='storage',
+                 nthreads=None, bint use_cache=True):
+        """
+        Perform the analyze phase with the best of several orderings.
+
+        The pattern is analyzed once per ordering strategy (see `ordering`),
+        concurrently in up to `nthreads` threads (default: one per
+        ordering). The ordering predicting the smallest real factor storage
+        (`criterion='storage'`) or the fewest floating-point operations
+        (`criterion='flops'`) is kept, the other one breaking ties, and its
+        analysis becomes the analysis of the solver, as after `analyze()`.
+
+        If `use_cache` is True, the choice is stored in the process-wide
+        `hsl.solvers.analysis.ordering_cache` so that `autotune()` and
+        `analyze()` reuse it for the same sparsity pattern without trying
+        the orderings again, as long as the stored choice is one of
+        `orderings`. The analysis is also stored in `analysis_cache`.
+
+        Returns:
+            ordering: the chosen ordering strategy
+            stats: a dictionary mapping each ordering that succeeded to a
+                   dictionary with the predicted real and integer factor
+                   storage (`lfact`, `lifact`) and operation count (`flops`)
+        """
+        cdef BaseMA57Solver_INT32_FLOAT32 trial
+        self._check_alive()
+        if criterion not in ('storage', 'flops'):
+            raise ValueError("criterion must be 'storage' or 'flops'")
+        for ordering in orderings:
+            if ordering not in MA57_ORDERINGS:
+                raise ValueError("Unknown ordering %d" % ordering)
+
+        key = self.pattern_key()
+        tuned = ordering_cache.get(('ma57', key)) if use_cache else None
+        if tuned is not None and tuned[0] in orderings:
+            self.data.icntl[5] = tuned[0]
+            self.analyze(use_cache=True)
+            return tuned
+
+        # Analyze copies of the pattern; Ma57_Analyze releases the GIL.
+        t = self.phase_report.start()
+        trials = []
+        for ordering in orderings:
+            trial = type(self)(self.n, self.n, self.nnz)
+            memcpy(trial.data.irn, self.data.irn, self.nnz*sizeof(int))
+            memcpy(trial.data.jcn, self.data.jcn, self.nnz*sizeof(int))
+            memcpy(&trial.data.icntl[0], &self.data.icntl[0], 20*sizeof(int))
+            memcpy(&trial.data.cntl[0], &self.data.cntl[0], 5*sizeof(float))
+            trial.data.icntl[5] = ordering
+            trials.append(trial)
+
+        pool = ThreadPool(nthreads or len(trials))
+        try:
+            done = pool.map(_analyze_trial, trials)
+        finally:
+            pool.close()
+            pool.join()
+
+        stats = {}
+        best = None
+        for (trial, ok) in zip(trials, done):
+            if ok:
+                stats[trial.data.icntl[5]] = {
+                    'lfact': trial.data.info[8],
+                    'lifact': trial.data.info[9],
+                    'flops': trial.data.rinfo[0] + trial.data.rinfo[1]}
+        if not stats:
+            raise RuntimeError("Analyze failed with every ordering")
+        if criterion == 'storage':
+            score = lambda o: (stats[o]['lfact'], stats[o]['flops'])
+        else:
+            score = lambda o: (stats[o]['flops'], stats[o]['lfact'])
+        best = min(stats, key=score)
+
+        for trial in trials:
+            if trial.data.icntl[5] == best:
+                blob = trial._dump_analysis(key)
+            trial.free()
+        self._recall_sizes(('ma57', key, best) if use_cache else None)
+        self._load_analysis(blob, key)
+        self.data.icntl[5] = best
+
+        if use_cache:
+            analysis_cache.put(('ma57', key, best), blob)
+            ordering_cache.put(('ma57', key), (best, stats))
+        self.phase_report.stop('analyze', t, self._report_stats)
+        return (best, stats)
+
+    def pattern_key(self):
+        """
+        Return the fingerprint of the sparsity pattern given to the solver.
+
+        See :func:`hsl.solvers.analysis.pattern_key`.
+        """
+        self._check_alive()
+        return pattern_key(self.n,
+                           int_array_view(self.data.irn, self.nnz) - 1,
+                           int_array_view(self.data.jcn, self.nnz) - 1)
+
+    def dump_analysis(self, filename=None):
+        """
+        Serialize the result of the analyze phase.
+
+        The pivot sequence, the analysis statistics and the sizes of the
+        factor storage are packed into a binary blob together with the
+        fingerprint of the sparsity pattern. If `filename` is given, the
+        blob is also written to that file.
+
+        Returns:
+            blob: the serialized analysis (bytes).
+        """
+        self._check_alive()
+        if self.data.fact == NULL:
+            raise RuntimeError("Analysis must be performed first.")
+
+        blob = self._dump_analysis(self.pattern_key())
+        if filename is not None:
+            with open(filename, 'wb') as f:
+                f.write(blob)
+        return blob
+
+    def load_analysis(self, blob=None, filename=None):
+        """
+        Restore an analysis produced by `dump_analysis()`.
+
+        This replaces the analyze phase: `factorize()` may be called right
+        after. The matrix data must have been given with `get_matrix_data()`
+        and its sparsity pattern must be the one that was analyzed.
+
+        Args:
+            blob: a serialized analysis
+            filename: a file holding a serialized analysis, used if
+                      `blob` is not given
+        """
+        self._check_alive()
+        if blob is None:
+            with open(filename, 'rb') as f:
+                blob = f.read()
+
+        self._load_analysis(blob, self.pattern_key())
+        return
+
+    cdef _dump_analysis(self, key):
+        return pack_ma57_analysis(key, self.n, self.nnz,
+                                  int_array_view(self.data.keep, self.data.lkeep),
+                                  int_array_view(&self.data.info[0], 40),
+                                  float_array_view(&self.data.rinfo[0], 20),
+                                  self.data.lfact, self.data.lifact)
+
+    cdef _load_analysis(self, blob, key):
+        cdef np.ndarray[int, ndim=1, mode='c'] keep, info
+        cdef np.ndarray[float, ndim=1, mode='c'] rinfo
+
+        (keep, info, rinfo64, lfact, lifact) = unpack_ma57_analysis(blob, key,
+                                                                    self.n, self.nnz)
+        rinfo = rinfo64.astype(np.float32)  # blobs store rinfo in double precision
+        if keep.size != self.data.lkeep:
+            raise ValueError("Analysis has wrong size!\n"
+                             "Expected lkeep = %d and got %d"%(self.data.lkeep, keep.size))
+
+        memcpy(self.data.keep, <int *> np.PyArray_DATA(keep), self.data.lkeep*sizeof(int))
+        memcpy(&self.data.info[0], <int *> np.PyArray_DATA(info), 40*sizeof(int))
+        memcpy(&self.data.rinfo[0], <float *> np.PyArray_DATA(rinfo), 20*sizeof(float))
+        self.data.lfact = max(lfact, self.data.lfact_min)
+        self.data.lifact = max(lifact, self.data.lifact_min)
+        Ma57_Allocate_Factors(self.data)
+        return
+
+    cdef _recall_sizes(self, sizing_key):
+        # Start the factor storage from the sizes that sufficed for
+        # sizing_key, and remember it to record larger sizes later.
+        self.sizing_key = sizing_key
+        sizes = factor_size_cache.get(sizing_key) if sizing_key is not None else None
+        (self.data.lfact_min, self.data.lifact_min) = sizes or (0, 0)
+
+    cdef _learn_sizes(self):
+        # Record the sizes reached after the factor storage had to grow.
+        if self.data.nrealloc == self.nrealloc_seen:
+            return
+        self.nrealloc_seen = self.data.nrealloc
+        if self.sizing_key is not None:
+            factor_size_cache.put(self.sizing_key,
+                                  (self.data.lfact_min, self.data.lifact_min))
+
+    def fetch_perm(self, *args):
+        """
+        fetch_perm() returns the permutation vector p used
+        to compute the factorization of A. Rows and columns
+        were permuted so that
+
+              P^T  A P = L  B  L^T
+
+        where i-th row of P is the p(i)-th row of the
+        identity matrix, L is unit upper triangular and
+        B is block diagonal with 1x1 and 2x2 blocks.
+        """
+        self._check_alive()
+        perm = []
+        cdef int i
+        for i in xrange(self.n):
+            perm.append(self.data.keep[i])
+        return perm
+
+
+    def factorize(self, *args):
+        """
+        Perform numerical factorization. Before this can be done, symbolic
+        factorization (the "analyze" phase) must have been performed.
+
+        The values of the elements of the matrix may have been altered since
+        the analyze phase but the sparsity pattern must not have changed. Use
+        the optional argument newA to specify the updated matrix if applicable.
+        """
+        cdef int error
+        self._check_alive()
+        t = self.phase_report.start()
+        with nogil:
+            error = Ma57_Factorize(self.data, self.a)
+        if error:
+            raise RuntimeError("Error return code from Factorize: %-d\n", error)
+        self._learn_sizes()
+
+        self.factorized = True
+
+        # Find out if matrix was rank deficient
+        self.data.rank = self.data.info[24]
+        self.data.rankdef = True if (self.data.rank < self.data.n) else False
+        self.phase_report.stop('factorize', t, self._report_stats)
+        return
+
+    def factorize_with_inertia(self, int target_pos, int target_neg,
+                               delta_policy=default_delta_policy):
+        """
+        Factorize A + delta * diag(I, 0) with a shift delta that corrects the
+        inertia.
+
+        The first `target_pos` diagonal entries of A are shifted by
+        delta >= 0 until the inertia of the shifted matrix is
+        (target_pos, target_neg, n - target_pos - target_neg). The trial
+        shifts are chosen by `delta_policy` (see
+        :class:`hsl.solvers.sils.DeltaPolicy`) and all trials run in C against
+        the existing analysis. The values given with `get_matrix_data()` are
+        left unchanged, so residuals and refinement use the unshifted matrix.
+        Only diagonal entries stored in A are shifted.
+
+        Returns:
+            the tuple (delta, inertia) of the final factorization. The number
+            of factorizations performed is available as `ntrials`.
+
+        Raises:
+            RuntimeError: if the shift needed exceeds `delta_policy.max`. The
+            unshifted matrix is then factorized and its inertia is reported.
+        """
+        cdef int error, ntrials
+        cdef float delta = delta_policy.initial(self.last_delta)
+        cdef float delta_max = delta_policy.max
+        cdef float grow = delta_policy.grow
+        self._check_alive()
+        self.factorized = False
+        t = self.phase_report.start()
+        with nogil:
+            error = Ma57_Factorize_Inertia(self.data, self.a, target_pos,
+                                           target_neg, &delta, delta_max,
+                                           grow, &ntrials)
+        self.ntrials = ntrials
+        if error and error != INERTIA_FAIL:
+            raise RuntimeError("Error return code from Factorize: %-d\n", error)
+        self._learn_sizes()
+
+        self.factorized = True
+        # Find out if matrix was rank deficient
+        self.data.rank = self.data.info[24]
+        self.data.rankdef = True if (self.data.rank < self.data.n) else False
+        inertia = (self.data.rank - self.data.info[23], self.data.info[23], self.data.n - self.data.rank)
+        if error == INERTIA_FAIL:
+            raise RuntimeError("Could not correct the inertia with shifts up "
+                               "to %g, the unshifted matrix has inertia %s"
+                               % (delta, inertia))
+        self.last_delta = delta
+        self.phase_report.stop('factorize', t, self._report_stats)
+        return (delta, inertia)
+
+    def refactorize(self, np.ndarray[float, ndim=1, mode='c'] values):
+        """
+        Perform numerical factorization with new values.
+
+        The sparsity pattern must be the one given at the analyze phase.
+        `values` holds the new values of the nonzeros in the same order as
+        the values given to `get_matrix_data()`. They are copied directly
+        into the solver and no index conversion or analysis is performed.
+        """
+        self._check_alive()
+        if values.size != self.nnz:
+            raise ValueError("Values array has wrong size!\n"
+                             "Expected %d values and got %d"%(self.nnz, values.size))
+
+        memcpy(self.a, <float *> np.PyArray_DATA(values), self.nnz*sizeof(float))
+        self.factorize()
+        return
+
+    def factorize_solve_batch(self, values, rhs, nthreads=None):
+        """
+        Factorize and solve a batch of matrices with the analyzed pattern.
+
+        Row k of `values`, a 2-D array of size batch x nnz, holds the values
+        of a matrix A_k in the order given to `get_matrix_data()` and row k
+        of `rhs`, of size batch x n, a right-hand side b_k. All the A_k share
+        the analysis of the solver. They are factorized and solved without
+        the GIL on `nthreads` threads (default: the number of CPUs), each
+        with its own factor storage sized from the analysis. The
+        factorization held by the solver is left unchanged.
+
+        Returns:
+            the tuple (X, inertia, status), where X[k] is the solution of
+            A_k x = b_k, inertia[k] holds the numbers of positive and negative
+            eigenvalues of A_k and status[k] is 0 or the first error code
+            returned for A_k. X[k] is only meaningful when status[k] is 0.
+        """
+        cdef float[:, ::1] v
+        cdef float[:, ::1] x
+        cdef int[:, ::1] inertia_view
+        cdef int[::1] status_view
+        cdef float *v_data
+        cdef float *x_data
+        cdef int *status_data
+        cdef int *inertia_data
+        cdef int nbatch, nt
+        self._check_alive()
+        if self.data.fact == NULL:
+            raise RuntimeError("Analysis must be performed first.")
+
+        values = np.ascontiguousarray(values, dtype=np.float32)
+        X = np.array(rhs, dtype=np.float32, order='C', copy=True)
+        if values.ndim != 2 or values.shape[1] != self.nnz:
+            raise ValueError("Values array has wrong shape!\n"
+                             "Expected (batch, %d) and got %s"%(self.nnz, str(values.shape)))
+        if X.shape != (values.shape[0], self.n):
+            raise ValueError("Right hand side has wrong shape!\n"
+                             "Expected (%d, %d) and got %s"%(values.shape[0], self.n, str(X.shape)))
+
+        nbatch = values.shape[0]
+        inertia = np.zeros((nbatch, 2), dtype=np.int32)
+        status = np.zeros(nbatch, dtype=np.int32)
+        if nbatch == 0 or self.n == 0:
+            return (X, inertia, status)
+        nt = cpu_count() if nthreads is None else nthreads
+        v = values
+        x = X
+        inertia_view = inertia
+        status_view = status
+        v_data = &v[0, 0]
+        x_data = &x[0, 0]
+        status_data = &status_view[0]
+        inertia_data = &inertia_view[0, 0]
+        with nogil:
+            Ma57_Factorize_Solve_Batch(self.data, nbatch, v_data, self.nnz,
+                                       x_data, self.n, status_data,
+                                       inertia_data, nt)
+        return (X, inertia, status)
+
+    def solve(self, np.ndarray[float, ndim=1] rhs, bint get_resid,
+              out=None, residual_out=None, bint overwrite_rhs=False):
+        """
+        solve(b) solves the linear system of equations Ax = b.
+        Warning: only one right-hand side is allowed.
+
+        The solution and residual are written into new arrays, or into the
+        caller-provided buffers `out` and `residual_out`, which must be
+        contiguous float32 arrays (or typed memoryviews) of size n. With
+        `overwrite_rhs`, the solution overwrites `rhs`. When all buffers are
+        provided, the solve performs no allocation.
+
+        Solves from several threads may run at the same time against the
+        same factorization, each with its own workspace, but not at the same
+        time as a factorization.
+
+        Args:
+            rhs: right-hand side
+            get_resid: also compute the residual r = rhs - Ax
+            out: buffer receiving the solution
+            residual_out: buffer receiving the residual
+            overwrite_rhs: write the solution into `rhs`; cannot be
+                           combined with `get_resid`
+
+        Returns:
+            x, or the tuple (x, residual) if get_resid is True, where x and
+            residual are `out` and `residual_out` when given.
+        """
+        cdef float *x_data
+        cdef float *rhs_data
+        cdef float *r_data
+        self._check_alive()
+        t = self.phase_report.start()
+
+        if rhs.size != self.n:
+            raise ValueError("Right hand side has wrong size!\n"
+                             "Attempting to solve the linear system, where A is of size (%d, %d) "
+                             "and rhs is of size (%g)"%(self.n, self.n, rhs.size))
+
+        if overwrite_rhs:
+            if get_resid:
+                raise ValueError("overwrite_rhs cannot be combined with get_resid")
+            out = rhs
+        elif out is None:
+            out = np.empty(self.n, dtype=np.float32)
+        x_data = vector_data(out, self.n, "out")
+        rhs = np.ascontiguousarray(rhs)
+        rhs_data = <float *> np.PyArray_DATA(rhs)
+
+        # When residual is requested, we need to call Refine instead of Solve
+        if get_resid:
+            if residual_out is None:
+                residual_out = np.empty(self.n, dtype=np.float32)
+            r_data = vector_data(residual_out, self.n, "residual_out")
+            if x_data == rhs_data or r_data == x_data or r_data == rhs_data:
+                raise ValueError("rhs, out and residual_out must not overlap")
+            self._refine_work(x_data, rhs_data, r_data, 1, 0)
+            self.phase_report.stop('solve', t)
+            return (out, residual_out)
+
+        else: 
+            if x_data != rhs_data:
+                memcpy(x_data, rhs_data, self.n*sizeof(float)) # x<- rhs ; will be overwritten
+            self._solve_work(x_data, 1)
+            self.phase_report.stop('solve', t)
+            return out
+
+    def solve_many(self, B, out=None, bint overwrite_b=False):
+        """
+        solve_many(B) solves the linear systems of equations AX = B.
+
+        B is a 2-D array of size n x k whose columns are the right-hand
+        sides. All columns are solved with a single call to MA57CD so
+        that the solve phase uses Level-3 BLAS. It may run at the same time
+        as other solves against the same factorization. B is copied once
+        as a whole into a Fortran-ordered float32 array, which is
+        overwritten by the solutions. That array is `out` if given, which
+        must then be a Fortran-contiguous float32 array of size n x k, or
+        `B` itself with `overwrite_b`.
+
+        Returns:
+            X: Fortran-ordered array of size n x k holding the solutions.
+        """
+        cdef float *x_data
+        cdef int nrhs
+        self._check_alive()
+        t = self.phase_report.start()
+
+        if B.ndim != 2 or B.shape[0] != self.n:
+            raise ValueError("Right hand side has wrong shape!\n"
+                             "Attempting to solve the linear system, where A is of size (%d, %d) "
+                             "and B is of shape %s"%(self.n, self.n, str(B.shape)))
+
+        nrhs = B.shape[1]
+        if overwrite_b:
+            out = B
+        if out is None:
+            X = np.array(B, dtype=np.float32, order='F', copy=True) # X<- B ; will be overwritten
+        else:
+            X = out
+        x_data = matrix_data(X, self.n, nrhs, "out")
+        if X is not B and out is not None:
+            np.asarray(X)[...] = B
+        if nrhs == 0:
+            self.phase_report.stop('solve', t)
+            return X
+
+        self._solve_work(x_data, nrhs)
+        self.phase_report.stop('solve', t)
+        return X
+
+    def refine(self, np.ndarray[float, ndim=1] x, np.ndarray[float, ndim=1] rhs,
+               np.ndarray[float, ndim=1] residual, int nitref=3, *args,
+               out=None, residual_out=None):
+        """
+        refine performs iterative refinement if necessary
+        until the scaled residual norm ||b-Ax||/(1+||b||) falls below a threshold 'tol'
+        or until nitref steps are taken.
+        
+        warning: Make sure you have called solve() with the same right-hand
+        side b before calling refine().
+
+        Refinements and solves from several threads may run at the same time
+        against the same factorization, but not at the same time as a
+        factorization.
+
+        The improved solution and residual are written into new arrays, or
+        into the caller-provided contiguous float32 buffers `out` and
+        `residual_out` of size n. Passing `out=x` and `residual_out=residual`
+        refines in place without allocating.
+
+        Args:
+            x: an estimated solution of Ax = b
+            rhs: right-hand side
+            residual: residual associated with given x entry
+            nitref: max number of iterative refinement steps
+            out: buffer receiving the improved solution
+            residual_out: buffer receiving the last residual
+
+        Returns:
+            (tuple):
+                * new_x: improved solution vector
+                * new_res: last residual vector
+        """
+        cdef float *x_data
+        cdef float *rhs_data
+        cdef float *r_data
+        self._check_alive()
+        t = self.phase_report.start()
+
+        if out is None:
+            out = np.empty(self.n, dtype=np.float32)
+        if residual_out is None:
+            residual_out = np.empty(self.n, dtype=np.float32)
+        x_data = vector_data(out, self.n, "out")
+        r_data = vector_data(residual_out, self.n, "residual_out")
+        rhs = np.ascontiguousarray(rhs)
+        rhs_data = <float *> np.PyArray_DATA(rhs)
+        if x_data == rhs_data or r_data == x_data or r_data == rhs_data:
+            raise ValueError("rhs, out and residual_out must not overlap")
+        copy_vector(x, x_data, self.n, "x")
+        copy_vector(residual, r_data, self.n, "residual")
+
+        self._refine_work(x_data, rhs_data, r_data, nitref, 2)
+        self.phase_report.stop('refine', t)
+        return (out, residual_out)
+
+    property callback:
+        """
+        Function called with an event dictionary after each phase, or None.
+        See :class:`hsl.solvers.report.SolverReport`.
+        """
+        def __get__(self): return self.phase_report.callback
+        def __set__(self, callback): self.phase_report.callback = callback
+
+    def report(self):
+        """
+        Return the timings of the phases and the statistics of the solver.
+
+        Returns:
+            a dictionary with the `solver` name, the number of calls and the
+            wall clock and CPU time of each phase (`phases`) and the
+            statistics of the last analysis and factorization (`stats`).
+            See :mod:`hsl.solvers.report`.
+        """
+        self._check_alive()
+        return self.phase_report.as_dict(self._report_stats())
+
+    def _report_stats(self):
+        return ma57_stats(self.data.info, self.data.rinfo, self.data.nrealloc,
+                          self.data.nworkalloc, self.data.nrestarts,
+                          self.data.ncopies)
+
+    def event_log(self):
+        """
+        Return the last events recorded by the factorization, oldest first.
+
+        Returns:
+            a structured array of type :data:`hsl.solvers.report.EVENT_DTYPE`,
+            whose `event` field indexes :data:`hsl.solvers.report.EVENTS`.
+        """
+        self._check_alive()
+        cdef np.ndarray log = np.empty(self.data.eventlog.size, dtype=EVENT_DTYPE)
+        cdef int nevents = HSL_Log_Copy(&self.data.eventlog,
+                                        <HSL_Event *> np.PyArray_DATA(log))
+        return log[:nevents]
+
+    def clear_log(self):
+        """Discard all events recorded so far."""
+        self._check_alive()
+        HSL_Log_Clear(&self.data.eventlog)
+
+    def stats(self):
+        """
+        Return statistics on the solve
+        """
+        self._check_alive()
+        return (self.data.info[13], # number of entries in factors
+                self.data.info[14], # storage for real data of factors
+                self.data.info[15], # storage for int  data of factors
+                self.data.info[20], # largest front size
+                self.data.info[21], # number of 2x2 pivots
+                self.data.info[23], # number of negative eigenvalues
+                self.data.info[24]) # matrix rank
+
+    def workspace_stats(self):
+        """
+        Return statistics on the solve workspaces.
+
+        Returns:
+            a dictionary with the list `lwork` of the sizes of the real
+            workspaces kept by the solver, one per solve that ran at the same
+            time, the number of workspace `allocations` and the number of
+            `solves` (calls to solve, solve_many and refine) performed so far.
+        """
+        cdef _Workspace work
+        self._check_alive()
+        lwork = []
+        for work in self.work_pool:
+            lwork.append(work.ws.lwork)
+        return {'lwork': lwork,
+                'allocations': self.data.nworkalloc,
+                'solves': self.data.nsolves}
@@ -8,10 +8,25 @@ cnp.import_array()
 
 
 
-from libc.stdio cimport FILE
 cimport numpy as np
 
-cdef extern from "ma57.h":
+cdef extern from "ma57.h" nogil:
+    enum: HSL_LOG_SIZE
+    enum: HSL_EVENT_SOLVE
+    enum: HSL_EVENT_REFINE
+    enum: HSL_EVENT_ERROR
+
+    ctypedef struct HSL_Event:
+        pass
+
+    ctypedef struct HSL_Log:
+        int       size                # Capacity of the ring buffer
+
+    cdef int  HSL_Log_Copy( const HSL_Log *elog, HSL_Event events[] )
+    cdef void HSL_Log_Clear( HSL_Log *elog )
+    cdef void HSL_Log_Event( HSL_Log *elog, int event, int code, int size1,
+                             int size2, double value )
+
     ctypedef struct Ma57_Data:
         int       n, nz               # Order and #nonzeros
         int       icntl[20]
@@ -23,6 +38,7 @@ cdef extern from "ma57.h":
         int       lkeep               # Pivot sequence
         int      *keep
         int      *iwork               # Wokspace array
+        int       liwork              # Size of array iwork
         double   *fact                # Matrix factors
         int       lfact               # Size of array fact
         int      *ifact               # Indexing of factors
@@ -33,21 +49,67 @@ cdef extern from "ma57.h":
         int       lrhs                # Leading dim of rhs
         double   *work                # Real workspace
         int       lwork               # Size of array work
+        int       nworkalloc          # Allocations of work
+        int       nsolves             # Calls to Solve and Refine
+        int       nrealloc            # Times fact or ifact grew
+        int       nrestarts           # Restarts of MA57BD from scratch and
+        int       ncopies             # calls to MA57ED in last factorization
+        double    fact_grow           # Growth of fact and ifact
+        int       lfact_min           # Sizes of fact and ifact that
+        int       lifact_min          # sufficed in a factorization
         int       calledcd            # Flag for MA57DD
         double   *x                   # Solution to Ax=rhs
         double   *residual            # = A x - rhs
         char      fetched             # Factors were fetched
                                       # Used for de-allocation
         int       rank, rankdef
-        FILE     *logfile             # File for log output
+        HSL_Log   eventlog            # Ring buffer of events
 
-    cdef Ma57_Data *Ma57_Initialize( int nz, int n, FILE *logfile )
+    cdef Ma57_Data *Ma57_Initialize( int nz, int n, int logsize )
     cdef int  Ma57_Analyze( Ma57_Data *ma57 );
+    cdef int  Ma57_Analyze_Perm( Ma57_Data *ma57, const int perm[] );
+    cdef void Ma57_Allocate_Factors( Ma57_Data *ma57 );
     cdef int  Ma57_Factorize( Ma57_Data *ma57, double A[] );
+    cdef int  Ma57_Factorize_Inertia( Ma57_Data *ma57, double A[], int npos,
+                                      int nneg, double *delta, double delta_max,
+                                      double grow, int *ntrials )
+    int INERTIA_FAIL
     cdef int  Ma57_Solve( Ma57_Data *ma57, double x[] );
+    cdef int  Ma57_Solve_Many( Ma57_Data *ma57, double x[], int nrhs, int lrhs );
+
+    ctypedef struct Ma57_Work:
+        int       lwork               # Size of array work
+        int       info[40]            # info of the last solve
+        double    rinfo[20]           # rinfo of the last refinement
+        int       nalloc              # Allocations of work
+
+    cdef Ma57_Work *Ma57_Work_Initialize( int n )
+    cdef int  Ma57_Solve_Work( const Ma57_Data *ma57, Ma57_Work *ws, double x[],
+                               int nrhs, int lrhs )
+    cdef int  Ma57_Refine_Work( const Ma57_Data *ma57, Ma57_Work *ws,
+                                double x[], double rhs[], double A[],
+                                double resid[], int maxitref, int job )
+    cdef void Ma57_Work_Finalize( Ma57_Work *ws )
+
     cdef int  Ma57_Refine( Ma57_Data *ma57, double x[], double rhs[], double A[],
                            int maxitref, int job );
     cdef void Ma57_Finalize(      Ma57_Data *ma57 );
+
+    ctypedef struct Ma57_System:
+        int       n, nz               # Order and #nonzeros
+        int      *irn                 # Sparsity pattern
+        int      *jcn
+        double   *a                   # Values
+        double   *x                   # rhs on entry, solution on exit
+        int       status              # First nonzero error code
+        int       npos, nneg          # Inertia
+
+    cdef int  Ma57_Solve_Batch( Ma57_System systems[], int nsystems,
+                                int ordering, int nthreads )
+    cdef int  Ma57_Factorize_Solve_Batch( const Ma57_Data *ma57, int nbatch,
+                                          double values[], int ldv,
+                                          double x[], int ldx, int status[],
+                                          int inertia[], int nthreads )
     cdef int  Process_Error_Code( Ma57_Data *ma57, int nerror );
 
 
@@ -60,6 +122,13 @@ cdef class BaseMA57Solver_INT32_FLOAT64:
         double* x
         double* residual
         int factorized
+        object phase_report
+        object work_pool
+        bint ordering_set
+        object sizing_key
+        int nrealloc_seen
+        double last_delta
+        int ntrials
         double cond
         double cond2
         double berr
@@ -70,3 +139,12 @@ cdef class BaseMA57Solver_INT32_FLOAT64:
         double relRes
 
     cdef index_to_fortran(self)
+    cdef void _free(self)
+    cdef _check_alive(self)
+    cdef int _solve_work(self, double *x, int nrhs) except -1
+    cdef int _refine_work(self, double *x, double *rhs, double *resid,
+                          int nitref, int job) except -1
+    cdef _dump_analysis(self, key)
+    cdef _load_analysis(self, blob, key)
+    cdef _recall_sizes(self, sizing_key)
+    cdef _learn_sizes(self)
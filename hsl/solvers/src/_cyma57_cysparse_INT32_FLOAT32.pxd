@@ -0,0 +1,6 @@
+from cysparse.sparse.ll_mat_matrices.ll_mat_INT32_t_FLOAT32_t cimport LLSparseMatrix_INT32_t_FLOAT32_t
+
+from hsl.solvers.src._cyma57_base_INT32_FLOAT32 cimport BaseMA57Solver_INT32_FLOAT32
+
+cdef class CySparseMA57Solver_INT32_FLOAT32(BaseMA57Solver_INT32_FLOAT32):
+    cpdef get_matrix_data(self, LLSparseMatrix_INT32_t_FLOAT32_t A)
\ No newline at end of file
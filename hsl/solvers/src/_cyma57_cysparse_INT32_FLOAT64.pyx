@@ -28,6 +28,7 @@ cdef class CySparseMA57Solver_INT32_FLOAT64(BaseMA57Solver_INT32_FLOAT64):
 
         Note: we keep the same name for this method in all derived classes.
         """
+        self._check_alive()
         # Memory allocation of `irn`, `jcn` and `a` is done by `BaseMA57Solver`.
 
         A.fill_triplet(self.data.irn, self.data.jcn, self.a)
@@ -0,0 +1,11 @@
+from hsl.solvers.src._cyma57_base_INT32_FLOAT32 cimport BaseMA57Solver_INT32_FLOAT32
+
+cimport numpy as cnp
+
+cdef class NumpyMA57Solver_INT32_FLOAT32(BaseMA57Solver_INT32_FLOAT32):
+    cpdef get_matrix_data(self, cnp.ndarray[cnp.int32_t, ndim=1] arow,
+                                cnp.ndarray[cnp.int32_t, ndim=1] acol,
+                                cnp.ndarray[cnp.float32_t, ndim=1] aval)
+
+    cdef _fill_compressed(self, const int[::1] indptr, const int[::1] indices,
+                          const float[::1] data, bint csr, bint full)
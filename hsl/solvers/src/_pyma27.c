@@ -50,13 +50,26 @@ typedef struct Pyma27Object {
 DL_EXPORT( void ) init_pyma27( void );
 static PyObject     *Pyma27_ma27(       Pyma27Object *self,  PyObject *args );
 static PyObject     *Pyma27_refine(     Pyma27Object *self,  PyObject *args );
+static PyObject     *Pyma27_refactorize( Pyma27Object *self, PyObject *args );
+static int           Pyma27_factorize_values( Pyma27Object *self            );
+static PyObject     *Pyma27_analyze(    Pyma27Object *self,  PyObject *args );
+static PyObject     *Pyma27_factorize(  Pyma27Object *self,  PyObject *args );
+static PyObject     *Pyma27_factorize_inertia( Pyma27Object *self, PyObject *args );
+static void          Pyma27_update_rank( Pyma27Object *self                  );
+static PyObject     *Pyma27_pattern(    Pyma27Object *self,  PyObject *args );
+static PyObject     *Pyma27_get_analysis( Pyma27Object *self, PyObject *args );
+static PyObject     *Pyma27_get_info(   Pyma27Object *self,  PyObject *args );
+static PyObject     *Pyma27_event_log(  Pyma27Object *self,  PyObject *args );
+static PyObject     *Pyma27_clear_log(  Pyma27Object *self,  PyObject *args );
+static PyObject     *Pyma27_set_analysis( Pyma27Object *self, PyObject *args );
 static PyObject     *Pyma27_factor(     PyObject     *self,  PyObject *args );
 static void          Pyma27_dealloc(    Pyma27Object *self                  );
 static PyObject     *Pyma27_getattr(    Pyma27Object *self,  char *name     );
 static PyObject     *Pyma27_Stats(      Pyma27Object *self,  PyObject *args );
 static PyObject     *Pyma27_fetch_perm( Pyma27Object *self                  );
 // static PyObject     *Pyma27_fetch_lb(   Pyma27Object *self,  PyObject *args );
-static Pyma27Object *NewPyma27Object(   LLMatObject  *llmat, PyObject *sqd  );
+static Pyma27Object *NewPyma27Object(   LLMatObject  *llmat, PyObject *sqd,
+                                        int analyze );
 extern PyObject *newCSRMatObject(int dim[], int nnz);
 void coord2csr( int n, int nz, int *irow, int *jcol, double *val,
                 int *iptr, int *jind, double *xval );
@@ -70,7 +83,8 @@ void coord2csr( int n, int nz, int *irow, int *jcol, double *val,
 /* ========================================================================== */
 
 
-static Pyma27Object *NewPyma27Object( LLMatObject *llmat, PyObject *sqd ) {
+static Pyma27Object *NewPyma27Object( LLMatObject *llmat, PyObject *sqd,
+                                      int analyze ) {
 
     Pyma27Object *self;
     int          n  = llmat->dim[0],
@@ -82,10 +96,11 @@ static Pyma27Object *NewPyma27Object( LLMatObject *llmat, PyObject *sqd ) {
     if( !(self = PyObject_New( Pyma27Object, &Pyma27Type ) ) )
         return NULL; //PyErr_NoMemory( );
 
-    self->data = Ma27_Initialize( nz, n, NULL );
+    self->data = Ma27_Initialize( nz, n, HSL_LOG_SIZE );
 
     /* Set pivot-for-stability threshold is matrix is SQD */
-    if( sqd == Py_True ) self->data->cntl[0] = 1.0e-15;
+    if( sqd == Py_True )
+        self->data->cntl[0] = self->data->pivtol_min = 1.0e-15;
 
     /* Keep a copy of matrix in a in case memory needs to be adjusted */
     /* Array a is never altered; we work with factors */
@@ -104,20 +119,51 @@ static Pyma27Object *NewPyma27Object( LLMatObject *llmat, PyObject *sqd ) {
         }
     }
 
-    /* Analyze */
+    /* Analyze and factorize, unless an analysis will be supplied with
+     * set_analysis() */
+    if( !analyze ) return self;
+
+    Py_BEGIN_ALLOW_THREADS
     error = Ma27_Analyze( self->data, 0 ); // iflag = 0: automatic pivot choice
+    Py_END_ALLOW_THREADS
     if( error ) {
         fprintf( stderr, " Error return code from Analyze: %-d\n", error );
+        Py_DECREF( self );
         return NULL; //Py_None; // ----- ADJUST ----- ?
     }
 
     /* Factorize */
-    error = Ma27_Factorize( self->data, self->a );
+    error = Pyma27_factorize_values( self );
     if( error ) {
         fprintf( stderr, " Error return code from Factorize: %-d\n", error );
+        Py_DECREF( self );
         return NULL; //Py_None; // ----- ADJUST ----- ?
     }
 
+    return self;
+}
+
+/* ========================================================================== */
+
+static int Pyma27_factorize_values( Pyma27Object *self ) {
+
+    /* Factorize the values held in self->a against the existing analysis */
+
+    int error;
+
+    Py_BEGIN_ALLOW_THREADS
+    error = Ma27_Factorize( self->data, self->a );
+    Py_END_ALLOW_THREADS
+    if( error ) return error;
+
+    Pyma27_update_rank( self );
+    return 0;
+}
+
+/* ========================================================================== */
+
+static void Pyma27_update_rank( Pyma27Object *self ) {
+
     /* Find out if matrix was rank deficient */
     self->data->rankdef = 0;
     self->data->rank = self->data->n;
@@ -125,8 +171,311 @@ static Pyma27Object *NewPyma27Object( LLMatObject *llmat, PyObject *sqd ) {
         self->data->rankdef = 1;
         self->data->rank = self->data->info[1];
     }
+}
 
-    return self;
+/* ========================================================================== */
+
+static char Pyma27_factorize_inertia_Doc[] = "Factorize the matrix with a diagonal shift that corrects its inertia";
+
+static PyObject *Pyma27_factorize_inertia( Pyma27Object *self, PyObject *args ) {
+
+    /* Shift the first npos diagonal entries until the inertia is
+     * (npos, nneg, n-npos-nneg). Return whether the inertia was corrected,
+     * the final shift and the number of factorizations. */
+
+    int    npos, nneg, ntrials, error;
+    double delta, delta_max, grow;
+
+    if( !PyArg_ParseTuple( args, "iiddd:factorize_inertia", &npos, &nneg,
+                           &delta, &delta_max, &grow ) )
+        return NULL;
+
+    Py_BEGIN_ALLOW_THREADS
+    error = Ma27_Factorize_Inertia( self->data, self->a, npos, nneg, &delta,
+                                    delta_max, grow, &ntrials );
+    Py_END_ALLOW_THREADS
+    if( error && error != INERTIA_FAIL ) {
+        PyErr_Format( PyExc_RuntimeError, "Error return code from Factorize: %d",
+                      error );
+        return NULL;
+    }
+
+    Pyma27_update_rank( self );
+    return Py_BuildValue( "idi", error == 0, delta, ntrials );
+}
+
+/* ========================================================================== */
+
+static char Pyma27_analyze_Doc[] = "Analyze the sparsity pattern held by the context";
+
+static PyObject *Pyma27_analyze( Pyma27Object *self, PyObject *args ) {
+
+    PyObject      *perm = Py_None;
+    PyArrayObject *a_perm;
+    int           *order = NULL;
+    int            warm_start = 0, error;
+
+    /* perm, if given, is the 0-based pivot order. Otherwise, warm_start
+     * requests the pivot order of the previous analysis. */
+    if( !PyArg_ParseTuple( args, "|Oi:analyze", &perm, &warm_start ) )
+        return NULL;
+
+    if( perm != Py_None ) {
+        a_perm = (PyArrayObject *)perm;
+        if( !PyArray_Check( perm ) || a_perm->descr->type_num != NPY_INT ||
+            a_perm->nd != 1 || !PyArray_ISCARRAY_RO( a_perm ) ) {
+            PyErr_SetString( PyExc_TypeError,
+                             "perm must be a contiguous 1-D int32 array" );
+            return NULL;
+        }
+        if( a_perm->dimensions[0] != self->data->n ) {
+            PyErr_Format( PyExc_ValueError, "perm must have size %d",
+                          self->data->n );
+            return NULL;
+        }
+        order = (int *)a_perm->data;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    if( order || warm_start )
+        error = Ma27_Analyze_Perm( self->data, order );
+    else
+        error = Ma27_Analyze( self->data, 0 ); // iflag = 0: automatic pivot choice
+    Py_END_ALLOW_THREADS
+    if( error == -9 ) {
+        PyErr_SetString( PyExc_ValueError, order ? "Invalid pivot order"
+                                                  : "No pivot order to reuse" );
+        return NULL;
+    }
+    if( error ) {
+        PyErr_Format( PyExc_RuntimeError, "Error return code from Analyze: %d",
+                      error );
+        return NULL;
+    }
+
+    Py_INCREF( Py_None );
+    return Py_None;
+}
+
+/* ========================================================================== */
+
+static char Pyma27_factorize_Doc[] = "Factorize the matrix held by the context";
+
+static PyObject *Pyma27_factorize( Pyma27Object *self, PyObject *args ) {
+
+    int error;
+
+    error = Pyma27_factorize_values( self );
+    if( error ) {
+        PyErr_Format( PyExc_RuntimeError, "Error return code from Factorize: %d",
+                      error );
+        return NULL;
+    }
+
+    Py_INCREF( Py_None );
+    return Py_None;
+}
+
+/* ========================================================================== */
+
+static char Pyma27_pattern_Doc[] = "Return the sparsity pattern as 0-based row and column indices";
+
+static PyObject *Pyma27_pattern( Pyma27Object *self, PyObject *args ) {
+
+    PyArrayObject *a_irow, *a_jcol;
+    npy_intp       dim[1];
+    int           *irow, *jcol;
+    int            k;
+
+    dim[0] = self->data->nz;
+    a_irow = (PyArrayObject *)PyArray_SimpleNew( 1, dim, NPY_INT );
+    a_jcol = (PyArrayObject *)PyArray_SimpleNew( 1, dim, NPY_INT );
+    if( !a_irow || !a_jcol ) {
+        Py_XDECREF( a_irow );
+        Py_XDECREF( a_jcol );
+        return NULL;
+    }
+
+    /* Indices are stored 1-based for MA27 */
+    irow = (int *)a_irow->data;
+    jcol = (int *)a_jcol->data;
+    for( k = 0; k < self->data->nz; k++ ) {
+        irow[k] = self->data->irn[k] - 1;
+        jcol[k] = self->data->icn[k] - 1;
+    }
+
+    return Py_BuildValue( "NN", a_irow, a_jcol );
+}
+
+/* ========================================================================== */
+
+static char Pyma27_get_analysis_Doc[] = "Return the state produced by the analyze phase";
+
+static PyObject *Pyma27_get_analysis( Pyma27Object *self, PyObject *args ) {
+
+    PyArrayObject *a_ikeep, *a_iw1, *a_info;
+    npy_intp       dim[1];
+    int            n = self->data->n;
+    int            liw1 = imax( 2 * n, self->data->nsteps );
+
+    dim[0] = 3 * n;
+    a_ikeep = (PyArrayObject *)PyArray_SimpleNew( 1, dim, NPY_INT );
+    dim[0] = liw1;
+    a_iw1 = (PyArrayObject *)PyArray_SimpleNew( 1, dim, NPY_INT );
+    dim[0] = 20;
+    a_info = (PyArrayObject *)PyArray_SimpleNew( 1, dim, NPY_INT );
+    if( !a_ikeep || !a_iw1 || !a_info ) {
+        Py_XDECREF( a_ikeep );
+        Py_XDECREF( a_iw1 );
+        Py_XDECREF( a_info );
+        return NULL;
+    }
+
+    memcpy( a_ikeep->data, self->data->ikeep, 3 * n * sizeof(int) );
+    memcpy( a_iw1->data, self->data->iw1, liw1 * sizeof(int) );
+    memcpy( a_info->data, self->data->info, 20 * sizeof(int) );
+
+    return Py_BuildValue( "NNiNdii", a_ikeep, a_iw1, self->data->nsteps,
+                          a_info, self->data->ops,
+                          self->data->la, self->data->liw );
+}
+
+/* ========================================================================== */
+
+static char Pyma27_get_info_Doc[] = "Return the statistics of the last analysis and factorization";
+
+static PyObject *Pyma27_get_info( Pyma27Object *self, PyObject *args ) {
+
+    PyArrayObject *a_info;
+    npy_intp       dim[1];
+
+    /* Return the info array, the predicted operation count, the number
+     * of times iw or factors had to grow, the number of pivot tolerance
+     * increases in the last factorization and the current tolerance */
+    dim[0] = 20;
+    a_info = (PyArrayObject *)PyArray_SimpleNew( 1, dim, NPY_INT );
+    if( !a_info ) return NULL;
+    memcpy( a_info->data, self->data->info, 20 * sizeof(int) );
+
+    return Py_BuildValue( "Ndiid", a_info, self->data->ops,
+                          self->data->nrealloc, self->data->npivtol,
+                          self->data->cntl[0] );
+}
+
+/* ========================================================================== */
+
+static char Pyma27_event_log_Doc[] = "Return the raw records of the event log, oldest first";
+
+static PyObject *Pyma27_event_log( Pyma27Object *self, PyObject *args ) {
+
+    HSL_Event *events;
+    PyObject  *records;
+    int        nevents;
+
+    events = (HSL_Event *)HSL_Calloc( imax( self->data->eventlog.size, 1 ),
+                                      sizeof(HSL_Event) );
+    if( events == NULL ) return PyErr_NoMemory();
+    nevents = HSL_Log_Copy( &(self->data->eventlog), events );
+    records = PyString_FromStringAndSize( (char *)events,
+                                          nevents * sizeof(HSL_Event) );
+    HSL_Free( events );
+    return records;
+}
+
+/* ========================================================================== */
+
+static char Pyma27_clear_log_Doc[] = "Discard all events from the event log";
+
+static PyObject *Pyma27_clear_log( Pyma27Object *self, PyObject *args ) {
+
+    HSL_Log_Clear( &(self->data->eventlog) );
+    Py_INCREF( Py_None );
+    return Py_None;
+}
+
+/* ========================================================================== */
+
+static char Pyma27_set_analysis_Doc[] = "Restore the state produced by the analyze phase";
+
+static PyObject *Pyma27_set_analysis( Pyma27Object *self, PyObject *args ) {
+
+    PyArrayObject *a_ikeep, *a_iw1, *a_info;
+    double         ops;
+    int            nsteps, la, liw, liw1;
+    int            n = self->data->n;
+
+    if( !PyArg_ParseTuple( args, "O!O!iO!dii:set_analysis",
+                           &PyArray_Type, &a_ikeep,
+                           &PyArray_Type, &a_iw1, &nsteps,
+                           &PyArray_Type, &a_info, &ops, &la, &liw ) )
+        return NULL;
+
+    liw1 = imax( 2 * n, nsteps );
+    if( a_ikeep->descr->type_num != NPY_INT || !PyArray_ISCARRAY_RO( a_ikeep ) ||
+        a_ikeep->nd != 1 || a_ikeep->dimensions[0] != 3 * n ||
+        a_iw1->descr->type_num != NPY_INT || !PyArray_ISCARRAY_RO( a_iw1 ) ||
+        a_iw1->nd != 1 || a_iw1->dimensions[0] != liw1 ||
+        a_info->descr->type_num != NPY_INT || !PyArray_ISCARRAY_RO( a_info ) ||
+        a_info->nd != 1 || a_info->dimensions[0] != 20 ) {
+        PyErr_SetString( PyExc_ValueError,
+                         "Analysis arrays have wrong type or size" );
+        return NULL;
+    }
+
+    if( liw1 > 2 * n ) {
+        HSL_Free( self->data->iw1 );
+        self->data->iw1 = (int *)HSL_Calloc( liw1, sizeof(int) );
+        if( self->data->iw1 == NULL ) return PyErr_NoMemory();
+    }
+    memcpy( self->data->ikeep, a_ikeep->data, 3 * n * sizeof(int) );
+    memcpy( self->data->iw1, a_iw1->data, liw1 * sizeof(int) );
+    memcpy( self->data->info, a_info->data, 20 * sizeof(int) );
+    self->data->nsteps = nsteps;
+    self->data->ops = ops;
+    self->data->la = la;
+    self->data->liw = liw;
+    if( Ma27_Allocate_Factors( self->data ) ) return PyErr_NoMemory();
+
+    Py_INCREF( Py_None );
+    return Py_None;
+}
+
+/* ========================================================================== */
+
+static char Pyma27_refactorize_Doc[] = "Factorize matrix with new values and the same sparsity pattern";
+
+static PyObject *Pyma27_refactorize( Pyma27Object *self, PyObject *args ) {
+
+    PyArrayObject *a_val;
+    int            error;
+
+    /* The new values must be given in the order used at analysis */
+    if( !PyArg_ParseTuple( args, "O!:refactorize", &PyArray_Type, &a_val ) )
+        return NULL;
+
+    if( a_val->descr->type_num != NPY_DOUBLE || a_val->nd != 1 ||
+        !PyArray_ISCARRAY_RO( a_val ) ) {
+        PyErr_SetString( PyExc_TypeError,
+                         "values must be a contiguous 1-D float64 array" );
+        return NULL;
+    }
+    if( a_val->dimensions[0] != self->data->nz ) {
+        PyErr_Format( PyExc_ValueError, "values must have size %d",
+                      self->data->nz );
+        return NULL;
+    }
+
+    memcpy( self->a, a_val->data, self->data->nz * sizeof(double) );
+
+    error = Pyma27_factorize_values( self );
+    if( error ) {
+        PyErr_Format( PyExc_RuntimeError, "Error return code from Factorize: %d",
+                      error );
+        return NULL;
+    }
+
+    Py_INCREF( Py_None );
+    return Py_None;
 }
 
 /* ========================================================================== */
@@ -270,7 +619,6 @@ static PyObject *Pyma27_ma27( Pyma27Object *self, PyObject *args ) {
 
     PyArrayObject *a_x, *a_rhs, *a_res;
     double        *x, *rhs;
-    int            i, j, k;
     int            error, comp_resid;
 
     /* We read a right-hand side and a solution */
@@ -296,11 +644,14 @@ static PyObject *Pyma27_ma27( Pyma27Object *self, PyObject *args ) {
     rhs = (double *)a_rhs->data;
     x = (double *)a_x->data;
 
-    /* Copy rhs into x; it will be overwritten by Ma27_Solve() */
-    cblas_dcopy( self->data->n, rhs, 1, x, 1 );
+    /* Copy rhs into x, unless solving in place; it will be overwritten
+     * by Ma27_Solve() */
+    if( x != rhs ) cblas_dcopy( self->data->n, rhs, 1, x, 1 );
 
     /* Solve */
+    Py_BEGIN_ALLOW_THREADS
     error = Ma27_Solve( self->data, x );
+    Py_END_ALLOW_THREADS
     if( error ) {
         fprintf( stderr, " Error return code from Solve: %-d\n", error );
         return NULL;
@@ -309,14 +660,10 @@ static PyObject *Pyma27_ma27( Pyma27Object *self, PyObject *args ) {
     /* Compute residual r = rhs - Ax */
     if( comp_resid ) {
         self->data->residual = (double *)a_res->data;
-        cblas_dcopy( self->data->n, rhs, 1, self->data->residual, 1 );
-        for( k = 0; k < self->data->nz; k++ ) {
-            i = self->data->irn[k] - 1;  /* Fortran indexing */
-            j = self->data->icn[k] - 1;
-            self->data->residual[i] -= self->a[k] * x[j];
-            if( i != j )
-                self->data->residual[j] -= self->a[k] * x[i];
-        }
+        Py_BEGIN_ALLOW_THREADS
+        Ma27_Residual( self->data, self->a, x, rhs, self->data->residual,
+                       1, self->data->n );
+        Py_END_ALLOW_THREADS
     }
 
     Py_INCREF( Py_None );
@@ -383,7 +730,9 @@ static PyObject *Pyma27_refine( Pyma27Object *self, PyObject *args ) {
     rhs = (double *)a_rhs->data;
     self->data->residual = (double *)a_res->data;
 
+    Py_BEGIN_ALLOW_THREADS
     nerror = Ma27_Refine( self->data, x, rhs, self->a, tol, nitref );
+    Py_END_ALLOW_THREADS
     if( nerror == -10 ) return NULL;
     Py_INCREF( Py_None );
     return Py_None;
@@ -404,6 +753,26 @@ static PyMethodDef Pyma27_special_methods[] = {
     METH_VARARGS, Pyma27_Stats_Doc      },
   { "refine",    (PyCFunction)Pyma27_refine,
     METH_VARARGS, Pyma27_refine_Doc     },
+  { "refactorize", (PyCFunction)Pyma27_refactorize,
+    METH_VARARGS, Pyma27_refactorize_Doc },
+  { "analyze",   (PyCFunction)Pyma27_analyze,
+    METH_VARARGS, Pyma27_analyze_Doc    },
+  { "factorize", (PyCFunction)Pyma27_factorize,
+    METH_VARARGS, Pyma27_factorize_Doc  },
+  { "factorize_inertia", (PyCFunction)Pyma27_factorize_inertia,
+    METH_VARARGS, Pyma27_factorize_inertia_Doc },
+  { "pattern",   (PyCFunction)Pyma27_pattern,
+    METH_VARARGS, Pyma27_pattern_Doc    },
+  { "get_analysis", (PyCFunction)Pyma27_get_analysis,
+    METH_VARARGS, Pyma27_get_analysis_Doc },
+  { "set_analysis", (PyCFunction)Pyma27_set_analysis,
+    METH_VARARGS, Pyma27_set_analysis_Doc },
+  { "get_info",  (PyCFunction)Pyma27_get_info,
+    METH_VARARGS, Pyma27_get_info_Doc   },
+  { "event_log", (PyCFunction)Pyma27_event_log,
+    METH_VARARGS, Pyma27_event_log_Doc  },
+  { "clear_log", (PyCFunction)Pyma27_clear_log,
+    METH_VARARGS, Pyma27_clear_log_Doc  },
   { NULL,        NULL,
     0,            NULL                  }
 };
@@ -419,13 +788,14 @@ static PyObject *Pyma27_factor( PyObject *self, PyObject *args ) {
     Pyma27Object  *rv;                    /* Return value */
     PyObject      *mat;                   /* Input matrix */
     PyObject      *sqd;                   /* SQD matrix flag */
+    int            analyze = 1;           /* Skip analysis if 0 */
 
     /* Read input matrix and limited memory factor */
-    if( !PyArg_ParseTuple( args, "OO:factor", &mat, &sqd ) )
+    if( !PyArg_ParseTuple( args, "OO|i:factor", &mat, &sqd, &analyze ) )
         return NULL;
 
     /* Spawn new Pyma27 Object, containing matrix factors */
-    rv = NewPyma27Object( (LLMatObject *)mat, sqd );
+    rv = NewPyma27Object( (LLMatObject *)mat, sqd, analyze );
     if( rv == NULL ) return NULL;
 
     return (PyObject *)rv;
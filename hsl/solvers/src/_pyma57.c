@@ -50,14 +50,26 @@ typedef struct Pyma57Object {
 DL_EXPORT( void ) init_pyma57( void );
 static PyObject     *Pyma57_ma57(       Pyma57Object *self,  PyObject *args );
 static PyObject     *Pyma57_factorize(  Pyma57Object *self,  PyObject *args );
+static PyObject     *Pyma57_refactorize( Pyma57Object *self, PyObject *args );
+static PyObject     *Pyma57_factorize_values( Pyma57Object *self            );
+static PyObject     *Pyma57_factorize_inertia( Pyma57Object *self, PyObject *args );
 static PyObject     *Pyma57_refine(     Pyma57Object *self,  PyObject *args );
 static PyObject     *Pyma57_analyze(    PyObject     *self,  PyObject *args );
+static PyObject     *Pyma57_analyze_pattern( Pyma57Object *self, PyObject *args );
 static void          Pyma57_dealloc(    Pyma57Object *self                  );
 static PyObject     *Pyma57_getattr(    Pyma57Object *self,  char *name     );
 static PyObject     *Pyma57_Stats(      Pyma57Object *self,  PyObject *args );
+static PyObject     *Pyma57_workspace(  Pyma57Object *self,  PyObject *args );
 static PyObject     *Pyma57_fetch_perm( Pyma57Object *self                  );
+static PyObject     *Pyma57_pattern(    Pyma57Object *self,  PyObject *args );
+static PyObject     *Pyma57_get_analysis( Pyma57Object *self, PyObject *args );
+static PyObject     *Pyma57_get_info(   Pyma57Object *self,  PyObject *args );
+static PyObject     *Pyma57_event_log(  Pyma57Object *self,  PyObject *args );
+static PyObject     *Pyma57_clear_log(  Pyma57Object *self,  PyObject *args );
+static PyObject     *Pyma57_set_analysis( Pyma57Object *self, PyObject *args );
 //static PyObject     *Pyma57_fetch_lb(   Pyma57Object *self,  PyObject *args );
-static PyObject *NewPyma57Object(   LLMatObject  *llmat, PyObject *sqd  );
+static PyObject *NewPyma57Object(   LLMatObject  *llmat, PyObject *sqd,
+                                    int analyze );
 extern PyObject *newCSRMatObject(int dim[], int nnz);
 void coord2csr( int n, int nz, int *irow, int *jcol, double *val,
                 int *iptr, int *jind, double *xval );
@@ -71,7 +83,8 @@ void coord2csr( int n, int nz, int *irow, int *jcol, double *val,
 /* ========================================================================== */
 
 
-static PyObject *NewPyma57Object( LLMatObject *llmat, PyObject *sqd ) {
+static PyObject *NewPyma57Object( LLMatObject *llmat, PyObject *sqd,
+                                  int analyze ) {
 
   Pyma57Object *self;
   int           n  = llmat->dim[0],
@@ -85,7 +98,8 @@ static PyObject *NewPyma57Object( LLMatObject *llmat, PyObject *sqd ) {
     return PyErr_NoMemory( ); // NULL;
   }
 
-  self->data = Ma57_Initialize( nz, n, NULL );
+  self->data = Ma57_Initialize( nz, n, HSL_LOG_SIZE );
+  self->a = NULL;    /* Values are supplied by factorize() */
 
   /* Set pivot-for-stability threshold is matrix is SQD */
   if( sqd == Py_True ) {
@@ -108,10 +122,15 @@ static PyObject *NewPyma57Object( LLMatObject *llmat, PyObject *sqd ) {
     }
   }
 
-  /* Analyze */
+  /* Analyze, unless an analysis will be supplied with set_analysis() */
+  if( !analyze ) return (PyObject *)self;
+
+  Py_BEGIN_ALLOW_THREADS
   error = Ma57_Analyze( self->data );
+  Py_END_ALLOW_THREADS
   if( error ) {
     fprintf( stderr, " Error return code from Analyze: %-d\n", error );
+    Py_DECREF( self );
     return NULL;
   }
   return (PyObject *)self;
@@ -119,6 +138,59 @@ static PyObject *NewPyma57Object( LLMatObject *llmat, PyObject *sqd ) {
 
 /* ========================================================================== */
 
+static char Pyma57_analyze_pattern_Doc[] = "Analyze the sparsity pattern held by the context";
+
+static PyObject *Pyma57_analyze_pattern( Pyma57Object *self, PyObject *args ) {
+
+  PyObject      *perm = Py_None;
+  PyArrayObject *a_perm;
+  int           *order = NULL;
+  int            warm_start = 0, error;
+
+  /* perm, if given, is the 0-based pivot order. Otherwise, warm_start
+   * requests the pivot order of the previous analysis. */
+  if( !PyArg_ParseTuple( args, "|Oi:analyze", &perm, &warm_start ) )
+    return NULL;
+
+  if( perm != Py_None ) {
+    a_perm = (PyArrayObject *)perm;
+    if( !PyArray_Check( perm ) || a_perm->descr->type_num != NPY_INT ||
+        a_perm->nd != 1 || !PyArray_ISCARRAY_RO( a_perm ) ) {
+      PyErr_SetString( PyExc_TypeError,
+                       "perm must be a contiguous 1-D int32 array" );
+      return NULL;
+    }
+    if( a_perm->dimensions[0] != self->data->n ) {
+      PyErr_Format( PyExc_ValueError, "perm must have size %d",
+                    self->data->n );
+      return NULL;
+    }
+    order = (int *)a_perm->data;
+  }
+
+  Py_BEGIN_ALLOW_THREADS
+  if( order || warm_start )
+    error = Ma57_Analyze_Perm( self->data, order );
+  else
+    error = Ma57_Analyze( self->data );
+  Py_END_ALLOW_THREADS
+  if( error == -9 ) {
+    PyErr_SetString( PyExc_ValueError, order ? "Invalid pivot order"
+                                              : "No pivot order to reuse" );
+    return NULL;
+  }
+  if( error ) {
+    PyErr_Format( PyExc_RuntimeError, "Error return code from Analyze: %d",
+                  error );
+    return NULL;
+  }
+
+  Py_INCREF( Py_None );
+  return Py_None;
+}
+
+/* ========================================================================== */
+
 static char Pyma57_factorize_Doc[] = "Factorize matrix";
 
 static PyObject *Pyma57_factorize( Pyma57Object *self, PyObject *args ) {
@@ -127,7 +199,6 @@ static PyObject *Pyma57_factorize( Pyma57Object *self, PyObject *args ) {
   LLMatObject *llmat;
   int          n, nz;
   int          i, k, elem;
-  int          error;
 
   /* See if input matrix has changed since analyze phase */
   if( !PyArg_ParseTuple( args, "O:factorize", &mat ) ) return NULL;
@@ -136,9 +207,12 @@ static PyObject *Pyma57_factorize( Pyma57Object *self, PyObject *args ) {
   n  = llmat->dim[0];
   nz = llmat->nnz;
 
-  /* Make temporary copy of matrix. Is there a way to avoid this?  */
-  self->a = (double *)HSL_Calloc( nz, sizeof(double) );
-  if( self->a == NULL ) return PyErr_NoMemory();
+  /* Keep a copy of the values for later refinement. It is allocated
+   * once and reused by subsequent factorizations. */
+  if( self->a == NULL ) {
+    self->a = (double *)HSL_Calloc( nz, sizeof(double) );
+    if( self->a == NULL ) return PyErr_NoMemory();
+  }
 
   elem = 0;
   for( i = 0; i < n; i++ ) {
@@ -150,10 +224,56 @@ static PyObject *Pyma57_factorize( Pyma57Object *self, PyObject *args ) {
     }
   }
 
+  return Pyma57_factorize_values( self );
+}
+
+/* ========================================================================== */
+
+static char Pyma57_refactorize_Doc[] = "Factorize matrix with new values and the same sparsity pattern";
+
+static PyObject *Pyma57_refactorize( Pyma57Object *self, PyObject *args ) {
+
+  PyArrayObject *a_val;
+
+  /* The new values must be given in the order used at analysis */
+  if( !PyArg_ParseTuple( args, "O!:refactorize", &PyArray_Type, &a_val ) )
+    return NULL;
+
+  if( a_val->descr->type_num != NPY_DOUBLE || a_val->nd != 1 ||
+      !PyArray_ISCARRAY_RO( a_val ) ) {
+    PyErr_SetString( PyExc_TypeError,
+                     "values must be a contiguous 1-D float64 array" );
+    return NULL;
+  }
+  if( a_val->dimensions[0] != self->data->nz ) {
+    PyErr_Format( PyExc_ValueError, "values must have size %d", self->data->nz );
+    return NULL;
+  }
+
+  if( self->a == NULL ) {
+    self->a = (double *)HSL_Calloc( self->data->nz, sizeof(double) );
+    if( self->a == NULL ) return PyErr_NoMemory();
+  }
+  memcpy( self->a, a_val->data, self->data->nz * sizeof(double) );
+
+  return Pyma57_factorize_values( self );
+}
+
+/* ========================================================================== */
+
+static PyObject *Pyma57_factorize_values( Pyma57Object *self ) {
+
+  /* Factorize the values held in self->a against the existing analysis */
+
+  int error;
+
   /* Factorize */
+  Py_BEGIN_ALLOW_THREADS
   error = Ma57_Factorize( self->data, self->a );
+  Py_END_ALLOW_THREADS
   if( error ) {
-    fprintf( stderr, " Error return code from Factorize: %-d\n", error );
+    PyErr_Format( PyExc_RuntimeError, "Error return code from Factorize: %d",
+                  error );
     return NULL;
   }
 
@@ -167,6 +287,43 @@ static PyObject *Pyma57_factorize( Pyma57Object *self, PyObject *args ) {
 
 /* ========================================================================== */
 
+static char Pyma57_factorize_inertia_Doc[] = "Factorize the matrix with a diagonal shift that corrects its inertia";
+
+static PyObject *Pyma57_factorize_inertia( Pyma57Object *self, PyObject *args ) {
+
+  /* Shift the first npos diagonal entries until the inertia is
+   * (npos, nneg, n-npos-nneg). Return whether the inertia was corrected,
+   * the final shift and the number of factorizations. */
+
+  int    npos, nneg, ntrials, error;
+  double delta, delta_max, grow;
+
+  if( !PyArg_ParseTuple( args, "iiddd:factorize_inertia", &npos, &nneg,
+                         &delta, &delta_max, &grow ) )
+    return NULL;
+  if( self->a == NULL ) {
+    PyErr_SetString( PyExc_RuntimeError, "Matrix values have not been given" );
+    return NULL;
+  }
+
+  Py_BEGIN_ALLOW_THREADS
+  error = Ma57_Factorize_Inertia( self->data, self->a, npos, nneg, &delta,
+                                  delta_max, grow, &ntrials );
+  Py_END_ALLOW_THREADS
+  if( error && error != INERTIA_FAIL ) {
+    PyErr_Format( PyExc_RuntimeError, "Error return code from Factorize: %d",
+                  error );
+    return NULL;
+  }
+
+  self->data->rank = self->data->info[24];
+  self->data->rankdef = (self->data->rank < self->data->n) ? 1 : 0;
+
+  return Py_BuildValue( "idi", error == 0, delta, ntrials );
+}
+
+/* ========================================================================== */
+
 static char Pyma57_fetch_perm_Doc[] = "Fetch variables permutation computed by MA57";
 
 static PyObject *Pyma57_fetch_perm( Pyma57Object *self ) {
@@ -191,6 +348,166 @@ static PyObject *Pyma57_fetch_perm( Pyma57Object *self ) {
 
 /* ========================================================================== */
 
+static char Pyma57_pattern_Doc[] = "Return the sparsity pattern as 0-based row and column indices";
+
+static PyObject *Pyma57_pattern( Pyma57Object *self, PyObject *args ) {
+
+  PyArrayObject *a_irow, *a_jcol;
+  npy_intp       dim[1];
+  int           *irow, *jcol;
+  int            k;
+
+  dim[0] = self->data->nz;
+  a_irow = (PyArrayObject *)PyArray_SimpleNew( 1, dim, NPY_INT );
+  a_jcol = (PyArrayObject *)PyArray_SimpleNew( 1, dim, NPY_INT );
+  if( !a_irow || !a_jcol ) {
+    Py_XDECREF( a_irow );
+    Py_XDECREF( a_jcol );
+    return NULL;
+  }
+
+  /* Indices are stored 1-based for MA57 */
+  irow = (int *)a_irow->data;
+  jcol = (int *)a_jcol->data;
+  for( k = 0; k < self->data->nz; k++ ) {
+    irow[k] = self->data->irn[k] - 1;
+    jcol[k] = self->data->jcn[k] - 1;
+  }
+
+  return Py_BuildValue( "NN", a_irow, a_jcol );
+}
+
+/* ========================================================================== */
+
+static char Pyma57_get_analysis_Doc[] = "Return the state produced by the analyze phase";
+
+static PyObject *Pyma57_get_analysis( Pyma57Object *self, PyObject *args ) {
+
+  PyArrayObject *a_keep, *a_info, *a_rinfo;
+  npy_intp       dim[1];
+
+  dim[0] = self->data->lkeep;
+  a_keep = (PyArrayObject *)PyArray_SimpleNew( 1, dim, NPY_INT );
+  dim[0] = 40;
+  a_info = (PyArrayObject *)PyArray_SimpleNew( 1, dim, NPY_INT );
+  dim[0] = 20;
+  a_rinfo = (PyArrayObject *)PyArray_SimpleNew( 1, dim, NPY_DOUBLE );
+  if( !a_keep || !a_info || !a_rinfo ) {
+    Py_XDECREF( a_keep );
+    Py_XDECREF( a_info );
+    Py_XDECREF( a_rinfo );
+    return NULL;
+  }
+
+  memcpy( a_keep->data, self->data->keep, self->data->lkeep * sizeof(int) );
+  memcpy( a_info->data, self->data->info, 40 * sizeof(int) );
+  memcpy( a_rinfo->data, self->data->rinfo, 20 * sizeof(double) );
+
+  return Py_BuildValue( "NNNii", a_keep, a_info, a_rinfo,
+                        self->data->lfact, self->data->lifact );
+}
+
+/* ========================================================================== */
+
+static char Pyma57_get_info_Doc[] = "Return the statistics of the last analysis and factorization";
+
+static PyObject *Pyma57_get_info( Pyma57Object *self, PyObject *args ) {
+
+  PyArrayObject *a_info, *a_rinfo;
+  npy_intp       dim[1];
+
+  /* Return the info and rinfo arrays, the number of times fact or ifact
+   * had to grow, the number of allocations of the solve workspace and the
+   * numbers of restarts and of copies of the last factorization */
+  dim[0] = 40;
+  a_info = (PyArrayObject *)PyArray_SimpleNew( 1, dim, NPY_INT );
+  dim[0] = 20;
+  a_rinfo = (PyArrayObject *)PyArray_SimpleNew( 1, dim, NPY_DOUBLE );
+  if( !a_info || !a_rinfo ) {
+    Py_XDECREF( a_info );
+    Py_XDECREF( a_rinfo );
+    return NULL;
+  }
+
+  memcpy( a_info->data, self->data->info, 40 * sizeof(int) );
+  memcpy( a_rinfo->data, self->data->rinfo, 20 * sizeof(double) );
+
+  return Py_BuildValue( "NNiiii", a_info, a_rinfo, self->data->nrealloc,
+                        self->data->nworkalloc, self->data->nrestarts,
+                        self->data->ncopies );
+}
+
+/* ========================================================================== */
+
+static char Pyma57_event_log_Doc[] = "Return the raw records of the event log, oldest first";
+
+static PyObject *Pyma57_event_log( Pyma57Object *self, PyObject *args ) {
+
+  HSL_Event *events;
+  PyObject  *records;
+  int        nevents;
+
+  events = (HSL_Event *)HSL_Calloc( imax( self->data->eventlog.size, 1 ),
+                                    sizeof(HSL_Event) );
+  if( events == NULL ) return PyErr_NoMemory();
+  nevents = HSL_Log_Copy( &(self->data->eventlog), events );
+  records = PyString_FromStringAndSize( (char *)events,
+                                        nevents * sizeof(HSL_Event) );
+  HSL_Free( events );
+  return records;
+}
+
+/* ========================================================================== */
+
+static char Pyma57_clear_log_Doc[] = "Discard all events from the event log";
+
+static PyObject *Pyma57_clear_log( Pyma57Object *self, PyObject *args ) {
+
+  HSL_Log_Clear( &(self->data->eventlog) );
+  Py_INCREF( Py_None );
+  return Py_None;
+}
+
+/* ========================================================================== */
+
+static char Pyma57_set_analysis_Doc[] = "Restore the state produced by the analyze phase";
+
+static PyObject *Pyma57_set_analysis( Pyma57Object *self, PyObject *args ) {
+
+  PyArrayObject *a_keep, *a_info, *a_rinfo;
+  int            lfact, lifact;
+
+  if( !PyArg_ParseTuple( args, "O!O!O!ii:set_analysis",
+                         &PyArray_Type, &a_keep,
+                         &PyArray_Type, &a_info,
+                         &PyArray_Type, &a_rinfo,
+                         &lfact, &lifact ) )
+    return NULL;
+
+  if( a_keep->descr->type_num != NPY_INT || !PyArray_ISCARRAY_RO( a_keep ) ||
+      a_keep->nd != 1 || a_keep->dimensions[0] != self->data->lkeep ||
+      a_info->descr->type_num != NPY_INT || !PyArray_ISCARRAY_RO( a_info ) ||
+      a_info->nd != 1 || a_info->dimensions[0] != 40 ||
+      a_rinfo->descr->type_num != NPY_DOUBLE || !PyArray_ISCARRAY_RO( a_rinfo ) ||
+      a_rinfo->nd != 1 || a_rinfo->dimensions[0] != 20 ) {
+    PyErr_SetString( PyExc_ValueError,
+                     "Analysis arrays have wrong type or size" );
+    return NULL;
+  }
+
+  memcpy( self->data->keep, a_keep->data, self->data->lkeep * sizeof(int) );
+  memcpy( self->data->info, a_info->data, 40 * sizeof(int) );
+  memcpy( self->data->rinfo, a_rinfo->data, 20 * sizeof(double) );
+  self->data->lfact = lfact;
+  self->data->lifact = lifact;
+  Ma57_Allocate_Factors( self->data );
+
+  Py_INCREF( Py_None );
+  return Py_None;
+}
+
+/* ========================================================================== */
+
 /* static char Pyma27_fetch_lb_Doc[] = "Fetch factors of A computed by MA27"; */
 
 /* static PyObject *Pyma27_fetch_lb( Pyma27Object *self, PyObject *args ) { */
@@ -300,12 +617,15 @@ static PyObject *Pyma57_ma57( Pyma57Object *self, PyObject *args ) {
   x = (double *)a_x->data;
   self->data->residual = (double *)a_res->data;
 
+  Py_BEGIN_ALLOW_THREADS
   if( get_resid == Py_True )  /* Solve and compute residual r = rhs - Ax */
     error = Ma57_Refine( self->data, x, rhs, self->a, 1, 0 );
   else {            /* Just solve */
-    cblas_dcopy( self->data->n, rhs, 1, x, 1 ); // x<- rhs ; will be overwritten
+    if( x != rhs )    /* x<- rhs ; will be overwritten */
+      cblas_dcopy( self->data->n, rhs, 1, x, 1 );
     error = Ma57_Solve( self->data, x );
   }
+  Py_END_ALLOW_THREADS
 
   if( error ) {
     fprintf( stderr, " Error return code from Solve: %-d\n", error );
@@ -344,6 +664,18 @@ static PyObject *Pyma57_Stats( Pyma57Object *self, PyObject *args ) {
 
 /* ========================================================================== */
 
+static char Pyma57_workspace_Doc[] = "Obtain statistics on the solve workspace";
+
+static PyObject *Pyma57_workspace( Pyma57Object *self, PyObject *args ) {
+
+  /* Return the size of the real workspace, the number of times it was
+   * allocated and the number of solves and refinements performed. */
+  return Py_BuildValue( "iii", self->data->lwork, self->data->nworkalloc,
+                        self->data->nsolves );
+}
+
+/* ========================================================================== */
+
 static char Pyma57_refine_Doc[] = "Perform iterative refinements";
 
 static PyObject *Pyma57_refine( Pyma57Object *self, PyObject *args ) {
@@ -376,7 +708,9 @@ static PyObject *Pyma57_refine( Pyma57Object *self, PyObject *args ) {
   rhs = (double *)a_rhs->data;
   self->data->residual = (double *)a_res->data;
 
+  Py_BEGIN_ALLOW_THREADS
   nerror = Ma57_Refine( self->data, x, rhs, self->a, nitref, 2 );
+  Py_END_ALLOW_THREADS
   if( nerror == -10 ) return NULL;
   return Py_BuildValue("dddddddd",
                        self->data->rinfo[10],    // 1st cond number estimate
@@ -398,12 +732,32 @@ static PyMethodDef Pyma57_special_methods[] = {
     METH_VARARGS, Pyma57_ma57_Doc                 },
   { "factorize", (PyCFunction)Pyma57_factorize,
     METH_VARARGS, Pyma57_factorize_Doc            },
+  { "refactorize", (PyCFunction)Pyma57_refactorize,
+    METH_VARARGS, Pyma57_refactorize_Doc          },
+  { "factorize_inertia", (PyCFunction)Pyma57_factorize_inertia,
+    METH_VARARGS, Pyma57_factorize_inertia_Doc    },
   { "fetchperm", (PyCFunction)Pyma57_fetch_perm,
     METH_VARARGS, Pyma57_fetch_perm_Doc           },
+  { "analyze",   (PyCFunction)Pyma57_analyze_pattern,
+    METH_VARARGS, Pyma57_analyze_pattern_Doc      },
+  { "pattern",   (PyCFunction)Pyma57_pattern,
+    METH_VARARGS, Pyma57_pattern_Doc              },
+  { "get_analysis", (PyCFunction)Pyma57_get_analysis,
+    METH_VARARGS, Pyma57_get_analysis_Doc         },
+  { "set_analysis", (PyCFunction)Pyma57_set_analysis,
+    METH_VARARGS, Pyma57_set_analysis_Doc         },
+  { "get_info",  (PyCFunction)Pyma57_get_info,
+    METH_VARARGS, Pyma57_get_info_Doc             },
+  { "event_log", (PyCFunction)Pyma57_event_log,
+    METH_VARARGS, Pyma57_event_log_Doc            },
+  { "clear_log", (PyCFunction)Pyma57_clear_log,
+    METH_VARARGS, Pyma57_clear_log_Doc            },
   //{ "fetchlb",   (PyCFunction)Pyma57_fetch_lb,
   //  METH_VARARGS, Pyma57_fetch_lb_Doc   },
   { "stats",     (PyCFunction)Pyma57_Stats,
     METH_VARARGS, Pyma57_Stats_Doc                },
+  { "workspace", (PyCFunction)Pyma57_workspace,
+    METH_VARARGS, Pyma57_workspace_Doc            },
   { "refine",    (PyCFunction)Pyma57_refine,
     METH_VARARGS, Pyma57_refine_Doc               },
   { NULL,         NULL,
@@ -421,13 +775,14 @@ static PyObject *Pyma57_analyze( PyObject *self, PyObject *args ) {
   PyObject  *rv;                    /* Return value */
   PyObject  *mat;                   /* Input matrix */
   PyObject  *sqd;                   /* SQD matrix flag */
+  int        analyze = 1;           /* Skip analysis if 0 */
 
   /* Read input matrix and limited memory factor */
-  if( !PyArg_ParseTuple( args, "OO:factor", &mat, &sqd ) )
+  if( !PyArg_ParseTuple( args, "OO|i:factor", &mat, &sqd, &analyze ) )
     return NULL;
 
   /* Spawn new Pyma57 Object, containing matrix symbolic factors */
-  rv = NewPyma57Object( (LLMatObject *)mat, sqd );
+  rv = NewPyma57Object( (LLMatObject *)mat, sqd, analyze );
   if( rv == NULL ) return NULL;
 
   return rv;
@@ -0,0 +1,95 @@
+/* Ring buffer of binary events shared by the MA27 and MA57 interfaces */
+
+#define _POSIX_C_SOURCE 199309L
+#include <time.h>
+#include "hslpy.h"
+
+static double HSL_Wall_Time( void ) {
+#ifdef CLOCK_REALTIME
+  struct timespec ts;
+  clock_gettime( CLOCK_REALTIME, &ts );
+  return (double)ts.tv_sec + 1.0e-9 * ts.tv_nsec;
+#else
+  return (double)time( NULL );
+#endif
+}
+
+/* -------------------------------------------------- */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "HSL_Log_Init"
+void HSL_Log_Init( HSL_Log *elog, int size ) {
+  /* A log of size 0 records nothing */
+  elog->size   = imax( size, 0 );
+  elog->count  = 0;
+  elog->events = elog->size ?
+    (HSL_Event *)HSL_Calloc( elog->size, sizeof(HSL_Event) ) : NULL;
+  if( !elog->events ) elog->size = 0;
+  return;
+}
+
+/* -------------------------------------------------- */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "HSL_Log_Event"
+void HSL_Log_Event( HSL_Log *elog, int event, int code, int size1,
+                    int size2, double value ) {
+  HSL_Event *e;
+
+  if( !elog->size ) return;
+  e = elog->events + elog->count % elog->size;
+  e->time  = HSL_Wall_Time();
+  e->value = value;
+  e->event = event;
+  e->code  = code;
+  e->size1 = size1;
+  e->size2 = size2;
+  elog->count++;
+  return;
+}
+
+/* -------------------------------------------------- */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "HSL_Log_Copy"
+int HSL_Log_Copy( const HSL_Log *elog, HSL_Event events[] ) {
+  /* Copy the events held in the log into events, oldest first, and return
+   * their number, which is at most the size of the log. */
+  long first = 0, k;
+  int  nevents = 0;
+
+  if( elog->count > elog->size ) first = elog->count - elog->size;
+  for( k = first; k < elog->count; k++ )
+    events[nevents++] = elog->events[k % elog->size];
+  return nevents;
+}
+
+/* -------------------------------------------------- */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "HSL_Log_Clear"
+void HSL_Log_Clear( HSL_Log *elog ) {
+  elog->count = 0;
+  return;
+}
+
+/* -------------------------------------------------- */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "HSL_Log_Free"
+void HSL_Log_Free( HSL_Log *elog ) {
+  HSL_Free( elog->events );
+  elog->size  = 0;
+  elog->count = 0;
+  return;
+}
@@ -0,0 +1,127 @@
+/* Factorize and solve a batch of matrices with the same sparsity pattern with
+ * MA27 on a pool of threads. The pattern is analyzed once, and each thread
+ * factorizes and solves its members with a copy of the analysis. */
+
+#include <pthread.h>
+#include "ma27.h"
+
+#ifdef __cplusplus
+extern "C" {   /* To prevent C++ compilers from mangling symbols */
+#endif
+
+    typedef struct Refactor_Queue {
+        const Ma27_Data *ma27;       /* Shared analysis */
+        int              nbatch;
+        hsl_real        *values;     /* Member k at values + k*ldv */
+        int              ldv;
+        hsl_real        *x;          /* Member k at x + k*ldx */
+        int              ldx;
+        int             *status;
+        int             *inertia;    /* (npos, nneg) of member k at 2*k */
+        int              next;       /* Next member to process */
+        pthread_mutex_t  lock;
+    } Refactor_Queue;
+
+/* ================================================================= */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Refactor_Worker"
+    static void *Refactor_Worker( void *arg ) {
+
+        Refactor_Queue *queue = (Refactor_Queue *)arg;
+        Ma27_Data      *ma27;
+        int             k, error, neig, rank;
+
+        ma27 = Ma27_Copy_Analysis( queue->ma27 );
+        while( 1 ) {
+            pthread_mutex_lock( &(queue->lock) );
+            k = queue->next++;
+            pthread_mutex_unlock( &(queue->lock) );
+            if( k >= queue->nbatch ) break;
+
+            queue->inertia[2*k] = queue->inertia[2*k+1] = 0;
+            if( !ma27 ) {
+                queue->status[k] = -10;
+                continue;
+            }
+
+            /* Start each member from the same pivot tolerance, so that its
+             * factors do not depend on the members factorized before it */
+            ma27->cntl[0] = queue->ma27->cntl[0];
+            ma27->nclean = 0;
+            error = Ma27_Factorize( ma27,
+                                    queue->values + (size_t)k * queue->ldv );
+            if( !error ) {
+                neig = ma27->info[14];
+                rank = (ma27->info[0] == 3) ? ma27->info[1] : ma27->n;
+                queue->inertia[2*k] = rank - neig;
+                queue->inertia[2*k+1] = neig;
+                error = Ma27_Solve( ma27, queue->x + (size_t)k * queue->ldx );
+            }
+            queue->status[k] = error;
+        }
+
+        if( ma27 ) Ma27_Finalize( ma27 );
+        return NULL;
+    }
+
+/* ================================================================= */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma27_Factorize_Solve_Batch"
+    int Ma27_Factorize_Solve_Batch( const Ma27_Data *ma27, int nbatch,
+                                    hsl_real values[], int ldv, hsl_real x[],
+                                    int ldx, int status[], int inertia[],
+                                    int nthreads ) {
+
+        /* Factorize and solve nbatch matrices with the pattern and analysis
+         * of ma27, which is not modified. The values of member k are
+         * values[k*ldv:k*ldv+nz] and its right-hand side x[k*ldx:k*ldx+n] is
+         * overwritten by the solution. status[k] is the first nonzero code
+         * returned by Ma27_Factorize or Ma27_Solve and inertia[2*k],
+         * inertia[2*k+1] are the numbers of positive and negative
+         * eigenvalues. Each thread factorizes into its own storage, sized
+         * from the analysis. Returns the number of threads used, which is
+         * smaller than nthreads if some threads could not be created. */
+        Refactor_Queue queue;
+        pthread_t     *threads;
+        int            t, nstarted = 0;
+
+        queue.ma27 = ma27;
+        queue.nbatch = nbatch;
+        queue.values = values;
+        queue.ldv = ldv;
+        queue.x = x;
+        queue.ldx = ldx;
+        queue.status = status;
+        queue.inertia = inertia;
+        queue.next = 0;
+        pthread_mutex_init( &(queue.lock), NULL );
+
+        nthreads = imax( 1, imin( nthreads, nbatch ) );
+        threads = (pthread_t *)HSL_Calloc( nthreads, sizeof(pthread_t) );
+        if( !threads ) nthreads = 1;  // The calling thread does all the work
+        for( t = 1; t < nthreads; t++ ) {
+            if( pthread_create( threads + t, NULL, Refactor_Worker, &queue ) )
+                break;
+            nstarted++;
+        }
+
+        /* The calling thread is one of the workers */
+        Refactor_Worker( &queue );
+        for( t = 1; t <= nstarted; t++ ) pthread_join( threads[t], NULL );
+
+        HSL_Free( threads );
+        pthread_mutex_destroy( &(queue.lock) );
+        return nstarted + 1;
+    }
+
+/* ================================================================= */
+
+#ifdef __cplusplus
+}              /* Closing brace for  extern "C"  block */
+#endif
@@ -9,9 +9,9 @@ extern "C" {   /* To prevent C++ compilers from mangling symbols */
 
 /* -------------------------------------------------- */
 
-static double
-cblas_dnrm_infty( const int N, const double *X, const int incX ) {
-    return fabs( X[ cblas_idamax( N, X, incX ) ] );
+static hsl_real
+cblas_nrm_infty( const int N, const hsl_real *X, const int incX ) {
+    return fabs( X[ HSL_IAMAX( N, X, incX ) ] );
 }
 
 /* ================================================================= */
@@ -20,16 +20,25 @@ cblas_dnrm_infty( const int N, const double *X, const int incX ) {
 #undef  __FUNCT__
 #endif
 #define __FUNCT__ "MA27_Initialize"
-    Ma27_Data *Ma27_Initialize( int nz, int n, FILE *logfile ) {
+    Ma27_Data *Ma27_Initialize( int nz, int n, int logsize ) {
 
-        /* Call initialize subroutine MA27ID and set defaults */
+        /* Call initialize subroutine MA27ID and set defaults. The event log
+         * holds the last logsize events. */
         Ma27_Data *ma27 = (Ma27_Data *)HSL_Calloc( 1, sizeof(Ma27_Data) );
 
-        LOGMSG( " MA27 :: Initializing..." );
-        ma27->logfile   = logfile;
+        HSL_Log_Init( &(ma27->eventlog), logsize );
         ma27->n         = n;
         ma27->nz        = nz;
         ma27->fetched   = 0;
+        ma27->nrealloc  = 0;
+        ma27->headroom  = HEADROOM;
+        ma27->la_min    = 0;
+        ma27->liw_min   = 0;
+        ma27->npivtol   = 0;
+        ma27->nclean    = 0;
+        ma27->relax_after = 0;
+        ma27->nworkalloc = 0;
+        ma27->nsolves   = 0;
         ma27->la        = ceil( 1.2 * nz );
         ma27->liw       = imax( ceil( 1.2 * ( 2*nz + 3*n + 1 )), LIW_MIN );
         ma27->irn       = (int *)HSL_Calloc( nz, sizeof(int) );
@@ -37,16 +46,17 @@ cblas_dnrm_infty( const int N, const double *X, const int incX ) {
         ma27->iw        = (int *)HSL_Calloc( ma27->liw, sizeof(int) );
         ma27->ikeep     = (int *)HSL_Calloc( 3 * n, sizeof(int) );
         ma27->iw1       = (int *)HSL_Calloc( 2 * n, sizeof(int) );
-        ma27->factors   = (double *)HSL_Calloc( ma27->la, sizeof(double) );
+        ma27->factors   = (hsl_real *)HSL_Calloc( ma27->la, sizeof(hsl_real) );
         // Don't allocate the residual for HSL --- will come from Python
-        //ma27->residual  = (double *)HSL_Calloc( n, sizeof(double) );
+        //ma27->residual  = (hsl_real *)HSL_Calloc( n, sizeof(hsl_real) );
 
         MA27ID( ma27->icntl, ma27->cntl );
         ma27->icntl[0] = 0;  // Stream for error messages.
         ma27->icntl[1] = 0;  // Stream for diagnotic messages.
         ma27->icntl[2] = 0;  // Verbosity: 0=none, 1=partial, 2=full
+        ma27->pivtol_min = ma27->cntl[0];
 
-        LOGMSG( " done\n" );
+        LOGEVENT( HSL_EVENT_INIT, 0, n, nz, 0.0 );
         return ma27;
     }
 
@@ -58,14 +68,34 @@ cblas_dnrm_infty( const int N, const double *X, const int incX ) {
 #define __FUNCT__ "Ma27_Analyze"
     int Ma27_Analyze( Ma27_Data *ma27, int iflag ) {
 
-        int n = ma27->n, finished = 0, error;
-        LOGMSG( " MA27 :: Analyzing\n" );
+        int n = ma27->n, finished = 0, error, i, liw;
+        int *order = NULL;
 
         ma27->iflag = iflag;
 
+        /* iw may have been sized for the factorization: MA27AD needs at
+         * least 2*nz + 3*n + 1 entries */
+        liw = imax( ceil( 1.2 * ( 2*ma27->nz + 3*n + 1 ) ), LIW_MIN );
+        if( ma27->liw < liw ) {
+            HSL_Free( ma27->iw );
+            ma27->iw = (int *)HSL_Calloc( liw, sizeof(int) );
+            ma27->liw = liw;
+        }
+
+        /* MA27AD overwrites ikeep: keep a user-supplied pivot order for
+         * restarts */
+        if( iflag == 1 ) {
+            order = (int *)HSL_Calloc( n, sizeof(int) );
+            if( !order ) return -10;
+            for( i = 0; i < n; i++ ) order[i] = ma27->ikeep[i];
+        }
+
         /* Unpack data structure and call MA27AD */
         while( !finished ) {
 
+            if( order )
+                for( i = 0; i < n; i++ ) ma27->ikeep[i] = order[i];
+
             MA27AD(&(ma27->n), &(ma27->nz), ma27->irn, ma27->icn,
                    ma27->iw, &(ma27->liw), ma27->ikeep, ma27->iw1,
                    &(ma27->nsteps), &(ma27->iflag), ma27->icntl,
@@ -77,49 +107,191 @@ cblas_dnrm_infty( const int N, const double *X, const int incX ) {
                 finished = 1;
             else {
                 error = Process_Error_Code( ma27, error );
-                if( error != -3 && error != -4 ) return error;
+                if( error != -3 && error != -4 ) {
+                    HSL_Free( order );
+                    return error;
+                }
             }
         }
-
-        /* Adjust size of factors (if necessary) */
-        if( ma27->info[4] > ma27->nz ) {
-            ma27->la = ceil( 1.2 * ma27->info[4] );
-            HSL_Free( ma27->factors );
-            ma27->factors = (double *)HSL_Calloc( ma27->la, sizeof(double) );
-        }
+        HSL_Free( order );
+
+        /* Size factors and iw from the storage predicted by the analysis
+         * for a factorization without compresses (info[2] and info[3]) with
+         * some headroom for delayed pivots, so that MA27BD neither restarts
+         * nor compresses its data. The sizes that sufficed in a previous
+         * factorization are used if larger. */
+        ma27->la  = imax( ceil( ma27->headroom * ma27->info[2] ),
+                          imax( ma27->nz, ma27->la_min ) );
+        ma27->liw = imax( ceil( ma27->headroom * ma27->info[3] ),
+                          ma27->liw_min );
 
         /* Adjust size of w1 (if necessary) */
-        if( ma27->nsteps > 2 * ma27->n ) {
+        if( ma27->nsteps > 2 * n ) {
             HSL_Free( ma27->iw1 );
             ma27->iw1 = (int *)HSL_Calloc( ma27->nsteps, sizeof(int) );
+            if( ! ma27->iw1 ) return -10;
         }
 
-        /* For now we assume the front size is maximal. */
-        ma27->w = (double *)HSL_Calloc( n, sizeof(double) );
-        if( ! ma27->w ) return -10;
+        if( Ma27_Allocate_Factors( ma27 ) ) return -10;
 
+        LOGEVENT( HSL_EVENT_ANALYZE, ma27->info[0], ma27->info[4],
+                  ma27->info[5], ma27->ops );
         return 0;
     }
 
 /* ================================================================= */
 
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma27_Analyze_Perm"
+    int Ma27_Analyze_Perm( Ma27_Data *ma27, const int perm[] ) {
+
+        /* Analyze with a user-supplied pivot order: variable i is
+         * eliminated in position perm[i] (0-based). If perm is NULL, the
+         * pivot order held in ikeep by a previous analysis is used again.
+         * Returns -9 if the pivot order is not a permutation. */
+        int n = ma27->n, i, k, error = 0;
+        int *seen;
+
+        if( perm )
+            for( i = 0; i < n; i++ ) ma27->ikeep[i] = perm[i] + 1;
+
+        seen = (int *)HSL_Calloc( n, sizeof(int) );
+        if( !seen ) return -10;
+        for( i = 0; i < n; i++ ) {
+            k = ma27->ikeep[i];
+            if( k < 1 || k > n || seen[k-1] ) {
+                ma27->info[0] = error = -9;
+                ma27->info[1] = i + 1;
+                break;
+            }
+            seen[k-1] = 1;
+        }
+        HSL_Free( seen );
+        if( error ) return Process_Error_Code( ma27, error );
+
+        return Ma27_Analyze( ma27, 1 ); // iflag = 1: pivot order in ikeep
+    }
+
+/* ================================================================= */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma27_Allocate_Factors"
+    int Ma27_Allocate_Factors( Ma27_Data *ma27 ) {
+
+        /* Allocate storage for the factorization from la and liw.
+         * Called after an analysis, or after ikeep, iw1, nsteps, la
+         * and liw have been restored from a previous analysis.
+         * Returns -10 if memory could not be allocated.
+         */
+        HSL_Free( ma27->factors );
+        HSL_Free( ma27->iw );
+        HSL_Free( ma27->w );
+        ma27->factors = (hsl_real *)HSL_Calloc( ma27->la, sizeof(hsl_real) );
+        ma27->iw      = (int *)HSL_Calloc( ma27->liw, sizeof(int) );
+
+        /* For now we assume the front size is maximal. */
+        ma27->w = (hsl_real *)HSL_Calloc( ma27->n, sizeof(hsl_real) );
+        if( !ma27->factors || !ma27->iw || !ma27->w ) return -10;
+        return 0;
+    }
+
+/* ================================================================= */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma27_Copy_Analysis"
+    Ma27_Data *Ma27_Copy_Analysis( const Ma27_Data *ma27 ) {
+
+        /* Return a new Ma27_Data with the pattern, controls and analysis of
+         * ma27 and its own factor storage, sized as for ma27. The copy may be
+         * factorized while ma27 is in use elsewhere. Nothing is logged. */
+        Ma27_Data *copy = Ma27_Initialize( ma27->nz, ma27->n, 0 );
+        int k;
+
+        if( !copy ) return NULL;
+        for( k = 0; k < ma27->nz; k++ ) {
+            copy->irn[k] = ma27->irn[k];
+            copy->icn[k] = ma27->icn[k];
+        }
+        for( k = 0; k < 3 * ma27->n; k++ ) copy->ikeep[k] = ma27->ikeep[k];
+        if( ma27->nsteps > 2 * ma27->n ) {
+            HSL_Free( copy->iw1 );
+            copy->iw1 = (int *)HSL_Calloc( ma27->nsteps, sizeof(int) );
+            if( !copy->iw1 ) {
+                Ma27_Finalize( copy );
+                return NULL;
+            }
+        }
+        for( k = 0; k < imax( 2 * ma27->n, ma27->nsteps ); k++ )
+            copy->iw1[k] = ma27->iw1[k];
+        for( k = 0; k < 30; k++ ) copy->icntl[k] = ma27->icntl[k];
+        for( k = 0; k < 5; k++ ) copy->cntl[k] = ma27->cntl[k];
+        for( k = 0; k < 20; k++ ) copy->info[k] = ma27->info[k];
+        copy->nsteps      = ma27->nsteps;
+        copy->iflag       = ma27->iflag;
+        copy->ops         = ma27->ops;
+        copy->headroom    = ma27->headroom;
+        copy->la_min      = ma27->la_min;
+        copy->liw_min     = ma27->liw_min;
+        copy->relax_after = ma27->relax_after;
+        copy->pivtol_min  = ma27->pivtol_min;
+        copy->la          = ma27->la;
+        copy->liw         = ma27->liw;
+        if( Ma27_Allocate_Factors( copy ) ) {
+            Ma27_Finalize( copy );
+            return NULL;
+        }
+        return copy;
+    }
+
+/* ================================================================= */
+
 #ifdef  __FUNCT__
 #undef  __FUNCT__
 #endif
 #define __FUNCT__ "Ma27_Factorize"
-    int Ma27_Factorize( Ma27_Data *ma27, double A[] ) {
+    int Ma27_Factorize( Ma27_Data *ma27, hsl_real A[] ) {
+
+        int finished = 0, error, nrealloc = ma27->nrealloc;
+        hsl_real pTol, new_pTol = PIV_MIN;
+
+        /* Start from the sizes that sufficed in a previous factorization */
+        if( ma27->la < ma27->la_min ) {
+            LOGEVENT( HSL_EVENT_RESIZE_REAL, 0, ma27->la, ma27->la_min, 0.0 );
+            HSL_Free( ma27->factors );
+            ma27->la = ma27->la_min;
+            ma27->factors = (hsl_real *)HSL_Calloc( ma27->la, sizeof(hsl_real) );
+            if( !ma27->factors ) {
+                ma27->la = 0;
+                return -10;
+            }
+        }
+        if( ma27->liw < ma27->liw_min ) {
+            LOGEVENT( HSL_EVENT_RESIZE_INT, 0, ma27->liw, ma27->liw_min, 0.0 );
+            HSL_Free( ma27->iw );
+            ma27->liw = ma27->liw_min;
+            ma27->iw = (int *)HSL_Calloc( ma27->liw, sizeof(int) );
+            if( !ma27->iw ) {
+                ma27->liw = 0;
+                return -10;
+            }
+        }
 
-        int finished = 0, error;
-        double pTol, new_pTol = PIV_MIN;
-        LOGMSG( " MA27 :: Factorizing..." );
-        
         /* Copy A into factors. */
-        cblas_dcopy( ma27->nz, A, 1, ma27->factors, 1 );
+        HSL_COPY( ma27->nz, A, 1, ma27->factors, 1 );
+
+        /* The pivot tolerance cntl[0] is kept from one factorization to the
+         * next, so that a matrix that needed a larger tolerance does not go
+         * through the same retries again. */
+        ma27->npivtol = 0;
 
         /* Unpack data structure and call MA27BD */
         while( !finished ) {
-            LOGMSG( " calling ma27bd... " );
-
             MA27BD( &(ma27->n), &(ma27->nz), ma27->irn, ma27->icn,
                     ma27->factors, &(ma27->la), ma27->iw, &(ma27->liw),
                     ma27->ikeep, &(ma27->nsteps), &(ma27->maxfrt),
@@ -128,60 +300,183 @@ cblas_dnrm_infty( const int N, const double *X, const int incX ) {
             error = ma27->info[0];
             pTol = ma27->cntl[0];
 
-            if( !error ) {
-                LOGMSG( "completed" );
+            if( !error || error == 3 ) {
+                /* A rank-deficient factorization (warning 3) is usable. The
+                 * tolerance that produced it is kept and not raised. */
                 finished = 1;
-            } else if(   (error == 3 || error == -5)    // Singular
-                      && (pTol <= PIV_MAX) ) {          // pTol less than max
-                /* Adjust pivot tolerance */
+            } else if( error == -5 && pTol <= PIV_MAX ) {  // Singular
+                /* Adjust pivot tolerance and retry */
                 if( pTol == 0.0 )
-                    pTol =  1.0e-6;
+                    new_pTol = 1.0e-6;
                 else {
-                    new_pTol = fmin( PIV_MAX, fmax( PIV_MIN, 100 * pTol ) );
+                    new_pTol = fmin( PIV_MAX,
+                                     fmax( PIV_MIN, PIV_RELAX * pTol ) );
                     if( new_pTol == pTol ) {
-                        /* We have tried all allowed pivot tolerances */
-                        LOGMSG("MA27: Failed to factorize matrix\n" );
-                        LOGMSG("      Order = %-d, ", ma27->n );
-                        if( error == 3 ) {
-                            LOGMSG("Rank =");
-                        } else {
-                            LOGMSG("Singularity at pivot step" );
-                        }
-                        LOGMSG(" %-d\n", ma27->info[2] );
+                        /* We have tried all allowed pivot tolerances. */
+                        LOGEVENT( HSL_EVENT_ERROR, error, ma27->info[1], 0,
+                                  pTol );
                         return -2;
                     }
                 }
                 ma27->cntl[0] = new_pTol;
-                if( error == 3 ) finished = 1;  // A factorization was produced!
+                ma27->npivtol++;
+                LOGEVENT( HSL_EVENT_PIVOT_TOL, error, ma27->info[1], 0,
+                          new_pTol );
+                /* MA27BD overwrote factors: start again from A */
+                HSL_COPY( ma27->nz, A, 1, ma27->factors, 1 );
             }
             else {
                 error = Process_Error_Code( ma27, error );
                 if( error == -4 ) {
                     /* Must re-initialize factors */
-                    cblas_dcopy( ma27->nz, A, 1, ma27->factors, 1 );
+                    HSL_COPY( ma27->nz, A, 1, ma27->factors, 1 );
                 }
                 if( error != -3 && error != -4 ) return error;
             }
         }
-        LOGMSG( " done\n" );
+
+        /* Remember the sizes that sufficed after a restart, and ask for more
+         * room next time if the real (info[11]) or integer (info[12]) data
+         * had to be compressed. The room asked for does not exceed the
+         * initial sizes for a factorization without compresses, so that
+         * repeated compresses do not make it grow without bound. */
+        if( ma27->nrealloc != nrealloc )
+            ma27->la_min = imax( ma27->la_min, ma27->la );
+        else if( ma27->info[11] )
+            ma27->la_min = imax( ma27->la_min,
+                                 imin( ceil( ma27->headroom * ma27->la ),
+                                       ceil( ma27->headroom * ma27->info[2] ) ) );
+        if( ma27->nrealloc != nrealloc )
+            ma27->liw_min = imax( ma27->liw_min, ma27->liw );
+        else if( ma27->info[12] )
+            ma27->liw_min = imax( ma27->liw_min,
+                                  imin( ceil( ma27->headroom * ma27->liw ),
+                                        ceil( ma27->headroom * ma27->info[3] ) ) );
+
+        /* Relax the pivot tolerance towards pivtol_min after relax_after
+         * factorizations in a row that did not raise it */
+        if( ma27->npivtol )
+            ma27->nclean = 0;
+        else if( ma27->relax_after > 0
+                 && ++ma27->nclean >= ma27->relax_after
+                 && ma27->cntl[0] > ma27->pivtol_min ) {
+            ma27->cntl[0] = fmax( ma27->pivtol_min, ma27->cntl[0] / PIV_RELAX );
+            ma27->nclean = 0;
+            LOGEVENT( HSL_EVENT_PIVOT_TOL, 0, 0, 0, ma27->cntl[0] );
+        }
+
+        LOGEVENT( HSL_EVENT_FACTORIZE, ma27->info[0], ma27->info[8],
+                  ma27->info[9], ma27->cntl[0] );
         return 0;
     }
 
 /* ================================================================= */
 
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma27_Factorize_Inertia"
+    int Ma27_Factorize_Inertia( Ma27_Data *ma27, hsl_real A[], int npos,
+                                int nneg, hsl_real *delta, hsl_real delta_max,
+                                hsl_real grow, int *ntrials ) {
+
+        /* Factorize A + delta diag(1,...,1,0,...,0), where the first npos
+         * diagonal entries are shifted, with delta = 0, *delta,
+         * grow * (*delta), ... until the inertia is (npos, nneg, n-npos-nneg).
+         * Only diagonal entries stored in A are shifted. On return, A holds
+         * its original values and *delta the shift of the last factorization.
+         * Returns 0 on success, INERTIA_FAIL if the shift would exceed
+         * delta_max, or the error code of the factorization. On INERTIA_FAIL,
+         * the factors are those of A, which is factorized again if it was
+         * shifted.
+         */
+        int      *diag;
+        hsl_real *diag0, shift = 0.0, next;
+        int       i, k, ndiag = 0, neig, rank, error;
+
+        diag  = (int *)HSL_Calloc( imax(npos,1), sizeof(int) );
+        diag0 = (hsl_real *)HSL_Calloc( imax(npos,1), sizeof(hsl_real) );
+        if( !diag || !diag0 ) {
+            HSL_Free( diag );
+            HSL_Free( diag0 );
+            return -10;
+        }
+
+        /* Find the first stored diagonal entry of each shifted row */
+        for( i = 0; i < npos; i++ ) diag[i] = -1;
+        for( k = 0; k < ma27->nz; k++ ) {
+            i = ma27->irn[k] - 1;
+            if( i == ma27->icn[k] - 1 && i < npos && diag[i] < 0 ) diag[i] = k;
+        }
+        for( i = 0; i < npos; i++ )
+            if( diag[i] >= 0 ) {
+                diag[ndiag] = diag[i];
+                diag0[ndiag++] = A[diag[i]];
+            }
+
+        for( *ntrials = 1; ; (*ntrials)++ ) {
+            for( k = 0; k < ndiag; k++ ) A[diag[k]] = diag0[k] + shift;
+            error = Ma27_Factorize( ma27, A );
+            if( error ) break;
+            neig = ma27->info[14];
+            rank = (ma27->info[0] == 3) ? ma27->info[1] : ma27->n;
+            LOGEVENT( HSL_EVENT_SHIFT, 0, rank - neig, neig, shift );
+            if( rank - neig == npos && neig == nneg ) break;
+            next = (shift == 0.0) ? *delta : grow * shift;
+            if( next <= shift || next > delta_max ) {
+                error = INERTIA_FAIL;
+                break;
+            }
+            shift = next;
+        }
+
+        for( k = 0; k < ndiag; k++ ) A[diag[k]] = diag0[k];
+        *delta = shift;
+        if( error == INERTIA_FAIL && shift != 0.0 ) {
+            k = Ma27_Factorize( ma27, A );
+            if( k ) error = k;
+        }
+        HSL_Free( diag );
+        HSL_Free( diag0 );
+        return error;
+    }
+
+/* ================================================================= */
+
 #ifdef  __FUNCT__
 #undef  __FUNCT__
 #endif
 #define __FUNCT__ "Ma27_Solve"
-    int Ma27_Solve( Ma27_Data *ma27, double x[] ) {
+    int Ma27_Solve( Ma27_Data *ma27, hsl_real x[] ) {
+
+        return Ma27_Solve_Many( ma27, x, 1, ma27->n );
+    }
+
+/* ================================================================= */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma27_Solve_Many"
+    int Ma27_Solve_Many( Ma27_Data *ma27, hsl_real x[], int nrhs, int ldx ) {
+
+        int col;
 
-        LOGMSG( " MA27 :: Solving\n" );
+        ma27->nsolves++;
 
-        /* Unpack data structure and call MA27CD */
-        MA27CD( &(ma27->n), ma27->factors, &(ma27->la), ma27->iw,
-                &(ma27->liw), ma27->w, &(ma27->maxfrt), x,
-                ma27->iw1, &(ma27->nsteps), ma27->icntl, ma27->info );
+        /* MA27CD handles a single right-hand side. Column col of x starts
+         * at x + col*ldx and is overwritten by the solution. */
+        for( col = 0; col < nrhs; col++ ) {
 
+            /* Unpack data structure and call MA27CD */
+            MA27CD( &(ma27->n), ma27->factors, &(ma27->la), ma27->iw,
+                    &(ma27->liw), ma27->w, &(ma27->maxfrt), x + col * ldx,
+                    ma27->iw1, &(ma27->nsteps), ma27->icntl, ma27->info );
+
+            if( ma27->info[0] ) break;
+        }
+
+        LOGEVENT( HSL_EVENT_SOLVE, ma27->info[0], nrhs, 0, 0.0 );
         return ma27->info[0];
     }
 
@@ -190,27 +485,152 @@ cblas_dnrm_infty( const int N, const double *X, const int incX ) {
 #ifdef  __FUNCT__
 #undef  __FUNCT__
 #endif
-#define __FUNCT__ "Ma27_Refine"
-    int Ma27_Refine( Ma27_Data *ma27, double x[], double rhs[],
-                     double A[], double tol, int maxitref ) {
+#define __FUNCT__ "Ma27_Work_Initialize"
+    Ma27_Work *Ma27_Work_Initialize( void ) {
+
+        /* The workspace is allocated by the first solve, from the sizes
+         * given by the factorization. Returns NULL if memory could not be
+         * allocated. */
+        Ma27_Work *ws = (Ma27_Work *)HSL_Calloc( 1, sizeof(Ma27_Work) );
+
+        if( !ws ) return NULL;
+        ws->w      = NULL;
+        ws->lw     = 0;
+        ws->iw1    = NULL;
+        ws->liw1   = 0;
+        ws->d      = NULL;
+        ws->ld     = 0;
+        ws->nalloc = 0;
+        return ws;
+    }
 
-        int    n = ma27->n, i, j, k, nitref;
-        double b_norm, resid_norm;
+/* ================================================================= */
 
-        LOGMSG( " MA27 :: Performing iterative refinement...\n" );
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Reserve_Work"
+    static int Reserve_Work( const Ma27_Data *ma27, Ma27_Work *ws ) {
+
+        /* MA27CD needs w of size maxfrt and iw1 of size nsteps. Returns -10
+         * if memory could not be allocated. */
+        if( ws->lw < ma27->maxfrt ) {
+            HSL_Free( ws->w );
+            ws->lw = imax( ma27->maxfrt, 1 );
+            ws->w  = (hsl_real *)HSL_Calloc( ws->lw, sizeof(hsl_real) );
+            ws->nalloc++;
+            if( !ws->w ) {
+                ws->lw = 0;
+                return -10;
+            }
+        }
+        if( ws->liw1 < ma27->nsteps ) {
+            HSL_Free( ws->iw1 );
+            ws->liw1 = imax( ma27->nsteps, 1 );
+            ws->iw1  = (int *)HSL_Calloc( ws->liw1, sizeof(int) );
+            ws->nalloc++;
+            if( !ws->iw1 ) {
+                ws->liw1 = 0;
+                return -10;
+            }
+        }
+        return 0;
+    }
 
-        /* Compute initial residual */
-        b_norm = cblas_dnrm_infty( n, rhs, 1 );        
-        cblas_dcopy( n, rhs, 1, ma27->residual, 1 );
-        for( k = 0; k < ma27->nz; k++ ) {
-            i = ma27->irn[k] - 1;
-            j = ma27->icn[k] - 1;
-            ma27->residual[i] -= A[k] * x[j];
-            if( i != j ) ma27->residual[j] -= A[k] * x[i];
+/* ================================================================= */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma27_Solve_Work"
+    int Ma27_Solve_Work( const Ma27_Data *ma27, Ma27_Work *ws, hsl_real x[],
+                         int nrhs, int ldx ) {
+
+        /* Same as Ma27_Solve_Many, with the workspace ws. ma27 is only
+         * read: several threads may call this function with the same
+         * factors, as long as each has its own ws and no thread factorizes
+         * at the same time. Nothing is logged; the info array of the solve
+         * is left in ws. */
+        int n = ma27->n, la = ma27->la, liw = ma27->liw;
+        int maxfrt = ma27->maxfrt, nsteps = ma27->nsteps;
+        int icntl[30], i, col;
+
+        for( i = 0; i < 30; i++ ) icntl[i] = ma27->icntl[i];
+        if( Reserve_Work( ma27, ws ) ) return -10;
+
+        ws->info[0] = 0;
+        for( col = 0; col < nrhs; col++ ) {
+            MA27CD( &n, ma27->factors, &la, ma27->iw, &liw, ws->w, &maxfrt,
+                    x + col * ldx, ws->iw1, &nsteps, icntl, ws->info );
+            if( ws->info[0] ) break;
         }
-        resid_norm = cblas_dnrm_infty( n, ma27->residual, 1 );
+        return ws->info[0];
+    }
+
+/* ================================================================= */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma27_Work_Finalize"
+    void Ma27_Work_Finalize( Ma27_Work *ws ) {
+
+        HSL_Free( ws->w );
+        HSL_Free( ws->iw1 );
+        HSL_Free( ws->d );
+        HSL_Free( ws );
+        return;
+    }
+
+/* ================================================================= */
 
-        LOGMSG( " Norm of residual: %-g\n", resid_norm );
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma27_Residual"
+    void Ma27_Residual( const Ma27_Data *ma27, hsl_real A[], hsl_real x[], hsl_real rhs[],
+                        hsl_real resid[], int nrhs, int ldx ) {
+
+        /* Compute resid = rhs - A x column by column, where only one
+         * triangle of the symmetric matrix A is stored in coordinate
+         * format. resid and rhs may point to the same array. */
+        int     n = ma27->n, nz = ma27->nz, i, j, k, col;
+        int    *irn = ma27->irn, *icn = ma27->icn;
+        hsl_real *xc, *rc;
+
+        for( col = 0; col < nrhs; col++ ) {
+            xc = x + col * ldx;
+            rc = resid + col * ldx;
+            if( rc != rhs + col * ldx )
+                HSL_COPY( n, rhs + col * ldx, 1, rc, 1 );
+            for( k = 0; k < nz; k++ ) {
+                i = irn[k] - 1;  /* Fortran indexing */
+                j = icn[k] - 1;
+                rc[i] -= A[k] * xc[j];
+                if( i != j ) rc[j] -= A[k] * xc[i];
+            }
+        }
+        return;
+    }
+
+/* ================================================================= */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma27_Refine"
+    int Ma27_Refine( Ma27_Data *ma27, hsl_real x[], hsl_real rhs[],
+                     hsl_real A[], hsl_real tol, int maxitref ) {
+
+        int    n = ma27->n, nitref;
+        hsl_real b_norm, resid_norm;
+
+        ma27->nsolves++;
+
+        /* Compute initial residual */
+        b_norm = cblas_nrm_infty( n, rhs, 1 );        
+        Ma27_Residual( ma27, A, x, rhs, ma27->residual, 1, n );
+        resid_norm = cblas_nrm_infty( n, ma27->residual, 1 );
 
         /* Perform iterative refinements, if required */
         nitref = 0;
@@ -219,36 +639,90 @@ cblas_dnrm_infty( const int N, const double *X, const int incX ) {
             nitref++;
 
             /* Solve system again with residual as rhs */
-            cblas_dcopy( n, ma27->residual, 1, rhs, 1 );
+            HSL_COPY( n, ma27->residual, 1, rhs, 1 );
             MA27CD( &n, ma27->factors, &(ma27->la), ma27->iw,
                     &(ma27->liw), ma27->w, &(ma27->maxfrt),
                     rhs, ma27->iw1, &(ma27->nsteps),
                     ma27->icntl, ma27->info );
 
             /* Update solution: x <- x + rhs */
-            cblas_daxpy( n, 1.0, rhs, 1, x, 1 );
+            HSL_AXPY( n, 1.0, rhs, 1, x, 1 );
           
             /* Update residual: residual <- residual - A rhs */
-            for( k = 0; k < ma27->nz; k++ ) {
-                i = ma27->irn[k] - 1;
-                j = ma27->icn[k] - 1;
-                ma27->residual[i] -= A[k] * rhs[j];
-                if( i != j )
-                    ma27->residual[j] -= A[k] * rhs[i];
-            }
-            resid_norm = cblas_dnrm_infty( n, ma27->residual, 1 );
-            
-            LOGMSG( " Ref %-d: Norm of residual: %-g\n", nitref,
-                                                         resid_norm );
+            Ma27_Residual( ma27, A, rhs, ma27->residual, ma27->residual, 1, n );
+            resid_norm = cblas_nrm_infty( n, ma27->residual, 1 );
         }
 
-        LOGMSG( " done\n" );
+        LOGEVENT( HSL_EVENT_REFINE, ma27->info[0], nitref, 0, resid_norm );
         return ma27->info[0];
 
     }
 
 /* ================================================================= */
 
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma27_Refine_Work"
+    int Ma27_Refine_Work( const Ma27_Data *ma27, Ma27_Work *ws, hsl_real x[],
+                          hsl_real rhs[], hsl_real A[], hsl_real resid[],
+                          hsl_real tol, int maxitref ) {
+
+        /* Same as Ma27_Refine, with the workspace ws and the residual in
+         * resid. The corrections are computed in ws, so rhs is only read.
+         * ma27 is only read, as in Ma27_Solve_Work. Nothing is logged; the
+         * info array, the number of steps and the residual norm of the
+         * refinement are left in ws. */
+        int n = ma27->n, la = ma27->la, liw = ma27->liw;
+        int maxfrt = ma27->maxfrt, nsteps = ma27->nsteps;
+        int icntl[30], i;
+        hsl_real b_norm, resid_norm;
+
+        for( i = 0; i < 30; i++ ) icntl[i] = ma27->icntl[i];
+        if( Reserve_Work( ma27, ws ) ) return -10;
+        if( ws->ld < n ) {
+            HSL_Free( ws->d );
+            ws->ld = imax( n, 1 );
+            ws->d  = (hsl_real *)HSL_Calloc( ws->ld, sizeof(hsl_real) );
+            ws->nalloc++;
+            if( !ws->d ) {
+                ws->ld = 0;
+                return -10;
+            }
+        }
+
+        /* Compute initial residual */
+        b_norm = cblas_nrm_infty( n, rhs, 1 );
+        Ma27_Residual( ma27, A, x, rhs, resid, 1, n );
+        resid_norm = cblas_nrm_infty( n, resid, 1 );
+
+        /* Perform iterative refinements, if required */
+        ws->info[0] = 0;
+        ws->nitref = 0;
+        while( ws->nitref < maxitref && resid_norm > tol * (1+b_norm) ) {
+
+            ws->nitref++;
+
+            /* Solve system again with residual as rhs */
+            HSL_COPY( n, resid, 1, ws->d, 1 );
+            MA27CD( &n, ma27->factors, &la, ma27->iw, &liw, ws->w, &maxfrt,
+                    ws->d, ws->iw1, &nsteps, icntl, ws->info );
+            if( ws->info[0] ) break;
+
+            /* Update solution: x <- x + d */
+            HSL_AXPY( n, 1.0, ws->d, 1, x, 1 );
+
+            /* Update residual: residual <- residual - A d */
+            Ma27_Residual( ma27, A, ws->d, resid, resid, 1, n );
+            resid_norm = cblas_nrm_infty( n, resid, 1 );
+        }
+
+        ws->resid_norm = resid_norm;
+        return ws->info[0];
+    }
+
+/* ================================================================= */
+
 #ifdef  __FUNCT__
 #undef  __FUNCT__
 #endif
@@ -256,7 +730,7 @@ cblas_dnrm_infty( const int N, const double *X, const int incX ) {
     void Ma27_Finalize( Ma27_Data *ma27 ) {
 
         /* Free allocated memory */
-        LOGMSG( " MA27 :: Deallocating data arrays..." );
+        HSL_Log_Free( &(ma27->eventlog) );
         HSL_Free( ma27->irn );
         HSL_Free( ma27->icn );
         HSL_Free( ma27->iw  );
@@ -280,66 +754,43 @@ cblas_dnrm_infty( const int N, const double *X, const int incX ) {
 
         int newsize;
 
-        LOGMSG( "    [nerror %-2d]", nerror );
-        /* Take appropriate action according to error code */
-        /* Inflation factors are from the MA27 spec sheet  */
+        /* Take appropriate action according to error code. info[1] holds
+         * the minimum size of iw (-3) or factors (-4) to retry with. */
         switch( nerror ) {
-            /* Warnings */
-            case 1:
-                LOGMSG( " Found %d indices out of range\n", ma27->info[1] );
-                break;
-
-            case 2:
-                LOGMSG( " Found %d sign changes in definite matrix\n",
-                        ma27->info[1] );
-                break;
-
-            case 3:
-                LOGMSG( " Matrix has rank %d, deficient\n", ma27->info[1] );
-                break;
-
-            /* Errors */
-            case -1:
-                LOGMSG( " Value of n is out of range: %d\n", ma27->n );
-                break;
-
-            case -2:
-                LOGMSG( " Value of nz is out of range: %d\n", ma27->nz );
-                break;
-
             case -3:
-                ma27->liw = ceil( 1.2 * ma27->info[1] );
-                LOGMSG( " Adjusting size of array IW to %d\n", ma27->liw );
+                newsize = ceil( ma27->headroom * ma27->info[1] );
+                LOGEVENT( HSL_EVENT_RESIZE_INT, nerror, ma27->liw, newsize,
+                          0.0 );
+                ma27->liw = newsize;
                 HSL_Free( ma27->iw ); ma27->iw = NULL;
                 ma27->iw = (int *)HSL_Calloc( ma27->liw, sizeof(int) );
+                ma27->nrealloc++;
                 break;
 
             case -4:
-                newsize = ceil( 1.2 * ma27->info[1] );
-                LOGMSG( " Adjusting size of array FACTORS to %d\n", newsize );
+                newsize = ceil( ma27->headroom * ma27->info[1] );
+                LOGEVENT( HSL_EVENT_RESIZE_REAL, nerror, ma27->la, newsize,
+                          0.0 );
                 HSL_Free( ma27->factors );
-                ma27->factors = (double*)HSL_Calloc( newsize, sizeof(double) );
+                ma27->factors = (hsl_real*)HSL_Calloc( newsize, sizeof(hsl_real) );
                 ma27->la = newsize;
+                ma27->nrealloc++;
                 break;
 
-            case -5:
-                LOGMSG( " Matrix singularity detected at pivot step %d\n",
-                        ma27->info[1] );
-                break;
-
-            case -6:
-                LOGMSG( " Change in pivot sign detected at pivot step %d\n",
-                        ma27->info[1] );
-                break;
-
-            case -7:
-                LOGMSG( " Value of nsteps out of range: %d\n", ma27->nsteps );
+            /* Warnings: indices out of range (1), sign changes in a
+             * definite matrix (2), rank deficiency (3).
+             * Errors: n (-1), nz (-2) or nsteps (-7) out of range,
+             * singularity (-5) or change of pivot sign (-6) at pivot
+             * step info[1], invalid pivot order (-9). */
+            case 1: case 2: case 3:
+            case -1: case -2: case -5: case -6: case -7: case -9:
+                LOGEVENT( HSL_EVENT_ERROR, nerror, ma27->info[1], 0, 0.0 );
                 break;
 
             default:
-                LOGMSG( " Unrecognized flag from Factorize()" );
+                LOGEVENT( HSL_EVENT_ERROR, nerror, ma27->info[1], 0, 0.0 );
                 nerror = -30;
-        }    
+        }
         return nerror;
     }
 
@@ -0,0 +1,255 @@
+/* Analyze, factorize and solve a batch of independent systems with MA57 on a
+ * pool of threads. Each thread keeps one Ma57_Data whose arrays are reused
+ * from one system to the next and only grow.
+ *
+ * A batch of matrices with the same sparsity pattern is analyzed once, and
+ * each thread factorizes and solves its members with a copy of the
+ * analysis. */
+
+#include <pthread.h>
+#include "ma57.h"
+
+#ifdef __cplusplus
+extern "C" {   /* To prevent C++ compilers from mangling symbols */
+#endif
+
+  typedef struct Batch_Queue {
+    Ma57_System    *systems;
+    int             nsystems;
+    int             next;         /* Next system to process */
+    int             ordering;     /* icntl[5] */
+    pthread_mutex_t lock;
+  } Batch_Queue;
+
+  typedef struct Refactor_Queue {
+    const Ma57_Data *ma57;        /* Shared analysis */
+    int              nbatch;
+    hsl_real        *values;      /* Member k at values + k*ldv */
+    int              ldv;
+    hsl_real        *x;           /* Member k at x + k*ldx */
+    int              ldx;
+    int             *status;
+    int             *inertia;     /* (npos, nneg) of member k at 2*k */
+    int              next;        /* Next member to process */
+    pthread_mutex_t  lock;
+  } Refactor_Queue;
+
+  /* ================================================================= */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Batch_Prepare"
+  static Ma57_Data *Batch_Prepare( Ma57_Data *ma57, int *nmax, int *nzmax,
+                                   const Ma57_System *sys, int ordering ) {
+
+    /* Return ma57, set up for sys. ma57 was created for order *nmax and
+     * *nzmax nonzeros, and is replaced by a larger one if sys does not fit.
+     * Returns NULL if the new one cannot be allocated. Nothing is logged. */
+    int k;
+
+    if( ma57 && ( sys->nz > *nzmax || sys->n > *nmax ) ) {
+      Ma57_Finalize( ma57 );
+      ma57 = NULL;
+    }
+    if( !ma57 ) {
+      *nmax = imax( sys->n, *nmax );
+      *nzmax = imax( sys->nz, *nzmax );
+      ma57 = Ma57_Initialize( *nzmax, *nmax, 0 );
+      if( !ma57 ) return NULL;
+      if( !ma57->irn || !ma57->jcn || !ma57->keep || !ma57->iwork ) {
+        Ma57_Finalize( ma57 );
+        return NULL;
+      }
+      ma57->icntl[5] = ordering;
+    }
+
+    ma57->n = sys->n;
+    ma57->nz = sys->nz;
+    ma57->lkeep = 5*sys->n + sys->nz + imax(sys->n,sys->nz) + 42 + sys->n;
+    ma57->liwork = 5*sys->n;
+    ma57->lfact_min = 0;       // Sizes learned for another system
+    ma57->lifact_min = 0;
+    for( k = 0; k < sys->nz; k++ ) {
+      ma57->irn[k] = sys->irn[k];
+      ma57->jcn[k] = sys->jcn[k];
+    }
+    return ma57;
+  }
+
+  /* ================================================================= */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Batch_Worker"
+  static void *Batch_Worker( void *arg ) {
+
+    Batch_Queue *queue = (Batch_Queue *)arg;
+    Ma57_Data   *ma57 = NULL;
+    Ma57_System *sys;
+    int          k, error, nmax = 0, nzmax = 0;
+
+    while( 1 ) {
+      pthread_mutex_lock( &(queue->lock) );
+      k = queue->next++;
+      pthread_mutex_unlock( &(queue->lock) );
+      if( k >= queue->nsystems ) break;
+
+      sys = queue->systems + k;
+      ma57 = Batch_Prepare( ma57, &nmax, &nzmax, sys, queue->ordering );
+      sys->npos = sys->nneg = 0;
+      if( !ma57 ) {
+        sys->status = -10;
+        continue;
+      }
+
+      error = Ma57_Analyze( ma57 );
+      if( !error ) error = Ma57_Factorize( ma57, sys->a );
+      if( !error ) {
+        sys->nneg = ma57->info[23];
+        sys->npos = ma57->info[24] - ma57->info[23];  // rank - neig
+        error = Ma57_Solve( ma57, sys->x );
+      }
+      sys->status = error;
+    }
+
+    if( ma57 ) Ma57_Finalize( ma57 );
+    return NULL;
+  }
+
+  /* ================================================================= */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma57_Solve_Batch"
+  int Ma57_Solve_Batch( Ma57_System systems[], int nsystems, int ordering,
+                        int nthreads ) {
+
+    /* Analyze, factorize and solve each system, on nthreads threads that
+     * take the systems in order. The status of each system is the first
+     * nonzero code returned by Ma57_Analyze, Ma57_Factorize or Ma57_Solve.
+     * Returns the number of threads used, which is smaller than nthreads if
+     * some threads could not be created. */
+    Batch_Queue queue;
+    pthread_t  *threads;
+    int         t, nstarted = 0;
+
+    queue.systems = systems;
+    queue.nsystems = nsystems;
+    queue.next = 0;
+    queue.ordering = ordering;
+    pthread_mutex_init( &(queue.lock), NULL );
+
+    nthreads = imax( 1, imin( nthreads, nsystems ) );
+    threads = (pthread_t *)HSL_Calloc( nthreads, sizeof(pthread_t) );
+    if( !threads ) nthreads = 1;  // The calling thread does all the work
+    for( t = 1; t < nthreads; t++ ) {
+      if( pthread_create( threads + t, NULL, Batch_Worker, &queue ) ) break;
+      nstarted++;
+    }
+
+    /* The calling thread is one of the workers */
+    Batch_Worker( &queue );
+    for( t = 1; t <= nstarted; t++ ) pthread_join( threads[t], NULL );
+
+    HSL_Free( threads );
+    pthread_mutex_destroy( &(queue.lock) );
+    return nstarted + 1;
+  }
+
+  /* ================================================================= */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Refactor_Worker"
+  static void *Refactor_Worker( void *arg ) {
+
+    Refactor_Queue *queue = (Refactor_Queue *)arg;
+    Ma57_Data      *ma57;
+    int             k, error;
+
+    ma57 = Ma57_Copy_Analysis( queue->ma57 );
+    while( 1 ) {
+      pthread_mutex_lock( &(queue->lock) );
+      k = queue->next++;
+      pthread_mutex_unlock( &(queue->lock) );
+      if( k >= queue->nbatch ) break;
+
+      queue->inertia[2*k] = queue->inertia[2*k+1] = 0;
+      if( !ma57 ) {
+        queue->status[k] = -10;
+        continue;
+      }
+      error = Ma57_Factorize( ma57, queue->values + (size_t)k * queue->ldv );
+      if( !error ) {
+        queue->inertia[2*k+1] = ma57->info[23];
+        queue->inertia[2*k] = ma57->info[24] - ma57->info[23];
+        error = Ma57_Solve( ma57, queue->x + (size_t)k * queue->ldx );
+      }
+      queue->status[k] = error;
+    }
+
+    if( ma57 ) Ma57_Finalize( ma57 );
+    return NULL;
+  }
+
+  /* ================================================================= */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma57_Factorize_Solve_Batch"
+  int Ma57_Factorize_Solve_Batch( const Ma57_Data *ma57, int nbatch,
+                                  hsl_real values[], int ldv, hsl_real x[],
+                                  int ldx, int status[], int inertia[],
+                                  int nthreads ) {
+
+    /* Factorize and solve nbatch matrices with the pattern and analysis of
+     * ma57, which is not modified. The values of member k are
+     * values[k*ldv:k*ldv+nz] and its right-hand side x[k*ldx:k*ldx+n] is
+     * overwritten by the solution. status[k] is the first nonzero code
+     * returned by Ma57_Factorize or Ma57_Solve and inertia[2*k],
+     * inertia[2*k+1] are the numbers of positive and negative eigenvalues.
+     * Each thread factorizes into its own storage, sized from the analysis.
+     * Returns the number of threads used, which is smaller than nthreads if
+     * some threads could not be created. */
+    Refactor_Queue queue;
+    pthread_t     *threads;
+    int            t, nstarted = 0;
+
+    queue.ma57 = ma57;
+    queue.nbatch = nbatch;
+    queue.values = values;
+    queue.ldv = ldv;
+    queue.x = x;
+    queue.ldx = ldx;
+    queue.status = status;
+    queue.inertia = inertia;
+    queue.next = 0;
+    pthread_mutex_init( &(queue.lock), NULL );
+
+    nthreads = imax( 1, imin( nthreads, nbatch ) );
+    threads = (pthread_t *)HSL_Calloc( nthreads, sizeof(pthread_t) );
+    if( !threads ) nthreads = 1;  // The calling thread does all the work
+    for( t = 1; t < nthreads; t++ ) {
+      if( pthread_create( threads + t, NULL, Refactor_Worker, &queue ) ) break;
+      nstarted++;
+    }
+
+    /* The calling thread is one of the workers */
+    Refactor_Worker( &queue );
+    for( t = 1; t <= nstarted; t++ ) pthread_join( threads[t], NULL );
+
+    HSL_Free( threads );
+    pthread_mutex_destroy( &(queue.lock) );
+    return nstarted + 1;
+  }
+
+  /* ================================================================= */
+
+#ifdef __cplusplus
+}              /* Closing brace for  extern "C"  block */
+#endif
@@ -20,13 +20,13 @@ extern "C" {   /* To prevent C++ compilers from mangling symbols */
 #undef  __FUNCT__
 #endif
 #define __FUNCT__ "MA57_Initialize"
-  Ma57_Data *Ma57_Initialize( int nz, int n, FILE *logfile ) {
+  Ma57_Data *Ma57_Initialize( int nz, int n, int logsize ) {
 
-    /* Call initialize subroutine MA57ID and set defaults */
+    /* Call initialize subroutine MA57ID and set defaults. The event log
+     * holds the last logsize events. */
     Ma57_Data *ma57 = (Ma57_Data *)HSL_Calloc( 1, sizeof(Ma57_Data) );
-    ma57->logfile   = logfile;
-
-    LOGMSG( " MA57 :: Initializing..." );
+    if( !ma57 ) return NULL;
+    HSL_Log_Init( &(ma57->eventlog), logsize );
 
     ma57->n         = n;
     ma57->nz        = nz;
@@ -35,10 +35,19 @@ extern "C" {   /* To prevent C++ compilers from mangling symbols */
     ma57->jcn       = (int *)HSL_Calloc( nz, sizeof(int) );
     ma57->lkeep     = 5*n + nz + imax(n,nz) + 42 + n; // Add n to suggested val.
     ma57->keep      = (int *)HSL_Calloc( ma57->lkeep, sizeof(int) );
-    ma57->iwork     = (int *)HSL_Calloc( 5*n, sizeof(int) );
+    ma57->liwork    = 5*n;    // MA57AD needs 5n, the other phases n
+    ma57->iwork     = (int *)HSL_Calloc( ma57->liwork, sizeof(int) );
     ma57->work      = NULL; // Will be initialize in Ma57_Solve()
+    ma57->lwork     = 0;
+    ma57->nworkalloc = 0;
+    ma57->nsolves   = 0;
+    ma57->nrealloc  = 0;
+    ma57->nrestarts = 0;
+    ma57->ncopies   = 0;
+    ma57->fact_grow = FACT_GROW;
+    ma57->lfact_min = 0;
+    ma57->lifact_min = 0;
 
-    LOGMSG( " calling ma57id..." );
     MA57ID( ma57->cntl, ma57->icntl ); // Initialize all parameters
 
     // Ensure some default parameters are appropriate
@@ -60,7 +69,7 @@ extern "C" {   /* To prevent C++ compilers from mangling symbols */
     ma57->icntl[14] = 1; // Scale system before factorizing    
     ma57->fetched = 0;
 
-    LOGMSG( " done\n");
+    LOGEVENT( HSL_EVENT_INIT, 0, n, nz, 0.0 );
     return ma57;
   }
 
@@ -73,12 +82,9 @@ extern "C" {   /* To prevent C++ compilers from mangling symbols */
   int Ma57_Analyze( Ma57_Data *ma57 ) {
 
     int finished = 0, error;
-    LOGMSG( " MA57 :: Analyzing..." );
 
     /* Unpack data structure and call MA57AD */
     while( !finished ) {
-      LOGMSG( "\n         calling ma57ad... " );
-
       MA57AD( &(ma57->n), &(ma57->nz), ma57->irn, ma57->jcn,
               &(ma57->lkeep), ma57->keep, ma57->iwork, ma57->icntl,
               ma57->info, ma57->rinfo );
@@ -94,16 +100,119 @@ extern "C" {   /* To prevent C++ compilers from mangling symbols */
       }
     }
 
-    // Allocate data for Factorize()
-    ma57->lfact = ceil( LFACT_GROW * ma57->info[8] );
-    ma57->fact = (double *)HSL_Calloc( ma57->lfact, sizeof(double) );
-    ma57->lifact = ceil( LIFACT_GROW * ma57->info[9] );
+    // Allocate data for Factorize(), at least the sizes known to be needed
+    ma57->lfact = imax( ceil( LFACT_GROW * ma57->info[8] ), ma57->lfact_min );
+    ma57->lifact = imax( ceil( LIFACT_GROW * ma57->info[9] ), ma57->lifact_min );
+    Ma57_Allocate_Factors( ma57 );
+
+    LOGEVENT( HSL_EVENT_ANALYZE, ma57->info[0], ma57->info[8], ma57->info[9],
+              ma57->rinfo[0] + ma57->rinfo[1] );
+    return 0;
+  }
+
+  /* ================================================================= */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma57_Analyze_Perm"
+  int Ma57_Analyze_Perm( Ma57_Data *ma57, const int perm[] ) {
+
+    /* Analyze with a user-supplied pivot order: variable i is eliminated
+     * in position perm[i] (0-based). If perm is NULL, the pivot order held
+     * in keep by a previous analysis is used again. MA57AD checks the
+     * pivot order and returns -9 if it is not a permutation. */
+    int i, error, ordering = ma57->icntl[5];
+
+    if( perm )
+      for( i = 0; i < ma57->n; i++ ) ma57->keep[i] = perm[i] + 1;
+
+    ma57->icntl[5] = 1;  // Pivot order in keep
+    error = Ma57_Analyze( ma57 );
+    ma57->icntl[5] = ordering;
+    return error;
+  }
+
+  /* ================================================================= */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma57_Allocate_Factors"
+  void Ma57_Allocate_Factors( Ma57_Data *ma57 ) {
+
+    /* Allocate the arrays used by Factorize() once keep holds a pivot
+     * sequence, either computed by Ma57_Analyze() or restored from a
+     * previous analysis. The sizes are taken from lfact and lifact.
+     * The workspaces iwork and work only depend on n and are kept. */
+    HSL_Free( ma57->fact );
+    ma57->fact = (hsl_real *)HSL_Calloc( ma57->lfact, sizeof(hsl_real) );
+    HSL_Free( ma57->ifact );
     ma57->ifact = (int *)HSL_Calloc( ma57->lifact, sizeof(int) );
-    HSL_Free( ma57->iwork );
-    ma57->iwork = (int *)HSL_Calloc( ma57->n, sizeof(int) );
-    ma57->work = NULL;
+    return;
+  }
+
+  /* ================================================================= */
 
-    LOGMSG( " done\n");
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma57_Copy_Analysis"
+  Ma57_Data *Ma57_Copy_Analysis( const Ma57_Data *ma57 ) {
+
+    /* Return a new Ma57_Data with the pattern, controls and analysis of
+     * ma57 and its own factor storage, sized as for ma57. The copy may be
+     * factorized while ma57 is in use elsewhere. Nothing is logged. */
+    Ma57_Data *copy = Ma57_Initialize( ma57->nz, ma57->n, 0 );
+    int k;
+
+    if( !copy ) return NULL;
+    for( k = 0; k < ma57->nz; k++ ) {
+      copy->irn[k] = ma57->irn[k];
+      copy->jcn[k] = ma57->jcn[k];
+    }
+    for( k = 0; k < ma57->lkeep; k++ ) copy->keep[k] = ma57->keep[k];
+    for( k = 0; k < 20; k++ ) copy->icntl[k] = ma57->icntl[k];
+    for( k = 0; k < 5; k++ ) copy->cntl[k] = ma57->cntl[k];
+    for( k = 0; k < 40; k++ ) copy->info[k] = ma57->info[k];
+    for( k = 0; k < 20; k++ ) copy->rinfo[k] = ma57->rinfo[k];
+    copy->fact_grow = ma57->fact_grow;
+    copy->lfact_min = ma57->lfact_min;
+    copy->lifact_min = ma57->lifact_min;
+    copy->lfact = imax( ceil( LFACT_GROW * ma57->info[8] ), ma57->lfact_min );
+    copy->lifact = imax( ceil( LIFACT_GROW * ma57->info[9] ),
+                         ma57->lifact_min );
+    Ma57_Allocate_Factors( copy );
+    if( !copy->fact || !copy->ifact ) {
+      Ma57_Finalize( copy );
+      return NULL;
+    }
+    return copy;
+  }
+
+  /* ================================================================= */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma57_Reserve_Work"
+  int Ma57_Reserve_Work( Ma57_Data *ma57, int lwork ) {
+
+    /* Make sure that work holds at least lwork doubles. The array is
+     * persistent and only grows, by at least a factor LWORK_GROW, so that
+     * repeated solves and refinements do not allocate. */
+    if( ma57->work && ma57->lwork >= lwork ) return 0;
+
+    if( ma57->work ) lwork = imax( lwork, ceil( LWORK_GROW * ma57->lwork ) );
+    LOGEVENT( HSL_EVENT_RESIZE_WORK, 0, ma57->lwork, lwork, 0.0 );
+    HSL_Free( ma57->work );
+    ma57->work = (hsl_real *)HSL_Calloc( lwork, sizeof(hsl_real) );
+    ma57->nworkalloc++;
+    if( !ma57->work ) {
+      ma57->lwork = 0;
+      return -10;
+    }
+    ma57->lwork = lwork;
     return 0;
   }
 
@@ -113,18 +222,23 @@ extern "C" {   /* To prevent C++ compilers from mangling symbols */
 #undef  __FUNCT__
 #endif
 #define __FUNCT__ "Ma57_Factorize"
-  int Ma57_Factorize( Ma57_Data *ma57, double A[] ) {
-
-    double *newFact;
+  int Ma57_Factorize( Ma57_Data *ma57, hsl_real A[] ) {
+
+    /* When fact or ifact is too small, they grow by a factor fact_grow, and
+     * at least to the size MA57BD asks for. With icntl[7] = 1, MA57BD stops
+     * with a warning (10 or 11), the factors computed so far are copied by
+     * MA57ED and the factorization continues. Otherwise, it stops with an
+     * error (-3 or -4) and is restarted from scratch in new arrays. */
+    hsl_real *newFact;
     int    *newIfact;
     int     newSize, one = 1, zero = 0;
     int     finished = 0, error;
-    LOGMSG( " MA57 :: Factorizing...\n" );
-        
+
+    ma57->nrestarts = 0;
+    ma57->ncopies = 0;
+
     /* Unpack data structure and call MA57BD */
     while( !finished ) {
-      LOGMSG( "         calling ma57bd... " );
-
       MA57BD( &(ma57->n), &(ma57->nz), A, ma57->fact, &(ma57->lfact),
               ma57->ifact, &(ma57->lifact), &(ma57->lkeep), ma57->keep,
               ma57->iwork, ma57->icntl, ma57->cntl, ma57->info, ma57->rinfo );
@@ -142,28 +256,42 @@ extern "C" {   /* To prevent C++ compilers from mangling symbols */
         if( error == -3 || error == 10 ) {
 
           /* Resize real workspace */
-          newSize = (error == 10) ? ma57->lfact : ma57->info[16];
-          newSize = ceil( LFACT_GROW * newSize );
-          newFact = (double *)HSL_Calloc( newSize, sizeof(double) );
-          MA57ED( &(ma57->n), &zero, ma57->keep, ma57->fact, &(ma57->lfact),
-                  newFact, &newSize, ma57->ifact, &(ma57->lifact), NULL, &zero,
-                  ma57->info );
+          newSize = ceil( ma57->fact_grow * ma57->lfact );
+          if( error == -3 )
+            newSize = imax( newSize, ceil( LFACT_GROW * ma57->info[16] ) );
+          LOGEVENT( HSL_EVENT_RESIZE_REAL, error, ma57->lfact, newSize, 0.0 );
+          newFact = (hsl_real *)HSL_Calloc( newSize, sizeof(hsl_real) );
+          if( error == 10 ) {
+            MA57ED( &(ma57->n), &zero, ma57->keep, ma57->fact, &(ma57->lfact),
+                    newFact, &newSize, ma57->ifact, &(ma57->lifact), NULL,
+                    &zero, ma57->info );
+            ma57->ncopies++;
+          } else
+            ma57->nrestarts++;
           HSL_Free( ma57->fact );
           ma57->fact = newFact; newFact = NULL;
           ma57->lfact = newSize;
+          ma57->nrealloc++;
 
         } else if( error == -4 || error == 11 ) {
 
           /* Resize integer workspace */
-          newSize = (error == 11) ? ma57->lifact : ma57->info[17];
-          newSize = ceil( LIFACT_GROW * newSize );
+          newSize = ceil( ma57->fact_grow * ma57->lifact );
+          if( error == -4 )
+            newSize = imax( newSize, ceil( LIFACT_GROW * ma57->info[17] ) );
+          LOGEVENT( HSL_EVENT_RESIZE_INT, error, ma57->lifact, newSize, 0.0 );
           newIfact = (int *)HSL_Calloc( newSize, sizeof(int) );
-          MA57ED( &(ma57->n), &one, ma57->keep, ma57->fact, &(ma57->lfact),
-                  NULL, &zero, ma57->ifact, &(ma57->lifact), newIfact, &newSize,
-                  ma57->info );
+          if( error == 11 ) {
+            MA57ED( &(ma57->n), &one, ma57->keep, ma57->fact, &(ma57->lfact),
+                    NULL, &zero, ma57->ifact, &(ma57->lifact), newIfact,
+                    &newSize, ma57->info );
+            ma57->ncopies++;
+          } else
+            ma57->nrestarts++;
           HSL_Free( ma57->ifact );
           ma57->ifact = newIfact; newIfact = NULL;
           ma57->lifact = newSize;
+          ma57->nrealloc++;
 
         } else {
           finished = 1;
@@ -172,63 +300,279 @@ extern "C" {   /* To prevent C++ compilers from mangling symbols */
       }
     }
 
-    LOGMSG( "         done\n");
+    /* Remember the sizes that sufficed so that a new analysis of the same
+     * pattern starts from them */
+    if( ma57->nrestarts || ma57->ncopies ) {
+      ma57->lfact_min = imax( ma57->lfact_min, ma57->lfact );
+      ma57->lifact_min = imax( ma57->lifact_min, ma57->lifact );
+    }
+
+    LOGEVENT( HSL_EVENT_FACTORIZE, ma57->info[0], ma57->info[14],
+              ma57->info[15], ma57->cntl[0] );
     return 0;
   }
 
   /* ================================================================= */
 
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma57_Factorize_Inertia"
+  int Ma57_Factorize_Inertia( Ma57_Data *ma57, hsl_real A[], int npos,
+                              int nneg, hsl_real *delta, hsl_real delta_max,
+                              hsl_real grow, int *ntrials ) {
+
+    /* Factorize A + delta diag(1,...,1,0,...,0), where the first npos
+     * diagonal entries are shifted, with delta = 0, *delta,
+     * grow * (*delta), ... until the inertia is (npos, nneg, n-npos-nneg).
+     * Only diagonal entries stored in A are shifted. On return, A holds
+     * its original values and *delta the shift of the last factorization.
+     * Returns 0 on success, INERTIA_FAIL if the shift would exceed
+     * delta_max, or the error code of the factorization. On INERTIA_FAIL,
+     * the factors are those of A, which is factorized again if it was
+     * shifted.
+     */
+    int      *diag;
+    hsl_real *diag0, shift = 0.0, next;
+    int       i, k, ndiag = 0, neig, error;
+
+    diag  = (int *)HSL_Calloc( imax(npos,1), sizeof(int) );
+    diag0 = (hsl_real *)HSL_Calloc( imax(npos,1), sizeof(hsl_real) );
+    if( !diag || !diag0 ) {
+      HSL_Free( diag );
+      HSL_Free( diag0 );
+      return -10;
+    }
+
+    /* Find the first stored diagonal entry of each shifted row */
+    for( i = 0; i < npos; i++ ) diag[i] = -1;
+    for( k = 0; k < ma57->nz; k++ ) {
+      i = ma57->irn[k] - 1;
+      if( i == ma57->jcn[k] - 1 && i < npos && diag[i] < 0 ) diag[i] = k;
+    }
+    for( i = 0; i < npos; i++ )
+      if( diag[i] >= 0 ) {
+        diag[ndiag] = diag[i];
+        diag0[ndiag++] = A[diag[i]];
+      }
+
+    for( *ntrials = 1; ; (*ntrials)++ ) {
+      for( k = 0; k < ndiag; k++ ) A[diag[k]] = diag0[k] + shift;
+      error = Ma57_Factorize( ma57, A );
+      if( error ) break;
+      neig = ma57->info[23];
+      LOGEVENT( HSL_EVENT_SHIFT, 0, ma57->info[24] - neig, neig, shift );
+      if( ma57->info[24] - neig == npos && neig == nneg ) break;
+      next = (shift == 0.0) ? *delta : grow * shift;
+      if( next <= shift || next > delta_max ) {
+        error = INERTIA_FAIL;
+        break;
+      }
+      shift = next;
+    }
+
+    for( k = 0; k < ndiag; k++ ) A[diag[k]] = diag0[k];
+    *delta = shift;
+    if( error == INERTIA_FAIL && shift != 0.0 ) {
+      k = Ma57_Factorize( ma57, A );
+      if( k ) error = k;
+    }
+    HSL_Free( diag );
+    HSL_Free( diag0 );
+    return error;
+  }
+
+  /* ================================================================= */
+
 #ifdef  __FUNCT__
 #undef  __FUNCT__
 #endif
 #define __FUNCT__ "Ma57_Solve"
-  int Ma57_Solve( Ma57_Data *ma57, double x[] ) {
+  int Ma57_Solve( Ma57_Data *ma57, hsl_real x[] ) {
 
-    int finished = 0, error;
+    return Ma57_Solve_Many( ma57, x, 1, ma57->n );
+  }
 
-    LOGMSG( " MA57 :: Solving..." );
+  /* ================================================================= */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma57_Solve_Many"
+  int Ma57_Solve_Many( Ma57_Data *ma57, hsl_real x[], int nrhs, int lrhs ) {
+
+    int finished = 0, error;
 
     ma57->job = 1;
-    ma57->lrhs = ma57->n;
-    ma57->nrhs = 1;
-    ma57->lwork = ma57->n * ma57->nrhs;
-    if( !ma57->work )
-      ma57->work = (double *)HSL_Calloc( ma57->lwork, sizeof(double) );
+    ma57->lrhs = lrhs;
+    ma57->nrhs = nrhs;
+    ma57->nsolves++;
 
-    while( !finished ) {
-      LOGMSG( "\n         calling ma57cd... " );
+    /* MA57CD needs lwork >= n * nrhs. */
+    if( Ma57_Reserve_Work( ma57, ma57->n * nrhs ) ) return -10;
 
-      /* Unpack data structure and call MA57CD */
+    while( !finished ) {
+      /* Unpack data structure and call MA57CD. x holds the nrhs columns of
+       * the right-hand side with leading dimension lrhs and is overwritten
+       * by the solution. */
       MA57CD( &(ma57->job), &(ma57->n), ma57->fact, &(ma57->lfact), ma57->ifact,
-              &(ma57->lifact), &ma57->nrhs, x, &(ma57->lrhs), ma57->work,
+              &(ma57->lifact), &(ma57->nrhs), x, &(ma57->lrhs), ma57->work,
               &(ma57->lwork), ma57->iwork, ma57->icntl, ma57->info );
 
       error = ma57->info[0];
       if( error == -17 ) {
-        HSL_Free( ma57->work );
-        ma57->lwork = ceil( 1.2 * ma57->lwork );
-        ma57->work = (double *)HSL_Calloc( ma57->lwork, sizeof(double) );
+        if( Ma57_Reserve_Work( ma57, ma57->lwork + 1 ) ) return -10;
       } else
         finished = 1;
       if( error ) error = Process_Error_Code( ma57, error );
     }
 
-    LOGMSG( " done\n" );
+    LOGEVENT( HSL_EVENT_SOLVE, error, nrhs, 0, 0.0 );
     return error;
   }
 
   /* ================================================================= */
 
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma57_Work_Initialize"
+  Ma57_Work *Ma57_Work_Initialize( int n ) {
+
+    /* The real workspace is allocated by the first solve. Returns NULL if
+     * memory could not be allocated. */
+    Ma57_Work *ws = (Ma57_Work *)HSL_Calloc( 1, sizeof(Ma57_Work) );
+
+    if( !ws ) return NULL;
+    ws->work   = NULL;
+    ws->lwork  = 0;
+    ws->iwork  = (int *)HSL_Calloc( imax(n,1), sizeof(int) );
+    ws->nalloc = 0;
+    if( !ws->iwork ) {
+      HSL_Free( ws );
+      return NULL;
+    }
+    return ws;
+  }
+
+  /* ================================================================= */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Reserve_Work"
+  static int Reserve_Work( Ma57_Work *ws, int lwork ) {
+
+    /* Same as Ma57_Reserve_Work, for the workspace ws. */
+    if( ws->work && ws->lwork >= lwork ) return 0;
+
+    if( ws->work ) lwork = imax( lwork, ceil( LWORK_GROW * ws->lwork ) );
+    HSL_Free( ws->work );
+    ws->work = (hsl_real *)HSL_Calloc( lwork, sizeof(hsl_real) );
+    ws->nalloc++;
+    if( !ws->work ) {
+      ws->lwork = 0;
+      return -10;
+    }
+    ws->lwork = lwork;
+    return 0;
+  }
+
+  /* ================================================================= */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma57_Solve_Work"
+  int Ma57_Solve_Work( const Ma57_Data *ma57, Ma57_Work *ws, hsl_real x[],
+                       int nrhs, int lrhs ) {
+
+    /* Same as Ma57_Solve_Many, with the workspace ws. ma57 is only read:
+     * several threads may call this function with the same factors, as long
+     * as each has its own ws and no thread factorizes at the same time.
+     * Nothing is logged; the info array of the solve is left in ws. */
+    int job = 1, n = ma57->n, lfact = ma57->lfact, lifact = ma57->lifact;
+    int icntl[20], i, lwork = n * nrhs;
+
+    for( i = 0; i < 20; i++ ) icntl[i] = ma57->icntl[i];
+
+    while( 1 ) {
+      /* MA57CD needs lwork >= n * nrhs. */
+      if( Reserve_Work( ws, lwork ) ) return -10;
+
+      MA57CD( &job, &n, ma57->fact, &lfact, ma57->ifact, &lifact, &nrhs, x,
+              &lrhs, ws->work, &(ws->lwork), ws->iwork, icntl, ws->info );
+
+      if( ws->info[0] != -17 ) break;
+      lwork = ws->lwork + 1;
+    }
+    return ws->info[0];
+  }
+
+  /* ================================================================= */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma57_Refine_Work"
+  int Ma57_Refine_Work( const Ma57_Data *ma57, Ma57_Work *ws, hsl_real x[],
+                        hsl_real rhs[], hsl_real A[], hsl_real resid[],
+                        int maxitref, int job ) {
+
+    /* Same as Ma57_Refine, with the workspace ws and the residual in resid.
+     * ma57 is only read, as in Ma57_Solve_Work. Nothing is logged; the info
+     * and rinfo arrays of the refinement are left in ws. */
+    int n = ma57->n, nz = ma57->nz, lfact = ma57->lfact,
+        lifact = ma57->lifact;
+    int icntl[20], i, lwork;
+    hsl_real cntl[5];
+
+    for( i = 0; i < 20; i++ ) icntl[i] = ma57->icntl[i];
+    for( i = 0; i < 5; i++ ) cntl[i] = ma57->cntl[i];
+
+    /* Make sure the work space is large enough. iwork holds the n entries
+     * required by MA57DD. */
+    icntl[8] = imax( 1, maxitref );  // Number of refinement iterations
+    lwork = n;
+    if( icntl[8] > 1 ) {
+      lwork += 2 * n;
+      if( icntl[9] > 0 )
+        lwork += 2 * n;
+    }
+    if( Reserve_Work( ws, lwork ) ) return -10;
+
+    MA57DD( &job, &n, &nz, A, ma57->irn, ma57->jcn, ma57->fact, &lfact,
+            ma57->ifact, &lifact, rhs, x, resid, ws->work, ws->iwork, icntl,
+            cntl, ws->info, ws->rinfo );
+    return ws->info[0];
+  }
+
+  /* ================================================================= */
+
+#ifdef  __FUNCT__
+#undef  __FUNCT__
+#endif
+#define __FUNCT__ "Ma57_Work_Finalize"
+  void Ma57_Work_Finalize( Ma57_Work *ws ) {
+
+    HSL_Free( ws->work );
+    HSL_Free( ws->iwork );
+    HSL_Free( ws );
+    return;
+  }
+
+  /* ================================================================= */
+
 #ifdef  __FUNCT__
 #undef  __FUNCT__
 #endif
 #define __FUNCT__ "Ma57_Refine"
-  int Ma57_Refine( Ma57_Data *ma57, double x[], double rhs[],
-                   double A[], int maxitref, int job ) {
+  int Ma57_Refine( Ma57_Data *ma57, hsl_real x[], hsl_real rhs[],
+                   hsl_real A[], int maxitref, int job ) {
     
-    int error;
+    int error, lwork;
 
-    LOGMSG( " MA57 :: Performing iterative refinement..." );
+    ma57->nsolves++;
 
     ma57->job = job;
     /* For values of 'job' that demand the presence of the residual,
@@ -236,19 +580,16 @@ extern "C" {   /* To prevent C++ compilers from mangling symbols */
      * this function.
      */
 
-    /* Allocate work space */
+    /* Make sure the work space is large enough. iwork always holds at
+     * least the n entries required by MA57DD. */
     ma57->icntl[8] = imax( 1, maxitref );  // Number of refinement iterations
-    HSL_Free( ma57->iwork );
-    ma57->iwork = (int *)HSL_Calloc( ma57->n, sizeof(int) );
-
-    HSL_Free( ma57->work );
-    ma57->lwork = ma57->n;
+    lwork = ma57->n;
     if( ma57->icntl[8] > 1 ) {
-      ma57->lwork += 2 * ma57->n;
+      lwork += 2 * ma57->n;
       if( ma57->icntl[9] > 0 )
-        ma57->lwork += 2 * ma57->n;
+        lwork += 2 * ma57->n;
     }
-    ma57->work = (double *)HSL_Calloc( ma57->lwork, sizeof(double) );
+    if( Ma57_Reserve_Work( ma57, lwork ) ) return -10;
 
     /* Perform iterative refinement */
     MA57DD( &(ma57->job), &(ma57->n), &(ma57->nz), A, ma57->irn, ma57->jcn,
@@ -258,7 +599,7 @@ extern "C" {   /* To prevent C++ compilers from mangling symbols */
 
     error = ma57->info[0];
     if( error ) error = Process_Error_Code(ma57, ma57->info[0]);
-    LOGMSG( " done\n" );
+    LOGEVENT( HSL_EVENT_REFINE, error, ma57->info[29], 0, ma57->rinfo[9] );
     return error;
   }
 
@@ -271,7 +612,7 @@ extern "C" {   /* To prevent C++ compilers from mangling symbols */
   void Ma57_Finalize( Ma57_Data *ma57 ) {
 
     /* Free allocated memory */
-    LOGMSG( " MA57 :: Deallocating data arrays..." );
+    HSL_Log_Free( &(ma57->eventlog) );
     HSL_Free( ma57->irn );
     HSL_Free( ma57->jcn );
     HSL_Free( ma57->keep );
@@ -280,7 +621,6 @@ extern "C" {   /* To prevent C++ compilers from mangling symbols */
     HSL_Free( ma57->ifact );
     //HSL_Free( ma57->rhs );
     HSL_Free( ma57->work );
-    LOGMSG( " done.\n" );
     free(ma57); //HSL_Free( ma57 );
     return;
   }
@@ -293,133 +633,28 @@ extern "C" {   /* To prevent C++ compilers from mangling symbols */
 #define __FUNCT__ "Process_Error_Code"
   int Process_Error_Code( Ma57_Data *ma57, int nerror ) {
 
-    LOGMSG( " [%3d]", nerror );
-    /* Take appropriate action according to error code */
-    /* Inflation factors are from the MA57 spec sheet  */
+    /* Resizes of fact, ifact (-3, -4, 10, 11) and work (-17) are logged
+     * where they are performed. Any other warning or error is logged with
+     * info[1], which holds the offending value for most errors. */
     switch( nerror ) {
 
     case 0:
+    case -3: case -4: case 10: case 11: case -17:
       break;
 
       /* Warnings */
-    case 1:
-      LOGMSG( " Found and ignored %d indices out of range.\n", ma57->info[2] );
-      break;
-
-    case 2:
-      LOGMSG( " Found and summed %d duplicate entries.\n", ma57->info[3] );
-      break;
-
-    case 3:
-      LOGMSG( " Found duplicate and out-of-range indices.\n" );
-      break;
-
-    case 4:
-      LOGMSG( " Matrix has rank %d, deficient.\n", ma57->info[24] );
-      break;
-
-    case 5:
-      LOGMSG( " Found %d pivot sign changes in definite matrix.\n",
-              ma57->info[25] );
-      break;
-
-    case 8:
-      LOGMSG( " Infinity norm of solution found to be zero.\n" );
-
-      break;
-
-    case 10:
-      LOGMSG( " Insufficient real space. Increased LFACT to %d.\n",
-              ma57->lfact );
-      break;
-
-    case 11:
-      LOGMSG( " Insufficient integer space. Increased LIFACT to %d.\n",
-              ma57->lifact );
-      break;
+    case 1: case 2: case 3: case 4: case 5: case 8:
 
       /* Errors */
-    case -1:
-      LOGMSG( " Value of n is out of range: %d.\n", ma57->info[1] );
-      break;
-
-    case -2:
-      LOGMSG( " Value of nz is out of range: %d.\n", ma57->info[2] );
-      break;
-
-    case -3:
-      LOGMSG( " Adjusted size of array FACT to %d.\n", ma57->lfact );
-      break;
-
-    case -4:
-      LOGMSG( " Adjusting size of array IFACT to %d.\n", ma57->lifact );
-      break;
-
-    case -5:
-      LOGMSG( " Small pivot encountered at pivot step %d. Threshold = %lf.\n",
-              ma57->info[1], ma57->cntl[1] );
-
-    case -6:
-      LOGMSG( " Change in pivot sign detected at pivot step %d.\n",
-              ma57->info[1] );
-      break;
-
-    case -7:
-      LOGMSG( " Erroneous sizing of array FACT or IFACT.\n" );
-      break;
-
-    case -8:
-      LOGMSG( " Iterative refinement failed to converge.\n" );
-      break;
-
-    case -9:
-      LOGMSG( " Error in user-supplied permutation array in component %d.\n",
-              ma57->info[1] );
-      break;
-
-    case -10:
-      LOGMSG( " Unknown pivoting strategy: %d\n.", ma57->info[1] );
-      break;
-
-    case -11:
-      LOGMSG( " Size of RHS must be %d. Received %d.\n",
-              ma57->n, ma57->info[1] );
-      break;
-
-    case -12:
-      LOGMSG( " Invalid value of JOB (%d).\n", ma57->info[1] );
-      break;
-
-    case -13:
-      LOGMSG( " Invalid number of iterative refinement steps (%d).\n",
-              ma57->info[1] );
-      break;
-
-    case -14:
-      LOGMSG( " Failed to estimate condition number.\n" );
-      break;
-
-    case -15:
-      LOGMSG( " LKEEP has value %d, less than minimum allowed.\n",
-              ma57->info[1] );
-      break;
-
-    case -16:
-      LOGMSG( " Invalid number of RHS (%d).\n", ma57->info[1] );
-      break;
-
-    case -17:
-      LOGMSG( " Increasing size of LWORK to %d.\n", ma57->lwork );
-      break;
-
-    case -18:
-      LOGMSG( " MeTiS library not available or not found.\n" );
+    case -1: case -2: case -5: case -6: case -7: case -8: case -9: case -10:
+    case -11: case -12: case -13: case -14: case -15: case -16: case -18:
+      LOGEVENT( HSL_EVENT_ERROR, nerror, ma57->info[1], 0, 0.0 );
       break;
 
     default:
-      LOGMSG( " Unrecognized flag from Factorize()." );
+      LOGEVENT( HSL_EVENT_ERROR, nerror, ma57->info[1], 0, 0.0 );
       nerror = -30;
-    }    
+    }
     return nerror;
   }
 
@@ -16,6 +16,68 @@
 #define FUNDERSCORE(a) a##_
 #endif
 
+/* Real type. Define HSL_FLOAT32 to build the interfaces to the single
+ * precision HSL routines instead of the double precision ones.
+ */
+
+#ifdef HSL_FLOAT32
+typedef float  hsl_real;
+#define HSL_PREC(s,d) s
+#else
+typedef double hsl_real;
+#define HSL_PREC(s,d) d
+#endif
+
+#define HSL_COPY  HSL_PREC(cblas_scopy,  cblas_dcopy)
+#define HSL_AXPY  HSL_PREC(cblas_saxpy,  cblas_daxpy)
+#define HSL_IAMAX HSL_PREC(cblas_isamax, cblas_idamax)
+
+/* Binary event log. Each solver records its phases, workspace resizes,
+ * pivot tolerance changes, inertia corrections and error codes in a ring
+ * buffer that holds the last HSL_LOG_SIZE events. Logging an event costs a
+ * clock read and a few stores, so the log is always on.
+ */
+
+#define HSL_LOG_SIZE 256
+
+enum {
+  HSL_EVENT_INIT = 0,      /* size1 = n, size2 = nz                       */
+  HSL_EVENT_ANALYZE,       /* size1, size2 = predicted real, int storage  */
+  HSL_EVENT_FACTORIZE,     /* size1, size2 = real, int storage            */
+  HSL_EVENT_SOLVE,         /* size1 = nrhs                                */
+  HSL_EVENT_REFINE,        /* size1 = # steps, value = residual norm
+                            * (relative for MA57)                       */
+  HSL_EVENT_RESIZE_REAL,   /* size1 = old size, size2 = new size          */
+  HSL_EVENT_RESIZE_INT,    /* size1 = old size, size2 = new size          */
+  HSL_EVENT_RESIZE_WORK,   /* size1 = old size, size2 = new size          */
+  HSL_EVENT_PIVOT_TOL,     /* size1 = info[1], value = new tolerance      */
+  HSL_EVENT_SHIFT,         /* size1, size2 = # positive, negative eigs,
+                            * value = diagonal shift                      */
+  HSL_EVENT_ERROR          /* code = error (< 0) or warning (> 0),
+                            * size1 = info[1]                             */
+};
+
+typedef struct HSL_Event {
+  double  time;                 /* Seconds since the epoch   */
+  double  value;                /* Tolerance, shift or norm  */
+  int     event;                /* One of HSL_EVENT_*        */
+  int     code;                 /* HSL return code           */
+  int     size1, size2;
+} HSL_Event;
+
+typedef struct HSL_Log {
+  HSL_Event *events;            /* Ring buffer               */
+  int        size;              /* Capacity of the buffer    */
+  long       count;             /* # events ever logged      */
+} HSL_Log;
+
+void HSL_Log_Init( HSL_Log *elog, int size );
+void HSL_Log_Event( HSL_Log *elog, int event, int code, int size1,
+                    int size2, double value );
+int  HSL_Log_Copy( const HSL_Log *elog, HSL_Event events[] );
+void HSL_Log_Clear( HSL_Log *elog );
+void HSL_Log_Free( HSL_Log *elog );
+
 /* Memory allocation routines */
 
 void *HSL_Malloc( void *object, int length, size_t s );
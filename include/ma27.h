@@ -11,43 +11,71 @@
 
 #include "hslpy.h"
 
-#define LOGMSG(...) if (ma27->logfile) fprintf(ma27->logfile, __VA_ARGS__);
+#define LOGEVENT(event, code, size1, size2, value) \
+    HSL_Log_Event( &(ma27->eventlog), event, code, size1, size2, value )
 
-#define MA27ID        FUNDERSCORE(ma27id)
-#define MA27AD        FUNDERSCORE(ma27ad)
-#define MA27BD        FUNDERSCORE(ma27bd)
-#define MA27CD        FUNDERSCORE(ma27cd)
+#define MA27ID HSL_PREC(FUNDERSCORE(ma27i), FUNDERSCORE(ma27id))
+#define MA27AD HSL_PREC(FUNDERSCORE(ma27a), FUNDERSCORE(ma27ad))
+#define MA27BD HSL_PREC(FUNDERSCORE(ma27b), FUNDERSCORE(ma27bd))
+#define MA27CD HSL_PREC(FUNDERSCORE(ma27c), FUNDERSCORE(ma27cd))
 #define MA27FACTORS   FUNDERSCORE(ma27factors)
 #define MA27QDEMASC   FUNDERSCORE(ma27qdemasc)
 
 typedef struct Ma27_Data {
     int     n, nz;               /* Order and #nonzeros */
     int     icntl[30], info[20];
-    double  cntl[5];
+    hsl_real cntl[5];
     int    *irn, *icn;           /* Sparsity pattern    */
     int    *iw, liw;             /* Integer workspace   */
     int    *ikeep;               /* Pivot sequence      */
     int    *iw1;                 /* Integer workspace   */
     int     nsteps;
     int     iflag;               /* Pivot selection     */
-    double  ops;                 /* Operation count     */
+    hsl_real ops;                /* Operation count     */
 
     char    rankdef;             /* Indicate whether matrix is rank-deficient */
     int     rank;                /* Matrix rank         */
 
     int     la;
-    double *factors;             /* Matrix factors      */
+    hsl_real *factors;           /* Matrix factors      */
+    int     nrealloc;            /* # times iw or factors grew */
+    hsl_real headroom;           /* la, liw = headroom * predictions */
+    int     la_min, liw_min;     /* Sizes that sufficed in a factorization */
+    int     npivtol;             /* # pivot tolerance increases in last
+                                  * factorization */
+    int     nclean;              /* # factorizations since the last increase */
+    int     relax_after;         /* Relax the pivot tolerance after this many
+                                  * clean factorizations (0: never) */
+    hsl_real pivtol_min;         /* Lowest pivot tolerance when relaxing */
     int     maxfrt;
-    double *w;                   /* Real workspace      */
+    hsl_real *w;                 /* Real workspace      */
+    int     nworkalloc;          /* # allocations of solve workspaces */
+    int     nsolves;             /* # calls to Solve and Refine */
 
-    double *residual;            /* = b - Ax            */
+    hsl_real *residual;          /* = b - Ax            */
 
     char    fetched;             /* Factors have been fetched
                                   * Used for de-allocation
                                   */
-    FILE   *logfile;             /* File for log output */
+    HSL_Log eventlog;            /* Ring buffer of events */
 } Ma27_Data;
 
+/* Workspace of a solve or a refinement. It is kept apart from the factors,
+ * so that several threads may solve with the same factorization at the same
+ * time, each with its own workspace. */
+typedef struct Ma27_Work {
+    hsl_real *w;                 /* Real workspace, size maxfrt  */
+    int     lw;
+    int    *iw1;                 /* Integer workspace, size nsteps */
+    int     liw1;
+    hsl_real *d;                 /* Refinement correction, size n */
+    int     ld;
+    int     info[20];            /* info of the last solve */
+    int     nitref;              /* # steps of the last refinement */
+    hsl_real resid_norm;         /* Residual norm of the last refinement */
+    int     nalloc;              /* # allocations of w, iw1 or d */
+} Ma27_Work;
+
 /* Below I indicate arrays of fixed length by specifying it
  * explicitly, e.g. icntl[30], arrays of variable length by
  * specifying it implicitly, e.g. iw[]. The remaining variables
@@ -55,17 +83,17 @@ typedef struct Ma27_Data {
  * size is fixed, but depends on the value of other parameters.
  */
 
-extern void MA27ID( int icntl[30], double cntl[5] );
+extern void MA27ID( int icntl[30], hsl_real cntl[5] );
 extern void MA27AD( int *n, int *nz, int *irn, int *icn, int iw[],
 		    int *liw, int *ikeep, int *iw1, int *nsteps,
-		    int *iflag, int icntl[30], double cntl[5],
-		    int info[20], double *ops );
+		    int *iflag, int icntl[30], hsl_real cntl[5],
+		    int info[20], hsl_real *ops );
 extern void MA27BD( int *n, int *nz, int *irn, int *icn,
-		    double *a, int *la, int iw[], int *liw,
+		    hsl_real *a, int *la, int iw[], int *liw,
 		    int *ikeep, int *nsteps, int *maxfrt, int *iw1,
-		    int icntl[30], double cntl[5], int info[20] );
-extern void MA27CD( int *n, double *a, int *la, int iw[], int *liw,
-		    double *w, int *maxfrt, double *rhs, int *iw1,
+		    int icntl[30], hsl_real cntl[5], int info[20] );
+extern void MA27CD( int *n, hsl_real *a, int *la, int iw[], int *liw,
+		    hsl_real *w, int *maxfrt, hsl_real *rhs, int *iw1,
 		    int *nsteps, int icntl[30], int info[20] );
 extern void MA27FACTORS( int *n, double a[], int *la, int iw[],
                          int *liw, int *maxfrt,
@@ -79,15 +107,42 @@ extern void MA27QDEMASC( int *n, int iw[], int *liwm1, int iw2[],
 
 /* Interfaces to the above MA27 subroutines */
 
-Ma27_Data * Ma27_Initialize(    int nz,          int n, FILE *logfile );
+Ma27_Data * Ma27_Initialize(    int nz,          int n, int logsize );
 int         Ma27_Analyze(       Ma27_Data *data, int iflag  );
-int         Ma27_Factorize(     Ma27_Data *data, double A[] );
-int         Ma27_Solve(         Ma27_Data *data, double x[] );
-int         Ma27_Refine(        Ma27_Data *data, double x[], double rhs[],
-                                double A[], double tol, int maxitref );
+int         Ma27_Analyze_Perm(  Ma27_Data *data, const int perm[] );
+int         Ma27_Allocate_Factors( Ma27_Data *data           );
+Ma27_Data * Ma27_Copy_Analysis( const Ma27_Data *data );
+int         Ma27_Factorize(     Ma27_Data *data, hsl_real A[] );
+int         Ma27_Factorize_Inertia( Ma27_Data *data, hsl_real A[], int npos,
+                                    int nneg, hsl_real *delta,
+                                    hsl_real delta_max, hsl_real grow,
+                                    int *ntrials );
+int         Ma27_Solve(         Ma27_Data *data, hsl_real x[] );
+int         Ma27_Solve_Many(    Ma27_Data *data, hsl_real x[], int nrhs,
+                                int ldx );
+Ma27_Work * Ma27_Work_Initialize( void );
+int         Ma27_Solve_Work(    const Ma27_Data *data, Ma27_Work *ws,
+                                hsl_real x[], int nrhs, int ldx );
+void        Ma27_Work_Finalize( Ma27_Work *ws );
+void        Ma27_Residual(      const Ma27_Data *data, hsl_real A[], hsl_real x[],
+                                hsl_real rhs[], hsl_real resid[], int nrhs,
+                                int ldx );
+int         Ma27_Refine(        Ma27_Data *data, hsl_real x[], hsl_real rhs[],
+                                hsl_real A[], hsl_real tol, int maxitref );
+int         Ma27_Refine_Work(   const Ma27_Data *data, Ma27_Work *ws,
+                                hsl_real x[], hsl_real rhs[], hsl_real A[],
+                                hsl_real resid[], hsl_real tol, int maxitref );
 void        Ma27_Finalize(      Ma27_Data *data             );
+int         Ma27_Factorize_Solve_Batch( const Ma27_Data *data, int nbatch,
+                                        hsl_real values[], int ldv,
+                                        hsl_real x[], int ldx, int status[],
+                                        int inertia[], int nthreads );
 int         Process_Error_Code( Ma27_Data *data, int error  );
 
 #define LIW_MIN    500
+#define HEADROOM   1.2   /* Default headroom over the predicted storage */
 #define PIV_MIN   -0.5
 #define PIV_MAX    0.5
+#define PIV_RELAX  100.0 /* Pivot tolerance is raised and relaxed by this */
+
+#define INERTIA_FAIL 20   /* Inertia could not be corrected */
@@ -11,43 +11,66 @@
 
 #include "hslpy.h"
 
-#define LOGMSG(...) if (ma57->logfile) fprintf(ma57->logfile, __VA_ARGS__)
+#define LOGEVENT(event, code, size1, size2, value) \
+  HSL_Log_Event( &(ma57->eventlog), event, code, size1, size2, value )
 
-#define MA57ID    FUNDERSCORE(ma57id)
-#define MA57AD    FUNDERSCORE(ma57ad)
-#define MA57BD    FUNDERSCORE(ma57bd)
-#define MA57CD    FUNDERSCORE(ma57cd)
-#define MA57DD    FUNDERSCORE(ma57dd)
-#define MA57ED    FUNDERSCORE(ma57ed)
+#define MA57ID HSL_PREC(FUNDERSCORE(ma57i), FUNDERSCORE(ma57id))
+#define MA57AD HSL_PREC(FUNDERSCORE(ma57a), FUNDERSCORE(ma57ad))
+#define MA57BD HSL_PREC(FUNDERSCORE(ma57b), FUNDERSCORE(ma57bd))
+#define MA57CD HSL_PREC(FUNDERSCORE(ma57c), FUNDERSCORE(ma57cd))
+#define MA57DD HSL_PREC(FUNDERSCORE(ma57d), FUNDERSCORE(ma57dd))
+#define MA57ED HSL_PREC(FUNDERSCORE(ma57e), FUNDERSCORE(ma57ed))
 
 typedef struct Ma57_Data {
   int       n, nz;               /* Order and #nonzeros */
   int       icntl[20], info[40];
-  double    cntl[5];
-  double    rinfo[20];
+  hsl_real  cntl[5];
+  hsl_real  rinfo[20];
   int      *irn, *jcn;           /* Sparsity pattern    */
   int       lkeep, *keep;        /* Pivot sequence      */
   int      *iwork;               /* Wokspace array      */
-  double   *fact;                /* Matrix factors      */
+  int       liwork;              /* Size of array iwork */
+  hsl_real *fact;                /* Matrix factors      */
   int       lfact;               /* Size of array fact  */
   int      *ifact;               /* Indexing of factors */
   int       lifact;              /* Size of array ifact */
   int       job;
   int       nrhs;                /* Number of rhs       */
-  double   *rhs;                 /* Right-hand sides    */
+  hsl_real *rhs;                 /* Right-hand sides    */
   int       lrhs;                /* Leading dim of rhs  */
-  double   *work;                /* Real workspace      */
+  hsl_real *work;                /* Real workspace      */
   int       lwork;               /* Size of array work  */
+  int       nworkalloc;          /* # allocations of work          */
+  int       nsolves;             /* # calls to Solve and Refine   */
+  int       nrealloc;            /* # times fact or ifact grew     */
+  int       nrestarts;           /* # restarts (-3, -4) and copies */
+  int       ncopies;             /* by MA57ED (10, 11) in the last
+                                  * factorization                  */
+  hsl_real  fact_grow;           /* Growth of fact and ifact       */
+  int       lfact_min;           /* Sizes of fact and ifact that   */
+  int       lifact_min;          /* sufficed in a factorization    */
   int       calledcd;            /* Flag for MA57DD     */
-  double   *x;                   /* Solution to Ax=rhs  */
-  double   *residual;            /* = A x - rhs         */
+  hsl_real *x;                   /* Solution to Ax=rhs  */
+  hsl_real *residual;            /* = A x - rhs         */
   char      fetched;             /* Factors were fetched
                                   * Used for de-allocation
                                   */
   int       rank, rankdef;
-  FILE     *logfile;             /* File for log output */
+  HSL_Log   eventlog;            /* Ring buffer of events */
 } Ma57_Data;
 
+/* Workspace of a solve or a refinement. It is kept apart from the factors,
+ * so that several threads may solve with the same factorization at the same
+ * time, each with its own workspace. */
+typedef struct Ma57_Work {
+  hsl_real *work;                /* Real workspace      */
+  int       lwork;               /* Size of array work  */
+  int      *iwork;               /* Integer workspace, size n */
+  int       info[40];            /* info of the last solve */
+  hsl_real  rinfo[20];           /* rinfo of the last refinement */
+  int       nalloc;              /* # allocations of work */
+} Ma57_Work;
+
 /* Below I indicate arrays of fixed length by specifying it
  * explicitly, e.g. icntl[30], arrays of variable length by
  * specifying it implicitly, e.g. iw[]. The remaining variables
@@ -55,37 +78,72 @@ typedef struct Ma57_Data {
  * size is fixed, but depends on the value of other parameters.
  */
 
-extern void MA57ID( double cntl[5], int icntl[20] );
+extern void MA57ID( hsl_real cntl[5], int icntl[20] );
 extern void MA57AD( int *n, int *ne, int irn[], int jcn[],
                     int *lkeep, int keep[], int iwork[], int icntl[20],
-                    int info[40], double rinfo[20] );
-extern void MA57BD( int *n, int *ne, double a[], double fact[], int *lfact,
+                    int info[40], hsl_real rinfo[20] );
+extern void MA57BD( int *n, int *ne, hsl_real a[], hsl_real fact[], int *lfact,
                     int ifact[], int *lifact, int *lkeep, int keep[],
-                    int iwork[], int icntl[20], double cntl[5],
-                    int info[40], double rinfo[20] );
-extern void MA57CD( int *job, int *n, double fact[], int *lfact,
-                    int ifact[], int *lifact, int *nrhs, double rhs[],
-                    int *lrhs, double work[], int *lwork, int iwork[],
+                    int iwork[], int icntl[20], hsl_real cntl[5],
+                    int info[40], hsl_real rinfo[20] );
+extern void MA57CD( int *job, int *n, hsl_real fact[], int *lfact,
+                    int ifact[], int *lifact, int *nrhs, hsl_real rhs[],
+                    int *lrhs, hsl_real work[], int *lwork, int iwork[],
                     int icntl[20], int info[40] );
-extern void MA57DD( int *job, int *n, int *ne, double a[], int irn[],
-                    int jcn[], double fact[], int *lfact, int ifact[],
-                    int *lifact, double rhs[], double x[], double resid[],
-                    double work[], int iwork[], int icntl[20], double cntl[5],
-                    int info[40], double rinfo[20] );
-extern void MA57ED( int *n, int *ic, int keep[], double fact[], int *lfact,
-                    double newfac[], int *lnew, int ifact[], int *lifact,
+extern void MA57DD( int *job, int *n, int *ne, hsl_real a[], int irn[],
+                    int jcn[], hsl_real fact[], int *lfact, int ifact[],
+                    int *lifact, hsl_real rhs[], hsl_real x[], hsl_real resid[],
+                    hsl_real work[], int iwork[], int icntl[20], hsl_real cntl[5],
+                    int info[40], hsl_real rinfo[20] );
+extern void MA57ED( int *n, int *ic, int keep[], hsl_real fact[], int *lfact,
+                    hsl_real newfac[], int *lnew, int ifact[], int *lifact,
                     int newifc[], int *linew, int info[40] );
 
+/* One of a batch of independent systems. irn and jcn are 1-based. */
+typedef struct Ma57_System {
+  int       n, nz;               /* Order and #nonzeros */
+  int      *irn, *jcn;           /* Sparsity pattern    */
+  hsl_real *a;                   /* Values              */
+  hsl_real *x;                   /* rhs on entry, solution on exit */
+  int       status;              /* First nonzero error code       */
+  int       npos, nneg;          /* Inertia             */
+} Ma57_System;
+
 /* Interfaces to the above MA57 subroutines */
 
-Ma57_Data *Ma57_Initialize( int nz, int n, FILE *logfile );
+Ma57_Data *Ma57_Initialize( int nz, int n, int logsize );
 int  Ma57_Analyze( Ma57_Data *ma57 );
-int  Ma57_Factorize( Ma57_Data *ma57, double A[] );
-int  Ma57_Solve( Ma57_Data *ma57, double x[] );
-int  Ma57_Refine( Ma57_Data *ma57, double x[], double rhs[], double A[],
+int  Ma57_Analyze_Perm( Ma57_Data *ma57, const int perm[] );
+void Ma57_Allocate_Factors( Ma57_Data *ma57 );
+Ma57_Data *Ma57_Copy_Analysis( const Ma57_Data *ma57 );
+int  Ma57_Reserve_Work( Ma57_Data *ma57, int lwork );
+int  Ma57_Factorize( Ma57_Data *ma57, hsl_real A[] );
+int  Ma57_Factorize_Inertia( Ma57_Data *ma57, hsl_real A[], int npos,
+                             int nneg, hsl_real *delta, hsl_real delta_max,
+                             hsl_real grow, int *ntrials );
+int  Ma57_Solve( Ma57_Data *ma57, hsl_real x[] );
+int  Ma57_Solve_Many( Ma57_Data *ma57, hsl_real x[], int nrhs, int lrhs );
+Ma57_Work *Ma57_Work_Initialize( int n );
+int  Ma57_Solve_Work( const Ma57_Data *ma57, Ma57_Work *ws, hsl_real x[],
+                      int nrhs, int lrhs );
+int  Ma57_Refine_Work( const Ma57_Data *ma57, Ma57_Work *ws, hsl_real x[],
+                       hsl_real rhs[], hsl_real A[], hsl_real resid[],
+                       int maxitref, int job );
+void Ma57_Work_Finalize( Ma57_Work *ws );
+int  Ma57_Refine( Ma57_Data *ma57, hsl_real x[], hsl_real rhs[], hsl_real A[],
                   int maxitref, int job );
 void Ma57_Finalize(      Ma57_Data *ma57 );
+int  Ma57_Solve_Batch( Ma57_System systems[], int nsystems, int ordering,
+                       int nthreads );
+int  Ma57_Factorize_Solve_Batch( const Ma57_Data *ma57, int nbatch,
+                                 hsl_real values[], int ldv, hsl_real x[],
+                                 int ldx, int status[], int inertia[],
+                                 int nthreads );
 int  Process_Error_Code( Ma57_Data *ma57, int nerror );
 
 #define LFACT_GROW  1.2
 #define LIFACT_GROW 1.2
+#define FACT_GROW   2.0   /* Default growth of fact and ifact on restarts */
+#define LWORK_GROW  1.5
+
+#define INERTIA_FAIL 20   /* Inertia could not be corrected */
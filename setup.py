@@ -139,7 +139,7 @@ include_dirs = [numpy_include, 'include', '.']
 # Relevant files for building MA27 extension.
 ma27_src = ['ma27s.f', 'ma27d.f']
 libma27_src = ['ma27fact.f']
-pyma27_src = ['ma27_lib.c', 'hsl_alloc.c', '_pyma27.c']
+pyma27_src = ['ma27_lib.c', 'hsl_alloc.c', 'hsl_log.c', '_pyma27.c']
 
 # Build PyMA27
 ma27_sources = [os.path.join(hsl_rootdir, 'ma27', 'src', name) for name in ma27_src]
@@ -160,7 +160,7 @@ if files_exist(ma27_sources):
 # Build PyMA57
 ma57_src = ['ddeps.f', 'ma57d.f', 'sdeps.f', 'ma57s.f']
 ma57_sources = [os.path.join(hsl_rootdir, 'ma57', 'src', name) for name in ma57_src]
-pyma57_src = ['ma57_lib.c', 'hsl_alloc.c', '_pyma57.c']
+pyma57_src = ['ma57_lib.c', 'hsl_alloc.c', 'hsl_log.c', '_pyma57.c']
 pyma57_sources = [os.path.join('hsl','solvers','src',name) for name in pyma57_src]
 
 if files_exist(ma57_sources):
@@ -226,11 +226,13 @@ context_ext_params = copy.deepcopy(ext_params)
 if files_exist(ma27_sources):
     cyma27_src_INT32_FLOAT64 = ['ma27_lib.c',
                                               'hsl_alloc.c',
+                                              'hsl_log.c',
+                                              'ma27_batch.c',
                                               '_cyma27_base_INT32_FLOAT64.c']
     cyma27_sources_INT32_FLOAT64 = [os.path.join('hsl', 'solvers', 'src', name) for name in cyma27_src_INT32_FLOAT64]
 
     cyma27_base_ext_params_INT32_FLOAT64 = copy.deepcopy(ext_params)
-    cyma27_base_ext_params_INT32_FLOAT64['libraries'] = ['hsl_ma27']
+    cyma27_base_ext_params_INT32_FLOAT64['libraries'] = ['hsl_ma27', 'pthread']
     retval = os.getcwd()
     os.chdir('hsl/solvers/src')
     call(['cython', '_cyma27_base_INT32_FLOAT64.pyx'])
@@ -253,12 +255,14 @@ if files_exist(ma27_sources):
 if files_exist(ma57_sources):
     cyma57_src_INT32_FLOAT64 = ['ma57_lib.c',
                                               'hsl_alloc.c',
+                                              'hsl_log.c',
+                                              'ma57_batch.c',
                                               '_cyma57_base_INT32_FLOAT64.c']
     cyma57_sources_INT32_FLOAT64 = [os.path.join('hsl', 'solvers', 'src', name) for name in cyma57_src_INT32_FLOAT64]
 
     base_ext_params_INT32_FLOAT64 = copy.deepcopy(ext_params)
     base_ext_params_INT32_FLOAT64['library_dirs'] = [metis_dir]
-    base_ext_params_INT32_FLOAT64['libraries'] = [metis_lib, 'hsl_ma57']
+    base_ext_params_INT32_FLOAT64['libraries'] = [metis_lib, 'hsl_ma57', 'pthread']
     retval = os.getcwd()
     os.chdir('hsl/solvers/src')
     call(['cython', '_cyma57_base_INT32_FLOAT64.pyx'])
@@ -278,6 +282,70 @@ if files_exist(ma57_sources):
                      **numpy_ext_params_INT32_FLOAT64)
 
 
+# Single precision variants, built from the same C sources with HSL_FLOAT32
+if files_exist(ma27_sources):
+    cyma27_src_INT32_FLOAT32 = ['ma27_lib.c',
+                                              'hsl_alloc.c',
+                                              'hsl_log.c',
+                                              'ma27_batch.c',
+                                              '_cyma27_base_INT32_FLOAT32.c']
+    cyma27_sources_INT32_FLOAT32 = [os.path.join('hsl', 'solvers', 'src', name) for name in cyma27_src_INT32_FLOAT32]
+
+    cyma27_base_ext_params_INT32_FLOAT32 = copy.deepcopy(ext_params)
+    cyma27_base_ext_params_INT32_FLOAT32['define_macros'] = [('HSL_FLOAT32', None)]
+    cyma27_base_ext_params_INT32_FLOAT32['libraries'] = ['hsl_ma27', 'pthread']
+    retval = os.getcwd()
+    os.chdir('hsl/solvers/src')
+    call(['cython', '_cyma27_base_INT32_FLOAT32.pyx'])
+    os.chdir(retval)
+    config.add_extension(name='solvers.src._cyma27_base_INT32_FLOAT32',
+                         sources=cyma27_sources_INT32_FLOAT32,
+                         **cyma27_base_ext_params_INT32_FLOAT32)
+
+    retval = os.getcwd()
+    os.chdir('hsl/solvers/src')
+    call(['cython', '_cyma27_numpy_INT32_FLOAT32.pyx'])
+    os.chdir(retval)
+    cyma27_numpy_ext_params_INT32_FLOAT32 = copy.deepcopy(ext_params)
+    cyma27_numpy_ext_params_INT32_FLOAT32['define_macros'] = [('HSL_FLOAT32', None)]
+    config.add_extension(name="solvers.src._cyma27_numpy_INT32_FLOAT32",
+                         sources=['hsl/solvers/src/_cyma27_numpy_INT32_FLOAT32.c'],
+                         **cyma27_numpy_ext_params_INT32_FLOAT32)
+
+
+
+if files_exist(ma57_sources):
+    cyma57_src_INT32_FLOAT32 = ['ma57_lib.c',
+                                              'hsl_alloc.c',
+                                              'hsl_log.c',
+                                              'ma57_batch.c',
+                                              '_cyma57_base_INT32_FLOAT32.c']
+    cyma57_sources_INT32_FLOAT32 = [os.path.join('hsl', 'solvers', 'src', name) for name in cyma57_src_INT32_FLOAT32]
+
+    base_ext_params_INT32_FLOAT32 = copy.deepcopy(ext_params)
+    base_ext_params_INT32_FLOAT32['define_macros'] = [('HSL_FLOAT32', None)]
+    base_ext_params_INT32_FLOAT32['library_dirs'] = [metis_dir]
+    base_ext_params_INT32_FLOAT32['libraries'] = [metis_lib, 'hsl_ma57', 'pthread']
+    retval = os.getcwd()
+    os.chdir('hsl/solvers/src')
+    call(['cython', '_cyma57_base_INT32_FLOAT32.pyx'])
+    os.chdir(retval)
+    config.add_extension(
+                name='solvers.src._cyma57_base_INT32_FLOAT32',
+                sources=cyma57_sources_INT32_FLOAT32,
+                **base_ext_params_INT32_FLOAT32)
+
+    retval = os.getcwd()
+    os.chdir('hsl/solvers/src')
+    call(['cython', '_cyma57_numpy_INT32_FLOAT32.pyx'])
+    os.chdir(retval)
+    numpy_ext_params_INT32_FLOAT32 = copy.deepcopy(ext_params)
+    numpy_ext_params_INT32_FLOAT32['define_macros'] = [('HSL_FLOAT32', None)]
+    config.add_extension(name="solvers.src._cyma57_numpy_INT32_FLOAT32",
+                     sources=['hsl/solvers/src/_cyma57_numpy_INT32_FLOAT32.c'],
+                     **numpy_ext_params_INT32_FLOAT32)
+
+
 if build_cysparse_ext:
     if files_exist(ma27_sources):
         retval = os.getcwd()
@@ -301,6 +369,30 @@ if build_cysparse_ext:
                      sources=['hsl/solvers/src/_cyma57_cysparse_INT32_FLOAT64.c'],
                      **cyma57_cysparse_ext_params_INT32_FLOAT64)
 
+    if files_exist(ma27_sources):
+        retval = os.getcwd()
+        os.chdir('hsl/solvers/src')
+        call(['cython', '-I', cysparse_rootdir[0], '_cyma27_cysparse_INT32_FLOAT32.pyx'])
+        os.chdir(retval)
+        cyma27_cysparse_ext_params_INT32_FLOAT32 = copy.deepcopy(ext_params)
+        cyma27_cysparse_ext_params_INT32_FLOAT32['define_macros'] = [('HSL_FLOAT32', None)]
+        cyma27_cysparse_ext_params_INT32_FLOAT32['include_dirs'].extend(cysparse_rootdir)
+        config.add_extension(name="solvers.src._cyma27_cysparse_INT32_FLOAT32",
+                     sources=['hsl/solvers/src/_cyma27_cysparse_INT32_FLOAT32.c'],
+                     **cyma27_cysparse_ext_params_INT32_FLOAT32)
+
+    if files_exist(ma57_sources):
+        retval = os.getcwd()
+        os.chdir('hsl/solvers/src')
+        call(['cython', '-I', cysparse_rootdir[0], '_cyma57_cysparse_INT32_FLOAT32.pyx'])
+        os.chdir(retval)
+        cyma57_cysparse_ext_params_INT32_FLOAT32 = copy.deepcopy(ext_params)
+        cyma57_cysparse_ext_params_INT32_FLOAT32['define_macros'] = [('HSL_FLOAT32', None)]
+        cyma57_cysparse_ext_params_INT32_FLOAT32['include_dirs'].extend(cysparse_rootdir)
+        config.add_extension(name="solvers.src._cyma57_cysparse_INT32_FLOAT32",
+                     sources=['hsl/solvers/src/_cyma57_cysparse_INT32_FLOAT32.c'],
+                     **cyma57_cysparse_ext_params_INT32_FLOAT32)
+
 
 packages_list = ['hsl', 'hsl.ordering', 'hsl.scaling', 'hsl.solvers',
                  'hsl.solvers.src', 'hsl.tools']
@@ -0,0 +1,25 @@
+"""Example matrices shared by the tests."""
+
+import numpy as np
+
+
+def ma57_spec_sheet_coo():
+    """The example from the MA57 spec sheet in coordinate format."""
+    arow = np.array([0, 0, 1, 1, 2, 2, 4], dtype=np.int32)
+    acol = np.array([0, 1, 2, 4, 2, 3, 4], dtype=np.int32)
+    aval = np.array([2.0, 3.0, 4.0, 6.0, 1.0, 5.0, 1.0], dtype=np.float64)
+    rhs = np.array([8, 45, 31, 15, 17], dtype=np.float64)
+    return (arow, acol, aval, rhs)
+
+
+def kkt_coo():
+    """A KKT matrix [H J^T; J 0] whose H needs a shift larger than 1.
+
+    H = diag(1, -3) and J = [1 1]. The lower triangle is given in coordinate
+    format, and the inertia is (2, 1, 0) once H + delta I is positive
+    definite on the null space of J, i.e., for delta > 1.
+    """
+    arow = np.array([0, 1, 2, 2], dtype=np.int32)
+    acol = np.array([0, 1, 0, 1], dtype=np.int32)
+    aval = np.array([1.0, -3.0, 1.0, 1.0])
+    return (arow, acol, aval)
@@ -0,0 +1,85 @@
+"""Tests relative to the serialization and caching of symbolic analyses."""
+
+import numpy as np
+from unittest import TestCase
+import pytest
+
+analysis = pytest.importorskip("hsl.solvers.analysis")
+
+
+class Test_Analysis(TestCase):
+
+    def setUp(self):
+        self.irow = np.array([0, 1, 2, 2, 4], dtype=np.int32)
+        self.jcol = np.array([0, 0, 1, 2, 4], dtype=np.int32)
+        self.key = analysis.pattern_key(5, self.irow, self.jcol)
+
+    def test_pattern_key(self):
+        assert self.key == analysis.pattern_key(5, self.irow.astype(np.int64),
+                                                list(self.jcol))
+        assert self.key != analysis.pattern_key(6, self.irow, self.jcol)
+        assert self.key != analysis.pattern_key(5, self.jcol, self.irow)
+
+    def test_pack_unpack_ma57(self):
+        keep = np.arange(40, dtype=np.int32)
+        info = np.arange(40, dtype=np.int32)
+        rinfo = np.linspace(0, 1, 20)
+        blob = analysis.pack_ma57_analysis(self.key, 5, 5, keep, info, rinfo,
+                                           100, 200)
+        (keep2, info2, rinfo2, lfact, lifact) = \
+            analysis.unpack_ma57_analysis(blob, self.key, 5, 5)
+        assert np.array_equal(keep, keep2)
+        assert np.array_equal(info, info2)
+        assert np.array_equal(rinfo, rinfo2)
+        assert (lfact, lifact) == (100, 200)
+
+    def test_pack_unpack_ma27(self):
+        ikeep = np.arange(15, dtype=np.int32)
+        iw1 = np.arange(10, dtype=np.int32)
+        info = np.arange(20, dtype=np.int32)
+        blob = analysis.pack_ma27_analysis(self.key, 5, 5, ikeep, iw1, 3, info,
+                                           12.0, 100, 200)
+        (ikeep2, iw12, nsteps, info2, ops, la, liw) = \
+            analysis.unpack_ma27_analysis(blob, self.key, 5, 5)
+        assert np.array_equal(ikeep, ikeep2)
+        assert np.array_equal(iw1, iw12)
+        assert np.array_equal(info, info2)
+        assert (nsteps, ops, la, liw) == (3, 12.0, 100, 200)
+        with pytest.raises(ValueError):
+            analysis.unpack_ma57_analysis(blob, self.key, 5, 5)
+
+    def test_unpack_mismatch(self):
+        blob = analysis.pack_ma57_analysis(self.key, 5, 5, np.zeros(40),
+                                           np.zeros(40), np.zeros(20), 1, 1)
+        other = analysis.pattern_key(5, self.jcol, self.irow)
+        with pytest.raises(ValueError):
+            analysis.unpack_ma57_analysis(blob, other, 5, 5)
+        with pytest.raises(ValueError):
+            analysis.unpack_ma57_analysis(blob[:-4], self.key, 5, 5)
+        with pytest.raises(ValueError):
+            analysis.unpack_ma57_analysis(b'garbage', self.key, 5, 5)
+
+
+class Test_AnalysisCache(TestCase):
+
+    def test_lru(self):
+        cache = analysis.AnalysisCache(maxsize=2)
+        cache.put('a', b'1')
+        cache.put('b', b'2')
+        assert cache.get('a') == b'1'
+        cache.put('c', b'3')           # evicts 'b', the least recently used
+        assert 'b' not in cache
+        assert cache.get('b') is None
+        assert cache.get('c') == b'3'
+        assert cache.stats() == {'hits': 2, 'misses': 1, 'evictions': 1,
+                                 'size': 2, 'maxsize': 2}
+        cache.resize(1)
+        assert len(cache) == 1 and 'c' in cache
+        cache.clear()
+        assert len(cache) == 0 and cache.hits == 0
+
+    def test_disabled(self):
+        cache = analysis.AnalysisCache(maxsize=0)
+        cache.put('a', b'1')
+        assert cache.get('a') is None
+        assert len(cache) == 0
@@ -0,0 +1,48 @@
+"""Tests relative to the batch solver."""
+
+import numpy as np
+from unittest import TestCase
+import pytest
+from hsl.solvers.batch import solve_batch
+from spec_sheet import ma57_spec_sheet_coo
+
+
+class Test_SolveBatch(TestCase):
+
+    def setUp(self):
+        pytest.importorskip("hsl.solvers.src._cyma57_base_INT32_FLOAT64")
+
+    def test_solve_batch(self):
+        (arow, acol, aval, rhs) = ma57_spec_sheet_coo()
+        # A KKT matrix [1 1; 1 0] of inertia (1, 1)
+        kkt = (np.array([0, 1]), np.array([0, 0]), np.array([1., 1.]))
+        matrices = [(arow, acol, k * aval) for k in range(1, 9)] + [kkt]
+        rhs_list = [rhs for k in range(1, 9)] + [np.array([3., 1.])]
+        (x, offsets, inertia, status) = solve_batch(matrices, rhs_list,
+                                                    nthreads=3)
+        assert list(offsets) == [5 * k for k in range(9)] + [42]
+        assert np.all(status == 0)
+        for k in range(1, 9):
+            xk = x[offsets[k-1]:offsets[k]]
+            assert np.allclose(xk, np.array([1., 2., 3., 4., 5.]) / k)
+            assert inertia[k-1].sum() == 5
+        assert np.allclose(x[offsets[8]:], np.array([1., 2.]))
+        assert list(inertia[8]) == [1, 1]
+
+    def test_from_scipy(self):
+        sp = pytest.importorskip("scipy.sparse")
+        (arow, acol, aval, rhs) = ma57_spec_sheet_coo()
+        A = sp.coo_matrix((aval, (arow, acol)), shape=(5, 5))
+        full = A + A.T - sp.diags(A.diagonal(), 0)
+        (x, offsets, inertia, status) = solve_batch([full.tocsr()], [rhs])
+        assert status[0] == 0
+        assert np.allclose(x, np.array([1., 2., 3., 4., 5.]))
+
+    def test_errors(self):
+        (arow, acol, aval, rhs) = ma57_spec_sheet_coo()
+        with pytest.raises(ValueError):
+            solve_batch([(arow, acol, aval)], [])
+        with pytest.raises(ValueError):
+            solve_batch([(arow, acol, aval)], [rhs[:4]])
+        (x, offsets, inertia, status) = solve_batch([], [])
+        assert x.size == 0 and list(offsets) == [0] and status.size == 0
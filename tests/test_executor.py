@@ -0,0 +1,117 @@
+"""Tests relative to the background execution of solver phases."""
+
+import threading
+import time
+import numpy as np
+from unittest import TestCase
+import pytest
+from hsl.solvers.executor import SolverExecutor, JobCancelled
+from spec_sheet import ma57_spec_sheet_coo
+
+
+class Test_SolverExecutor(TestCase):
+
+    def setUp(self):
+        self.executor = SolverExecutor(2)
+
+    def tearDown(self):
+        self.executor.close()
+
+    def test_cancel(self):
+        started = threading.Event()
+        release = threading.Event()
+        ran = []
+
+        def block():
+            started.set()
+            release.wait()
+            ran.append('block')
+
+        job = self.executor.submit([('block', block, (), {}),
+                                    ('next', ran.append, ('next',), {})])
+        started.wait()
+        assert job.phase == 'block' and not job.done()
+        assert job.cancel()
+        release.set()
+        with pytest.raises(JobCancelled):
+            job.result()
+        assert job.cancelled() and ran == ['block']
+        assert not job.cancel()
+
+    def test_result(self):
+        done = []
+        job = self.executor.submit([('sum', sum, ([1, 2, 3],), {})])
+        assert job.result(timeout=10) == 6
+        job.add_done_callback(done.append)
+        assert done == [job] and job.done() and not job.cancelled()
+
+        job = self.executor.submit([('fail', int, ('x',), {})])
+        with pytest.raises(ValueError):
+            job.result(timeout=10)
+        self.executor.close()
+        with pytest.raises(RuntimeError):
+            self.executor.submit([])
+
+    def test_phases_serialized(self):
+        # A factorization runs alone, solves of the same solver may overlap
+        class Solver(object):
+            concurrent_solves = True
+
+            def __init__(self):
+                self.lock = threading.Lock()
+                self.running = []
+                self.seen = []  # (phase, phases running when it started)
+
+            def run(self, phase):
+                with self.lock:
+                    self.seen.append((phase, list(self.running)))
+                    self.running.append(phase)
+                time.sleep(0.01)
+                with self.lock:
+                    self.running.remove(phase)
+
+            def factorize(self):
+                self.run('factorize')
+
+            def solve(self, rhs):
+                self.run('solve')
+                return rhs
+
+            def refine(self):
+                self.run('refine')
+
+        solver = Solver()
+        with SolverExecutor(4) as executor:
+            jobs = [executor.solve(solver, k) for k in range(4)]
+            jobs.append(executor.factorize(solver))
+            jobs += [executor.solve(solver, k) for k in range(4)]
+            for job in jobs:
+                job.result(timeout=10)
+        assert not executor._phase_locks  # Forgotten once the jobs are done
+        for (phase, running) in solver.seen:
+            if phase == 'factorize':
+                assert running == []
+            else:
+                assert 'factorize' not in running
+
+        # Without concurrent_solves, solves run alone as well
+        del Solver.concurrent_solves
+        solver = Solver()
+        with SolverExecutor(4) as executor:
+            jobs = [executor.solve(solver, k) for k in range(4)]
+            jobs += [executor.refine(solver) for k in range(2)]
+            for job in jobs:
+                job.result(timeout=10)
+        assert [running for (phase, running) in solver.seen] == [[]] * 6
+
+    def test_solver(self):
+        pytest.importorskip("hsl.solvers.src._cyma57_numpy_INT32_FLOAT64")
+        from hsl.solvers.src._cyma57_numpy_INT32_FLOAT64 import NumpyMA57Solver_INT32_FLOAT64
+        (arow, acol, aval, rhs) = ma57_spec_sheet_coo()
+        context = NumpyMA57Solver_INT32_FLOAT64(5, 5, 7)
+        context.get_matrix_data(arow, acol, aval)
+        x = self.executor.factorize_and_solve(context, rhs, analyze=True).result()
+        assert np.allclose(x, np.array([1., 2., 3., 4., 5.]))
+        jobs = [self.executor.solve(context, k * rhs, False) for k in range(1, 9)]
+        for (k, job) in zip(range(1, 9), jobs):
+            assert np.allclose(job.result(), k * np.array([1., 2., 3., 4., 5.]))
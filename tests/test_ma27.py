@@ -1,14 +1,28 @@
 """Tests relative to MA27."""
 
 import numpy as np
+from multiprocessing.pool import ThreadPool
 from unittest import TestCase
 from pysparse import spmatrix
 from pykrylov.linop import PysparseLinearOperator, IdentityOperator, linop_from_ndarray
 import pytest
+from spec_sheet import kkt_coo
+try:
+    from hsl.solvers.sils import DeltaPolicy
+except ImportError:
+    pass
 try:
     from hsl.solvers.pyma27 import PyMa27Solver
 except ImportError:
     pass
+try:
+    from hsl.solvers.src._cyma27_numpy_INT32_FLOAT64 import NumpyMA27Solver_INT32_FLOAT64
+except ImportError:
+    pass
+try:
+    from hsl.solvers.src._cyma27_numpy_INT32_FLOAT32 import NumpyMA27Solver_INT32_FLOAT32
+except ImportError:
+    pass
 
 
 def hilbert(n):
@@ -54,6 +68,15 @@ def ma27_spec_sheet():
     return (A, rhs)
 
 
+def ma27_spec_sheet_coo():
+    """The example from the MA27 spec sheet in coordinate format."""
+    arow = np.array([0, 0, 1, 1, 2, 2, 4], dtype=np.int32)
+    acol = np.array([0, 1, 2, 4, 2, 3, 4], dtype=np.int32)
+    aval = np.array([2.0, 3.0, 4.0, 6.0, 1.0, 5.0, 1.0], dtype=np.float64)
+    rhs = np.array([8, 45, 31, 15, 17], dtype=np.float64)
+    return (arow, acol, aval, rhs)
+
+
 class Test_MA27(TestCase):
 
     def setUp(self):
@@ -87,6 +110,89 @@ class Test_MA27(TestCase):
         sils.refine(rhs, niteref=5, tol=1e-18)
         assert np.allclose(sils.residual, np.zeros(n), 1e-18)
 
+    def test_refactorize(self):
+        (A, rhs) = ma27_spec_sheet()
+        sils = PyMa27Solver(A)
+        (val, irow, jcol) = A.find()
+        sils.refactorize(2 * val)
+        sils.solve(rhs)
+        assert np.allclose(sils.x, np.array([1., 2., 3., 4., 5.]) / 2)
+        assert sils.inertia == (3, 2, 0)
+
+    def test_analyze_perm(self):
+        (A, rhs) = ma27_spec_sheet()
+        sils = PyMa27Solver(A, perm=[4, 3, 2, 1, 0])
+        sils.solve(rhs)
+        assert np.allclose(sils.x, np.array([1., 2., 3., 4., 5.]))
+        assert sorted(sils.fetch_perm()) == [1, 2, 3, 4, 5]
+        sils.analyze(warm_start=True)
+        sils.solve(rhs)
+        assert np.allclose(sils.x, np.array([1., 2., 3., 4., 5.]))
+        with pytest.raises(ValueError):
+            sils.analyze(perm=[0, 0, 1, 2, 3])
+
+    def test_dump_load_analysis(self):
+        (A, rhs) = ma27_spec_sheet()
+        blob = PyMa27Solver(A, use_cache=False).dump_analysis()
+        sils = PyMa27Solver(A, use_cache=False)
+        sils.load_analysis(blob)
+        sils.solve(rhs)
+        assert np.allclose(sils.x, np.array([1., 2., 3., 4., 5.]))
+        with pytest.raises(ValueError):
+            PyMa27Solver(hilbert(5)).load_analysis(blob)
+
+    def test_analysis_cache(self):
+        from hsl.solvers.analysis import analysis_cache
+        analysis_cache.clear()
+        (A, rhs) = ma27_spec_sheet()
+        for k in range(3):
+            sils = PyMa27Solver(A)
+            sils.solve(rhs)
+            assert np.allclose(sils.x, np.array([1., 2., 3., 4., 5.]))
+            assert sils.inertia == (3, 2, 0)
+        assert (analysis_cache.misses, analysis_cache.hits) == (1, 2)
+
+    def test_factorize_with_inertia(self):
+        (arow, acol, aval) = kkt_coo()
+        A = spmatrix.ll_mat_sym(3, 4)
+        A.put(aval, arow, acol)
+        sils = PyMa27Solver(A)
+        (delta, inertia) = sils.factorize_with_inertia(2, 1)
+        assert inertia == (2, 1, 0) and sils.inertia == inertia
+        assert 1.0 < delta < 8.0
+        assert sils.ntrials == 7
+        # The next correction starts from a third of the last shift
+        (delta2, inertia) = sils.factorize_with_inertia(2, 1)
+        assert inertia == (2, 1, 0)
+        assert sils.ntrials == 2 and np.allclose(delta2, delta / 3)
+        sils.last_delta = 0.0
+        with pytest.raises(RuntimeError):
+            sils.factorize_with_inertia(2, 1, DeltaPolicy(1.0e-4, 1.0e-20, 1.0, 8.0, 1.0 / 3))
+        # The shifted factors are not left in place
+        assert sils.inertia == (1, 2, 0)
+
+    def test_solve_overwrite(self):
+        (A, rhs) = ma27_spec_sheet()
+        sils = PyMa27Solver(A)
+        sils.solve(rhs, get_resid=False, overwrite_b=True)
+        assert np.allclose(rhs, np.array([1., 2., 3., 4., 5.]))
+        with pytest.raises(ValueError):
+            sils.solve(rhs, overwrite_b=True)
+
+    def test_threads(self):
+        # Independent solver objects may be used from different threads
+        def solve(k):
+            (A, rhs) = ma27_spec_sheet()
+            sils = PyMa27Solver(A)
+            sils.solve(k * rhs)
+            return sils.x.copy()
+
+        pool = ThreadPool(4)
+        xs = pool.map(solve, range(1, 9))
+        pool.close()
+        for k, x in zip(range(1, 9), xs):
+            assert np.allclose(x, k * np.array([1., 2., 3., 4., 5.]))
+
     # def test_fetch_lb_perm(self):
     #     """P^T  A P = L  B  L^T"""
     #     # Example from the spec sheet
@@ -100,3 +206,360 @@ class Test_MA27(TestCase):
     #     B = PysparseLinearOperator(sils.B)
     #
     #     assert np.allclose((L * B * L.T).to_array(), (P.T * A * P).to_array())
+
+
+class Test_NumpyMA27(TestCase):
+
+    def setUp(self):
+        pytest.importorskip("hsl.solvers.src._cyma27_numpy_INT32_FLOAT64")
+        (arow, acol, aval, self.rhs) = ma27_spec_sheet_coo()
+        self.context = NumpyMA27Solver_INT32_FLOAT64(5, 5, 7)
+        self.context.get_matrix_data(arow, acol, aval)
+        self.context.analyze()
+        self.context.factorize()
+
+    def test_solve_residual(self):
+        (x, residual) = self.context.solve(self.rhs, True)
+        assert np.allclose(x, np.array([1., 2., 3., 4., 5.]))
+        assert np.allclose(residual, np.zeros(5))
+
+    def test_analyze_perm(self):
+        (arow, acol, aval, rhs) = ma27_spec_sheet_coo()
+        context = NumpyMA27Solver_INT32_FLOAT64(5, 5, 7)
+        context.get_matrix_data(arow, acol, aval)
+        with pytest.raises(ValueError):
+            context.analyze(warm_start=True)  # nothing to reuse yet
+        context.analyze(perm=np.arange(5)[::-1])
+        context.factorize()
+        x = context.solve(rhs, False)
+        assert np.allclose(x, np.array([1., 2., 3., 4., 5.]))
+        context.analyze(warm_start=True)
+        context.factorize()
+        x = context.solve(rhs, False)
+        assert np.allclose(x, np.array([1., 2., 3., 4., 5.]))
+        # Reuse the pivot order of another solver
+        context.analyze(perm=np.array(self.context.fetch_perm()) - 1)
+        context.factorize()
+        x = context.solve(rhs, False)
+        assert np.allclose(x, np.array([1., 2., 3., 4., 5.]))
+        with pytest.raises(ValueError):
+            context.analyze(perm=[0, 0, 1, 2, 3])
+        with pytest.raises(ValueError):
+            context.analyze(perm=np.arange(4))
+
+    def test_report(self):
+        events = []
+        self.context.callback = events.append
+        self.context.factorize()
+        self.context.solve(self.rhs, False)
+        report = self.context.report()
+        assert report['phases']['analyze']['calls'] == 1
+        assert report['phases']['factorize']['calls'] == 2
+        assert report['phases']['solve']['calls'] == 1
+        assert report['stats']['reallocations'] == 0
+        assert [e['phase'] for e in events] == ['factorize', 'solve']
+        assert events[0]['stats'] == report['stats']
+
+    def test_solve_threads(self):
+        # Concurrent solves and refinements against one factorization
+        def solve(k):
+            if k % 3 == 0:
+                return self.context.solve(k * self.rhs, False)
+            if k % 3 == 1:
+                return self.context.solve_many(np.outer(k * self.rhs, [1., 2.]))[:, 0]
+            rhs = k * self.rhs
+            (x, r) = self.context.solve(rhs, True)
+            assert np.allclose(r, np.zeros(5))
+            x = self.context.refine(x, rhs, r, 0.0, 2)[0]
+            assert np.array_equal(rhs, k * self.rhs)  # rhs is left untouched
+            return x
+
+        pool = ThreadPool(4)
+        xs = pool.map(solve, range(1, 33))
+        pool.close()
+        pool.join()
+        for k, x in zip(range(1, 33), xs):
+            assert np.allclose(x, k * np.array([1., 2., 3., 4., 5.]))
+        assert self.context.report()['phases']['solve']['calls'] == 32
+        assert self.context.report()['phases']['refine']['calls'] == 11
+
+    def test_workspace_reuse(self):
+        for k in range(10):
+            (x, r) = self.context.solve(self.rhs, True)
+            self.context.refine(x, self.rhs, r, 0.0, 2)
+            self.context.solve_many(np.ones((5, 2)))
+        stats = self.context.workspace_stats()
+        assert stats['solves'] == 30
+        assert stats['allocations'] <= 3
+        assert len(stats['lw']) == 1 and stats['lw'][0] >= 1
+
+    def test_event_log(self):
+        from hsl.solvers.report import EVENTS
+        log = self.context.event_log()
+        events = [EVENTS[e] for e in log['event']]
+        assert events[0] == 'init' and (log['size1'][0], log['size2'][0]) == (5, 7)
+        assert events[-1] == 'factorize'
+        assert np.all(np.diff(log['time']) >= 0)
+        self.context.solve(self.rhs, False)
+        log = self.context.event_log()
+        assert EVENTS[log['event'][-1]] == 'solve' and log['size1'][-1] == 1
+        self.context.clear_log()
+        assert self.context.event_log().size == 0
+
+    def test_headroom(self):
+        from hsl.solvers.analysis import factor_size_cache
+        assert self.context.headroom == 1.2
+        with pytest.raises(ValueError):
+            self.context.headroom = 0.5
+        self.context.headroom = 1.5
+        assert self.context.headroom == 1.5
+        # The sizes recorded for the pattern are used by a new analysis
+        (arow, acol, aval, rhs) = ma27_spec_sheet_coo()
+        context = NumpyMA27Solver_INT32_FLOAT64(5, 5, 7)
+        context.get_matrix_data(arow, acol, aval)
+        factor_size_cache.put(('ma27', context.pattern_key()), (1000, 1000))
+        try:
+            context.analyze()
+            context.factorize()
+            assert context.stats()[3:5] == (0, 0)
+            assert context.report()['stats']['reallocations'] == 0
+            x = context.solve(rhs, False)
+            assert np.allclose(x, np.array([1., 2., 3., 4., 5.]))
+        finally:
+            factor_size_cache.clear()
+
+    def test_pivot_tol(self):
+        # A rank-deficient factorization is accepted with the tolerance
+        # that produced it, which is not raised from one call to the next
+        arow = np.array([0, 1, 1, 2], dtype=np.int32)
+        acol = np.array([0, 0, 1, 2], dtype=np.int32)
+        aval = np.array([1., 1., 1., 2.])
+        context = NumpyMA27Solver_INT32_FLOAT64(3, 3, 4)
+        context.get_matrix_data(arow, acol, aval)
+        context.analyze(use_cache=False)
+        tol = context.pivot_tol
+        for k in range(3):
+            context.factorize()
+            assert context.pivot_retries == 0 and context.pivot_tol == tol
+        assert context.report()['stats']['pivot_retries'] == 0
+        with pytest.raises(ValueError):
+            context.relax_after = -1
+        context.relax_after = 1
+        context.pivot_tol = 10 * tol
+        context.factorize()
+        assert context.pivot_tol == 10 * tol  # Not relaxed below its setting
+
+    def test_refactorize(self):
+        (arow, acol, aval, rhs) = ma27_spec_sheet_coo()
+        self.context.refactorize(2 * aval)
+        x = self.context.solve(rhs, False)
+        assert np.allclose(x, np.array([1., 2., 3., 4., 5.]) / 2)
+
+    def test_analysis_cache(self):
+        from hsl.solvers.analysis import analysis_cache
+        analysis_cache.clear()
+        (arow, acol, aval, rhs) = ma27_spec_sheet_coo()
+        for k in range(2):
+            context = NumpyMA27Solver_INT32_FLOAT64(5, 5, 7)
+            context.get_matrix_data(arow, acol, aval)
+            context.analyze()
+            context.factorize()
+            x = context.solve(rhs, False)
+            assert np.allclose(x, np.array([1., 2., 3., 4., 5.]))
+        assert (analysis_cache.misses, analysis_cache.hits) == (1, 1)
+
+    def test_solve_out(self):
+        x = np.empty(5)
+        r = np.empty(5)
+        (x2, r2) = self.context.solve(self.rhs, True, out=x, residual_out=r)
+        assert x2 is x and r2 is r
+        assert np.allclose(x, np.array([1., 2., 3., 4., 5.]))
+        assert np.allclose(r, np.zeros(5))
+        (x2, r2) = self.context.refine(x, self.rhs, r, out=x, residual_out=r)
+        assert x2 is x and r2 is r
+        assert np.allclose(x, np.array([1., 2., 3., 4., 5.]))
+        b = self.rhs.copy()
+        with pytest.raises(ValueError):
+            self.context.refine(x, b, r, out=b, residual_out=r)
+        with pytest.raises(ValueError):
+            self.context.refine(x, self.rhs, r, out=x, residual_out=x)
+        b = self.rhs.copy()
+        assert self.context.solve(b, False, overwrite_rhs=True) is b
+        assert np.allclose(b, np.array([1., 2., 3., 4., 5.]))
+        with pytest.raises(ValueError):
+            self.context.solve(self.rhs, False, out=np.empty(4))
+        X = np.empty((5, 2), order='F')
+        assert self.context.solve_many(np.ones((5, 2)), out=X) is X
+        assert np.allclose(X[:, 0], X[:, 1])
+
+    def test_factorize_solve_batch(self):
+        # Members share the analysis and leave the solver's factors alone
+        (arow, acol, aval, rhs) = ma27_spec_sheet_coo()
+        scales = np.arange(1.0, 9.0)
+        (X, inertia, status) = self.context.factorize_solve_batch(
+            np.outer(scales, aval), np.tile(rhs, (8, 1)), nthreads=3)
+        assert not np.any(status)
+        assert np.allclose(X * scales[:, None], np.arange(1.0, 6.0))
+        assert np.allclose(self.context.solve(self.rhs, False),
+                           np.array([1., 2., 3., 4., 5.]))
+
+        (arow, acol, aval) = kkt_coo()
+        context = NumpyMA27Solver_INT32_FLOAT64(3, 3, 4)
+        context.get_matrix_data(arow, acol, aval)
+        with pytest.raises(RuntimeError):
+            context.factorize_solve_batch(aval[None, :], np.ones((1, 3)))
+        context.analyze(use_cache=False)
+        deltas = np.array([0.0, 2.0, 0.5, 4.0])
+        values = np.tile(aval, (4, 1))
+        values[:, :2] += deltas[:, None]
+        rhs = np.array([[1.0 + d, 0.0, 1.0] for d in deltas])
+        (X, inertia, status) = context.factorize_solve_batch(values, rhs)
+        assert not np.any(status)
+        assert np.allclose(X, np.array([1.0, 0.0, 0.0]))
+        assert inertia.tolist() == [[1, 2], [2, 1], [1, 2], [2, 1]]
+        with pytest.raises(ValueError):
+            context.factorize_solve_batch(values[:, :3], rhs)
+        with pytest.raises(ValueError):
+            context.factorize_solve_batch(values, rhs[:3])
+
+    def test_factorize_with_inertia(self):
+        (arow, acol, aval) = kkt_coo()
+        context = NumpyMA27Solver_INT32_FLOAT64(3, 3, 4)
+        context.get_matrix_data(arow, acol, aval)
+        context.analyze(use_cache=False)
+        (delta, inertia) = context.factorize_with_inertia(2, 1)
+        assert inertia == (2, 1, 0)
+        assert 1.0 < delta < 8.0
+        assert context.ntrials == 7 and context.last_delta == delta
+        # The factors are those of the shifted matrix
+        x = context.solve(np.array([1.0 + delta, 0.0, 1.0]), False)
+        assert np.allclose(x, np.array([1.0, 0.0, 0.0]))
+        with pytest.raises(RuntimeError):
+            context.factorize_with_inertia(2, 1, DeltaPolicy(1.0e-4, 1.0e-20, 1.0, 8.0, 1.0 / 3))
+        # The shifted factors are not left in place
+        assert context.factorized
+        x = context.solve(np.array([4.0, -3.0, 3.0]), False)
+        assert np.allclose(x, np.array([1.0, 2.0, 3.0]))
+
+    def test_free(self):
+        (arow, acol, aval, rhs) = ma27_spec_sheet_coo()
+        with NumpyMA27Solver_INT32_FLOAT64(5, 5, 7) as context:
+            context.get_matrix_data(arow, acol, aval)
+            context.analyze()
+            context.factorize()
+            x = context.solve(rhs, False)
+        assert np.allclose(x, np.array([1., 2., 3., 4., 5.]))
+        with pytest.raises(RuntimeError):
+            context.solve(rhs, False)
+        with pytest.raises(RuntimeError):
+            context.headroom
+        with pytest.raises(RuntimeError):
+            context.pivot_tol
+        with pytest.raises(RuntimeError):
+            context.pivot_retries
+        with pytest.raises(RuntimeError):
+            context.relax_after
+        context.free()  # releasing twice is harmless
+
+    def test_solve_many(self):
+        B = np.empty((5, 2), order='F')
+        B[:, 0] = self.rhs
+        B[:, 1] = 3 * self.rhs
+        (X, R) = self.context.solve_many(B, get_resid=True)
+        x = np.array([1., 2., 3., 4., 5.])
+        assert np.allclose(X[:, 0], x)
+        assert np.allclose(X[:, 1], 3 * x)
+        assert np.allclose(R, np.zeros((5, 2)))
+
+    def test_compressed(self):
+        (arow, acol, aval, rhs) = ma27_spec_sheet_coo()
+        A = np.zeros((5, 5))
+        A[arow, acol] = aval
+        A = A + A.T - np.diag(A.diagonal())
+        x = np.array([1., 2., 3., 4., 5.])
+        for B in (A, np.tril(A), np.triu(A)):
+            (col, row) = np.nonzero(B.T)  # column by column
+            indptr = np.concatenate(([0], np.cumsum((B != 0).sum(axis=0))))
+            context = NumpyMA27Solver_INT32_FLOAT64.from_csc(5, indptr, row, B[row, col])
+            context.analyze()
+            context.factorize()
+            assert np.allclose(context.solve(rhs, False), x)
+            # the CSR arrays of B.T are the CSC arrays of B
+            context = NumpyMA27Solver_INT32_FLOAT64.from_csr(5, indptr, row, B[row, col])
+            context.analyze()
+            context.factorize()
+            assert np.allclose(context.solve(rhs, False), x)
+        with pytest.raises(ValueError):
+            NumpyMA27Solver_INT32_FLOAT64.from_csc(5, indptr, row + 1, B[row, col])
+        B = np.tril(A)
+        (col, row) = np.nonzero(B.T)
+        indptr = np.concatenate(([0], np.cumsum((B != 0).sum(axis=0))))
+        indptr[-1] -= 1  # drops the last entry
+        with pytest.raises(ValueError):
+            self.context.get_csc_data(indptr, row, B[row, col])
+
+        # Each off-diagonal entry given once, in either triangle
+        B = np.tril(A)
+        B[0, 1], B[1, 0] = B[1, 0], 0.0
+        B[1, 4], B[4, 1] = B[4, 1], 0.0
+        (col, row) = np.nonzero(B.T)
+        indptr = np.concatenate(([0], np.cumsum((B != 0).sum(axis=0))))
+        context = NumpyMA27Solver_INT32_FLOAT64.from_csc(5, indptr, row, B[row, col])
+        context.analyze()
+        context.factorize()
+        assert np.allclose(context.solve(rhs, False), x)
+
+        # Full storage is told from the pattern: roundoff in the mirrored
+        # values is tolerated, a real mismatch is rejected
+        B = A.copy()
+        B[1, 0] *= 1 + 1e-14
+        (col, row) = np.nonzero(B.T)
+        indptr = np.concatenate(([0], np.cumsum((B != 0).sum(axis=0))))
+        context = NumpyMA27Solver_INT32_FLOAT64.from_csc(5, indptr, row, B[row, col])
+        context.analyze()
+        context.factorize()
+        assert np.allclose(context.solve(rhs, False), x)
+        B[1, 0] += 1.0
+        with pytest.raises(ValueError):
+            NumpyMA27Solver_INT32_FLOAT64.from_csc(5, indptr, row, B[row, col])
+
+    def test_from_scipy(self):
+        sp = pytest.importorskip("scipy.sparse")
+        (arow, acol, aval, rhs) = ma27_spec_sheet_coo()
+        A = sp.coo_matrix((aval, (arow, acol)), shape=(5, 5))
+        x = np.array([1., 2., 3., 4., 5.])
+        full = A + A.T - sp.diags(A.diagonal(), 0)
+        for B in (A, A.tocsr(), A.tocsc(), full.tocsr(), full.tocsc()):
+            context = NumpyMA27Solver_INT32_FLOAT64.from_scipy(B)
+            context.analyze()
+            context.factorize()
+            assert np.allclose(context.solve(rhs, False), x)
+
+
+class Test_NumpyMA27_FLOAT32(TestCase):
+
+    def setUp(self):
+        pytest.importorskip("hsl.solvers.src._cyma27_numpy_INT32_FLOAT32")
+        (arow, acol, aval, rhs) = ma27_spec_sheet_coo()
+        self.rhs = rhs.astype(np.float32)
+        self.context = NumpyMA27Solver_INT32_FLOAT32(5, 5, 7)
+        self.context.get_matrix_data(arow, acol, aval.astype(np.float32))
+        self.context.analyze(use_cache=False)
+        self.context.factorize()
+
+    def test_solve(self):
+        x = self.context.solve(self.rhs, False)
+        assert x.dtype == np.float32
+        assert np.allclose(x, np.array([1., 2., 3., 4., 5.]), rtol=1e-5)
+        X = self.context.solve_many(np.ones((5, 2), dtype=np.float32))
+        assert X.dtype == np.float32
+        assert np.allclose(X[:, 0], X[:, 1])
+
+    def test_same_analysis(self):
+        (arow, acol, aval, rhs) = ma27_spec_sheet_coo()
+        context = NumpyMA27Solver_INT32_FLOAT64(5, 5, 7)
+        context.get_matrix_data(arow, acol, aval)
+        context.load_analysis(self.context.dump_analysis())
+        context.factorize()
+        assert context.fetch_perm() == self.context.fetch_perm()
+        assert np.allclose(context.solve(rhs, False), np.array([1., 2., 3., 4., 5.]))
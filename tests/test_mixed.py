@@ -0,0 +1,70 @@
+"""Tests relative to the mixed precision solver."""
+
+import numpy as np
+from unittest import TestCase
+import pytest
+try:
+    from hsl.solvers.mixed import MixedPrecisionSolver
+except ImportError:
+    pass
+
+
+def laplacian_1d(n, shift=0.0):
+    """Return the lower triangle of tridiag(-1, 2 - shift, -1)."""
+    idx = np.arange(n, dtype=np.int32)
+    arow = np.concatenate((idx, idx[1:])).astype(np.int32)
+    acol = np.concatenate((idx, idx[:-1])).astype(np.int32)
+    aval = np.concatenate(((2.0 - shift) * np.ones(n), -np.ones(n - 1)))
+    return (arow, acol, aval)
+
+
+class Test_MixedPrecision(TestCase):
+
+    def setUp(self):
+        pytest.importorskip("hsl.solvers.src._cyma57_numpy_INT32_FLOAT32")
+        pytest.importorskip("hsl.solvers.src._cyma27_numpy_INT32_FLOAT32")
+
+    def test_refine(self):
+        n = 50
+        (arow, acol, aval) = laplacian_1d(n)
+        e = np.random.RandomState(0).rand(n)
+        b = 2 * e
+        b[1:] -= e[:-1]
+        b[:-1] -= e[1:]  # A e
+        for solver in ('ma27', 'ma57'):
+            P = MixedPrecisionSolver(n, arow, acol, aval, solver=solver)
+            x = P.solve(b)
+            assert not P.fallback
+            assert P.nitref >= 1
+            assert np.allclose(x, e, rtol=0, atol=1e-10)
+            assert np.max(np.abs(P.residual)) <= 1e-13
+
+    def test_fallback(self):
+        # A is indefinite and nearly singular in single precision
+        n = 50
+        (arow, acol, aval) = laplacian_1d(n, shift=2 - 2 * np.cos(np.pi / (n + 1)) - 1e-7)
+        b = np.ones(n)
+        P = MixedPrecisionSolver(n, arow, acol, aval, maxitref=3)
+        x = P.solve(b)
+        assert P.fallback
+        assert np.max(np.abs(P.residual)) <= 1e-8 * np.max(np.abs(x))
+        P.refactorize(2 * aval)
+        assert not P.fallback
+
+    def test_out_of_range(self):
+        # The values overflow in single precision, whose solution is not finite
+        n = 10
+        (arow, acol, aval) = laplacian_1d(n)
+        e = np.ones(n)
+        b = np.zeros(n)
+        b[0] = b[-1] = 1.0e39  # A e
+        for solver in ('ma27', 'ma57'):
+            P = MixedPrecisionSolver(n, arow, acol, 1.0e39 * aval, solver=solver)
+            x = P.solve(b)
+            assert P.fallback
+            assert np.allclose(x, e)
+
+    def test_bad_solver(self):
+        (arow, acol, aval) = laplacian_1d(3)
+        with pytest.raises(ValueError):
+            MixedPrecisionSolver(3, arow, acol, aval, solver='ma97')
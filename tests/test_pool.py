@@ -0,0 +1,49 @@
+"""Tests relative to the process pool."""
+
+import numpy as np
+from unittest import TestCase
+import pytest
+from hsl.solvers.pool import FactorizationPool
+from spec_sheet import ma57_spec_sheet_coo
+
+
+class Test_FactorizationPool(TestCase):
+
+    def setUp(self):
+        pytest.importorskip("hsl.solvers.src._cyma57_numpy_INT32_FLOAT64")
+        self.pool = FactorizationPool(2)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_solve(self):
+        (arow, acol, aval, rhs) = ma57_spec_sheet_coo()
+        handles = [self.pool.factorize((arow, acol, k * aval))
+                   for k in range(1, 5)]
+        for (k, handle) in zip(range(1, 5), handles):
+            x = self.pool.solve(handle, rhs)
+            assert np.allclose(k * x, np.array([1., 2., 3., 4., 5.]))
+        X = self.pool.solve(handles[0], np.outer(rhs, [1., 2.]))
+        assert X.shape == (5, 2)
+        assert np.allclose(X[:, 1], np.array([2., 4., 6., 8., 10.]))
+
+        # The factorization stays in its worker and may be updated
+        self.pool.refactorize(handles[0], 2 * aval)
+        assert np.allclose(self.pool.solve(handles[0], 2 * rhs),
+                           np.array([1., 2., 3., 4., 5.]))
+
+    def test_errors(self):
+        (arow, acol, aval, rhs) = ma57_spec_sheet_coo()
+        handle = self.pool.factorize((arow, acol, aval), n=5)
+        with pytest.raises(ValueError):
+            self.pool.solve(handle, rhs[:4])
+        with pytest.raises(ValueError):
+            self.pool.refactorize(handle, aval[:4])
+        self.pool.release(handle)
+        with pytest.raises(ValueError):
+            self.pool.solve(handle, rhs)
+        with pytest.raises(ValueError):
+            self.pool.factorize((arow, acol[:4], aval))
+        self.pool.close()
+        with pytest.raises(RuntimeError):
+            self.pool.factorize((arow, acol, aval))
@@ -0,0 +1,84 @@
+"""Tests relative to the timing and statistics reports of the solvers."""
+
+import threading
+import numpy as np
+from unittest import TestCase
+import pytest
+
+report = pytest.importorskip("hsl.solvers.report")
+
+
+class Test_SolverReport(TestCase):
+
+    def setUp(self):
+        self.events = []
+        self.report = report.SolverReport('solver', self.events.append)
+
+    def test_phases(self):
+        for k in range(3):
+            t = self.report.start()
+            self.report.stop('solve', t)
+        phases = self.report.as_dict({})['phases']
+        assert set(phases) == set(report.PHASES)
+        assert phases['solve']['calls'] == 3
+        assert phases['solve']['wall'] >= 0 and phases['solve']['cpu'] >= 0
+        assert phases['factorize']['calls'] == 0
+        # The report is a copy
+        phases['solve']['calls'] = 0
+        assert self.report.phases['solve']['calls'] == 3
+        self.report.reset()
+        assert self.report.phases['solve']['calls'] == 0
+
+    def test_threads(self):
+        def record():
+            for k in range(1000):
+                self.report.stop('solve', self.report.start())
+        self.report.callback = None
+        threads = [threading.Thread(target=record) for k in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert self.report.phases['solve']['calls'] == 4000
+
+    def test_callback(self):
+        t = self.report.start()
+        self.report.stop('factorize', t, lambda: {'neig': 1})
+        self.report.stop('solve', t)
+        assert [e['phase'] for e in self.events] == ['factorize', 'solve']
+        assert self.events[0]['solver'] == 'solver'
+        assert self.events[0]['stats'] == {'neig': 1}
+        assert 'stats' not in self.events[1]
+        self.report.callback = None
+        self.report.stop('solve', t, lambda: 1 / 0)  # stats not computed
+        assert len(self.events) == 2
+
+    def test_stats(self):
+        info = np.arange(40)
+        rinfo = np.arange(20.0)
+        stats = report.ma57_stats(info, rinfo, 1, 2)
+        assert stats['predicted_flops'] == 1.0 and stats['flops'] == 5.0
+        assert stats['delayed_pivots'] == 22
+        assert (stats['reallocations'], stats['workspace_allocations']) == (1, 2)
+        assert (stats['restarts'], stats['copies']) == (0, 0)
+        stats = report.ma57_stats(info, rinfo, 1, 2, 3, 4)
+        assert (stats['restarts'], stats['copies']) == (3, 4)
+        stats = report.ma27_stats(info[:20], 3.0, 4)
+        assert stats['predicted_flops'] == 3.0 and stats['neig'] == 14
+        assert stats['reallocations'] == 4
+        assert stats['pivot_retries'] == 0
+        stats = report.ma27_stats(info[:20], 3.0, 4, 2, 0.5)
+        assert (stats['pivot_retries'], stats['pivot_tol']) == (2, 0.5)
+
+    def test_event_log_array(self):
+        assert report.EVENT_DTYPE.itemsize == 32  # sizeof(HSL_Event)
+        events = np.zeros(2, dtype=report.EVENT_DTYPE)
+        events['event'] = [report.EVENTS.index('resize_real'),
+                           report.EVENTS.index('error')]
+        events['code'] = [-4, -5]
+        events['size1'] = [100, 3]
+        events['size2'] = [120, 0]
+        log = report.event_log_array(events.tobytes())
+        assert np.array_equal(log, events)
+        log['code'] = 0  # the log is writable
+        assert report.event_log_array(b'').size == 0